@@ -13,12 +13,28 @@ from scipy.integrate import solve_ivp
 import warnings
 from collections import OrderedDict
 import functools
+import glob
+import hashlib
+import io
+import os
+import pickle
+import queue
+import tempfile
+import threading
+import zipfile
 
 from ..core.equilibrium import Equilibrium, EquilibriumRegion, Point2D
-from ..core.mesh import MultiLocationArray
+from ..core.mesh import BoutMesh, handleMultiLocationArray
 
 from ..utils import critical, polygons
 from ..utils.utils import with_default
+from ..__version__ import get_versions
+
+
+def _zero_profile(psi):
+    # Module-level function rather than a lambda so that TokamakEquilibrium can be
+    # pickled
+    return 0.0
 
 
 class TokamakEquilibrium(Equilibrium):
@@ -244,8 +260,76 @@ class TokamakEquilibrium(Equilibrium):
             value_type=float,
             check_all=[is_positive, lambda x: x < 1.0],
         ),
+        geqdsk_cache_dir=WithMeta(
+            None,
+            doc=(
+                "Directory for a cache of parsed G-EQDSK files, so that read_geqdsk() "
+                "does not have to parse the same file again. None disables the cache"
+            ),
+            value_type=[str, NoneType],
+        ),
+        geqdsk_cache_spline=WithMeta(
+            True,
+            doc=(
+                "Also store the coefficients of the spline interpolating psi in the "
+                "G-EQDSK cache, so it does not have to be created again"
+            ),
+            value_type=bool,
+        ),
+        geqdsk_cache_max_size=WithMeta(
+            1.0e9,
+            doc=(
+                "Maximum total size in bytes of the files in the G-EQDSK cache. Entries "
+                "are removed when it is exceeded, according to geqdsk_cache_eviction. "
+                "None for no limit"
+            ),
+            value_type=[float, int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
+        geqdsk_cache_eviction=WithMeta(
+            "least_recently_used",
+            doc=(
+                "Which entries to remove first when the G-EQDSK cache is too big: the "
+                "'least_recently_used' or the 'oldest'"
+            ),
+            value_type=str,
+            allowed=["least_recently_used", "oldest"],
+        ),
+        stage_cache_dir=WithMeta(
+            None,
+            doc=(
+                "Directory for a cache of the results of the stages of creating a grid "
+                "with read_geqdsk_mesh() (equilibrium, mesh, R and Z, geometry), so "
+                "that a run with some options changed can start from the last stage "
+                "that does not use them. None disables the cache. The entries are "
+                "pickle files, so only use a directory that you trust"
+            ),
+            value_type=[str, NoneType],
+        ),
+        stage_cache_max_size=WithMeta(
+            1.0e10,
+            doc=(
+                "Maximum total size in bytes of the files in the stage cache. The least "
+                "recently used entries are removed when it is exceeded. None for no "
+                "limit"
+            ),
+            value_type=[float, int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
     )
 
+    # Options that do not change the equilibrium, used to key the entries of a
+    # StageCache. All other options (and all nonorthogonal options) are used in the
+    # "equilibrium" stage.
+    option_stages = {
+        "geqdsk_cache_dir": None,
+        "geqdsk_cache_spline": None,
+        "geqdsk_cache_max_size": None,
+        "geqdsk_cache_eviction": None,
+        "stage_cache_dir": None,
+        "stage_cache_max_size": None,
+    }
+
     def __init__(
         self,
         R1D,
@@ -260,6 +344,8 @@ class TokamakEquilibrium(Equilibrium):
         make_regions=True,
         settings=None,
         nonorthogonal_settings=None,
+        psi_func=None,
+        previous=None,
     ):
         """
         Create a Tokamak equilibrium.
@@ -296,8 +382,27 @@ class TokamakEquilibrium(Equilibrium):
                (self.user_options)
         nonorthogonal_settings = A dict that will be used to set non-default values of
                options (self.nonorthogonal_options)
+        psi_func = RectBivariateSpline
+               Spline interpolating psi2D, if it has already been created (e.g. loaded
+               from a GeqdskCache). Ignored if dct=True.
+        previous = TokamakEquilibrium
+               Equilibrium for a nearby time (e.g. the previous slice of a time series)
+               with the same topology. Its O- and X-points are refined for the new psi
+               instead of searching the whole grid for critical points, and the
+               FineContours of its regions are used as initial guesses for the
+               FineContours of the regions of this equilibrium. Falls back to
+               find_critical() if the critical points cannot be refined.
 
         """
+        # Identifies the poloidal field, so that things that depend only on the field
+        # (e.g. PerpendicularTrajectoryCache) can be re-used by a new
+        # TokamakEquilibrium created from the same input
+        field_hash = hashlib.sha256()
+        for a in [R1D, Z1D, psi2D]:
+            field_hash.update(np.ascontiguousarray(a, dtype=float).tobytes())
+        field_hash.update(str(dct).encode())
+        self.field_hash = field_hash.hexdigest()
+
         if dct:
             # Create an interpolation
             # This sets the functions
@@ -310,6 +415,8 @@ class TokamakEquilibrium(Equilibrium):
             #   self.d2psidZ2
             #   self.d2psidRdZ
             self.magneticFunctionsFromGrid(R1D, Z1D, psi2D)
+        elif psi_func is not None:
+            self.psi_func = psi_func
         else:
             self.psi_func = interpolate.RectBivariateSpline(R1D, Z1D, psi2D)
 
@@ -329,8 +436,8 @@ class TokamakEquilibrium(Equilibrium):
             # Spline representing the derivative of f
             self.fprime_spl = self.f_spl.derivative()
         else:
-            self.f_spl = lambda psi: 0.0
-            self.fprime_spl = lambda psi: 0.0
+            self.f_spl = _zero_profile
+            self.fprime_spl = _zero_profile
 
         # Optional pressure profile
         if pressure is not None:
@@ -343,7 +450,38 @@ class TokamakEquilibrium(Equilibrium):
 
         # Find critical points (O- and X-points)
         R2D, Z2D = np.meshgrid(R1D, Z1D, indexing="ij")
-        opoints, xpoints = critical.find_critical(R2D, Z2D, psi2D)
+        if dct:
+            spline = interpolate.RectBivariateSpline(R1D, Z1D, psi2D)
+        else:
+            spline = self.psi_func
+        # Candidate critical points. Their number is used to check whether critical
+        # points have appeared or disappeared since the previous equilibrium, e.g. if
+        # the topology changes from single null to double null
+        candidates = critical.find_Bp2_minima(spline, R2D, Z2D)
+        self.n_Bp2_minima = len(candidates[0])
+        self.critical_points = None
+        if previous is not None:
+            if self.n_Bp2_minima != previous.n_Bp2_minima:
+                print(
+                    "Number of candidate critical points changed from previous "
+                    "equilibrium, searching for critical points",
+                    flush=True,
+                )
+            else:
+                self.critical_points = critical.refine_critical(
+                    spline, R2D, Z2D, *previous.critical_points
+                )
+                if self.critical_points is None:
+                    print(
+                        "Could not refine critical points of previous equilibrium, "
+                        "searching for critical points",
+                        flush=True,
+                    )
+        if self.critical_points is None:
+            self.critical_points = critical.find_critical(
+                R2D, Z2D, psi2D, f=spline, candidates=candidates
+            )
+        opoints, xpoints = self.critical_points
         if len(opoints) == 0:
             warnings.warn("No O-points found in TokamakEquilibrium input")
         else:
@@ -392,6 +530,14 @@ class TokamakEquilibrium(Equilibrium):
 
         self.equilibOptions = {}
 
+        # Positions of the FineContours of the regions of the previous equilibrium, used
+        # as initial guesses in createRegionObjects()
+        self.fine_contour_guesses = {}
+        if previous is not None and hasattr(previous, "regions"):
+            for name, region in previous.regions.items():
+                if region._fine_contour is not None:
+                    self.fine_contour_guesses[name] = region._fine_contour.positions
+
         super().__init__(nonorthogonal_settings)
 
         # Print the table of options
@@ -1241,21 +1387,20 @@ class TokamakEquilibrium(Equilibrium):
 
                 return norm * end_psi + (1.0 - norm) * start_psi
 
-            # Iterate in angle from start to end
+            # Find the points at all angles from start to end together
+            angles = np.linspace(start_angle + dtheta, end_angle - dtheta, npoints)
             points = [
-                Point2D(
+                Point2D(r, z)
+                for r, z in zip(
                     *critical.find_psisurface(
                         self,
                         r0,
                         z0,
-                        r0 + 8.0 * np.cos(angle),
-                        z0 + 8.0 * np.sin(angle),
-                        psival=psival(angle),
+                        r0 + 8.0 * np.cos(angles),
+                        z0 + 8.0 * np.sin(angles),
+                        psival=psival(angles),
                     )
                 )
-                for angle in np.linspace(
-                    start_angle + dtheta, end_angle - dtheta, npoints
-                )
             ]
 
             # Add points to the beginning and end near (but not at) the X-points
@@ -1359,6 +1504,7 @@ class TokamakEquilibrium(Equilibrium):
                 points=region["points"],  # list of Point2D objects on the line
                 psival=region["psi"],
             )
+            eqreg.fine_contour_guess = self.fine_contour_guesses.get(name)
 
             # Grids of psi values in each segment
             eqreg.psi_vals = [segments[name]["psi_vals"] for name in region["segments"]]
@@ -1389,9 +1535,7 @@ class TokamakEquilibrium(Equilibrium):
 
                     assert region["psi"] is not None
                     leg_psi = region["psi"]
-                    eqreg.pressure = lambda psi: self.pressure(
-                        leg_psi + sign * abs(psi - leg_psi)
-                    )
+                    eqreg.pressure = functools.partial(self.legPressure, leg_psi, sign)
                 else:
                     # Core region, so use the core pressure
                     eqreg.pressure = self.pressure
@@ -1440,35 +1584,6 @@ class TokamakEquilibrium(Equilibrium):
             [(key, region_objects[key]) for key in ordering if key in region_objects]
         )
 
-    def handleMultiLocationArray(getResult):
-        @functools.wraps(getResult)
-        # Define a function which handles MultiLocationArray arguments
-        def handler(self, *args):
-            if isinstance(args[0], MultiLocationArray):
-                for arg in args[1:]:
-                    assert isinstance(arg, MultiLocationArray), (
-                        "if first arg is a MultiLocationArray, then others must be as "
-                        "well"
-                    )
-                result = MultiLocationArray(args[0].nx, args[0].ny)
-
-                if all(arg.centre is not None for arg in args):
-                    result.centre = getResult(self, *(arg.centre for arg in args))
-
-                if all(arg.xlow is not None for arg in args):
-                    result.xlow = getResult(self, *(arg.xlow for arg in args))
-
-                if all(arg.ylow is not None for arg in args):
-                    result.ylow = getResult(self, *(arg.ylow for arg in args))
-
-                if all(arg.corners is not None for arg in args):
-                    result.corners = getResult(self, *(arg.corners for arg in args))
-            else:
-                result = getResult(self, *args)
-            return result
-
-        return handler
-
     @handleMultiLocationArray
     def psi(self, R, Z):
         "Return the poloidal flux at the given (R,Z) location"
@@ -1516,14 +1631,279 @@ class TokamakEquilibrium(Equilibrium):
             return None
         return self.p_spl(psi * self.f_psi_sign)
 
+    def legPressure(self, leg_psi, sign, psi):
+        """
+        Plasma pressure in a leg region, reflected in poloidal flux about leg_psi so
+        that the pressure in the private flux region falls away from the separatrix
+        """
+        return self.pressure(leg_psi + sign * abs(psi - leg_psi))
+
     @property
     def Bt_axis(self):
         """Calculate toroidal field on axis"""
         return self.fpol(self.psi_axis) / self.o_point.R
 
 
+class GeqdskCache:
+    """
+    On-disk cache of parsed G-EQDSK files, and optionally of the spline of psi created
+    from them.
+
+    Each entry is a .npz file, named by a hash of the contents of the G-EQDSK file and
+    of the settings that change the spline. When the total size of the entries is more
+    than max_size, the least recently used entries (or the oldest entries, if
+    eviction="oldest") are removed.
+    """
+
+    # Extension of the files of the entries
+    suffix = ".npz"
+
+    def __init__(self, directory, max_size=None, eviction="least_recently_used"):
+        if eviction not in ["least_recently_used", "oldest"]:
+            raise ValueError(f"Unrecognised eviction={eviction}")
+        self.directory = directory
+        self.max_size = max_size
+        self.eviction = eviction
+
+    @staticmethod
+    def key(contents, **settings):
+        """
+        Key identifying the entry for a G-EQDSK file with the given contents, read using
+        settings
+        """
+        key = hashlib.sha256(contents.encode())
+        for name in sorted(settings):
+            key.update(f"{name}={settings[name]!r};".encode())
+        return key.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + self.suffix)
+
+    def load(self, key):
+        """
+        Load the entry for key
+
+        Returns
+        -------
+
+        The data dictionary returned by geqdsk._geqdsk.read() and the spline of psi
+        (None if it was not stored), or None if there is no valid entry for key
+        """
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as f:
+                arrays = {name: f[name] for name in f.files}
+        except (OSError, ValueError, zipfile.BadZipFile):
+            return None
+
+        if self.eviction == "least_recently_used":
+            os.utime(path)
+
+        psi_func = None
+        if "spline_tx" in arrays:
+            # Re-create the RectBivariateSpline from its knots and coefficients, without
+            # fitting it again
+            psi_func = interpolate.RectBivariateSpline.__new__(
+                interpolate.RectBivariateSpline
+            )
+            psi_func.tck = tuple(
+                arrays.pop(f"spline_{name}") for name in ["tx", "ty", "c"]
+            )
+            psi_func.degrees = tuple(int(k) for k in arrays.pop("spline_degrees"))
+            psi_func.fp = arrays.pop("spline_fp").item()
+
+        # Scalars were stored as 0d arrays
+        data = {
+            name: value.item() if value.ndim == 0 else value
+            for name, value in arrays.items()
+        }
+
+        print(f"Read equilibrium from cache {path}", flush=True)
+
+        return data, psi_func
+
+    def store(self, key, data, psi_func=None):
+        """
+        Store data (the dictionary returned by geqdsk._geqdsk.read()) and, optionally,
+        psi_func (a RectBivariateSpline) as the entry for key
+        """
+        arrays = dict(data)
+        if psi_func is not None:
+            for name, value in zip(["tx", "ty", "c"], psi_func.tck):
+                arrays[f"spline_{name}"] = value
+            arrays["spline_degrees"] = np.array(psi_func.degrees)
+            arrays["spline_fp"] = psi_func.fp
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write to a temporary file and then rename it, so that a partly written entry
+        # is never read
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.evict(keep=key)
+
+    def evict(self, keep=None):
+        """
+        Remove entries until the total size is at most max_size. The entry for keep is
+        not removed
+        """
+        if self.max_size is None:
+            return
+
+        entries = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        # Entries are touched when they are read with eviction="least_recently_used",
+        # so in either case the entries to remove first are the ones with the oldest
+        # modification times
+        entries.sort()
+        keep_path = None if keep is None else self._path(keep)
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            if path == keep_path:
+                continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+
+class StageCache(GeqdskCache):
+    """
+    On-disk cache of the results of the stages of read_geqdsk_mesh(): the
+    TokamakEquilibrium ("equilibrium"), the BoutMesh with its MeshRegions ("mesh"), the
+    BoutMesh after calculateRZ() ("RZ"), and after geometry() ("geometry").
+
+    Each entry is a pickle file, named by a hash of the key of the previous stage and of
+    the options used by the stage (see option_stages of TokamakEquilibrium and
+    BoutMesh), so an entry is only found if the inputs of its stage and of all the
+    stages before it are the same. When the total size of the entries is more than
+    max_size, the least recently used entries are removed.
+    """
+
+    suffix = ".pkl"
+
+    stages = ["equilibrium", "mesh", "RZ", "geometry"]
+
+    def __init__(self, directory, max_size=None):
+        super().__init__(directory, max_size=max_size)
+
+    @classmethod
+    def stageKeys(cls, contents, settings, nonorthogonal_settings, cocos=1):
+        """
+        Keys identifying the entries of each stage for a G-EQDSK file with the given
+        contents, read using settings, nonorthogonal_settings and cocos
+
+        Returns
+        -------
+
+        dict of the key of each stage
+        """
+        stage_options = {stage: {} for stage in cls.stages}
+
+        equilibrium_options = TokamakEquilibrium.user_options_factory.create(settings)
+        for name, value in equilibrium_options.items():
+            stage = TokamakEquilibrium.option_stages.get(name, "equilibrium")
+            if stage is not None:
+                stage_options[stage][name] = value
+        stage_options["equilibrium"].update(
+            TokamakEquilibrium.nonorthogonal_options_factory.create(
+                nonorthogonal_settings
+            ).items()
+        )
+
+        # Options shared with the equilibrium are already included in its key
+        mesh_options = BoutMesh.user_options_factory.create(settings)
+        for name, value in mesh_options.items():
+            if name in equilibrium_options:
+                continue
+            stage = BoutMesh.option_stages.get(name, "mesh")
+            if stage is not None:
+                stage_options[stage][name] = value
+
+        # Entries created by a different version of hypnotoad are not used
+        key = cls.key(contents, cocos=cocos, version=get_versions()["version"])
+        result = {}
+        for stage in cls.stages:
+            key = cls.key(key, stage=stage, **stage_options[stage])
+            result[stage] = key
+
+        return result
+
+    def load(self, key):
+        """
+        Load the entry for key
+
+        Returns
+        -------
+
+        The object that was stored, or None if there is no valid entry for key
+        """
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                result = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            # For example a file that was truncated, or that refers to classes that
+            # have changed since it was written
+            warnings.warn(f"Could not read stage cache entry {path}: {e}")
+            return None
+
+        os.utime(path)
+
+        print(f"Read stage from cache {path}", flush=True)
+
+        return result
+
+    def store(self, key, result):
+        """
+        Store result as the entry for key. Results that cannot be pickled (for example
+        because they refer to local functions) are not stored.
+        """
+        try:
+            data = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            warnings.warn(f"Could not store result in stage cache: {e}")
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+
+        # Write to a temporary file and then rename it, so that a partly written entry
+        # is never read
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+        self.evict(keep=key)
+
+
 def read_geqdsk(
-    filehandle, settings=None, nonorthogonal_settings=None, make_regions=True
+    filehandle, settings=None, nonorthogonal_settings=None, make_regions=True, cocos=1
 ):
     """
     Read geqdsk formatted data from a file object, returning
@@ -1534,11 +1914,15 @@ def read_geqdsk(
     filehandle   A file handle to read
     settings     dict passed to TokamakEquilibrium
     nonorthogonal_settings  dict passed to TokamakEquilibrium
+    cocos        COordinate COnventions, passed to geqdsk._geqdsk.read()
 
     Options
     -------
     reverse_current = bool  Changes the sign of poloidal flux psi
     extrapolate_profiles = bool   Extrapolate pressure using exponential
+    geqdsk_cache_dir = str  Directory of a GeqdskCache to use. See also
+                            geqdsk_cache_spline, geqdsk_cache_max_size and
+                            geqdsk_cache_eviction
     """
 
     if settings is None:
@@ -1546,8 +1930,278 @@ def read_geqdsk(
 
     from ..geqdsk._geqdsk import read as geq_read
 
-    data = geq_read(filehandle)
+    options = TokamakEquilibrium.user_options_factory.create(settings)
+
+    cache = None
+    psi_func = None
+    if options.geqdsk_cache_dir is not None:
+        cache = GeqdskCache(
+            options.geqdsk_cache_dir,
+            max_size=options.geqdsk_cache_max_size,
+            eviction=options.geqdsk_cache_eviction,
+        )
+        filehandle.seek(0)
+        geqdsk_input = filehandle.read()
+        cache_key = GeqdskCache.key(
+            geqdsk_input,
+            cocos=cocos,
+            reverse_current=settings.get("reverse_current", False),
+            extrapolate_profiles=settings.get("extrapolate_profiles", False),
+            spline=options.geqdsk_cache_spline,
+        )
+        cached = cache.load(cache_key)
+        if cached is None:
+            data = geq_read(io.StringIO(geqdsk_input), cocos=cocos)
+        else:
+            data, psi_func = cached
+            cache = None
+    else:
+        data = geq_read(filehandle, cocos=cocos)
+
+    result = _equilibrium_from_geqdsk_data(
+        data,
+        settings=settings,
+        nonorthogonal_settings=nonorthogonal_settings,
+        make_regions=make_regions,
+        psi_func=psi_func,
+    )
+
+    if cache is not None:
+        # Not found in the cache, so store the data, and the spline if needed
+        cache.store(
+            cache_key, data, result.psi_func if options.geqdsk_cache_spline else None
+        )
+
+    # Store geqdsk input as a string in the TokamakEquilibrium object so we can save it
+    # in BoutMesh.writeGridFile
+    if options.geqdsk_cache_dir is None:
+        # reset to beginning of file
+        filehandle.seek(0)
+        # read file as a single string
+        geqdsk_input = filehandle.read()
+    result.geqdsk_input = geqdsk_input
+    # also save filename, if it exists
+    if hasattr(filehandle, "name"):
+        result.geqdsk_filename = filehandle.name
+
+    return result
+
+
+def read_geqdsk_mesh(filehandle, settings=None, nonorthogonal_settings=None, cocos=1):
+    """
+    Read geqdsk formatted data from a file object, and create a BoutMesh from it,
+    including its R and Z arrays and geometrical quantities
+
+    With the stage_cache_dir option, the results of each stage (the TokamakEquilibrium,
+    the BoutMesh, its R and Z arrays, and its geometry) are stored in a StageCache, and
+    the calculation starts from the result of the last stage that is in the cache. For
+    example, if only options used by geometry() (see BoutMesh.option_stages) change,
+    only geometry() is run again.
+
+    Inputs
+    ------
+    filehandle   A file handle to read
+    settings     dict passed to TokamakEquilibrium and BoutMesh
+    nonorthogonal_settings  dict passed to TokamakEquilibrium
+    cocos        COordinate COnventions, passed to geqdsk._geqdsk.read()
+
+    Options
+    -------
+    As for read_geqdsk() and BoutMesh, and
+
+    stage_cache_dir = str  Directory of a StageCache to use. See also
+                           stage_cache_max_size
+    """
+    if settings is None:
+        settings = {}
+    if nonorthogonal_settings is None:
+        nonorthogonal_settings = {}
+
+    options = TokamakEquilibrium.user_options_factory.create(settings)
+
+    cache = None
+    stages = StageCache.stages
+    first_stage = 0
+    result = None
+    if options.stage_cache_dir is not None:
+        cache = StageCache(
+            options.stage_cache_dir, max_size=options.stage_cache_max_size
+        )
+        filehandle.seek(0)
+        keys = StageCache.stageKeys(
+            filehandle.read(), settings, nonorthogonal_settings, cocos=cocos
+        )
+        filehandle.seek(0)
+
+        # Start from the result of the last stage that is in the cache
+        for i, stage in reversed(list(enumerate(stages))):
+            result = cache.load(keys[stage])
+            if result is not None:
+                print(f"Starting after stage '{stage}'", flush=True)
+                first_stage = i + 1
+                break
+
+        if result is not None:
+            equilibrium = result if first_stage == 1 else result.equilibrium
+            if hasattr(filehandle, "name"):
+                equilibrium.geqdsk_filename = filehandle.name
+            if first_stage > 1:
+                # Options that are not used by the stages that were loaded may be
+                # different from the ones the cached BoutMesh was created with
+                result.resetOptions(settings)
+
+    for stage in stages[first_stage:]:
+        if stage == "equilibrium":
+            result = read_geqdsk(
+                filehandle,
+                settings=settings,
+                nonorthogonal_settings=nonorthogonal_settings,
+                cocos=cocos,
+            )
+        elif stage == "mesh":
+            result = BoutMesh(result, settings)
+        elif stage == "RZ":
+            result.calculateRZ()
+            # hy only depends on the R and Z arrays and the contours, and is the
+            # most expensive part of geometry(), so is stored with them
+            result.geometry_graph.evaluate("hy")
+        else:
+            result.geometry()
+
+        if cache is not None:
+            cache.store(keys[stage], result)
+
+    return result
 
+
+def read_geqdsk_series(
+    source,
+    settings=None,
+    nonorthogonal_settings=None,
+    make_regions=True,
+    cocos=1,
+    raw=False,
+    prefetch=2,
+    warm_start=False,
+):
+    """
+    Read a time series of geqdsk equilibria, yielding a TokamakEquilibrium for each time
+    slice in turn
+
+    The files are parsed on a background thread, up to prefetch time slices ahead of
+    the one being used, so reading the files overlaps with creating the equilibria,
+    while at most prefetch parsed time slices are held in memory.
+
+    Inputs
+    ------
+    source       A directory (all the files in it are read, in order of their names), a
+                 glob pattern (the matching files are read in order of their names), a
+                 file containing one or more time slices one after another, or a list
+                 of files
+    settings     dict passed to TokamakEquilibrium
+    nonorthogonal_settings  dict passed to TokamakEquilibrium
+    make_regions  passed to TokamakEquilibrium
+    cocos        COordinate COnventions, passed to geqdsk._geqdsk.read()
+    raw          If True, yield the dictionaries returned by geqdsk._geqdsk.read()
+                 instead of TokamakEquilibrium objects
+    prefetch     Number of time slices to parse ahead
+    warm_start   If True, create each TokamakEquilibrium with previous=<the
+                 TokamakEquilibrium of the previous time slice>. Create the Mesh for
+                 each time slice with previous=<the Mesh of the previous time slice>
+                 to also use the previous grid as initial guesses
+
+    Options are the same as for read_geqdsk(), except that the geqdsk_cache_* options
+    are not used.
+    """
+    from ..geqdsk._geqdsk import read_slices
+
+    if settings is None:
+        settings = {}
+    if prefetch < 1:
+        raise ValueError(f"prefetch={prefetch} should be at least 1")
+
+    if isinstance(source, (str, os.PathLike)):
+        source = os.fspath(source)
+        if os.path.isdir(source):
+            filenames = sorted(
+                os.path.join(source, name)
+                for name in os.listdir(source)
+                if os.path.isfile(os.path.join(source, name))
+            )
+        elif any(c in source for c in "*?["):
+            filenames = sorted(glob.glob(source))
+            if not filenames:
+                raise ValueError(f"No files match {source}")
+        else:
+            filenames = [source]
+    else:
+        filenames = list(source)
+
+    slices = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+
+    def put(item):
+        # Wait for space in the queue, unless the consumer has stopped
+        while not stop.is_set():
+            try:
+                slices.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def parse():
+        try:
+            for filename in filenames:
+                with open(filename, "rt") as fh:
+                    for data, text in read_slices(fh, cocos, return_text=True):
+                        if not put((filename, data, text)):
+                            return
+        except Exception as e:
+            put(e)
+        else:
+            put(None)
+
+    thread = threading.Thread(target=parse, daemon=True)
+    thread.start()
+    previous = None
+    try:
+        while True:
+            item = slices.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            filename, data, text = item
+
+            if raw:
+                yield data
+                continue
+
+            result = _equilibrium_from_geqdsk_data(
+                data,
+                settings=settings,
+                nonorthogonal_settings=nonorthogonal_settings,
+                make_regions=make_regions,
+                previous=previous,
+            )
+            result.geqdsk_input = text
+            result.geqdsk_filename = filename
+            if warm_start:
+                previous = result
+            yield result
+    finally:
+        stop.set()
+        thread.join()
+
+
+def _equilibrium_from_geqdsk_data(
+    data, settings, nonorthogonal_settings, make_regions, psi_func=None, previous=None
+):
+    """
+    Create a TokamakEquilibrium from the dictionary returned by geqdsk._geqdsk.read().
+    See read_geqdsk()
+    """
     # Range of psi normalises psi derivatives
     psi_boundary = data["sibdry"]
     psi_axis = data["simagx"]
@@ -1570,7 +2224,8 @@ def read_geqdsk(
 
     if settings.get("reverse_current", False):
         warnings.warn("Reversing the sign of the poloidal field")
-        psi2D *= -1.0
+        # Not in-place, so data["psi"] is unchanged if it is stored in the cache
+        psi2D = -psi2D
         psi1D *= -1.0
 
     # Get the wall
@@ -1599,7 +2254,7 @@ def read_geqdsk(
         # fpol constant in SOL
         fpol = np.concatenate([fpol, np.full(psiSOL.shape, fpol[-1])])
 
-    result = TokamakEquilibrium(
+    return TokamakEquilibrium(
         R1D,
         Z1D,
         psi2D,
@@ -1610,16 +2265,6 @@ def read_geqdsk(
         make_regions=make_regions,
         settings=settings,
         nonorthogonal_settings=nonorthogonal_settings,
+        psi_func=psi_func,
+        previous=previous,
     )
-
-    # Store geqdsk input as a string in the TokamakEquilibrium object so we can save it
-    # in BoutMesh.writeGridFile
-    # reset to beginning of file
-    filehandle.seek(0)
-    # read file as a single string and store in result
-    result.geqdsk_input = filehandle.read()
-    # also save filename, if it exists
-    if hasattr(filehandle, "name"):
-        result.geqdsk_filename = filehandle.name
-
-    return result
@@ -22,9 +22,9 @@ import warnings
 
 import numpy
 from optionsfactory import WithMeta
-from optionsfactory.checks import is_positive
+from optionsfactory.checks import NoneType, is_positive, is_positive_or_None
 
-from ..core.mesh import BoutMesh
+from ..core.mesh import BoutMesh, handleMultiLocationArray
 from ..core.equilibrium import (
     Equilibrium,
     Point2D,
@@ -123,6 +123,34 @@ class TORPEXMagneticField(Equilibrium):
         ),
         saddle_point_p1=[0.85, -0.15],
         saddle_point_p2=[0.85, 0.15],
+        coil_field_grid_nR=WithMeta(
+            None,
+            doc=(
+                "If set, psi due to the coils is tabulated on a grid with this many "
+                "points in R, covering the bounding box of the wall, and psi and its "
+                "derivatives are interpolated from the grid with a spline, instead of "
+                "being calculated from the coils at every evaluation"
+            ),
+            value_type=[int, NoneType],
+            check_all=is_positive_or_None,
+        ),
+        coil_field_grid_nZ=WithMeta(
+            lambda options: options.coil_field_grid_nR,
+            doc="Number of points in Z of the grid used by coil_field_grid_nR",
+            value_type=[int, NoneType],
+            check_all=is_positive_or_None,
+        ),
+        coil_field_grid_rtol=WithMeta(
+            1.0e-6,
+            doc=(
+                "Warn if psi or Grad(psi) interpolated from the grid set by "
+                "coil_field_grid_nR differs from the values calculated from the coils "
+                "by more than this, relative to the range of psi or the maximum of "
+                "|Grad(psi)| inside the wall"
+            ),
+            value_type=[float, int],
+            check_all=is_positive,
+        ),
     )
 
     def __init__(self, equilibOptions, meshOptions):
@@ -321,137 +349,216 @@ class TORPEXMagneticField(Equilibrium):
 
         A radially increasing psi results in Bp going clockwise in the poloidal plane.
         """
-        import sympy
-        from sympy.functions.special.elliptic_integrals import elliptic_k, elliptic_e
-        import scipy.special
-
-        R, Z = sympy.symbols("R Z")
-        mu0 = 4.0e-7 * sympy.pi
-
-        A_phi = 0 * R
-
-        for coil in self.coils:
-            # little-r is the vector position from the centre of the coil to (R,Z)
-            # sinTheta is the angle between r and the axis through the centre of the coil
-            rSquared = R ** 2 + (Z - coil.Z) ** 2
-            r = sympy.sqrt(rSquared)
-            sinTheta = R / r
-            kSquared = (
-                4
-                * coil.R
-                * r
-                * sinTheta
-                / (rSquared + coil.R ** 2 + 2 * coil.R * r * sinTheta)
-            )
-            A_phi += (
-                coil.I
-                * coil.R
-                / sympy.sqrt(r ** 2 + coil.R ** 2 + 2 * coil.R * r * sinTheta)
-                / kSquared
-                * ((2 - kSquared) * elliptic_k(kSquared) - 2 * elliptic_e(kSquared))
+        self._coil_R = numpy.array([coil.R for coil in self.coils], dtype=float)
+        self._coil_Z = numpy.array([coil.Z for coil in self.coils], dtype=float)
+        self._coil_I = numpy.array([coil.I for coil in self.coils], dtype=float)
+
+        if self.user_options.coil_field_grid_nR is not None:
+            self.tabulateCoilPsi(
+                self.user_options.coil_field_grid_nR,
+                self.user_options.coil_field_grid_nZ,
             )
+            psi_derivatives = self.tabulatedCoilPsi
+        else:
+            psi_derivatives = self.coilPsi
 
-        # multiply by costant pre-factor
-        A_phi *= mu0 / sympy.pi
-
-        psi = -R * A_phi
-        dpsidR = sympy.diff(psi, R)
-        dpsidZ = sympy.diff(psi, Z)
-        modGradpsiSquared = dpsidR ** 2 + dpsidZ ** 2
-        B_R = dpsidZ / R
-        B_Z = -dpsidR / R
-        d2psidR2 = sympy.diff(psi, R, R)
-        d2psidZ2 = sympy.diff(psi, Z, Z)
-        d2psidRdZ = sympy.diff(psi, R, Z)
-
-        self.psi = sympy.lambdify(
-            [R, Z],
-            psi,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
-        )
-        self.f_R = sympy.lambdify(
-            [R, Z],
-            dpsidR / modGradpsiSquared,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        def psi(R, Z):
+            return psi_derivatives(R, Z)[0]
+
+        def f_R(R, Z):
+            _, dpsidR, dpsidZ = psi_derivatives(R, Z, nderiv=1)
+            return dpsidR / (dpsidR ** 2 + dpsidZ ** 2)
+
+        def f_Z(R, Z):
+            _, dpsidR, dpsidZ = psi_derivatives(R, Z, nderiv=1)
+            return dpsidZ / (dpsidR ** 2 + dpsidZ ** 2)
+
+        def Bp_R(R, Z):
+            return psi_derivatives(R, Z, nderiv=1)[2] / R
+
+        def Bp_Z(R, Z):
+            return -psi_derivatives(R, Z, nderiv=1)[1] / R
+
+        def d2psidR2(R, Z):
+            return psi_derivatives(R, Z, nderiv=2)[3]
+
+        def d2psidZ2(R, Z):
+            return psi_derivatives(R, Z, nderiv=2)[4]
+
+        def d2psidRdZ(R, Z):
+            return psi_derivatives(R, Z, nderiv=2)[5]
+
+        self.psi = psi
+        self.f_R = f_R
+        self.f_Z = f_Z
+        self.Bp_R = Bp_R
+        self.Bp_Z = Bp_Z
+        self.d2psidR2 = d2psidR2
+        self.d2psidZ2 = d2psidZ2
+        self.d2psidRdZ = d2psidRdZ
+
+    def tabulateCoilPsi(self, nR, nZ, ncheck=1000):
+        """
+        Tabulate psi due to the coils and its first and second derivatives on an nR x nZ
+        grid covering the bounding box of the wall, and create splines interpolating
+        them, which are used by tabulatedCoilPsi(). Each derivative has its own spline,
+        so evaluating a derivative costs the same as evaluating psi.
+
+        The splines are checked against the values calculated from the coils at ncheck
+        random points inside the wall, and a warning is given if the error is larger
+        than the coil_field_grid_rtol option.
+        """
+        from scipy.interpolate import RectBivariateSpline
+
+        # Extend the grid a little beyond the wall, as the splines do not extrapolate
+        margin = 0.1 * self.awall
+        R1D = numpy.linspace(
+            self.Rcentre - self.awall - margin, self.Rcentre + self.awall + margin, nR
         )
-        self.f_Z = sympy.lambdify(
-            [R, Z],
-            dpsidZ / modGradpsiSquared,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        Z1D = numpy.linspace(
+            self.Zcentre - self.awall - margin, self.Zcentre + self.awall + margin, nZ
         )
-        self.Bp_R = sympy.lambdify(
-            [R, Z],
-            B_R,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        R2D, Z2D = numpy.meshgrid(R1D, Z1D, indexing="ij")
+        self._coil_grid_bounds = (R1D[0], R1D[-1], Z1D[0], Z1D[-1])
+        self._coil_psi_splines = [
+            RectBivariateSpline(R1D, Z1D, values)
+            for values in self.coilPsi(R2D, Z2D, nderiv=2)
+        ]
+
+        # Check the accuracy at random points inside the wall
+        rng = numpy.random.RandomState(0)
+        r = self.awall * numpy.sqrt(rng.uniform(size=ncheck))
+        theta = rng.uniform(0.0, 2.0 * numpy.pi, size=ncheck)
+        R = self.Rcentre + r * numpy.cos(theta)
+        Z = self.Zcentre + r * numpy.sin(theta)
+
+        psi, dpsidR, dpsidZ = self.coilPsi(R, Z, nderiv=1)
+        psi_spline, dpsidR_spline, dpsidZ_spline = self.tabulatedCoilPsi(R, Z, nderiv=1)
+        psi_error = numpy.max(numpy.abs(psi_spline - psi)) / (
+            numpy.max(psi) - numpy.min(psi)
         )
-        self.Bp_Z = sympy.lambdify(
-            [R, Z],
-            B_Z,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        gradpsi_error = numpy.max(
+            numpy.sqrt((dpsidR_spline - dpsidR) ** 2 + (dpsidZ_spline - dpsidZ) ** 2)
+        ) / numpy.max(numpy.sqrt(dpsidR ** 2 + dpsidZ ** 2))
+
+        print(
+            f"Tabulated coil field on {nR}x{nZ} grid: relative error in psi "
+            f"{psi_error}, in Grad(psi) {gradpsi_error}",
+            flush=True,
         )
-        self.d2psidR2 = sympy.lambdify(
-            [R, Z],
-            d2psidR2,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        rtol = self.user_options.coil_field_grid_rtol
+        if psi_error > rtol or gradpsi_error > rtol:
+            warnings.warn(
+                f"Relative error of tabulated coil field (psi: {psi_error}, "
+                f"Grad(psi): {gradpsi_error}) is larger than "
+                f"coil_field_grid_rtol={rtol}. Increase coil_field_grid_nR and "
+                f"coil_field_grid_nZ"
+            )
+
+    @handleMultiLocationArray
+    def tabulatedCoilPsi(self, R, Z, nderiv=0):
+        """
+        Interpolate psi due to the coils, and optionally its derivatives, at (R, Z) from
+        the grid created by tabulateCoilPsi(). Returns the same values as coilPsi().
+        Points outside the grid (where the splines would not be accurate) are
+        calculated from the coils instead.
+        """
+        result = tuple(
+            spline(R, Z, grid=False)
+            for spline in self._coil_psi_splines[: (nderiv + 1) * (nderiv + 2) // 2]
         )
-        self.d2psidZ2 = sympy.lambdify(
-            [R, Z],
-            d2psidZ2,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+
+        Rmin, Rmax, Zmin, Zmax = self._coil_grid_bounds
+        outside = (R < Rmin) | (R > Rmax) | (Z < Zmin) | (Z > Zmax)
+        if numpy.any(outside):
+            result = tuple(
+                numpy.where(outside, exact, interpolated)
+                for exact, interpolated in zip(self.coilPsi(R, Z, nderiv), result)
+            )
+
+        return result
+
+    @handleMultiLocationArray
+    def coilPsi(self, R, Z, nderiv=0):
+        """
+        Calculate psi due to the coils, and optionally its derivatives, at (R, Z).
+
+        R and Z may be floats, arrays or MultiLocationArrays. All the coils are
+        evaluated together, using an extra array dimension for the coils.
+
+        Returns a tuple (psi,) if nderiv=0, (psi, dpsidR, dpsidZ) if nderiv=1 or
+        (psi, dpsidR, dpsidZ, d2psidR2, d2psidZ2, d2psidRdZ) if nderiv=2.
+        """
+        from scipy.special import ellipk, ellipe
+
+        # Add a dimension for the coils
+        R = numpy.asarray(R, dtype=float)[..., numpy.newaxis]
+        Z = numpy.asarray(Z, dtype=float)[..., numpy.newaxis]
+        a = self._coil_R
+        dZ = Z - self._coil_Z
+
+        # psi = -R*A_phi = -mu0*I/(4*pi) * sqrt(D) * F(m), with
+        # D = (R + a)**2 + dZ**2, m = 4*a*R/D and F(m) = (2 - m)*K(m) - 2*E(m), where K
+        # and E are the complete elliptic integrals of the first and second kinds
+        prefactor = -1.0e-7 * self._coil_I
+        D = (R + a) ** 2 + dZ ** 2
+        sqrtD = numpy.sqrt(D)
+        m = 4.0 * a * R / D
+        K = ellipk(m)
+        E = ellipe(m)
+        F = (2.0 - m) * K - 2.0 * E
+
+        result = (numpy.sum(prefactor * sqrtD * F, axis=-1),)
+        if nderiv == 0:
+            return result
+
+        # dF/dm
+        Fm = 0.5 * E / (1.0 - m) - 0.5 * K
+
+        # Derivatives of D, sqrt(D) and m
+        D_R = 2.0 * (R + a)
+        D_Z = 2.0 * dZ
+        sqrtD_R = 0.5 * D_R / sqrtD
+        sqrtD_Z = 0.5 * D_Z / sqrtD
+        m_R = 4.0 * a / D - m * D_R / D
+        m_Z = -m * D_Z / D
+
+        result += (
+            numpy.sum(prefactor * (sqrtD_R * F + sqrtD * Fm * m_R), axis=-1),
+            numpy.sum(prefactor * (sqrtD_Z * F + sqrtD * Fm * m_Z), axis=-1),
         )
-        self.d2psidRdZ = sympy.lambdify(
-            [R, Z],
-            d2psidRdZ,
-            modules=[
-                "numpy",
-                {
-                    "elliptic_k": scipy.special.ellipk,
-                    "elliptic_e": scipy.special.ellipe,
-                },
-            ],
+        if nderiv == 1:
+            return result
+
+        # d2F/dm2, using dK/dm = (E - (1 - m)*K)/(2*m*(1 - m)) and dE/dm = (E - K)/(2*m)
+        K_m = (E - (1.0 - m) * K) / (2.0 * m * (1.0 - m))
+        E_m = (E - K) / (2.0 * m)
+        Fmm = 0.5 * E_m / (1.0 - m) + 0.5 * E / (1.0 - m) ** 2 - 0.5 * K_m
+
+        sqrtD_RR = 1.0 / sqrtD - sqrtD_R ** 2 / sqrtD
+        sqrtD_ZZ = 1.0 / sqrtD - sqrtD_Z ** 2 / sqrtD
+        sqrtD_RZ = -sqrtD_R * sqrtD_Z / sqrtD
+        m_RR = -8.0 * a * D_R / D ** 2 - 2.0 * m / D + 2.0 * m * D_R ** 2 / D ** 2
+        m_ZZ = -2.0 * m / D + 2.0 * m * D_Z ** 2 / D ** 2
+        m_RZ = -4.0 * a * D_Z / D ** 2 + 2.0 * m * D_R * D_Z / D ** 2
+
+        def second_derivative(sqrtD_XY, sqrtD_X, sqrtD_Y, m_X, m_Y, m_XY):
+            return numpy.sum(
+                prefactor
+                * (
+                    sqrtD_XY * F
+                    + Fm * (sqrtD_X * m_Y + sqrtD_Y * m_X)
+                    + sqrtD * (Fmm * m_X * m_Y + Fm * m_XY)
+                ),
+                axis=-1,
+            )
+
+        result += (
+            second_derivative(sqrtD_RR, sqrtD_R, sqrtD_R, m_R, m_R, m_RR),
+            second_derivative(sqrtD_ZZ, sqrtD_Z, sqrtD_Z, m_Z, m_Z, m_ZZ),
+            second_derivative(sqrtD_RZ, sqrtD_R, sqrtD_Z, m_R, m_Z, m_RZ),
         )
+        return result
 
     def makeRegions(self, npoints=100):
         """
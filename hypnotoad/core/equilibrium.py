@@ -34,6 +34,7 @@ from optionsfactory.checks import (
     is_non_negative,
     is_non_negative_or_None,
 )
+import threading
 import warnings
 
 import numpy
@@ -83,6 +84,11 @@ func_timeout.FunctionTimedOut.getMsg = refineTimeoutMessage
 # distance between the intersections is less than this
 intersect_tolerance = 1.0e-14
 
+# lock used when creating attributes that are only created the first time they are
+# needed (e.g. Equilibrium.wallRInterp), so that they are created safely when methods
+# are called from several threads at once
+_lazy_attribute_lock = threading.Lock()
+
 
 class Point2D:
     """
@@ -111,23 +117,15 @@ class Point2D:
 
     def __iter__(self):
         """
-        Along with __next__() allows Point2D class to be treated like a tuple, e.g.
+        Allows Point2D class to be treated like a tuple, e.g.
         p = Point2D(1., 0.)
         val = f(*p)
         where f is a function that takes two arguments
-        """
-        self.iterStep = 0
-        return self
 
-    def __next__(self):
-        if self.iterStep == 0:
-            self.iterStep = 1
-            return self.R
-        elif self.iterStep == 1:
-            self.iterStep = 2
-            return self.Z
-        else:
-            raise StopIteration
+        Returns a new iterator each time, rather than storing the iteration state in the
+        Point2D, so that the same point can be used by several threads at once.
+        """
+        return iter((self.R, self.Z))
 
     def __repr__(self):
         """
@@ -456,7 +454,20 @@ class FineContour:
         ),
     )
 
-    def __init__(self, parentContour, settings):
+    def __init__(self, parentContour, settings, *, initial_positions=None):
+        """
+        Parameters
+        ----------
+        parentContour : PsiContour
+            The contour to represent
+        settings : dict
+            Non-default values of the options
+        initial_positions : array of shape (n, 2), optional
+            Positions of the points of a FineContour of a nearby contour (for example
+            the same contour of the grid for the previous slice of a time-dependent
+            equilibrium), used as the initial guess instead of interpolating
+            parentContour. Ignored if they do not cover the whole of this contour.
+        """
         self.parentContour = parentContour
         self.user_options = self.user_options_factory.create(settings)
         self.distance = None
@@ -484,29 +495,118 @@ class FineContour:
             Nfine + self.extend_lower_fine + self.extend_upper_fine,
         )
 
-        # Initial guess from interpolation of psiContour, iterate to a more accurate
-        # version below.
-        # Extend a copy of parentContour to make the extrapolation more stable.
-        # This makes parentCopy have twice the extra points as parentContour has.
-        parentCopy = self.parentContour.newContourFromSelf()
-        parentCopy.temporaryExtend(
-            extend_lower=self.parentContour.extend_lower,
-            extend_upper=self.parentContour.extend_upper,
-            ds_lower=calc_distance(parentCopy[0], parentCopy[1]),
-            ds_upper=calc_distance(parentCopy[-1], parentCopy[-2]),
-        )
-        interp_input, distance_estimate = parentCopy._coarseInterp()
+        self.startInd = self.extend_lower_fine
+        self.endInd = Nfine - 1 + self.extend_lower_fine
 
-        sfine = distance_estimate[parentCopy.endInd] / (Nfine - 1) * self.indices_fine
+        # Methods passed to PsiContour.refinePoint() by self.refine(), None to use the
+        # parent contour's refine_methods
+        self.refine_methods = None
+
+        if initial_positions is None or not self._positionsFromGuess(initial_positions):
+            # Not using a guess, so reset anything set by self._positionsFromGuess()
+            self.refine_methods = None
+            self.distance = None
+
+            # Initial guess from interpolation of psiContour, iterate to a more accurate
+            # version below.
+            # Extend a copy of parentContour to make the extrapolation more stable.
+            # This makes parentCopy have twice the extra points as parentContour has.
+            parentCopy = self.parentContour.newContourFromSelf()
+            parentCopy.temporaryExtend(
+                extend_lower=self.parentContour.extend_lower,
+                extend_upper=self.parentContour.extend_upper,
+                ds_lower=calc_distance(parentCopy[0], parentCopy[1]),
+                ds_upper=calc_distance(parentCopy[-1], parentCopy[-2]),
+            )
+            interp_input, distance_estimate = parentCopy._coarseInterp()
 
-        # 2d array with size {N,2} giving the (R,Z)-positions of points on the contour
-        self.positions = numpy.array(tuple(interp_input(s).as_ndarray() for s in sfine))
+            sfine = (
+                distance_estimate[parentCopy.endInd] / (Nfine - 1) * self.indices_fine
+            )
 
-        self.startInd = self.extend_lower_fine
-        self.endInd = Nfine - 1 + self.extend_lower_fine
+            # 2d array with size {N,2} giving the (R,Z)-positions of points on the
+            # contour
+            self.positions = numpy.array(
+                tuple(interp_input(s).as_ndarray() for s in sfine)
+            )
 
         self.equaliseSpacing()
 
+    def _positionsFromGuess(self, guess):
+        """
+        Set self.positions by refining the points in guess onto this contour, then
+        interpolating them to give the initial positions of the points of this
+        FineContour, with the first and last points of the parent contour at startInd
+        and endInd. Returns False if guess does not cover this contour.
+        """
+        guess = numpy.array(guess, dtype=float)
+        if guess.ndim != 2 or guess.shape[0] < 4 or guess.shape[1] != 2:
+            return False
+
+        # The points will stay close to the contour, so try a Newton iteration along
+        # Grad(psi) first, which is much faster than integrating
+        methods = self.parentContour.user_options.refine_methods
+        if isinstance(methods, str):
+            methods = [methods]
+        self.refine_methods = ["gradpsi-newton"] + list(methods)
+
+        self.positions = guess
+        try:
+            self.refine()
+        except SolutionError:
+            return False
+        self.calcDistance(reallocate=True)
+        ds_guess = self.distance[1:] - self.distance[:-1]
+        if not numpy.all(ds_guess > 0.0):
+            return False
+
+        start = self.parentContour[self.parentContour.startInd]
+        end = self.parentContour[self.parentContour.endInd]
+        for p in [start, end]:
+            # Points of the parent contour must be close to the guess
+            nearest = numpy.min(
+                numpy.sum((self.positions - p.as_ndarray()) ** 2, axis=1)
+            )
+            if nearest > numpy.max(ds_guess) ** 2:
+                return False
+        s_start = self.getDistance(start)
+        s_end = self.getDistance(end)
+        if s_end <= s_start:
+            return False
+
+        Nfine = self.user_options.finecontour_Nfine
+        ds = (s_end - s_start) / (Nfine - 1)
+        sfine = s_start + ds * self.indices_fine
+        if sfine[0] < self.distance[0] - ds or sfine[-1] > self.distance[-1] + ds:
+            # Would need to extrapolate too far
+            return False
+
+        interpR = interp1d(
+            self.distance,
+            self.positions[:, 0],
+            kind="cubic",
+            assume_sorted=True,
+            fill_value="extrapolate",
+        )
+        interpZ = interp1d(
+            self.distance,
+            self.positions[:, 1],
+            kind="cubic",
+            assume_sorted=True,
+            fill_value="extrapolate",
+        )
+        positions = numpy.stack([interpR(sfine), interpZ(sfine)], axis=-1)
+
+        # Use exactly the end points of the parent contour, which are kept fixed by
+        # equaliseSpacing()
+        positions[self.startInd, :] = start.as_ndarray()
+        positions[self.endInd, :] = end.as_ndarray()
+
+        self.positions = positions
+        self.distance = None
+
+        return True
+
     def extend(self, *, extend_lower=0, extend_upper=0):
 
         Nfine = self.user_options.finecontour_Nfine
@@ -745,19 +845,20 @@ class FineContour:
 
             p = self.positions[0, :]
             tangent = self.positions[1, :] - self.positions[0, :]
+            methods = self.refine_methods
             result[0, :] = self.parentContour.refinePoint(
-                Point2D(*p), Point2D(*tangent)
+                Point2D(*p), Point2D(*tangent), methods=methods
             ).as_ndarray()
             for i in range(1, self.positions.shape[0] - 1):
                 p = self.positions[i, :]
                 tangent = self.positions[i + 1, :] - self.positions[i - 1, :]
                 result[i, :] = self.parentContour.refinePoint(
-                    Point2D(*p), Point2D(*tangent)
+                    Point2D(*p), Point2D(*tangent), methods=methods
                 ).as_ndarray()
             p = self.positions[-1, :]
             tangent = self.positions[-1, :] - self.positions[-2, :]
             result[-1, :] = self.parentContour.refinePoint(
-                Point2D(*p), Point2D(*tangent)
+                Point2D(*p), Point2D(*tangent), methods=methods
             ).as_ndarray()
 
             self.positions = result
@@ -909,14 +1010,24 @@ class PsiContour:
             ["integrate+newton", "integrate"],
             doc=(
                 "Ordered list of methods to try when refining points. Valid names are: "
-                "'newton' - Newton iteration; 'line' - a line search; 'integrate' "
-                "integrate along psi gradient; 'integrate+newton' integrate, then "
-                "refine with Newton; 'none' - no refinement (always succeeds)"
+                "'newton' - Newton iteration; 'gradpsi-newton' - Newton iteration "
+                "along Grad(psi), fast for points already close to the contour; 'line' "
+                "- a line search; 'integrate' integrate along psi gradient; "
+                "'integrate+newton' integrate, then refine with Newton; 'none' - no "
+                "refinement (always succeeds)"
             ),
             value_type=[str, Sequence],
             check_all=lambda x: numpy.all(
                 [
-                    value in ["newton", "line", "integrate", "integrate+newton", "none"]
+                    value
+                    in [
+                        "newton",
+                        "gradpsi-newton",
+                        "line",
+                        "integrate",
+                        "integrate+newton",
+                        "none",
+                    ]
                     for value in ([x] if isinstance(x, str) else x)
                 ]
             ),
@@ -931,6 +1042,10 @@ class PsiContour:
 
         self._fine_contour = None
 
+        # Positions of the points of a FineContour of a nearby contour, used as the
+        # initial guess when creating self._fine_contour, see FineContour.__init__()
+        self.fine_contour_guess = None
+
         self._distance = None
 
         # Function that evaluates the vector potential at R,Z
@@ -999,7 +1114,11 @@ class PsiContour:
     @property
     def fine_contour(self):
         if self._fine_contour is None:
-            self._fine_contour = FineContour(self, dict(self.user_options))
+            self._fine_contour = FineContour(
+                self,
+                dict(self.user_options),
+                initial_positions=self.fine_contour_guess,
+            )
             # Ensure that the fine contour is long enough
             self.checkFineContourExtend()
         return self._fine_contour
@@ -1007,15 +1126,23 @@ class PsiContour:
     @property
     def distance(self):
         if self._distance is None:
-            self._distance = [self.fine_contour.getDistance(p) for p in self]
-            d = numpy.array(self._distance)
-            if not numpy.all(d[1:] - d[:-1] > 0.0):
+            self._distance = numpy.array(
+                [self.fine_contour.getDistance(p) for p in self]
+            )
+            if not numpy.all(self._distance[1:] - self._distance[:-1] > 0.0):
                 raise ValueError(
                     f"Distance not monotonically increasing for this contour. "
                     f"distance={self._distance}"
                 )
         return self._distance
 
+    def releaseFineContour(self):
+        """
+        Release the FineContour to save memory, keeping the distances if they have been
+        calculated already. The FineContour is created again if it is needed.
+        """
+        self._fine_contour = None
+
     def __iter__(self):
         return self.points.__iter__()
 
@@ -1028,6 +1155,17 @@ class PsiContour:
     def __len__(self):
         return self.points.__len__()
 
+    def __getstate__(self):
+        # Store the points as an array when pickling, as this is much more compact than
+        # a list of Point2D objects
+        state = self.__dict__.copy()
+        state["points"] = numpy.array([[p.R, p.Z] for p in self.points], dtype=float)
+        return state
+
+    def __setstate__(self, state):
+        state["points"] = [Point2D(R, Z) for R, Z in state["points"]]
+        self.__dict__.update(state)
+
     def setSelfToContour(self, contour):
         """
         Copy the state of this object from contour
@@ -1041,6 +1179,7 @@ class PsiContour:
         self.extend_lower = contour.extend_lower
         self.extend_upper = contour.extend_upper
         self._fine_contour = contour._fine_contour
+        self.fine_contour_guess = contour.fine_contour_guess
 
     def newContourFromSelf(self, *, points=None, psival=None):
         if points is None:
@@ -1055,6 +1194,7 @@ class PsiContour:
         new_contour.endInd = self.endInd
         new_contour.extend_lower = self.extend_lower
         new_contour.extend_upper = self.extend_upper
+        new_contour.fine_contour_guess = self.fine_contour_guess
         if points is None:
             new_contour._fine_contour = self._fine_contour
 
@@ -1181,6 +1321,49 @@ class PsiContour:
             count += 1
             fprev = fnext
 
+    def refinePointNewtonGradPsi(self, p, tangent, width, atol):
+        """Use Newton iteration along Grad(psi) to refine point.
+        This converges quickly if the original point is close to the contour, for
+        example when it is on the same contour of a nearby equilibrium
+        """
+
+        def f(position):
+            return self.psi(*position) - self.psival
+
+        def gradPsi(position, eps=1e-10):
+            # Calculate derivatives using finite difference, as in refinePointIntegrate
+            psi0 = self.psi(*position)
+            dpsidr = (self.psi(position[0] + eps, position[1]) - psi0) / eps
+            dpsidz = (self.psi(position[0], position[1] + eps) - psi0) / eps
+            return numpy.array([dpsidr, dpsidz])
+
+        position = p.as_ndarray()
+        fprev = f(position)
+
+        if numpy.abs(fprev) < atol * numpy.abs(self.psival):
+            # don't need to refine
+            return p
+
+        count = 0
+        while True:
+            # Take another iteration
+            grad = gradPsi(position)
+            position = position - fprev * grad / numpy.sum(grad ** 2)
+            fnext = f(position)
+            if abs(fnext) < atol:
+                # Converged. Take one more step, which costs little as convergence is
+                # quadratic, so that the point is as close to the contour as the
+                # result of the integrating methods
+                grad = gradPsi(position)
+                final = position - fnext * grad / numpy.sum(grad ** 2)
+                if abs(f(final)) < abs(fnext):
+                    position = final
+                return Point2D(*position)
+            if abs(fnext) > abs(fprev) or count > 10:
+                raise SolutionError("Diverging newton iteration")
+            count += 1
+            fprev = fnext
+
     def refinePointLinesearch(self, p, tangent, width, atol):
         """Refines the location of a point p, using a line search method
         along the tangent vector
@@ -1283,6 +1466,7 @@ class PsiContour:
 
                   Valid names are:
                   - "newton"       Newton iteration
+                  - "gradpsi-newton"  Newton iteration along Grad(psi)
                   - "line"         A line search
                   - "integrate"    Integrate along psi gradient
                   - "integrate+newton"  Integrate, then refine with Newton
@@ -1301,6 +1485,7 @@ class PsiContour:
         # during __init__ and then re-used.
         available_methods = {
             "newton": self.refinePointNewton,
+            "gradpsi-newton": self.refinePointNewtonGradPsi,
             "line": self.refinePointLinesearch,
             "integrate": self.refinePointIntegrate,
             "integrate+newton": (
@@ -2114,12 +2299,10 @@ class EquilibriumRegion(PsiContour):
         )
 
         # Use nonorthogonal defaults from settings updated in user_options by Equilibrium
-        self.nonorthogonal_options_factory = (
-            self.equilibrium.nonorthogonal_options_factory
-        )
-
-        self.nonorthogonal_options = self.nonorthogonal_options_factory.create(
-            self.equilibrium.nonorthogonal_options
+        self.nonorthogonal_options = (
+            self.equilibrium.nonorthogonal_options_factory.create(
+                self.equilibrium.nonorthogonal_options
+            )
         )
 
         self.nx = nx
@@ -2171,8 +2354,10 @@ class EquilibriumRegion(PsiContour):
             self.xPointsAtEnd.append(None)
 
     def resetNonorthogonalOptions(self, nonorthogonal_settings):
-        self.nonorthogonal_options = self.nonorthogonal_options_factory.create(
-            nonorthogonal_settings
+        self.nonorthogonal_options = (
+            self.equilibrium.nonorthogonal_options_factory.create(
+                nonorthogonal_settings
+            )
         )
 
     def getTargetParameter(self, spacing):
@@ -2304,6 +2489,20 @@ class EquilibriumRegion(PsiContour):
             "nonorthogonal_range_upper_outer": nonorthogonal_range_upper_outer,
         }
 
+    def getDistributionParameters(self):
+        """
+        All the parameters that determine how points are distributed along the contours
+        of this region for a nonorthogonal grid
+        """
+        result = self.getSpacings()
+        result[
+            "nonorthogonal_spacing_method"
+        ] = self.nonorthogonal_options.nonorthogonal_spacing_method
+        result[
+            "nonorthogonal_radial_range_power"
+        ] = self.nonorthogonal_options.nonorthogonal_radial_range_power
+        return result
+
     def copy(self):
         result = EquilibriumRegion(
             equilibrium=self.equilibrium,
@@ -2327,6 +2526,7 @@ class EquilibriumRegion(PsiContour):
         result.endInd = self.endInd
         result.extend_lower = self.extend_lower
         result.extend_upper = self.extend_upper
+        result.fine_contour_guess = self.fine_contour_guess
         return result
 
     def newRegionFromPsiContour(self, contour):
@@ -2352,6 +2552,7 @@ class EquilibriumRegion(PsiContour):
         result.endInd = contour.endInd
         result.extend_lower = contour.extend_lower
         result.extend_upper = contour.extend_upper
+        result.fine_contour_guess = contour.fine_contour_guess
         return result
 
     def ny(self, radialIndex):
@@ -3448,6 +3649,11 @@ class Equilibrium:
       - self.wall: list of Point2D giving vertices of polygon representing the wall, in
         anti-clockwise order; assumed to be closed so last element and first are taken to
         be connected
+
+    Derived classes may also provide:
+      - self.d2psidR2, self.d2psidZ2, self.d2psidRdZ: functions which take two
+        arguments, {R,Z}, and return the second derivatives of psi. If these are
+        provided, findSaddlePoint() uses Newton iterations to find the saddle point.
     """
 
     user_options_factory = OptionsFactory(
@@ -3487,7 +3693,14 @@ class Equilibrium:
         user_options have been initialized.
         """
         # Update nonorthogonal defaults from settings in user_options
-        self.nonorthogonal_options_factory = self.nonorthogonal_options_factory.add(
+        self.nonorthogonal_options_factory = self._makeNonorthogonalOptionsFactory()
+
+        self.nonorthogonal_options = self.nonorthogonal_options_factory.create(
+            nonorthogonal_settings
+        )
+
+    def _makeNonorthogonalOptionsFactory(self):
+        return type(self).nonorthogonal_options_factory.add(
             nonorthogonal_xpoint_poloidal_spacing_length=(
                 0.25 * self.user_options.xpoint_poloidal_spacing_length
             ),
@@ -3498,9 +3711,17 @@ class Equilibrium:
             ),
         )
 
-        self.nonorthogonal_options = self.nonorthogonal_options_factory.create(
-            nonorthogonal_settings
-        )
+    def __getstate__(self):
+        # The OptionsFactory contains lambda functions as defaults, so cannot be
+        # pickled. It is re-created from user_options when unpickling.
+        state = self.__dict__.copy()
+        state.pop("nonorthogonal_options_factory", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        if "user_options" in state:
+            self.nonorthogonal_options_factory = self._makeNonorthogonalOptionsFactory()
 
     def resetNonorthogonalOptions(self, nonorthogonal_settings):
         self.nonorthogonal_options = self.nonorthogonal_options_factory.create(
@@ -3629,6 +3850,15 @@ class Equilibrium:
         p3 = p2 + a * e2
         p4 = p1 + a * e2
 
+        if getattr(self, "d2psidR2", None) is not None:
+            result = self._findSaddlePointNewton(p1, p2, p3, p4, atol)
+            if result is not None:
+                return result
+            print(
+                "Newton iteration failed in findSaddlePoint, using line searches",
+                flush=True,
+            )
+
         # For the purposes of naming variables here, take p1 to be 'bottom left', p2 to
         # be 'top left', p3 to be 'top right' and p4 to be 'bottom right'
         posLeft, minLeft = self.findExtremum_1d(p1, p2)
@@ -3681,6 +3911,56 @@ class Equilibrium:
 
         return (extremumVert + extremumHoriz) / 2.0
 
+    def _findSaddlePointNewton(self, p1, p2, p3, p4, atol, maxits=50):
+        """
+        Find a saddle point of self.psi inside the square box with corners p1, p2, p3,
+        p4 by solving Grad(psi)=0 with Newton iterations, using the second derivatives
+        of psi. The iteration starts from the centre of the box. Returns None if the
+        iteration does not converge, leaves the box or finds an extremum rather than a
+        saddle point.
+        """
+        corners = [p1, p2, p3, p4]
+
+        def inside(p):
+            # The corners are in clockwise order, so p is inside the box if it is to
+            # the right of every side
+            for c1, c2 in zip(corners, corners[1:] + corners[:1]):
+                side = c2 - c1
+                if side.R * (p.Z - c1.Z) - side.Z * (p.R - c1.R) > 0.0:
+                    return False
+            return True
+
+        p = (p1 + p3) / 2.0
+
+        for count in range(1, maxits + 1):
+            # Grad(psi) from the poloidal magnetic field
+            dpsidR = -p.R * self.Bp_Z(p.R, p.Z)
+            dpsidZ = p.R * self.Bp_R(p.R, p.Z)
+
+            # Hessian of psi
+            H = numpy.array(
+                [
+                    [self.d2psidR2(p.R, p.Z), self.d2psidRdZ(p.R, p.Z)],
+                    [self.d2psidRdZ(p.R, p.Z), self.d2psidZ2(p.R, p.Z)],
+                ],
+                dtype=float,
+            )
+            if not numpy.linalg.det(H) < 0.0:
+                # Not near a saddle point
+                return None
+
+            step = numpy.linalg.solve(H, [-dpsidR, -dpsidZ])
+            p = p + Point2D(*step)
+
+            if not inside(p):
+                return None
+
+            if numpy.sqrt(step[0] ** 2 + step[1] ** 2) < atol:
+                print("findSaddlePoint took", count, "Newton iterations to converge")
+                return p
+
+        return None
+
     def findRoots_1d(
         self, f, n, xmin, xmax, atol=2.0e-8, rtol=1.0e-5, maxintervals=1024
     ):
@@ -3752,23 +4032,26 @@ class Equilibrium:
             return Point2D(self.wallRInterp(s), self.wallZInterp(s))
         except AttributeError:
             # wall interpolation functions not created yet
+            with _lazy_attribute_lock:
+                if not hasattr(self, "wallRInterp"):
+                    wall = deepcopy(self.wall)
 
-            wall = deepcopy(self.wall)
-
-            # make closed contour
-            wall.append(wall[0])
+                    # make closed contour
+                    wall.append(wall[0])
 
-            R = [p.R for p in wall]
-            Z = [p.Z for p in wall]
+                    R = [p.R for p in wall]
+                    Z = [p.Z for p in wall]
 
-            wallfraction = numpy.linspace(0.0, 1.0, len(wall))
+                    wallfraction = numpy.linspace(0.0, 1.0, len(wall))
 
-            self.wallRInterp = interp1d(
-                wallfraction, R, kind="linear", assume_sorted=True
-            )
-            self.wallZInterp = interp1d(
-                wallfraction, Z, kind="linear", assume_sorted=True
-            )
+                    # Set wallRInterp last, as its existence is used to check that
+                    # both functions have been created
+                    self.wallZInterp = interp1d(
+                        wallfraction, Z, kind="linear", assume_sorted=True
+                    )
+                    self.wallRInterp = interp1d(
+                        wallfraction, R, kind="linear", assume_sorted=True
+                    )
 
             return Point2D(self.wallRInterp(s), self.wallZInterp(s))
 
@@ -3783,30 +4066,36 @@ class Equilibrium:
             )
         except AttributeError:
             # wall vector interpolation functions not created yet
-            Rcomponents = [
-                self.wall[i + 1].R - self.wall[i].R for i in range(len(self.wall) - 1)
-            ]
-            Rcomponents.append(self.wall[0].R - self.wall[-1].R)
-            Rcomponents.append(self.wall[1].R - self.wall[0].R)
-
-            Zcomponents = [
-                self.wall[i + 1].Z - self.wall[i].Z for i in range(len(self.wall) - 1)
-            ]
-            Zcomponents.append(self.wall[0].Z - self.wall[-1].Z)
-            Zcomponents.append(self.wall[1].Z - self.wall[0].Z)
-
-            wallfraction = numpy.linspace(0.0, 1.0, len(self.wall) + 1)
-
-            # Vector along wall stays constant along each segment, as we assume the
-            # segments are straight. Have calculated the vector at each vertex for the
-            # following segment, so use 'previous' interpolation to just take the value
-            # from the previous point
-            self.wallVectorRComponent = interp1d(
-                wallfraction, Rcomponents, kind="previous", assume_sorted=True
-            )
-            self.wallVectorZComponent = interp1d(
-                wallfraction, Zcomponents, kind="previous", assume_sorted=True
-            )
+            with _lazy_attribute_lock:
+                if not hasattr(self, "wallVectorRComponent"):
+                    Rcomponents = [
+                        self.wall[i + 1].R - self.wall[i].R
+                        for i in range(len(self.wall) - 1)
+                    ]
+                    Rcomponents.append(self.wall[0].R - self.wall[-1].R)
+                    Rcomponents.append(self.wall[1].R - self.wall[0].R)
+
+                    Zcomponents = [
+                        self.wall[i + 1].Z - self.wall[i].Z
+                        for i in range(len(self.wall) - 1)
+                    ]
+                    Zcomponents.append(self.wall[0].Z - self.wall[-1].Z)
+                    Zcomponents.append(self.wall[1].Z - self.wall[0].Z)
+
+                    wallfraction = numpy.linspace(0.0, 1.0, len(self.wall) + 1)
+
+                    # Vector along wall stays constant along each segment, as we assume
+                    # the segments are straight. Have calculated the vector at each
+                    # vertex for the following segment, so use 'previous' interpolation
+                    # to just take the value from the previous point.
+                    # Set wallVectorRComponent last, as its existence is used to check
+                    # that both functions have been created
+                    self.wallVectorZComponent = interp1d(
+                        wallfraction, Zcomponents, kind="previous", assume_sorted=True
+                    )
+                    self.wallVectorRComponent = interp1d(
+                        wallfraction, Rcomponents, kind="previous", assume_sorted=True
+                    )
 
             return numpy.array(
                 [self.wallVectorRComponent(s), self.wallVectorZComponent(s)]
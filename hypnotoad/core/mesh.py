@@ -22,9 +22,14 @@ Classes to handle Meshes and geometrical quantities for generating BOUT++ grids
 """
 
 from copy import deepcopy
+import functools
+import io
+import multiprocessing
 import numbers
-import re
+import pickle
+import time
 import warnings
+import weakref
 
 import numpy
 from optionsfactory import OptionsFactory, WithMeta
@@ -38,7 +43,13 @@ from scipy.integrate import solve_ivp
 from boututils.boutarray import BoutArray
 from boututils.run_wrapper import shell_safe
 
-from .equilibrium import calc_distance, Equilibrium, EquilibriumRegion, Point2D
+from .equilibrium import (
+    calc_distance,
+    Equilibrium,
+    EquilibriumRegion,
+    Point2D,
+    SolutionError,
+)
 from ..__version__ import get_versions
 
 
@@ -46,80 +57,187 @@ class MultiLocationArray(numpy.lib.mixins.NDArrayOperatorsMixin):
     """
     Container for arrays representing points at different cell locations
     Not all have to be filled.
+
+    The arrays for all the locations are views into a single contiguous buffer, which is
+    allocated when the first location is used. Getting a location that has not been set
+    yet initialises it to zero; use has_centre, has_xlow, has_ylow and has_corners to
+    check whether a location has been set without initialising it.
+
+    storage can be passed to provide the arrays for some locations, e.g. views into a
+    larger global array, which are then used instead of allocating those locations in
+    the buffer.
     """
 
-    _centre_array = None
-    _xlow_array = None
-    _ylow_array = None
-    _corners_array = None
+    locations = ("centre", "xlow", "ylow", "corners")
 
-    def __init__(self, nx, ny):
+    def __init__(self, nx, ny, storage=None):
         self.nx = nx
         self.ny = ny
         # Attributes that will be saved to output files along with the array
         self.attributes = {}
+        # Buffer holding the arrays for all locations not in self._storage
+        self._buffer = None
+        # Arrays provided for some locations, instead of views into self._buffer
+        self._storage = {} if storage is None else dict(storage)
+        for location, array in self._storage.items():
+            if array.shape != self._shape(location):
+                raise ValueError(
+                    f"storage for {location} has shape {array.shape}, expected "
+                    f"{self._shape(location)}"
+                )
+        # Arrays for the locations that have been set
+        self._arrays = {}
+
+    def _shape(self, location):
+        if location == "centre":
+            return (self.nx, self.ny)
+        elif location == "xlow":
+            return (self.nx + 1, self.ny)
+        elif location == "ylow":
+            return (self.nx, self.ny + 1)
+        elif location == "corners":
+            return (self.nx + 1, self.ny + 1)
+        raise ValueError(f"Unrecognised location {location}")
+
+    def _view(self, location):
+        # Get the array for location as a view into self._buffer, or from
+        # self._storage. Does not initialise the values
+        if location in self._storage:
+            return self._storage[location]
+        buffer_locations = [loc for loc in self.locations if loc not in self._storage]
+        if self._buffer is None:
+            self._buffer = numpy.empty(
+                sum(numpy.prod(self._shape(loc)) for loc in buffer_locations)
+            )
+        start = 0
+        for loc in buffer_locations:
+            shape = self._shape(loc)
+            size = shape[0] * shape[1]
+            if loc == location:
+                return self._buffer[start : start + size].reshape(shape)
+            start += size
+
+    def _getArray(self, location, initialise=True):
+        # Get the array for location, creating it (filled with zeros if initialise=True)
+        # if it has not been set yet
+        array = self._arrays.get(location)
+        if array is None:
+            array = self._view(location)
+            if initialise:
+                array[...] = 0.0
+            self._arrays[location] = array
+        return array
+
+    def _setArray(self, location, value):
+        self._getArray(location, initialise=False)[...] = value
 
     @property
     def centre(self):
-        if self._centre_array is None:
-            self._centre_array = numpy.zeros([self.nx, self.ny])
-        return self._centre_array
+        return self._getArray("centre")
 
     @centre.setter
     def centre(self, value):
-        if self._centre_array is None:
-            self._centre_array = numpy.zeros([self.nx, self.ny])
-        self._centre_array[...] = value
+        self._setArray("centre", value)
 
     @property
     def xlow(self):
-        if self._xlow_array is None:
-            self._xlow_array = numpy.zeros([self.nx + 1, self.ny])
-        return self._xlow_array
+        return self._getArray("xlow")
 
     @xlow.setter
     def xlow(self, value):
-        if self._xlow_array is None:
-            self._xlow_array = numpy.zeros([self.nx + 1, self.ny])
-        self._xlow_array[...] = value
+        self._setArray("xlow", value)
 
     @property
     def ylow(self):
-        if self._ylow_array is None:
-            self._ylow_array = numpy.zeros([self.nx, self.ny + 1])
-        return self._ylow_array
+        return self._getArray("ylow")
 
     @ylow.setter
     def ylow(self, value):
-        if self._ylow_array is None:
-            self._ylow_array = numpy.zeros([self.nx, self.ny + 1])
-        self._ylow_array[...] = value
+        self._setArray("ylow", value)
 
     @property
     def corners(self):
-        if self._corners_array is None:
-            self._corners_array = numpy.zeros([self.nx + 1, self.ny + 1])
-        return self._corners_array
+        return self._getArray("corners")
 
     @corners.setter
     def corners(self, value):
-        if self._corners_array is None:
-            self._corners_array = numpy.zeros([self.nx + 1, self.ny + 1])
-        self._corners_array[...] = value
+        self._setArray("corners", value)
+
+    @property
+    def has_centre(self):
+        return "centre" in self._arrays
+
+    @property
+    def has_xlow(self):
+        return "xlow" in self._arrays
+
+    @property
+    def has_ylow(self):
+        return "ylow" in self._arrays
+
+    @property
+    def has_corners(self):
+        return "corners" in self._arrays
+
+    # The arrays for each location, or None if they have not been set
+    @property
+    def _centre_array(self):
+        return self._arrays.get("centre")
+
+    @property
+    def _xlow_array(self):
+        return self._arrays.get("xlow")
+
+    @property
+    def _ylow_array(self):
+        return self._arrays.get("ylow")
+
+    @property
+    def _corners_array(self):
+        return self._arrays.get("corners")
 
     def copy(self):
         new_multilocationarray = MultiLocationArray(self.nx, self.ny)
-        if self.centre is not None:
-            new_multilocationarray.centre = self.centre.copy()
-        if self.xlow is not None:
-            new_multilocationarray.xlow = self.xlow.copy()
-        if self.ylow is not None:
-            new_multilocationarray.ylow = self.ylow.copy()
-        if self.corners is not None:
-            new_multilocationarray.corners = self.corners.copy()
+        if self._storage:
+            # The copy does not share the provided storage, so copy location by location
+            for location, array in self._arrays.items():
+                new_multilocationarray._setArray(location, array)
+        elif self._buffer is not None:
+            new_multilocationarray._buffer = self._buffer.copy()
+            for location in self._arrays:
+                new_multilocationarray._getArray(location, initialise=False)
 
         return new_multilocationarray
 
+    def withStorage(self, storage):
+        """
+        Return a MultiLocationArray with the same values and attributes as this one,
+        which uses the arrays in storage for the locations that they are given for.
+        Returns self if it already uses those arrays.
+        """
+        if all(self._storage.get(loc) is array for loc, array in storage.items()):
+            return self
+        result = MultiLocationArray(self.nx, self.ny, storage=storage)
+        for location, array in self._arrays.items():
+            result._setArray(location, array)
+        result.attributes = self.attributes
+        return result
+
+    def __getstate__(self):
+        # The arrays are views into self._buffer (or are in self._storage, which is
+        # pickled as independent arrays), so only pickle self._buffer and which locations
+        # have been set, and re-create the views when unpickling
+        state = self.__dict__.copy()
+        state["_arrays"] = list(self._arrays)
+        return state
+
+    def __setstate__(self, state):
+        locations = state.pop("_arrays")
+        self.__dict__.update(state)
+        self._arrays = {}
+        for location in locations:
+            self._getArray(location, initialise=False)
+
     # The following __array_ufunc__ implementation allows the MultiLocationArray class to
     # be handled by Numpy functions, and add, subtract, etc. like an ndarray.
     # The implementation is mostly copied from the example in
@@ -141,129 +259,163 @@ class MultiLocationArray(numpy.lib.mixins.NDArrayOperatorsMixin):
 
         MLArrays = [self] + [x for x in inputs if isinstance(x, MultiLocationArray)]
 
-        result = MultiLocationArray(self.nx, self.ny)
+        # Only calculate the locations that are set in all the inputs
+        locations = [
+            location
+            for location in self.locations
+            if all(location in x._arrays for x in MLArrays)
+        ]
+
+        def unwrap(x, location, initialise=True):
+            if isinstance(x, MultiLocationArray):
+                return x._getArray(location, initialise=initialise)
+            return x
 
-        # Defer to the implementation of the ufunc on unwrapped values.
-        if all(x._centre_array is not None for x in MLArrays):
-            this_inputs = tuple(
-                x._centre_array if isinstance(x, MultiLocationArray) else x
-                for x in inputs
-            )
+        if method == "__call__":
+            # Write the results directly into the output arrays, which are either given
+            # by 'out' (e.g. for in-place operators) or newly created, to avoid
+            # creating temporary arrays. If 'where' is passed, not all values of the
+            # output are set, so initialise new output locations to zero.
             if out:
+                results = out
+            else:
+                results = tuple(
+                    MultiLocationArray(self.nx, self.ny) for _ in range(ufunc.nout)
+                )
+            initialise = "where" in kwargs
+            for location in locations:
                 kwargs["out"] = tuple(
-                    x.centre if isinstance(x, MultiLocationArray) else x for x in out
+                    unwrap(x, location, initialise=initialise) for x in results
                 )
-            this_result = getattr(ufunc, method)(*this_inputs, **kwargs)
+                ufunc(*(unwrap(x, location) for x in inputs), **kwargs)
 
-            if type(this_result) is tuple:
-                # multiple return values
-                if not type(result) is tuple:
-                    result = tuple(
-                        MultiLocationArray(self.nx, self.ny) for x in this_result
-                    )
-                for i, x in enumerate(this_result):
-                    result[i].centre = x
+            return results[0] if len(results) == 1 else results
 
-            elif method == "at":
-                # no return value
-                result = None
-            else:
-                # one return value
-                result.centre = this_result
+        if method == "at":
+            # no return value
+            for location in locations:
+                ufunc.at(*(unwrap(x, location) for x in inputs), **kwargs)
+            return None
 
-        # Defer to the implementation of the ufunc on unwrapped values.
-        if all(x._xlow_array is not None for x in MLArrays):
-            this_inputs = tuple(
-                x._xlow_array if isinstance(x, MultiLocationArray) else x
-                for x in inputs
-            )
+        # Other methods, e.g. 'reduce'
+        result = None
+        for location in locations:
             if out:
-                kwargs["out"] = tuple(
-                    x.xlow if isinstance(x, MultiLocationArray) else x for x in out
-                )
-            this_result = getattr(ufunc, method)(*this_inputs, **kwargs)
+                kwargs["out"] = tuple(unwrap(x, location) for x in out)
+            this_result = getattr(ufunc, method)(
+                *(unwrap(x, location) for x in inputs), **kwargs
+            )
 
             if type(this_result) is tuple:
                 # multiple return values
-                if not type(result) is tuple:
+                if result is None:
                     result = tuple(
                         MultiLocationArray(self.nx, self.ny) for x in this_result
                     )
                 for i, x in enumerate(this_result):
-                    result[i].xlow = x
-
-            elif method == "at":
-                # no return value
-                result = None
+                    result[i]._setArray(location, x)
             else:
                 # one return value
-                result.xlow = this_result
+                if result is None:
+                    result = MultiLocationArray(self.nx, self.ny)
+                result._setArray(location, this_result)
 
-        # Defer to the implementation of the ufunc on unwrapped values.
-        if all(x._ylow_array is not None for x in MLArrays):
-            this_inputs = tuple(
-                x._ylow_array if isinstance(x, MultiLocationArray) else x
-                for x in inputs
-            )
-            if out:
-                kwargs["out"] = tuple(
-                    x.ylow if isinstance(x, MultiLocationArray) else x for x in out
-                )
-            this_result = getattr(ufunc, method)(*this_inputs, **kwargs)
+        if result is None:
+            result = MultiLocationArray(self.nx, self.ny)
+        return result
 
-            if type(this_result) is tuple:
-                # multiple return values
-                if not type(result) is tuple:
-                    result = tuple(
-                        MultiLocationArray(self.nx, self.ny) for x in this_result
-                    )
-                for i, x in enumerate(this_result):
-                    result[i].ylow = x
+    def zero(self):
+        # Initialise all locations, set them to zero and return the result
+        self.centre = 0.0
+        self.xlow = 0.0
+        self.ylow = 0.0
+        self.corners = 0.0
+        return self
 
-            elif method == "at":
-                # no return value
-                result = None
-            else:
-                # one return value
-                result.ylow = this_result
 
-        # Defer to the implementation of the ufunc on unwrapped values.
-        if all(x._corners_array is not None for x in MLArrays):
-            this_inputs = tuple(
-                x._corners_array if isinstance(x, MultiLocationArray) else x
-                for x in inputs
+def handleMultiLocationArray(getResult):
+    """
+    Decorator for methods getResult(self, *args, **kwargs) so that they can be called
+    with MultiLocationArray arguments.
+
+    If the first positional argument is a MultiLocationArray, all the positional
+    arguments must be, and getResult is called once for each location that is set in
+    all of them. Keyword arguments are passed through unchanged. The result is a
+    MultiLocationArray, or a tuple of MultiLocationArrays if getResult returns a tuple.
+    """
+
+    @functools.wraps(getResult)
+    def handler(self, *args, **kwargs):
+        if not isinstance(args[0], MultiLocationArray):
+            return getResult(self, *args, **kwargs)
+
+        for arg in args[1:]:
+            assert isinstance(
+                arg, MultiLocationArray
+            ), "if first arg is a MultiLocationArray, then others must be as well"
+        nx, ny = args[0].nx, args[0].ny
+
+        result = None
+        for location in MultiLocationArray.locations:
+            if not all(getattr(arg, "has_" + location) for arg in args):
+                continue
+            this_result = getResult(
+                self, *(getattr(arg, location) for arg in args), **kwargs
             )
-            if out:
-                kwargs["out"] = tuple(
-                    x.corners if isinstance(x, MultiLocationArray) else x for x in out
-                )
-            this_result = getattr(ufunc, method)(*this_inputs, **kwargs)
 
             if type(this_result) is tuple:
                 # multiple return values
-                if not type(result) is tuple:
-                    result = tuple(
-                        MultiLocationArray(self.nx, self.ny) for x in this_result
-                    )
-                for i, x in enumerate(this_result):
-                    result[i].corners = x
-
-            elif method == "at":
-                # no return value
-                result = None
+                if result is None:
+                    result = tuple(MultiLocationArray(nx, ny) for _ in this_result)
+                for x, value in zip(result, this_result):
+                    x._setArray(location, value)
             else:
                 # one return value
-                result.corners = this_result
+                if result is None:
+                    result = MultiLocationArray(nx, ny)
+                result._setArray(location, this_result)
 
+        if result is None:
+            result = MultiLocationArray(nx, ny)
         return result
 
-    def zero(self):
-        # Initialise all locations, set them to zero and return the result
-        self.centre = 0.0
-        self.xlow = 0.0
-        self.ylow = 0.0
-        self.corners = 0.0
-        return self
+    return handler
+
+
+class FieldWithHalo:
+    """
+    A field on a MeshRegion, along with the boundary rows of the field from the
+    neighbouring MeshRegions (the 'halo') that are needed to take derivatives. Created
+    by MeshRegion.fieldWithHalo().
+
+    halo is a dict whose keys are (direction, location), e.g. ("inner", "centre"), and
+    whose values are arrays holding the row (or column) of the field at location in the
+    neighbouring region in direction that is adjacent to this region.
+    """
+
+    def __init__(self, field, halo, name):
+        self.field = field
+        self.halo = halo
+        self.name = name
+
+
+class _RegionSlice:
+    """
+    Proxy for a MeshRegion whose MultiLocationArray members return a single location,
+    sliced with index, so that functions of MeshRegion members can be evaluated on the
+    boundary rows of a MeshRegion.
+    """
+
+    def __init__(self, region, location, index):
+        self._region = region
+        self._location = location
+        self._index = index
+
+    def __getattr__(self, name):
+        value = getattr(self._region, name)
+        if isinstance(value, MultiLocationArray):
+            return getattr(value, self._location)[self._index]
+        return value
 
 
 class MeshRegion:
@@ -297,6 +449,21 @@ class MeshRegion:
             value_type=[str, NoneType],
             allowed=[None, "smoothnl"],
         ),
+        smoothnl_tolerance=WithMeta(
+            1.0e-3,
+            doc=(
+                "Smoothing with curvature_smoothing='smoothnl' stops when the maximum "
+                "change in an iteration is less than this value"
+            ),
+            value_type=[float, int],
+            check_all=is_non_negative,
+        ),
+        smoothnl_max_iterations=WithMeta(
+            50,
+            doc="Maximum number of iterations for curvature_smoothing='smoothnl'",
+            value_type=int,
+            check_all=is_positive,
+        ),
         follow_perpendicular_rtol=WithMeta(
             2.0e-8,
             doc="Relative tolerance for following Grad(psi)",
@@ -309,6 +476,57 @@ class MeshRegion:
             value_type=[float, int],
             check_all=is_non_negative,
         ),
+        follow_perpendicular_batch=WithMeta(
+            False,
+            doc=(
+                "Follow Grad(psi) from all the points on the separatrix segment of a "
+                "region together, integrating them as a single stacked system of ODEs"
+            ),
+            value_type=bool,
+        ),
+        follow_perpendicular_batch_per_trajectory=WithMeta(
+            True,
+            doc=(
+                "When follow_perpendicular_batch=True, apply "
+                "follow_perpendicular_rtol and follow_perpendicular_atol to each "
+                "trajectory individually rather than to the RMS error of all the "
+                "trajectories"
+            ),
+            value_type=bool,
+        ),
+        follow_perpendicular_cache=WithMeta(
+            False,
+            doc=(
+                "Keep the lines followed along Grad(psi) from the separatrix as "
+                "dense-output interpolants, stored with the equilibrium, so that "
+                "meshes with different radial grids (e.g. changing nx_core, nx_sol or "
+                "psi_spacing_separatrix_multiplier) created from the same equilibrium "
+                "re-use them instead of following the lines again. Not used when "
+                "follow_perpendicular_batch=True"
+            ),
+            value_type=bool,
+        ),
+        contour_workers=WithMeta(
+            None,
+            doc=(
+                "Number of workers used within each MeshRegion for the operations done "
+                "separately on each contour (refining, finding wall intersections and "
+                "regridding). None or 1 does them serially"
+            ),
+            value_type=[int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
+        contour_executor=WithMeta(
+            "thread",
+            doc=(
+                "Kind of workers used when contour_workers>1. 'process' workers are "
+                "forked, so this requires the 'fork' start method for multiprocessing. "
+                "Finding wall intersections always uses threads, as it creates "
+                "functions that cannot be sent back from a worker process"
+            ),
+            value_type=str,
+            allowed=["thread", "process"],
+        ),
         geometry_rtol=WithMeta(
             1.0e-10,
             doc=(
@@ -330,7 +548,14 @@ class MeshRegion:
     )
 
     def __init__(
-        self, meshParent, myID, equilibriumRegion, connections, radialIndex, settings
+        self,
+        meshParent,
+        myID,
+        equilibriumRegion,
+        connections,
+        radialIndex,
+        settings,
+        fine_contour_guesses=None,
     ):
 
         self.user_options = self.user_options_factory.create(settings)
@@ -379,6 +604,10 @@ class MeshRegion:
         # Absolute tolerance for checking if two points are the same
         self.atol = 1.0e-7
 
+        # Arrays provided by the parent Mesh to store some fields in, see
+        # setFieldStorage()
+        self._field_storage = {}
+
         # get points in this region
         self.contours = []
         if self.radialIndex < self.equilibriumRegion.separatrix_radial_index:
@@ -487,63 +716,210 @@ class MeshRegion:
             # to calculate perp_d
             self.equilibriumRegion.sin_angle_at_end = numpy.sqrt(1.0 - cos_angle ** 2)
 
+        if self.user_options.follow_perpendicular_batch:
+            self.followPerpendicularBatch(temp_psi_vals)
+        else:
+            print(
+                f"Following perpendicular: 1/{len(self.equilibriumRegion)}",
+                end="\r",
+                flush=True,
+            )
+
+            perp_points = self._followPerpendicular(
+                self.equilibriumRegion[0], temp_psi_vals
+            )
+
+            if self.radialIndex < self.equilibriumRegion.separatrix_radial_index:
+                # region is inside separatrix, so points were found from last to first
+                perp_points.reverse()
+
+            for i, point in enumerate(perp_points):
+                self.contours.append(
+                    self.equilibriumRegion.newContourFromSelf(
+                        points=[point], psival=self.psi_vals[i]
+                    )
+                )
+                self.contours[i].global_xind = self.globalXInd(i)
+            for i, p in enumerate(self.equilibriumRegion[1:]):
+                print(
+                    f"Following perpendicular: {i + 2}/{len(self.equilibriumRegion)}",
+                    end="\r",
+                    flush=True,
+                )
+
+                perp_points = self._followPerpendicular(p, temp_psi_vals)
+                if self.radialIndex < self.equilibriumRegion.separatrix_radial_index:
+                    perp_points.reverse()
+                for j, point in enumerate(perp_points):
+                    self.contours[j].append(point)
+
+        # Initial guesses for the FineContours, e.g. from the same region of a Mesh for
+        # the previous slice of a time series
+        if fine_contour_guesses is None:
+            fine_contour_guesses = [None] * len(self.contours)
+        for contour, guess in zip(self.contours, fine_contour_guesses):
+            contour.fine_contour_guess = guess
+
+        # refine the contours to make sure they are at exactly the right psi-value
+        self.mapContours(self._refineContour)
+
+        if not self.user_options.orthogonal:
+            self.addPointAtWallToContours()
+            self.distributePointsNonorthogonal()
+
+    def setFieldStorage(self, field_storage):
+        """
+        Provide arrays to store fields in, for example views into the global arrays of a
+        BoutMesh, so that the values are calculated directly into those arrays and do
+        not have to be copied out of the MeshRegion afterwards. The geometry methods
+        create the fields that have storage with _newField().
+
+        Parameters
+        ----------
+        field_storage : dict
+            Maps the name of each field to a dict of the arrays to use for some of its
+            locations, e.g. {"Rxy": {"centre": array}}. Replaces any storage set
+            previously. Fields that have already been set are moved into the new
+            storage.
+        """
+        self._field_storage = field_storage
+        for name, storage in field_storage.items():
+            f = self.__dict__.get(name)
+            if isinstance(f, MultiLocationArray):
+                self.__dict__[name] = f.withStorage(storage)
+
+    def _newField(self, name):
+        # Create the MultiLocationArray for the field 'name', using the arrays provided
+        # for it by setFieldStorage() if there are any
+        return MultiLocationArray(
+            self.nx, self.ny, storage=self._field_storage.get(name)
+        )
+
+    def _evaluateField(self, name, func, *args):
+        # Evaluate func at each location that is set in all the MultiLocationArrays
+        # args, writing the results into a new field 'name' created by _newField()
+        result = self._newField(name)
+        for location in MultiLocationArray.locations:
+            if all(getattr(arg, "has_" + location) for arg in args):
+                setattr(
+                    result, location, func(*(getattr(arg, location) for arg in args))
+                )
+        return result
+
+    def _followPerpendicular(self, p, psi_vals):
+        """
+        Follow Grad(psi) from the point p to each value in psi_vals, using the
+        equilibrium's PerpendicularTrajectoryCache if follow_perpendicular_cache=True
+        """
+        cache = self.meshParent.perpendicular_trajectory_cache
+        if cache is not None:
+            return cache.follow(p, self.equilibriumRegion.psi(*p), psi_vals)
+
+        return followPerpendicular(
+            self.meshParent.equilibrium.f_R,
+            self.meshParent.equilibrium.f_Z,
+            p,
+            self.equilibriumRegion.psi(*p),
+            psi_vals,
+            rtol=self.user_options.follow_perpendicular_rtol,
+            atol=self.user_options.follow_perpendicular_atol,
+        )
+
+    def followPerpendicularBatch(self, temp_psi_vals):
+        """
+        Create self.contours by following Grad(psi) from all the points of
+        self.equilibriumRegion at once, using followPerpendicularBatch()
+        """
         print(
-            f"Following perpendicular: 1/{len(self.equilibriumRegion)}",
-            end="\r",
+            f"Following perpendicular: {len(self.equilibriumRegion)} points",
             flush=True,
         )
 
-        perp_points = followPerpendicular(
+        psi = self.equilibriumRegion.psi
+        perp_points = followPerpendicularBatch(
             self.meshParent.equilibrium.f_R,
             self.meshParent.equilibrium.f_Z,
-            self.equilibriumRegion[0],
-            self.equilibriumRegion.psi(*self.equilibriumRegion[0]),
+            self.equilibriumRegion,
+            [psi(*p) for p in self.equilibriumRegion],
             temp_psi_vals,
             rtol=self.user_options.follow_perpendicular_rtol,
             atol=self.user_options.follow_perpendicular_atol,
+            per_trajectory=self.user_options.follow_perpendicular_batch_per_trajectory,
         )
 
         if self.radialIndex < self.equilibriumRegion.separatrix_radial_index:
             # region is inside separatrix, so points were found from last to first
-            perp_points.reverse()
+            perp_points = perp_points[:, ::-1, :]
 
-        for i, point in enumerate(perp_points):
+        for i in range(perp_points.shape[1]):
             self.contours.append(
                 self.equilibriumRegion.newContourFromSelf(
-                    points=[point], psival=self.psi_vals[i]
+                    points=[Point2D(*p) for p in perp_points[:, i, :]],
+                    psival=self.psi_vals[i],
                 )
             )
             self.contours[i].global_xind = self.globalXInd(i)
-        for i, p in enumerate(self.equilibriumRegion[1:]):
-            print(
-                f"Following perpendicular: {i + 2}/{len(self.equilibriumRegion)}",
-                end="\r",
-                flush=True,
-            )
 
-            perp_points = followPerpendicular(
-                self.meshParent.equilibrium.f_R,
-                self.meshParent.equilibrium.f_Z,
-                p,
-                self.equilibriumRegion.psi(*p),
-                temp_psi_vals,
-                rtol=self.user_options.follow_perpendicular_rtol,
-                atol=self.user_options.follow_perpendicular_atol,
-            )
-            if self.radialIndex < self.equilibriumRegion.separatrix_radial_index:
-                perp_points.reverse()
-            for j, point in enumerate(perp_points):
-                self.contours[j].append(point)
+    def mapContours(self, func, allow_process=True):
+        """
+        Call func(i) for the index i of each contour in self.contours, and return a list
+        of the results.
+
+        Uses contour_workers workers if contour_workers>1. func should only modify
+        self.contours[i], so that the contours can be handled in any order. With
+        contour_executor='process' (only used if allow_process=True) the workers are
+        forked from this process and send back self.contours[i] pickled, so func's
+        results must also be picklable.
+        """
+        workers = self.user_options.contour_workers
+        n = len(self.contours)
+        if workers is None or workers == 1 or n < 2:
+            return [func(i) for i in range(n)]
+
+        if (
+            allow_process
+            and self.user_options.contour_executor == "process"
+            and "fork" in multiprocessing.get_all_start_methods()
+        ):
+            global _region_for_workers
+            _region_for_workers = self
+            try:
+                # Use multiprocessing.Pool, as concurrent.futures.ProcessPoolExecutor
+                # only accepts a multiprocessing context for Python>=3.7
+                with multiprocessing.get_context("fork").Pool(workers) as pool:
+                    pickled = pool.starmap(
+                        _mapContourInWorker, zip([func.__name__] * n, range(n))
+                    )
+            finally:
+                _region_for_workers = None
+
+            results = []
+            for i, data in enumerate(pickled):
+                self.contours[i], result = _RegionUnpickler(
+                    io.BytesIO(data), self.meshParent
+                ).load()
+                results.append(result)
+            return results
+        else:
+            from concurrent.futures import ThreadPoolExecutor
 
-        # refine the contours to make sure they are at exactly the right psi-value
-        for contour in self.contours:
-            contour.refine(width=self.user_options.refine_width)
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                return list(executor.map(func, range(n)))
 
-        if not self.user_options.orthogonal:
-            self.addPointAtWallToContours()
-            self.distributePointsNonorthogonal()
+    def _refineContour(self, i_contour):
+        self.contours[i_contour].refine(width=self.user_options.refine_width)
 
     def addPointAtWallToContours(self):
+        # sfunc_orthogonal functions created after contour has been extended past wall
+        # (if necessary) but before adding the wall point to the contour (as adding this
+        # point makes the spacing of points on the contour not-smooth) and adjusted for
+        # the change in distance after redefining startInd to be at the wall
+        # The sfunc_orthogonal functions cannot be pickled, so always use threads here
+        self.sfunc_orthogonal_list = self.mapContours(
+            self._addPointAtWallToContour, allow_process=False
+        )
+
+    def _addPointAtWallToContour(self, i_contour):
         # maximum number of times to extend the contour when it has not yet hit the wall
         max_extend = 100
 
@@ -553,12 +929,6 @@ class MeshRegion:
         # should the contour intersect a wall at the upper end?
         upper_wall = self.connections["upper"] is None
 
-        # sfunc_orthogonal functions created after contour has been extended past wall
-        # (if necessary) but before adding the wall point to the contour (as adding this
-        # point makes the spacing of points on the contour not-smooth) and adjusted for
-        # the change in distance after redefining startInd to be at the wall
-        self.sfunc_orthogonal_list = []
-
         # find wall intersections
         def correct_sfunc_orthogonal(contour, sfunc_orthogonal_original):
             distance_at_original_start = contour.distance[contour.startInd]
@@ -573,303 +943,310 @@ class MeshRegion:
                 - distance_at_wall
             )
 
-        for i_contour, contour in enumerate(self.contours):
-            print(
-                f"finding wall intersections: {i_contour + 1}/{len(self.contours)}",
-                end="\r",
-                flush=True,
-            )
-
-            # point where contour intersects the lower wall
-            lower_intersect = None
-
-            # index of the segment of the contour that intersects the lower wall
-            lower_intersect_index = 0
+        contour = self.contours[i_contour]
+        print(
+            f"finding wall intersections: {i_contour + 1}/{len(self.contours)}",
+            end="\r",
+            flush=True,
+        )
 
-            # point where contour intersects the upper wall
-            upper_intersect = None
+        # point where contour intersects the lower wall
+        lower_intersect = None
 
-            # index of the segment of the contour that intersects the upper wall
-            upper_intersect_index = -2
+        # index of the segment of the contour that intersects the lower wall
+        lower_intersect_index = 0
 
-            # starting orthogonal spacing function
-            sfunc_orthogonal = contour.contourSfunc()
+        # point where contour intersects the upper wall
+        upper_intersect = None
 
-            if lower_wall:
-                if upper_wall:
-                    starti = len(contour) // 2
-                else:
-                    starti = len(contour) - 1
+        # index of the segment of the contour that intersects the upper wall
+        upper_intersect_index = -2
 
-                # find whether one of the segments of the contour already intersects the
-                # wall
-                for i in range(starti, 0, -1):
-                    lower_intersect = self.meshParent.equilibrium.wallIntersection(
-                        contour[i], contour[i - 1]
-                    )
-                    if lower_intersect is not None:
-                        lower_intersect_index = i - 1
-                        break
-
-                count = 0
-                ds_extend = contour.distance[1] - contour.distance[0]
-                while lower_intersect is None:
-                    # contour has not yet intersected with wall, so make it longer and
-                    # try again
-                    contour.temporaryExtend(extend_lower=1, ds_lower=ds_extend)
-                    lower_intersect = self.meshParent.equilibrium.wallIntersection(
-                        contour[1], contour[0]
-                    )
-                    count += 1
-                    assert (
-                        count < max_extend
-                    ), "extended contour too far without finding wall"
+        # starting orthogonal spacing function
+        sfunc_orthogonal = contour.contourSfunc()
 
+        if lower_wall:
             if upper_wall:
-                if lower_wall:
-                    starti = len(contour // 2)
-                else:
-                    starti = 0
+                starti = len(contour) // 2
+            else:
+                starti = len(contour) - 1
 
-                # find whether one of the segments of the contour already intersects the
-                # wall
-                for i in range(starti, len(contour) - 1):
-                    upper_intersect = self.meshParent.equilibrium.wallIntersection(
-                        contour[i], contour[i + 1]
-                    )
-                    if upper_intersect is not None:
-                        upper_intersect_index = i
-                        break
-
-                count = 0
-                ds_extend = contour.distance[-1] - contour.distance[-2]
-                while upper_intersect is None:
-                    # contour has not yet intersected with wall, so make it longer and
-                    # try again
-                    contour.temporaryExtend(extend_upper=1, ds_upper=ds_extend)
-                    upper_intersect = self.meshParent.equilibrium.wallIntersection(
-                        contour[-2], contour[-1]
-                    )
-                    count += 1
-                    assert (
-                        count < max_extend
-                    ), "extended contour too far without finding wall"
+            # find whether one of the segments of the contour already intersects the
+            # wall
+            for i in range(starti, 0, -1):
+                lower_intersect = self.meshParent.equilibrium.wallIntersection(
+                    contour[i], contour[i - 1]
+                )
+                if lower_intersect is not None:
+                    lower_intersect_index = i - 1
+                    break
 
-            # now add points on the wall(s) to the contour
+            count = 0
+            ds_extend = contour.distance[1] - contour.distance[0]
+            while lower_intersect is None:
+                # contour has not yet intersected with wall, so make it longer and
+                # try again
+                contour.temporaryExtend(extend_lower=1, ds_lower=ds_extend)
+                lower_intersect = self.meshParent.equilibrium.wallIntersection(
+                    contour[1], contour[0]
+                )
+                count += 1
+                assert (
+                    count < max_extend
+                ), "extended contour too far without finding wall"
+
+        if upper_wall:
             if lower_wall:
-                # need to construct a new sfunc which gives distance from the wall, not
-                # the distance from the original startInd
+                starti = len(contour // 2)
+            else:
+                starti = 0
 
-                # this sfunc would put the points at the positions along the contour
-                # where the grid would be orthogonal
-                sfunc_orthogonal_original = contour.contourSfunc()
+            # find whether one of the segments of the contour already intersects the
+            # wall
+            for i in range(starti, len(contour) - 1):
+                upper_intersect = self.meshParent.equilibrium.wallIntersection(
+                    contour[i], contour[i + 1]
+                )
+                if upper_intersect is not None:
+                    upper_intersect_index = i
+                    break
 
-                # now make lower_intersect_index the index where the point at the wall is
-                # check whether one of the points is already on the wall
-                if (
-                    calc_distance(contour[lower_intersect_index], lower_intersect)
-                    < self.atol
-                ):
-                    pass
-                elif (
-                    calc_distance(contour[lower_intersect_index + 1], lower_intersect)
-                    < self.atol
-                ):
-                    lower_intersect_index = lower_intersect_index + 1
-                else:
-                    # otherwise insert a new point
-                    lower_intersect_index += 1
-                    contour.insert(lower_intersect_index, lower_intersect)
-
-                # contour.contourSfunc() would put the points at the positions along the
-                # contour where the grid would be orthogonal
-                # need to correct sfunc_orthogonal for the distance between the point at
-                # the lower wall and the original start-point
-                sfunc_orthogonal = correct_sfunc_orthogonal(
-                    contour, sfunc_orthogonal_original
+            count = 0
+            ds_extend = contour.distance[-1] - contour.distance[-2]
+            while upper_intersect is None:
+                # contour has not yet intersected with wall, so make it longer and
+                # try again
+                contour.temporaryExtend(extend_upper=1, ds_upper=ds_extend)
+                upper_intersect = self.meshParent.equilibrium.wallIntersection(
+                    contour[-2], contour[-1]
                 )
+                count += 1
+                assert (
+                    count < max_extend
+                ), "extended contour too far without finding wall"
 
-                # start contour from the wall
-                contour.startInd = lower_intersect_index
+        # now add points on the wall(s) to the contour
+        if lower_wall:
+            # need to construct a new sfunc which gives distance from the wall, not
+            # the distance from the original startInd
 
-            if upper_wall:
-                if lower_wall:
-                    # need to correct for point already added at lower wall
-                    upper_intersect_index += 1
+            # this sfunc would put the points at the positions along the contour
+            # where the grid would be orthogonal
+            sfunc_orthogonal_original = contour.contourSfunc()
 
-                # this sfunc would put the points at the positions along the contour
-                # where the grid would be orthogonal
-                sfunc_orthogonal = contour.contourSfunc()
+            # now make lower_intersect_index the index where the point at the wall is
+            # check whether one of the points is already on the wall
+            if (
+                calc_distance(contour[lower_intersect_index], lower_intersect)
+                < self.atol
+            ):
+                pass
+            elif (
+                calc_distance(contour[lower_intersect_index + 1], lower_intersect)
+                < self.atol
+            ):
+                lower_intersect_index = lower_intersect_index + 1
+            else:
+                # otherwise insert a new point
+                lower_intersect_index += 1
+                contour.insert(lower_intersect_index, lower_intersect)
+
+            # contour.contourSfunc() would put the points at the positions along the
+            # contour where the grid would be orthogonal
+            # need to correct sfunc_orthogonal for the distance between the point at
+            # the lower wall and the original start-point
+            sfunc_orthogonal = correct_sfunc_orthogonal(
+                contour, sfunc_orthogonal_original
+            )
 
-                # now make upper_intersect_index the index where the point at the wall is
-                # check whether one of the points is already on the wall
-                if (
-                    calc_distance(contour[upper_intersect_index], upper_intersect)
-                    < self.atol
-                ):
-                    pass
-                elif (
-                    calc_distance(contour[upper_intersect_index + 1], upper_intersect)
-                    < self.atol
-                ):
-                    upper_intersect_index = upper_intersect_index + 1
-                else:
-                    # otherwise insert a new point
-                    contour.insert(upper_intersect_index + 1, upper_intersect)
-                    if upper_intersect_index >= 0:
-                        upper_intersect_index += 1
+            # start contour from the wall
+            contour.startInd = lower_intersect_index
 
-                # end point is now at the wall
-                contour.endInd = upper_intersect_index
+        if upper_wall:
+            if lower_wall:
+                # need to correct for point already added at lower wall
+                upper_intersect_index += 1
 
-            self.sfunc_orthogonal_list.append(sfunc_orthogonal)
+            # this sfunc would put the points at the positions along the contour
+            # where the grid would be orthogonal
+            sfunc_orthogonal = contour.contourSfunc()
 
-            contour.refine(width=self.user_options.refine_width)
-            contour.checkFineContourExtend()
+            # now make upper_intersect_index the index where the point at the wall is
+            # check whether one of the points is already on the wall
+            if (
+                calc_distance(contour[upper_intersect_index], upper_intersect)
+                < self.atol
+            ):
+                pass
+            elif (
+                calc_distance(contour[upper_intersect_index + 1], upper_intersect)
+                < self.atol
+            ):
+                upper_intersect_index = upper_intersect_index + 1
+            else:
+                # otherwise insert a new point
+                contour.insert(upper_intersect_index + 1, upper_intersect)
+                if upper_intersect_index >= 0:
+                    upper_intersect_index += 1
 
-    def distributePointsNonorthogonal(self, nonorthogonal_settings=None):
+            # end point is now at the wall
+            contour.endInd = upper_intersect_index
+
+        contour.refine(width=self.user_options.refine_width)
+        contour.checkFineContourExtend()
+
+        return sfunc_orthogonal
+
+    def distributePointsNonorthogonal(self, nonorthogonal_settings=None):
         if nonorthogonal_settings is not None:
             self.equilibriumRegion.resetNonorthogonalOptions(nonorthogonal_settings)
 
+        # start and end points of the contours, used to find the direction of the
+        # surface connecting neighbouring contours
+        self._contour_end_points = [
+            (contour[contour.startInd], contour[contour.endInd])
+            for contour in self.contours
+        ]
+
         # regrid the contours (which all know where the wall is)
-        for i_contour, contour in enumerate(self.contours):
-            print(
-                f"distributing points on contour: {i_contour + 1}/{len(self.contours)}",
-                end="\r",
-                flush=True,
-            )
+        self.mapContours(self._distributePointsOnContour)
 
-            contour_is_separatrix = (
-                numpy.abs(
-                    (contour.psival - self.meshParent.equilibrium.psi_sep[0])
-                    / self.meshParent.equilibrium.psi_sep[0]
-                )
-                < 1.0e-9
+        del self._contour_end_points
+
+    def _distributePointsOnContour(self, i_contour):
+        contour = self.contours[i_contour]
+        print(
+            f"distributing points on contour: {i_contour + 1}/{len(self.contours)}",
+            end="\r",
+            flush=True,
+        )
+
+        contour_is_separatrix = (
+            numpy.abs(
+                (contour.psival - self.meshParent.equilibrium.psi_sep[0])
+                / self.meshParent.equilibrium.psi_sep[0]
             )
+            < 1.0e-9
+        )
 
-            def surface_vec(lower):
-                if contour_is_separatrix:
-                    if lower:
-                        if self.equilibriumRegion.wallSurfaceAtStart is not None:
-                            return self.equilibriumRegion.wallSurfaceAtStart
-                        else:
-                            # Use poloidal spacing on a separatrix contour
-                            return None
-                    else:
-                        if self.equilibriumRegion.wallSurfaceAtEnd is not None:
-                            return self.equilibriumRegion.wallSurfaceAtEnd
-                        else:
-                            # Use poloidal spacing on a separatrix contour
-                            return None
-
-                if i_contour == 0:
-                    c_in = self.contours[0]
-                else:
-                    # contours are being changed, but start and end points are fixed so
-                    # it is OK to use contours[i_contour-1] anyway
-                    c_in = self.contours[i_contour - 1]
-                if i_contour == len(self.contours) - 1:
-                    c_out = self.contours[i_contour]
-                else:
-                    c_out = self.contours[i_contour + 1]
+        def surface_vec(lower):
+            if contour_is_separatrix:
                 if lower:
-                    p_in = c_in[c_in.startInd]
-                    p_out = c_out[c_out.startInd]
-                else:
-                    p_in = c_in[c_in.endInd]
-                    p_out = c_out[c_out.endInd]
-                return [p_out.R - p_in.R, p_out.Z - p_in.Z]
-
-            if (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "orthogonal"
-            ):
-                warnings.warn(
-                    "'orthogonal' option is not currently compatible with "
-                    "extending grid past targets"
-                )
-                sfunc = self.sfunc_orthogonal_list[i_contour]
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "fixed_poloidal"
-            ):
-                # this sfunc gives a fixed poloidal spacing at beginning and end of
-                # contours
-                sfunc = self.equilibriumRegion.getSfuncFixedSpacing(
-                    2 * self.ny_noguards + 1,
-                    contour.totalDistance(),
-                    method="monotonic",
-                )
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "poloidal_orthogonal_combined"
-            ):
-                sfunc = self.equilibriumRegion.combineSfuncs(
-                    contour, self.sfunc_orthogonal_list[i_contour]
-                )
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "fixed_perp_lower"
-            ):
-                sfunc = self.equilibriumRegion.getSfuncFixedPerpSpacing(
-                    2 * self.ny_noguards + 1, contour, surface_vec(True), True
-                )
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "fixed_perp_upper"
-            ):
-                sfunc = self.equilibriumRegion.getSfuncFixedPerpSpacing(
-                    2 * self.ny_noguards + 1, contour, surface_vec(False), False
-                )
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "perp_orthogonal_combined"
-            ):
-                sfunc = self.equilibriumRegion.combineSfuncs(
-                    contour,
-                    self.sfunc_orthogonal_list[i_contour],
-                    surface_vec(True),
-                    surface_vec(False),
-                )
-            elif (
-                self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
-                == "combined"
-            ):
-                if self.equilibriumRegion.wallSurfaceAtStart is not None:
-                    # use poloidal spacing near a wall
-                    surface_vec_lower = None
-                else:
-                    # use perp spacing
-                    surface_vec_lower = surface_vec(True)
-                if self.equilibriumRegion.wallSurfaceAtEnd is not None:
-                    # use poloidal spacing near a wall
-                    surface_vec_upper = None
+                    if self.equilibriumRegion.wallSurfaceAtStart is not None:
+                        return self.equilibriumRegion.wallSurfaceAtStart
+                    else:
+                        # Use poloidal spacing on a separatrix contour
+                        return None
                 else:
-                    # use perp spacing
-                    surface_vec_upper = surface_vec(False)
-                sfunc = self.equilibriumRegion.combineSfuncs(
-                    contour,
-                    self.sfunc_orthogonal_list[i_contour],
-                    surface_vec_lower,
-                    surface_vec_upper,
-                )
+                    if self.equilibriumRegion.wallSurfaceAtEnd is not None:
+                        return self.equilibriumRegion.wallSurfaceAtEnd
+                    else:
+                        # Use poloidal spacing on a separatrix contour
+                        return None
+
+            # contours may be being changed (possibly by other workers), but start
+            # and end points are fixed so it is OK to use the end points saved
+            # before regridding
+            i_in = max(i_contour - 1, 0)
+            i_out = min(i_contour + 1, len(self.contours) - 1)
+            if lower:
+                p_in = self._contour_end_points[i_in][0]
+                p_out = self._contour_end_points[i_out][0]
             else:
-                raise ValueError(
-                    "Unrecognized option '"
-                    + str(
-                        self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method  # noqa: E501
-                    )
-                    + "' for nonorthogonal poloidal spacing function"
-                )
+                p_in = self._contour_end_points[i_in][1]
+                p_out = self._contour_end_points[i_out][1]
+            return [p_out.R - p_in.R, p_out.Z - p_in.Z]
 
-            contour.regrid(
+        if (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "orthogonal"
+        ):
+            warnings.warn(
+                "'orthogonal' option is not currently compatible with "
+                "extending grid past targets"
+            )
+            sfunc = self.sfunc_orthogonal_list[i_contour]
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "fixed_poloidal"
+        ):
+            # this sfunc gives a fixed poloidal spacing at beginning and end of
+            # contours
+            sfunc = self.equilibriumRegion.getSfuncFixedSpacing(
                 2 * self.ny_noguards + 1,
-                sfunc=sfunc,
-                width=self.user_options.refine_width,
-                extend_lower=self.equilibriumRegion.extend_lower,
-                extend_upper=self.equilibriumRegion.extend_upper,
+                contour.totalDistance(),
+                method="monotonic",
+            )
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "poloidal_orthogonal_combined"
+        ):
+            sfunc = self.equilibriumRegion.combineSfuncs(
+                contour, self.sfunc_orthogonal_list[i_contour]
+            )
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "fixed_perp_lower"
+        ):
+            sfunc = self.equilibriumRegion.getSfuncFixedPerpSpacing(
+                2 * self.ny_noguards + 1, contour, surface_vec(True), True
+            )
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "fixed_perp_upper"
+        ):
+            sfunc = self.equilibriumRegion.getSfuncFixedPerpSpacing(
+                2 * self.ny_noguards + 1, contour, surface_vec(False), False
+            )
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "perp_orthogonal_combined"
+        ):
+            sfunc = self.equilibriumRegion.combineSfuncs(
+                contour,
+                self.sfunc_orthogonal_list[i_contour],
+                surface_vec(True),
+                surface_vec(False),
+            )
+        elif (
+            self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method
+            == "combined"
+        ):
+            if self.equilibriumRegion.wallSurfaceAtStart is not None:
+                # use poloidal spacing near a wall
+                surface_vec_lower = None
+            else:
+                # use perp spacing
+                surface_vec_lower = surface_vec(True)
+            if self.equilibriumRegion.wallSurfaceAtEnd is not None:
+                # use poloidal spacing near a wall
+                surface_vec_upper = None
+            else:
+                # use perp spacing
+                surface_vec_upper = surface_vec(False)
+            sfunc = self.equilibriumRegion.combineSfuncs(
+                contour,
+                self.sfunc_orthogonal_list[i_contour],
+                surface_vec_lower,
+                surface_vec_upper,
+            )
+        else:
+            raise ValueError(
+                "Unrecognized option '"
+                + str(
+                    self.equilibriumRegion.nonorthogonal_options.nonorthogonal_spacing_method  # noqa: E501
+                )
+                + "' for nonorthogonal poloidal spacing function"
             )
 
+        contour.regrid(
+            2 * self.ny_noguards + 1,
+            sfunc=sfunc,
+            width=self.user_options.refine_width,
+            extend_lower=self.equilibriumRegion.extend_lower,
+            extend_upper=self.equilibriumRegion.extend_upper,
+        )
+
     def globalXInd(self, i):
         """
         Get the global x-index in the set of MeshRegions connected radially to this one
@@ -901,8 +1278,8 @@ class MeshRegion:
         ylow values include the upper point, above the final cell-centre grid point
         """
 
-        self.Rxy = MultiLocationArray(self.nx, self.ny)
-        self.Zxy = MultiLocationArray(self.nx, self.ny)
+        self.Rxy = self._newField("Rxy")
+        self.Zxy = self._newField("Zxy")
 
         self.Rxy.centre = numpy.array(
             [[p.R for p in contour[1::2]] for contour in self.contours[1::2]]
@@ -982,12 +1359,20 @@ class MeshRegion:
         """
         Calculate geometrical quantities for this region
         """
-
-        self.psixy = self.meshParent.equilibrium.psi(self.Rxy, self.Zxy)
-
-        self.dx = MultiLocationArray(self.nx, self.ny)
-        self.dx.centre = (self.psi_vals[2::2] - self.psi_vals[:-2:2])[:, numpy.newaxis]
-        self.dx.ylow = (self.psi_vals[2::2] - self.psi_vals[:-2:2])[:, numpy.newaxis]
+        self.calcPsi()
+        self.calcSpacing()
+        self.calcBp()
+        self.calcPressure()
+        self.calcBt()
+        self.calcB()
+
+    def calcPsi(self):
+        """
+        Calculate psi, and the x-coordinate, which increases radially across the grid
+        """
+        self.psixy = self._evaluateField(
+            "psixy", self.meshParent.equilibrium.psi, self.Rxy, self.Zxy
+        )
 
         if self.psi_vals[0] > self.psi_vals[-1]:
             # x-coordinate is -psixy so x always increases radially across grid
@@ -997,22 +1382,34 @@ class MeshRegion:
             self.bpsign = 1.0
             self.xcoord = self.psixy
 
-        self.dy = MultiLocationArray(self.nx, self.ny)
+    def calcSpacing(self):
+        """
+        Calculate the grid spacings dx and dy
+        """
+        self.dx = self._newField("dx")
+        self.dx.centre = (self.psi_vals[2::2] - self.psi_vals[:-2:2])[:, numpy.newaxis]
+        self.dx.ylow = (self.psi_vals[2::2] - self.psi_vals[:-2:2])[:, numpy.newaxis]
+
+        self.dy = self._newField("dy")
         self.dy.centre = self.meshParent.dy_scalar
         self.dy.ylow = self.meshParent.dy_scalar
         self.dy.xlow = self.meshParent.dy_scalar
         self.dy.corners = self.meshParent.dy_scalar
 
-        self.Brxy = self.meshParent.equilibrium.Bp_R(self.Rxy, self.Zxy)
-        self.Bzxy = self.meshParent.equilibrium.Bp_Z(self.Rxy, self.Zxy)
-        self.Bpxy = numpy.sqrt(self.Brxy ** 2 + self.Bzxy ** 2)
-
-        if hasattr(
-            self.meshParent.equilibrium.regions[self.equilibriumRegion.name], "pressure"
-        ):
-            self.pressure = self.meshParent.equilibrium.regions[
-                self.equilibriumRegion.name
-            ].pressure(self.psixy)
+    def calcBp(self):
+        """
+        Calculate the poloidal magnetic field, with the sign of Bpxy set by the direction
+        of the field relative to Grad(y)
+        """
+        self.Brxy = self._evaluateField(
+            "Brxy", self.meshParent.equilibrium.Bp_R, self.Rxy, self.Zxy
+        )
+        self.Bzxy = self._evaluateField(
+            "Bzxy", self.meshParent.equilibrium.Bp_Z, self.Rxy, self.Zxy
+        )
+        self.Bpxy = numpy.sqrt(
+            self.Brxy ** 2 + self.Bzxy ** 2, out=self._newField("Bpxy")
+        )
 
         # determine direction - dot Bp with Grad(y) vector
         # evaluate in 'sol' at outer radial boundary
@@ -1032,7 +1429,7 @@ class MeshRegion:
             print(
                 "Poloidal field is in opposite direction to Grad(theta) -> Bp negative"
             )
-            self.Bpxy = -self.Bpxy
+            numpy.negative(self.Bpxy, out=self.Bpxy)
             if self.bpsign > 0.0:
                 raise ValueError(
                     "Sign of Bp should be negative? (note this check will raise an "
@@ -1047,10 +1444,39 @@ class MeshRegion:
                     "region)"
                 )
 
+    def calcPressure(self):
+        """
+        Calculate the pressure, if the equilibrium provides it
+        """
+        if hasattr(
+            self.meshParent.equilibrium.regions[self.equilibriumRegion.name], "pressure"
+        ):
+            self.pressure = self._evaluateField(
+                "pressure",
+                self.meshParent.equilibrium.regions[
+                    self.equilibriumRegion.name
+                ].pressure,
+                self.psixy,
+            )
+
+    def calcBt(self):
+        """
+        Calculate the toroidal magnetic field
+        """
         # Get toroidal field from poloidal current function fpol
-        self.Btxy = self.meshParent.equilibrium.fpol(self.psixy) / self.Rxy
+        self.Btxy = numpy.divide(
+            self.meshParent.equilibrium.fpol(self.psixy),
+            self.Rxy,
+            out=self._newField("Btxy"),
+        )
 
-        self.Bxy = numpy.sqrt(self.Bpxy ** 2 + self.Btxy ** 2)
+    def calcB(self):
+        """
+        Calculate the magnitude of the magnetic field
+        """
+        self.Bxy = numpy.sqrt(
+            self.Bpxy ** 2 + self.Btxy ** 2, out=self._newField("Bxy")
+        )
 
     def geometry2(self):
         """
@@ -1074,10 +1500,17 @@ class MeshRegion:
         #    self.beta.centre = 0.
         #    self.eta.centre = 0.
 
-        # variation of toroidal angle with y following a field line. Called 'pitch' in
-        # Hypnotoad1 because if y was the poloidal angle then dphidy would be the pitch
-        # angle.
-        self.dphidy = self.hy * self.Btxy / (self.Bpxy * self.Rxy)
+        self.calcDphidy()
+
+    def calcDphidy(self):
+        """
+        Calculate the variation of toroidal angle with y following a field line
+        """
+        # Called 'pitch' in Hypnotoad1 because if y was the poloidal angle then dphidy
+        # would be the pitch angle.
+        self.dphidy = numpy.divide(
+            self.hy * self.Btxy, self.Bpxy * self.Rxy, out=self._newField("dphidy")
+        )
 
     def capBpYlowXpoint(self):
         if self.equilibriumRegion.xPointsAtStart[self.radialIndex] is not None:
@@ -1133,6 +1566,7 @@ class MeshRegion:
         has been called on the MeshRegion at the beginning of the y-group. To ensure
         this, call geometry1() and geometry2() on all regions first, then calcMetric on
         all regions.
+        The curvature terms are calculated separately, by calc_curvature().
         """
         if not self.user_options.shiftedmetric:
             # To implement the shiftedmetric==False case, would have to define a
@@ -1150,7 +1584,7 @@ class MeshRegion:
                 "of a double-null configuration."
             )
             # integrated shear
-            self.sinty = self.DDX("zShift")
+            self.sinty = self.DDX("zShift", out=self._newField("sinty"))
             self.I = self.sinty
         else:
             # Zero integrated shear, because the coordinate system is defined locally to
@@ -1164,96 +1598,17 @@ class MeshRegion:
         # Here ShiftTorsion = d2phidxdy
         # Haven't checked this is exactly the quantity needed by BOUT++...
         # ShiftTorsion is only used in Curl operator - Curl is rarely used.
-        self.ShiftTorsion = self.DDX("#dphidy")
-
-        if self.user_options.orthogonal:
-            self.g11 = (self.Rxy * self.Bpxy) ** 2
-            self.g22 = 1.0 / self.hy ** 2
-            self.g33 = (
-                self.I * self.g11 + (self.dphidy / self.hy) ** 2 + 1.0 / self.Rxy ** 2
-            )
-            self.g12 = MultiLocationArray(self.nx, self.ny).zero()
-            self.g13 = -self.I * self.g11
-            self.g23 = -self.dphidy / self.hy ** 2
-
-            self.J = self.hy / self.Bpxy
-
-            self.g_11 = 1.0 / self.g11 + (self.I * self.Rxy) ** 2
-            self.g_22 = self.hy ** 2 + (self.Rxy * self.dphidy) ** 2
-            self.g_33 = self.Rxy ** 2
-            self.g_12 = self.Rxy ** 2 * self.dphidy * self.I
-            self.g_13 = self.Rxy ** 2 * self.I
-            self.g_23 = self.dphidy * self.Rxy ** 2
-        else:
-            self.g11 = (self.Rxy * self.Bpxy) ** 2
-            self.g22 = 1.0 / (self.hy * self.cosBeta) ** 2
-            self.g33 = (
-                1.0 / self.Rxy ** 2
-                + (self.Rxy * self.Bpxy * self.I) ** 2
-                + (self.dphidy / (self.hy * self.cosBeta)) ** 2
-                + 2.0
-                * self.Rxy
-                * self.Bpxy
-                * self.I
-                * self.dphidy
-                * self.tanBeta
-                / self.hy
-            )
-            self.g12 = self.Rxy * numpy.abs(self.Bpxy) * self.tanBeta / self.hy
-            self.g13 = (
-                -self.Rxy * self.Bpxy * self.dphidy * self.tanBeta / self.hy
-                - self.I * (self.Rxy * self.Bpxy) ** 2
-            )
-            self.g23 = (
-                -self.bpsign * self.dphidy / (self.hy * self.cosBeta) ** 2
-                - self.Rxy * numpy.abs(self.Bpxy) * self.I * self.tanBeta / self.hy
-            )
-
-            self.J = self.hy / self.Bpxy
-
-            self.g_11 = (
-                1.0 / (self.Rxy * self.Bpxy * self.cosBeta) ** 2
-                + (self.I * self.Rxy) ** 2
-            )
-            self.g_22 = self.hy ** 2 + (self.dphidy * self.Rxy) ** 2
-            self.g_33 = self.Rxy ** 2
-            self.g_12 = (
-                self.bpsign * self.I * self.dphidy * self.Rxy ** 2
-                - self.hy * self.tanBeta / (self.Rxy * numpy.abs(self.Bpxy))
-            )
-            self.g_13 = self.I * self.Rxy ** 2
-            self.g_23 = self.bpsign * self.dphidy * self.Rxy ** 2
-
-        # check Jacobian is OK
-        Jcheck = (
-            self.bpsign
-            * 1.0
-            / numpy.sqrt(
-                self.g11 * self.g22 * self.g33
-                + 2.0 * self.g12 * self.g13 * self.g23
-                - self.g11 * self.g23 ** 2
-                - self.g22 * self.g13 ** 2
-                - self.g33 * self.g12 ** 2
-            )
-        )
-        # ignore grid points at X-points as J should diverge there (as Bp->0)
-        if Jcheck._corners_array is not None:
-            # If Jcheck was not calculated at the corners location, no check is needed.
-            # Skip these fixes because they would initialise Jcheck.corners, which we do
-            # not want to do.
-            if self.equilibriumRegion.xPointsAtStart[self.radialIndex] is not None:
-                Jcheck.corners[0, 0] = self.J.corners[0, 0]
-            if self.equilibriumRegion.xPointsAtStart[self.radialIndex + 1] is not None:
-                Jcheck.corners[-1, 0] = self.J.corners[-1, 0]
-            if self.equilibriumRegion.xPointsAtEnd[self.radialIndex] is not None:
-                Jcheck.corners[0, -1] = self.J.corners[0, -1]
-            if self.equilibriumRegion.xPointsAtEnd[self.radialIndex + 1] is not None:
-                Jcheck.corners[-1, -1] = self.J.corners[-1, -1]
-
-        check = (
-            numpy.abs(self.J - Jcheck) / numpy.abs(self.J)
-            < self.user_options.geometry_rtol
-        )
+        self.ShiftTorsion = self.DDX("dphidy", out=self._newField("ShiftTorsion"))
+
+        # Create the outputs, then fill them one location at a time
+        metric_names = ["g11", "g22", "g33", "g12", "g13", "g23", "J"]
+        metric_names += ["g_11", "g_22", "g_33", "g_12", "g_13", "g_23"]
+        for name in metric_names:
+            setattr(self, name, self._newField(name))
+        Jcheck = MultiLocationArray(self.nx, self.ny)
+        check = {}
+        for location in MultiLocationArray.locations:
+            check[location] = self._calcMetricAtLocation(location, Jcheck)
 
         def ploterror(location):
             if location == "centre":
@@ -1292,69 +1647,262 @@ class MeshRegion:
             pyplot.colorbar()
             pyplot.show()
 
-        if not numpy.all(check.centre):
-            ploterror("centre")
-            raise ValueError(
-                f"Geometry: Jacobian at centre should be consistent with "
-                f"1/sqrt(det(g)) calculated from the metric tensor. If the plot "
-                f"looks OK, you may want to increase the value of "
-                f"geometry_rtol={self.user_options.geometry_rtol}"
-            )
-
-        if not numpy.all(check.ylow):
-            ploterror("ylow")
-            raise ValueError(
-                f"Geometry: Jacobian at ylow should be consistent with "
-                f"1/sqrt(det(g)) calculated from the metric tensor. If the plot "
-                f"looks OK, you may want to increase the value of "
-                f"geometry_rtol={self.user_options.geometry_rtol}"
-            )
-
-        if check._xlow_array is not None:
-            if not numpy.all(check.xlow):
-                ploterror("xlow")
-                raise ValueError(
-                    f"Geometry: Jacobian at xlow should be consistent with "
-                    f"1/sqrt(det(g)) calculated from the metric tensor. If the "
-                    f"plot looks OK, you may want to increase the value of "
-                    f"geometry_rtol={self.user_options.geometry_rtol}"
-                )
-        if check._corners_array is not None:
-            if not numpy.all(check.corners):
-                ploterror("corners")
+        for location in ["centre", "ylow", "xlow", "corners"]:
+            # The check is required at centre and ylow, and is done at xlow and corners
+            # if Jcheck was calculated there
+            if check[location] is None and location in ["xlow", "corners"]:
+                continue
+            if not check[location]:
+                ploterror(location)
                 raise ValueError(
-                    f"Geometry: Jacobian at corners should be consistent with "
-                    f"1/sqrt(det(g)) calculated from the metric tensor. If the "
-                    f"plot looks OK, you may want to increase the value of "
+                    f"Geometry: Jacobian at {location} should be consistent with "
+                    f"1/sqrt(det(g)) calculated from the metric tensor. If the plot "
+                    f"looks OK, you may want to increase the value of "
                     f"geometry_rtol={self.user_options.geometry_rtol}"
                 )
 
-        # curvature terms
-        self.calc_curvature()
+    def _calcMetricAtLocation(self, location, Jcheck):
+        """
+        Calculate the components of the metric tensor, J and Jcheck=1/sqrt(det(g)) at
+        one location, writing the results directly into the (already created) output
+        arrays, using in-place operations on a couple of work arrays so that no other
+        temporary arrays are created. The order of operations is the same as for the
+        expressions written out in terms of MultiLocationArrays, so the results are
+        identical.
+
+        Outputs are only calculated if all the inputs they depend on are present at
+        location. Returns whether J is consistent with Jcheck at location, or None if
+        Jcheck was not calculated there.
+        """
+        orthogonal = self.user_options.orthogonal
+        bpsign = self.bpsign
+
+        inputs = [self.Rxy, self.Bpxy, self.hy, self.dphidy, self.I]
+        if not all(getattr(f, "has_" + location) for f in inputs):
+            return None
+        R, Bp, hy, dphidy, I = (f._getArray(location) for f in inputs)
+        if orthogonal:
+            have_beta = True
+        else:
+            have_beta = all(
+                getattr(f, "has_" + location) for f in [self.cosBeta, self.tanBeta]
+            )
+            if have_beta:
+                cosBeta = self.cosBeta._getArray(location)
+                tanBeta = self.tanBeta._getArray(location)
+
+        def out(name):
+            return self.__dict__[name]._getArray(location, initialise=False)
+
+        t = numpy.empty_like(R)
+        u = numpy.empty_like(R)
+
+        def sq(x, result):
+            # x**2 evaluated in the same way as for a MultiLocationArray
+            return numpy.power(x, 2, out=result)
+
+        # Components that do not depend on beta
+        ########################################
+
+        g11 = out("g11")
+        numpy.multiply(R, Bp, out=g11)
+        sq(g11, g11)
+
+        numpy.divide(hy, Bp, out=out("J"))
+
+        g_22 = out("g_22")
+        sq(hy, g_22)
+        if orthogonal:
+            numpy.multiply(R, dphidy, out=t)
+        else:
+            numpy.multiply(dphidy, R, out=t)
+        numpy.add(g_22, sq(t, t), out=g_22)
+
+        g_33 = out("g_33")
+        sq(R, g_33)
+
+        numpy.multiply(g_33, I, out=out("g_13"))
+
+        if orthogonal:
+            numpy.multiply(dphidy, g_33, out=out("g_23"))
+        else:
+            g_23 = out("g_23")
+            numpy.multiply(bpsign, dphidy, out=g_23)
+            numpy.multiply(g_23, g_33, out=g_23)
+
+        if not have_beta:
+            return None
+
+        # Components that depend on beta for non-orthogonal grids
+        ##########################################################
+
+        g22 = out("g22")
+        g33 = out("g33")
+        g12 = out("g12")
+        g13 = out("g13")
+        g23 = out("g23")
+        g_11 = out("g_11")
+        g_12 = out("g_12")
+
+        if orthogonal:
+            numpy.divide(1.0, sq(hy, g22), out=g22)
+
+            numpy.multiply(I, g11, out=g33)
+            numpy.divide(dphidy, hy, out=t)
+            numpy.add(g33, sq(t, t), out=g33)
+            numpy.divide(1.0, sq(R, t), out=t)
+            numpy.add(g33, t, out=g33)
+
+            g12[...] = 0.0
+
+            # -I*g11
+            numpy.multiply(I, g11, out=g13)
+            numpy.negative(g13, out=g13)
+
+            # -dphidy/hy**2
+            numpy.divide(dphidy, sq(hy, g23), out=g23)
+            numpy.negative(g23, out=g23)
+
+            numpy.divide(1.0, g11, out=g_11)
+            numpy.multiply(I, R, out=t)
+            numpy.add(g_11, sq(t, t), out=g_11)
+
+            numpy.multiply(g_33, dphidy, out=g_12)
+            numpy.multiply(g_12, I, out=g_12)
+        else:
+            # (hy*cosBeta)**2
+            numpy.multiply(hy, cosBeta, out=u)
+            sq(u, u)
+
+            numpy.divide(1.0, u, out=g22)
+
+            numpy.divide(1.0, sq(R, g33), out=g33)
+            numpy.multiply(R, Bp, out=t)
+            numpy.multiply(t, I, out=t)
+            numpy.add(g33, sq(t, t), out=g33)
+            numpy.multiply(hy, cosBeta, out=t)
+            numpy.divide(dphidy, t, out=t)
+            numpy.add(g33, sq(t, t), out=g33)
+            numpy.multiply(2.0, R, out=t)
+            numpy.multiply(t, Bp, out=t)
+            numpy.multiply(t, I, out=t)
+            numpy.multiply(t, dphidy, out=t)
+            numpy.multiply(t, tanBeta, out=t)
+            numpy.divide(t, hy, out=t)
+            numpy.add(g33, t, out=g33)
+
+            # R*|Bp|*tanBeta/hy
+            numpy.abs(Bp, out=t)
+            numpy.multiply(R, t, out=g12)
+            numpy.multiply(g12, tanBeta, out=g12)
+            numpy.divide(g12, hy, out=g12)
+
+            # -R*Bp*dphidy*tanBeta/hy - I*(R*Bp)**2
+            numpy.multiply(R, Bp, out=g13)
+            numpy.multiply(g13, dphidy, out=g13)
+            numpy.multiply(g13, tanBeta, out=g13)
+            numpy.divide(g13, hy, out=g13)
+            numpy.negative(g13, out=g13)
+            numpy.multiply(I, g11, out=t)
+            numpy.subtract(g13, t, out=g13)
+
+            # -bpsign*dphidy/(hy*cosBeta)**2 - R*|Bp|*I*tanBeta/hy
+            numpy.multiply(-bpsign, dphidy, out=g23)
+            numpy.divide(g23, u, out=g23)
+            numpy.abs(Bp, out=t)
+            numpy.multiply(R, t, out=t)
+            numpy.multiply(t, I, out=t)
+            numpy.multiply(t, tanBeta, out=t)
+            numpy.divide(t, hy, out=t)
+            numpy.subtract(g23, t, out=g23)
+
+            # 1/(R*Bp*cosBeta)**2 + (I*R)**2
+            numpy.multiply(R, Bp, out=g_11)
+            numpy.multiply(g_11, cosBeta, out=g_11)
+            numpy.divide(1.0, sq(g_11, g_11), out=g_11)
+            numpy.multiply(I, R, out=t)
+            numpy.add(g_11, sq(t, t), out=g_11)
+
+            # bpsign*I*dphidy*R**2 - hy*tanBeta/(R*|Bp|)
+            numpy.multiply(bpsign, I, out=g_12)
+            numpy.multiply(g_12, dphidy, out=g_12)
+            numpy.multiply(g_12, g_33, out=g_12)
+            numpy.multiply(hy, tanBeta, out=t)
+            numpy.abs(Bp, out=u)
+            numpy.multiply(R, u, out=u)
+            numpy.divide(t, u, out=t)
+            numpy.subtract(g_12, t, out=g_12)
+
+        # check Jacobian is OK
+        ######################
+
+        # determinant of the metric tensor
+        # g11*g22*g33 + 2*g12*g13*g23 - g11*g23**2 - g22*g13**2 - g33*g12**2
+        Jc = Jcheck._getArray(location, initialise=False)
+        numpy.multiply(g11, g22, out=Jc)
+        numpy.multiply(Jc, g33, out=Jc)
+        numpy.multiply(2.0, g12, out=t)
+        numpy.multiply(t, g13, out=t)
+        numpy.multiply(t, g23, out=t)
+        numpy.add(Jc, t, out=Jc)
+        numpy.multiply(g11, sq(g23, t), out=t)
+        numpy.subtract(Jc, t, out=Jc)
+        numpy.multiply(g22, sq(g13, t), out=t)
+        numpy.subtract(Jc, t, out=Jc)
+        numpy.multiply(g33, sq(g12, t), out=t)
+        numpy.subtract(Jc, t, out=Jc)
+        numpy.sqrt(Jc, out=Jc)
+        numpy.divide(bpsign * 1.0, Jc, out=Jc)
+
+        J = out("J")
+        if location == "corners":
+            # ignore grid points at X-points as J should diverge there (as Bp->0)
+            if self.equilibriumRegion.xPointsAtStart[self.radialIndex] is not None:
+                Jc[0, 0] = J[0, 0]
+            if self.equilibriumRegion.xPointsAtStart[self.radialIndex + 1] is not None:
+                Jc[-1, 0] = J[-1, 0]
+            if self.equilibriumRegion.xPointsAtEnd[self.radialIndex] is not None:
+                Jc[0, -1] = J[0, -1]
+            if self.equilibriumRegion.xPointsAtEnd[self.radialIndex + 1] is not None:
+                Jc[-1, -1] = J[-1, -1]
+
+        # abs(J - Jcheck)/abs(J) < geometry_rtol
+        numpy.subtract(J, Jc, out=t)
+        numpy.abs(t, out=t)
+        numpy.abs(J, out=u)
+        numpy.divide(t, u, out=t)
+        return bool(numpy.all(t < self.user_options.geometry_rtol))
 
     def calc_curvature(self):
         if self.user_options.curvature_type == "curl(b/B) with x-y derivatives":
             # calculate curl on x-y grid
-            self.curl_bOverB_x = (
+            self.curl_bOverB_x = numpy.multiply(
                 -2.0
                 * self.bpsign
                 * self.Bpxy
                 * self.Btxy
                 * self.Rxy
-                / (self.hy * self.Bxy ** 3)
-                * self.DDY("#Bxy")
+                / (self.hy * self.Bxy ** 3),
+                self.DDY("Bxy"),
+                out=self._newField("curl_bOverB_x"),
             )
-            self.curl_bOverB_y = (
-                -self.bpsign * self.Bpxy / self.hy * self.DDX("#Btxy*#Rxy/#Bxy**2")
+            self.curl_bOverB_y = numpy.multiply(
+                -self.bpsign * self.Bpxy / self.hy,
+                self.DDX(lambda r: r.Btxy * r.Rxy / r.Bxy ** 2),
+                out=self._newField("curl_bOverB_y"),
             )
-            self.curl_bOverB_z = (
-                self.Bpxy ** 3 / (self.hy * self.Bxy ** 2) * self.DDX("#hy/#Bpxy")
-                - self.Btxy * self.Rxy / self.Bxy ** 2 * self.DDX("#Btxy/#Rxy")
-                - self.I * self.curl_bOverB_x
+            self.curl_bOverB_z = numpy.subtract(
+                self.Bpxy ** 3
+                / (self.hy * self.Bxy ** 2)
+                * self.DDX(lambda r: r.hy / r.Bpxy)
+                - self.Btxy
+                * self.Rxy
+                / self.Bxy ** 2
+                * self.DDX(lambda r: r.Btxy / r.Rxy),
+                self.I * self.curl_bOverB_x,
+                out=self._newField("curl_bOverB_z"),
             )
-            self.bxcvx = self.Bxy / 2.0 * self.curl_bOverB_x
-            self.bxcvy = self.Bxy / 2.0 * self.curl_bOverB_y
-            self.bxcvz = self.Bxy / 2.0 * self.curl_bOverB_z
+            self.calcBxcv()
         elif self.user_options.curvature_type == "curl(b/B)":
             # Calculate Curl(b/B) in R-Z, then project onto x-y-z components
             # This calculates contravariant components of a curvature vector
@@ -1466,33 +2014,35 @@ class MeshRegion:
                     R * BR(R, Z)
                 )
 
-            self.curl_bOverB_x = curl_bOverB_x(self.Rxy, self.Zxy)
+            self.curl_bOverB_x = self._evaluateField(
+                "curl_bOverB_x", curl_bOverB_x, self.Rxy, self.Zxy
+            )
 
             # Grad(y) = (d_Z, 0, -d_R)/(hy*cosBeta)
             #         = (BR*cosBeta-BZ*sinBeta, 0, BZ*cosBeta+BR*sinBeta)/(Bp*hy*cosBeta)
             #         = (BR-BZ*tanBeta, 0, BZ+BR*tanBeta)/(Bp*hy)
-            curl_bOverB_y = (
+            self.curl_bOverB_y = numpy.divide(
                 curl_bOverB_R(self.Rxy, self.Zxy)
                 * (BR(self.Rxy, self.Zxy) - BZ(self.Rxy, self.Zxy) * self.tanBeta)
                 + curl_bOverB_Z(self.Rxy, self.Zxy)
-                * (BZ(self.Rxy, self.Zxy) + BR(self.Rxy, self.Zxy) * self.tanBeta)
-            ) / (self.Bpxy * self.hy)
-            self.curl_bOverB_y = curl_bOverB_y
+                * (BZ(self.Rxy, self.Zxy) + BR(self.Rxy, self.Zxy) * self.tanBeta),
+                self.Bpxy * self.hy,
+                out=self._newField("curl_bOverB_y"),
+            )
 
             # Grad(z) = Grad(zeta) - Bt*hy/(Bp*R)*Grad(y) - I*Grad(x)
-            self.curl_bOverB_z = (
+            self.curl_bOverB_z = numpy.subtract(
                 curl_bOverB_zeta(self.Rxy, self.Zxy) / self.Rxy
-                - self.Btxy * self.hy / (self.Bpxy * self.Rxy) * self.curl_bOveryB_y
-                - self.I * self.curl_bOverB_x
+                - self.Btxy * self.hy / (self.Bpxy * self.Rxy) * self.curl_bOveryB_y,
+                self.I * self.curl_bOverB_x,
+                out=self._newField("curl_bOverB_z"),
             )
 
             # bxcv is calculated this way for backward compatibility with Hypnotoad.
             # bxcv stands for 'b x kappa' where kappa is the field-line curvature, which
             # is not exactly equivalent to the result here, but this is how Hypnotoad
             # passed 'curvature' calculated as curl(b/B)
-            self.bxcvx = self.Bxy / 2.0 * self.curl_bOverB_x
-            self.bxcvy = self.Bxy / 2.0 * self.curl_bOverB_y
-            self.bxcvz = self.Bxy / 2.0 * self.curl_bOverB_z
+            self.calcBxcv()
         elif self.user_options.curvature_type == "bxkappa":
             raise ValueError("bxkappa form of curvature not implemented yet")
             self.bxcvx = float("nan")
@@ -1505,6 +2055,22 @@ class MeshRegion:
                 + "' for curvature type"
             )
 
+    def calcBxcv(self):
+        """
+        Calculate the curvature terms bxcvx, bxcvy and bxcvz from the components of
+        curl(b/B)
+        """
+        for component in ["x", "y", "z"]:
+            setattr(
+                self,
+                "bxcv" + component,
+                numpy.multiply(
+                    self.Bxy / 2.0,
+                    getattr(self, "curl_bOverB_" + component),
+                    out=self._newField("bxcv" + component),
+                ),
+            )
+
     def calcHy(self):
         # hy = |Grad(theta)|
         # hy = dtheta/ds at constant psi, phi when psi and theta are orthogonal
@@ -1512,89 +2078,85 @@ class MeshRegion:
         if not self.user_options.orthogonal:
             warnings.warn("need to check that this is correct for non-orthogonal grids")
 
-        hy = MultiLocationArray(self.nx, self.ny)
+        hy = self._newField("hy")
         # contours have accurately calculated distances
+        # d has shape (2*nx+1, 2*ny+1): even x-indices are at xlow positions, odd
+        # x-indices at cell centres; even y-indices are at ylow positions, odd y-indices
+        # at cell centres
+        d = self.stackedDistances()
+
         # calculate distances between j+/-0.5
-        for i in range(self.nx):
-            print(f"{self.name} calcHy {i} / {2 * self.nx + 1}", end="\r", flush=True)
-            d = numpy.array(self.contours[2 * i + 1].distance)
-            hy.centre[i, :] = d[2::2] - d[:-2:2]
-            hy.ylow[i, 1:-1] = d[3:-1:2] - d[1:-3:2]
-            if self.connections["lower"] is not None:
-                cbelow = self.getNeighbour("lower").contours[2 * i + 1]
-                hy.ylow[i, 0] = d[1] - d[0] + cbelow.distance[-1] - cbelow.distance[-2]
-            else:
-                # no region below, so estimate distance to point before '0' as the same
-                # as from '0' to '1'
-                hy.ylow[i, 0] = 2.0 * (d[1] - d[0])
-            if self.connections["upper"] is not None:
-                cabove = self.getNeighbour("upper").contours[2 * i + 1]
-                hy.ylow[i, -1] = d[-1] - d[-2] + cabove.distance[1] - cabove.distance[0]
-            else:
-                # no region below, so estimate distance to point before '0' as the same
-                # as from '0' to '1'
-                hy.ylow[i, -1] = 2.0 * (d[-1] - d[-2])
+        # shape (2*nx+1, ny)
+        hy_ycentre = d[:, 2::2] - d[:, :-2:2]
 
-        for i in range(self.nx + 1):
-            print(
-                f"{self.name} calcHy {i + self.nx} / {2 * self.nx + 1}",
-                end="\r",
-                flush=True,
-            )
-            d = numpy.array(self.contours[2 * i].distance)
-            hy.xlow[i, :] = d[2::2] - d[:-2:2]
-            hy.corners[i, 1:-1] = d[3:-1:2] - d[1:-3:2]
-            if self.connections["lower"] is not None:
-                cbelow = self.getNeighbour("lower").contours[2 * i]
-                hy.corners[i, 0] = (
-                    d[1] - d[0] + cbelow.distance[-1] - cbelow.distance[-2]
-                )
-            else:
-                # no region below, so estimate distance to point before '0' as the same
-                # as from '0' to '1'
-                hy.corners[i, 0] = 2.0 * (d[1] - d[0])
-            if self.connections["upper"] is not None:
-                cabove = self.getNeighbour("upper").contours[2 * i]
-                hy.corners[i, -1] = (
-                    d[-1] - d[-2] + cabove.distance[1] - cabove.distance[0]
-                )
-            else:
-                # no region below, so estimate distance to point before '0' as the same
-                # as from '0' to '1'
-                hy.corners[i, -1] = 2.0 * (d[-1] - d[-2])
+        # shape (2*nx+1, ny+1)
+        hy_ylow = numpy.zeros([2 * self.nx + 1, self.ny + 1])
+        hy_ylow[:, 1:-1] = d[:, 3:-1:2] - d[:, 1:-3:2]
+        if self.connections["lower"] is not None:
+            dbelow = self.getNeighbour("lower").stackedDistances()
+            hy_ylow[:, 0] = d[:, 1] - d[:, 0] + dbelow[:, -1] - dbelow[:, -2]
+        else:
+            # no region below, so estimate distance to point before '0' as the same
+            # as from '0' to '1'
+            hy_ylow[:, 0] = 2.0 * (d[:, 1] - d[:, 0])
+        if self.connections["upper"] is not None:
+            dabove = self.getNeighbour("upper").stackedDistances()
+            hy_ylow[:, -1] = d[:, -1] - d[:, -2] + dabove[:, 1] - dabove[:, 0]
+        else:
+            # no region above, so estimate distance to point after the last one as the
+            # same as from the second-last to the last
+            hy_ylow[:, -1] = 2.0 * (d[:, -1] - d[:, -2])
 
-        hy /= self.dy
+        hy.centre = hy_ycentre[1::2, :]
+        hy.xlow = hy_ycentre[::2, :]
+        hy.ylow = hy_ylow[1::2, :]
+        hy.corners = hy_ylow[::2, :]
 
-        def negative_indices(a):
-            xinds, yinds = numpy.where(a < 0.0)
-            return list(zip(list(xinds), list(yinds)))
+        hy /= self.dy
 
-        if not numpy.all(hy.centre > 0.0):
-            raise ValueError(
-                f"hy.centre should always be positive. Negative values found in "
-                f"region '{self.name}' at (x,y) indices {negative_indices(hy.centre)}"
-            )
-        if not numpy.all(hy.xlow > 0.0):
-            raise ValueError(
-                f"hy.xlow should always be positive. Negative values found in "
-                f"region '{self.name}' at (x,y) indices {negative_indices(hy.xlow)}"
-            )
-        if not numpy.all(hy.ylow > 0.0):
-            raise ValueError(
-                f"hy.ylow should always be positive. Negative values found in "
-                f"region '{self.name}' at (x,y) indices {negative_indices(hy.ylow)}"
-            )
-        if not numpy.all(hy.corners > 0.0):
-            raise ValueError(
-                f"hy.corners should always be positive. Negative values found in "
-                f"region '{self.name}' at (x,y) indices {negative_indices(hy.corners)}"
-            )
-        assert numpy.all(hy.xlow > 0.0), "hy.xlow should always be positive"
-        assert numpy.all(hy.ylow > 0.0), "hy.ylow should always be positive"
-        assert numpy.all(hy.corners > 0.0), "hy.corners should always be positive"
+        for location in ["centre", "xlow", "ylow", "corners"]:
+            hy_location = getattr(hy, location)
+            if not numpy.all(hy_location > 0.0):
+                xinds, yinds = numpy.where(~(hy_location > 0.0))
+                raise ValueError(
+                    f"hy.{location} should always be positive. Negative values found "
+                    f"in region '{self.name}' at (x,y) indices "
+                    f"{list(zip(list(xinds), list(yinds)))}"
+                )
 
         return hy
 
+    def stackedDistances(self):
+        """
+        Distances along all the contours of this region, as an array with shape
+        (len(self.contours), len(contour))
+        """
+        if self.contours is None:
+            # contours have been released by releaseContours()
+            return self._stacked_distances
+        return numpy.array([contour.distance for contour in self.contours])
+
+    def releaseContours(self):
+        """
+        Store the distances along the contours, which are needed by calcHy(), then
+        release the PsiContours, and the FineContours used to calculate the distances,
+        to save memory. Methods that need the contours, like fillRZ() and
+        distributePointsNonorthogonal(), cannot be used afterwards.
+        """
+        if self.contours is None:
+            return
+
+        distances = []
+        for contour in self.contours:
+            distances.append(contour.distance)
+            # Release each FineContour as soon as it is not needed, so they do not all
+            # exist at the same time
+            contour.releaseFineContour()
+        self._stacked_distances = numpy.array(distances)
+
+        self.contours = None
+        self.equilibriumRegion.releaseFineContour()
+
     def calcBeta(self):
         """
         Calculate beta (angle between e_x and Grad(x), also the angle between e_y and
@@ -1704,7 +2266,7 @@ class MeshRegion:
             return None
 
         region = self
-        region.zShift = MultiLocationArray(region.nx, region.ny)
+        region.zShift = region._newField("zShift")
         while True:
             # calculate integral for field lines with centre and ylow points
             i_centre = 0.25 * numpy.cumsum(
@@ -1767,7 +2329,7 @@ class MeshRegion:
                 # Note: If periodic, next_region is self (back to start)
                 break
             else:
-                next_region.zShift = MultiLocationArray(next_region.nx, next_region.ny)
+                next_region.zShift = next_region._newField("zShift")
                 next_region.zShift.ylow[:, 0] = region.zShift.ylow[:, -1]
                 next_region.zShift.corners[:, 0] = region.zShift.corners[:, -1]
                 region = next_region
@@ -1791,62 +2353,108 @@ class MeshRegion:
         else:
             return self.meshParent.regions[self.connections[face]]
 
-    def _eval_from_region(self, expr, region=None, component=None):
-        # Utility routine to evaluate an expression using different MeshRegions
-        # Names of fields belonging to the MeshRegion are indicated by a '#' in expr,
-        # e.g.  if 'foo' and 'bar' are two member variables, we could have
-        # expr='#foo + #bar'
+    # Locations and indices of the rows of the neighbouring regions in each direction
+    # that are needed by DDX() and DDY()
+    _halo_rows = {
+        "inner": [("centre", (-1, slice(None))), ("ylow", (-1, slice(None)))],
+        "outer": [("centre", (0, slice(None))), ("ylow", (0, slice(None)))],
+        "lower": [("centre", (slice(None), -1)), ("xlow", (slice(None), -1))],
+        "upper": [("centre", (slice(None), 0)), ("xlow", (slice(None), 0))],
+    }
 
-        if region is None:
-            region_string = "self"
-        else:
-            region_string = "self.getNeighbour('" + region + "')"
+    def fieldWithHalo(self, f):
+        """
+        Get the field f on this region, along with the boundary rows of f from the
+        neighbouring regions that are needed by DDX() and DDY(). The result can be
+        passed to both DDX() and DDY(), so that the boundary rows are only gathered
+        once.
+
+        f can be:
+        - the name of a MultiLocationArray member of MeshRegion, e.g. "Bxy"
+        - a MultiLocationArray member of this MeshRegion, e.g. self.Bxy
+        - a function that takes a MeshRegion and returns a MultiLocationArray, e.g.
+          lambda r: r.Btxy * r.Rxy / r.Bxy ** 2. For the boundary rows, the function is
+          only evaluated on the rows that are needed from the neighbouring regions.
+        - a FieldWithHalo, which is returned unchanged
+        """
+        if isinstance(f, FieldWithHalo):
+            return f
 
-        if component is None:
-            component = ""
-        else:
-            component = "." + component
+        if isinstance(f, MultiLocationArray):
+            names = [name for name, value in vars(self).items() if value is f]
+            if not names:
+                raise ValueError(
+                    "MultiLocationArray passed to fieldWithHalo() must be a member of "
+                    "the MeshRegion, so that its values in neighbouring regions can "
+                    "be found. Pass a function of the MeshRegion instead."
+                )
+            f = names[0]
+
+        if isinstance(f, str):
+            name = f
+
+            def func(region):
+                return getattr(region, name)
 
-        # replace the name of the field with an expression to get that field from the
-        # MeshRegion 'region'
-        expr = re.sub("#(\\w+)", region_string + ".__dict__['\\1']" + component, expr)
+        else:
+            func = f
+            name = getattr(f, "__name__", str(f))
+
+        halo = {}
+        for direction, rows in self._halo_rows.items():
+            neighbour = self.getNeighbour(direction)
+            if neighbour is None:
+                continue
+            for location, index in rows:
+                halo[(direction, location)] = func(
+                    _RegionSlice(neighbour, location, index)
+                )
 
-        return eval(expr)
+        return FieldWithHalo(func(self), halo, name)
 
-    def DDX(self, expr):
+    def DDX(self, f, out=None):
         # x-derivative of a MultiLocationArray, calculated with 2nd order central
         # differences
+        # f can be anything accepted by fieldWithHalo()
+        # The result is written into out if it is given
 
-        f = self._eval_from_region(expr)
+        f_with_halo = self.fieldWithHalo(f)
+        name = f_with_halo.name
+        f = f_with_halo.field
+
+        # Without a neighbour, the staggered values on the boundary are used instead
+        boundary = (
+            self.connections["inner"] is None or self.connections["outer"] is None
+        )
 
-        result = MultiLocationArray(self.nx, self.ny)
+        result = MultiLocationArray(self.nx, self.ny) if out is None else out
 
-        if f.xlow is not None:
+        if f.has_xlow:
             result.centre[...] = (f.xlow[1:, :] - f.xlow[:-1, :]) / self.dx.centre
         else:
             warnings.warn(
-                "No xlow field available to calculate DDX(" + expr + ").centre"
+                "No xlow field available to calculate DDX(" + name + ").centre"
             )
-        if f.corners is not None:
+        if f.has_corners:
             result.ylow[...] = (f.corners[1:, :] - f.corners[:-1, :]) / self.dx.ylow
         else:
             warnings.warn(
-                "No corners field available to calculate DDX(" + expr + ").ylow"
+                "No corners field available to calculate DDX(" + name + ").ylow"
             )
 
-        if f.centre is not None:
+        if f.has_centre and (f.has_xlow or not boundary):
             result.xlow[1:-1, :] = (f.centre[1:, :] - f.centre[:-1, :]) / self.dx.xlow[
                 1:-1, :
             ]
             if self.connections["inner"] is not None:
-                f_inner = self._eval_from_region(expr, "inner", "centre[-1, :]")
+                f_inner = f_with_halo.halo[("inner", "centre")]
                 result.xlow[0, :] = (f.centre[0, :] - f_inner) / self.dx.xlow[0, :]
             else:
                 result.xlow[0, :] = (f.centre[0, :] - f.xlow[0, :]) / (
                     self.dx.xlow[0, :] / 2.0
                 )
             if self.connections["outer"] is not None:
-                f_outer = self._eval_from_region(expr, "outer", "centre[0, :]")
+                f_outer = f_with_halo.halo[("outer", "centre")]
                 result.xlow[-1, :] = (f_outer - f.centre[-1, :]) / self.dx.xlow[-1, :]
             else:
                 result.xlow[-1, :] = (f.xlow[-1, :] - f.centre[-1, :]) / (
@@ -1854,22 +2462,23 @@ class MeshRegion:
                 )
         else:
             warnings.warn(
-                "No centre field available to calculate DDX(" + expr + ").xlow"
+                "No centre field (or xlow field on the boundaries) available to "
+                "calculate DDX(" + name + ").xlow"
             )
 
-        if f.ylow is not None:
+        if f.has_ylow and (f.has_corners or not boundary):
             result.corners[1:-1, :] = (
                 f.ylow[1:, :] - f.ylow[:-1, :]
             ) / self.dx.corners[1:-1, :]
             if self.connections["inner"] is not None:
-                f_inner = self._eval_from_region(expr, "inner", "ylow[-1, :]")
+                f_inner = f_with_halo.halo[("inner", "ylow")]
                 result.corners[0, :] = (f.ylow[0, :] - f_inner) / self.dx.corners[0, :]
             else:
                 result.corners[0, :] = (f.ylow[0, :] - f.corners[0, :]) / (
                     self.dx.corners[0, :] / 2.0
                 )
             if self.connections["outer"] is not None:
-                f_outer = self._eval_from_region(expr, "outer", "ylow[0, :]")
+                f_outer = f_with_halo.halo[("outer", "ylow")]
                 result.corners[-1, :] = (f_outer - f.ylow[-1, :]) / self.dx.corners[
                     -1, :
                 ]
@@ -1879,44 +2488,55 @@ class MeshRegion:
                 )
         else:
             warnings.warn(
-                "No ylow field available to calculate DDX(" + expr + ").corners"
+                "No ylow field (or corners field on the boundaries) available to "
+                "calculate DDX(" + name + ").corners"
             )
 
         return result
 
-    def DDY(self, expr):
+    def DDY(self, f, out=None):
         # y-derivative of a MultiLocationArray, calculated with 2nd order central
         # differences
-        f = self._eval_from_region(expr)
+        # f can be anything accepted by fieldWithHalo()
+        # The result is written into out if it is given
 
-        result = MultiLocationArray(self.nx, self.ny)
+        f_with_halo = self.fieldWithHalo(f)
+        name = f_with_halo.name
+        f = f_with_halo.field
 
-        if f.ylow is not None:
+        # Without a neighbour, the staggered values on the boundary are used instead
+        boundary = (
+            self.connections["lower"] is None or self.connections["upper"] is None
+        )
+
+        result = MultiLocationArray(self.nx, self.ny) if out is None else out
+
+        if f.has_ylow:
             result.centre[...] = (f.ylow[:, 1:] - f.ylow[:, :-1]) / self.dy.centre
         else:
             warnings.warn(
-                "No ylow field available to calculate DDY(" + expr + ").centre"
+                "No ylow field available to calculate DDY(" + name + ").centre"
             )
-        if f.corners is not None:
+        if f.has_corners:
             result.xlow[...] = (f.corners[:, 1:] - f.corners[:, :-1]) / self.dy.xlow
         else:
             warnings.warn(
-                "No corners field available to calculate DDY(" + expr + ").xlow"
+                "No corners field available to calculate DDY(" + name + ").xlow"
             )
 
-        if f.centre is not None:
+        if f.has_centre and (f.has_ylow or not boundary):
             result.ylow[:, 1:-1] = (f.centre[:, 1:] - f.centre[:, :-1]) / self.dy.ylow[
                 :, 1:-1
             ]
             if self.connections["lower"] is not None:
-                f_lower = self._eval_from_region(expr, "lower", "centre[:, -1]")
+                f_lower = f_with_halo.halo[("lower", "centre")]
                 result.ylow[:, 0] = (f.centre[:, 0] - f_lower) / self.dy.ylow[:, 0]
             else:
                 result.ylow[:, 0] = (f.centre[:, 0] - f.ylow[:, 0]) / (
                     self.dy.ylow[:, 0] / 2.0
                 )
             if self.connections["upper"] is not None:
-                f_upper = self._eval_from_region(expr, "upper", "centre[:, 0]")
+                f_upper = f_with_halo.halo[("upper", "centre")]
                 result.ylow[:, -1] = (f_upper - f.centre[:, -1]) / self.dy.ylow[:, -1]
             else:
                 result.ylow[:, -1] = (f.ylow[:, -1] - f.centre[:, -1]) / (
@@ -1924,22 +2544,23 @@ class MeshRegion:
                 )
         else:
             warnings.warn(
-                "No centre field available to calculate DDY(" + expr + ").ylow"
+                "No centre field (or ylow field on the boundaries) available to "
+                "calculate DDY(" + name + ").ylow"
             )
 
-        if f.xlow is not None:
+        if f.has_xlow and (f.has_corners or not boundary):
             result.corners[:, 1:-1] = (
                 f.xlow[:, 1:] - f.xlow[:, :-1]
             ) / self.dy.corners[:, 1:-1]
             if self.connections["lower"] is not None:
-                f_lower = self._eval_from_region(expr, "lower", "xlow[:, -1]")
+                f_lower = f_with_halo.halo[("lower", "xlow")]
                 result.corners[:, 0] = (f.xlow[:, 0] - f_lower) / self.dy.corners[:, 0]
             else:
                 result.corners[:, 0] = (f.xlow[:, 0] - f.corners[:, 0]) / (
                     self.dy.corners[:, 0] / 2.0
                 )
             if self.connections["upper"] is not None:
-                f_upper = self._eval_from_region(expr, "upper", "xlow[:, 0]")
+                f_upper = f_with_halo.halo[("upper", "xlow")]
                 result.corners[:, -1] = (f_upper - f.xlow[:, -1]) / self.dy.corners[
                     :, -1
                 ]
@@ -1949,420 +2570,200 @@ class MeshRegion:
                 )
         else:
             warnings.warn(
-                "No xlow field available to calculate DDY(" + expr + ").corners"
+                "No xlow field (or corners field on the boundaries) available to "
+                "calculate DDY(" + name + ").corners"
             )
 
         return result
 
-    def smoothnl_inner1(self, varname):
-        f = getattr(self, varname)
-        if self.connections["inner"] is not None:
-            f_inner = getattr(self.getNeighbour("inner"), varname)
-        else:
-            f_inner = None
-        if self.connections["outer"] is not None:
-            f_outer = getattr(self.getNeighbour("outer"), varname)
-        else:
-            f_outer = None
-        if self.connections["lower"] is not None:
-            f_lower = getattr(self.getNeighbour("lower"), varname)
-        else:
-            f_lower = None
-        if self.connections["upper"] is not None:
-            f_upper = getattr(self.getNeighbour("upper"), varname)
-        else:
-            f_upper = None
-
-        mxn = MultiLocationArray(self.nx, self.ny)
-        myn = MultiLocationArray(self.nx, self.ny)
-
-        if f.centre is not None:
-            dxm = numpy.zeros(f.centre.shape)
-            dxp = numpy.zeros(f.centre.shape)
-            dym = numpy.zeros(f.centre.shape)
-            dyp = numpy.zeros(f.centre.shape)
 
-            dxm[1:-1, :] = f.centre[1:-1, :] - f.centre[:-2, :]
-            dxp[1:-1, :] = f.centre[2:, :] - f.centre[1:-1, :]
+class GeometryGraph:
+    """
+    Dependency graph of the stages of the calculation of geometrical quantities.
+
+    Each node is a stage of the calculation, which provides some quantities and
+    requires the results of other nodes. Requirements can be given either as the name
+    of a node or as the name of a quantity, which refers to the last node added that
+    provides it. Nodes are evaluated lazily: evaluate() only runs the nodes that the
+    requested quantities transitively depend on, and that have not been evaluated
+    already. The time taken by each node is recorded, so the cost of each output can be
+    inspected with cost() and describe(), along with the resident memory of the process
+    before and after each node and the peak while it was evaluated.
+
+    Local nodes calculate their quantities separately for each part of the grid (e.g.
+    each MeshRegion), using only values from the same part. They keep track of which
+    parts are stale (see markStale()), and when they are evaluated they only update
+    those parts.
+
+    Parameters
+    ----------
+    on_evaluate : callable, optional
+        Called with the name of each node after it is evaluated
+    """
 
-            if f_inner is not None:
-                dxm[0, :] = f.centre[0, :] - f_inner.centre[-1, :]
-            if f_outer is not None:
-                dxm[-1, :] = f_outer.centre[0, :] - f.centre[-1, :]
-
-            dym[:, 1:-1] = f.centre[:, 1:-1] - f.centre[:, :-2]
-            dyp[:, 1:-1] = f.centre[:, 2:] - f.centre[:, 1:-1]
-
-            if f_lower is not None:
-                dym[:, 0] = f.centre[:, 0] - f_lower.centre[:, -1]
-            if f_upper is not None:
-                dym[:, -1] = f_upper.centre[:, 0] - f.centre[:, -1]
-
-            mxn.centre = 0.5 * (abs(dxm) + abs(dxp))
-            myn.centre = 0.5 * (abs(dym) + abs(dyp))
-
-        # Note indexing of staggered fields from neighbouring regions - staggered points
-        # overlap at the boundaries.
-        # Don't set outer or upper boundary points so we can sum the results without
-        # duplicates
-
-        if f.xlow is not None:
-            dxm = numpy.zeros(f.xlow.shape)
-            dxp = numpy.zeros(f.xlow.shape)
-            dym = numpy.zeros(f.xlow.shape)
-            dyp = numpy.zeros(f.xlow.shape)
-
-            dxm[1:-2, :] = f.xlow[1:-2, :] - f.xlow[:-3, :]
-            dxp[1:-2, :] = f.xlow[2:-1, :] - f.xlow[1:-2, :]
-
-            if f_inner is not None:
-                dxm[0, :] = f.xlow[0, :] - f_inner.xlow[-2, :]
-            if f_outer is not None:
-                dxm[-2, :] = f_outer.xlow[0, :] - f.xlow[-2, :]
-
-            dym[:, 1:-1] = f.xlow[:, 1:-1] - f.xlow[:, :-2]
-            dyp[:, 1:-1] = f.xlow[:, 2:] - f.xlow[:, 1:-1]
-
-            if f_lower is not None:
-                dym[:, 0] = f.xlow[:, 0] - f_lower.xlow[:, -1]
-            if f_upper is not None:
-                dym[:, -1] = f_upper.xlow[:, 0] - f.xlow[:, -1]
-
-            mxn.xlow = 0.5 * (abs(dxm) + abs(dxp))
-            myn.xlow = 0.5 * (abs(dym) + abs(dyp))
-
-        if f.ylow is not None:
-            dxm = numpy.zeros(f.ylow.shape)
-            dxp = numpy.zeros(f.ylow.shape)
-            dym = numpy.zeros(f.ylow.shape)
-            dyp = numpy.zeros(f.ylow.shape)
-
-            dxm[1:-1, :] = f.ylow[1:-1, :] - f.ylow[:-2, :]
-            dxp[1:-1, :] = f.ylow[2:, :] - f.ylow[1:-1, :]
-
-            if f_inner is not None:
-                dxm[0, :] = f.ylow[0, :] - f_inner.ylow[-1, :]
-            if f_outer is not None:
-                dxm[-1, :] = f_outer.ylow[0, :] - f.ylow[-1, :]
-
-            dym[:, 1:-2] = f.ylow[:, 1:-2] - f.ylow[:, :-3]
-            dyp[:, 1:-2] = f.ylow[:, 2:-1] - f.ylow[:, 1:-2]
-
-            if f_lower is not None:
-                dym[:, 0] = f.ylow[:, 0] - f_lower.ylow[:, -2]
-            if f_upper is not None:
-                dym[:, -2] = f_upper.ylow[:, 0] - f.ylow[:, -2]
-
-            mxn.ylow = 0.5 * (abs(dxm) + abs(dxp))
-            myn.ylow = 0.5 * (abs(dym) + abs(dyp))
-
-        if f.corners is not None:
-            dxm = numpy.zeros(f.corners.shape)
-            dxp = numpy.zeros(f.corners.shape)
-            dym = numpy.zeros(f.corners.shape)
-            dyp = numpy.zeros(f.corners.shape)
-
-            dxm[1:-2, :-1] = f.corners[1:-2, :-1] - f.corners[:-3, :-1]
-            dxp[1:-2, :-1] = f.corners[2:-1, :-1] - f.corners[1:-2, :-1]
-
-            if f_inner is not None:
-                dxm[0, :-1] = f.corners[0, :-1] - f_inner.corners[-2, :-1]
-            if f_outer is not None:
-                dxm[-2, :-1] = f_outer.corners[0, :-1] - f.corners[-2, :-1]
-
-            dym[:-1, 1:-2] = f.corners[:-1, 1:-2] - f.corners[:-1, :-3]
-            dyp[:-1, 1:-2] = f.corners[:-1, 2:-1] - f.corners[:-1, 1:-2]
+    def __init__(self, on_evaluate=None):
+        # Functions, provided quantities, and requirements of each node, in the order
+        # that they were added
+        self.nodes = {}
+        # The node that provides each quantity
+        self.providers = {}
+        # Nodes that have been evaluated since the last reset()
+        self.evaluated = set()
+        # Time taken by the last evaluation of each node
+        self.timings = {}
+        # Resident memory of the process before, after and during the last evaluation
+        # of each node (see _StageMemory)
+        self.memory = {}
+        # Parts of the grid that each local node needs to update when it is next
+        # evaluated
+        self.stale = {}
+        self.on_evaluate = on_evaluate
+
+    def addNode(self, name, func, provides=(), requires=(), local=False):
+        """
+        Add a node to the graph
 
-            if f_lower is not None:
-                dym[:-1, 0] = f.corners[:-1, 0] - f_lower.corners[:-1, -2]
-            if f_upper is not None:
-                dym[:-1, -2] = f_upper.corners[:-1, 0] - f.corners[:-1, -2]
-
-            mxn.corners = 0.5 * (abs(dxm) + abs(dxp))
-            myn.corners = 0.5 * (abs(dym) + abs(dyp))
+        Parameters
+        ----------
+        name : str
+            Name of the node
+        func : callable
+            Function called with no arguments to evaluate the node, or for local nodes
+            with the set of stale parts of the grid to update
+        provides : sequence of str
+            Names of the quantities calculated by the node
+        requires : sequence of str
+            Names of nodes or quantities that must be evaluated before this node
+        local : bool, optional
+            Whether the node is local, i.e. calculates its quantities for each part of
+            the grid only from values in the same part
+        """
+        if name in self.nodes:
+            raise ValueError(f"GeometryGraph already has a node called '{name}'")
+        self.nodes[name] = {
+            "func": func,
+            "provides": tuple(provides),
+            "requires": tuple(self.getNode(r) for r in requires),
+        }
+        if local:
+            self.stale[name] = set()
+        for quantity in provides:
+            self.providers[quantity] = name
 
-        return mxn, myn
-
-    def smoothnl_inner2(self, varname, markx, marky):
-        tmp = getattr(self, varname).copy()
-        if self.connections["inner"] is not None:
-            tmp_inner = getattr(self.getNeighbour("inner"), varname).copy()
-        else:
-            tmp_inner = None
-        if self.connections["outer"] is not None:
-            tmp_outer = getattr(self.getNeighbour("outer"), varname).copy()
-        else:
-            tmp_outer = None
-        if self.connections["lower"] is not None:
-            tmp_lower = getattr(self.getNeighbour("lower"), varname).copy()
-        else:
-            tmp_lower = None
-        if self.connections["upper"] is not None:
-            tmp_upper = getattr(self.getNeighbour("upper"), varname).copy()
-        else:
-            tmp_upper = None
+    def getNode(self, name):
+        """
+        Get the name of the node given either its name, or the name of a quantity that
+        it provides
+        """
+        if name in self.nodes:
+            return name
+        try:
+            return self.providers[name]
+        except KeyError:
+            raise ValueError(
+                f"'{name}' is not a node of the GeometryGraph, or a quantity provided "
+                f"by one"
+            )
 
-        # Smooth the smoothing mask
-        def smooth_mask(mark):
-            result = MultiLocationArray(self.nx, self.ny)
-            if mark.centre is not None:
-                result.centre = 0.1 * (
-                    mark.centre[1:-1, 1:-1]
-                    + mark.centre[0:-2, 1:-1]
-                    + mark.centre[2:, 1:-1]
-                    + mark.centre[1:-1, :-2]
-                    + mark.centre[1:-1, 2:]
-                )
-            if mark.xlow is not None:
-                result.xlow = 0.1 * (
-                    mark.xlow[1:-1, 1:-1]
-                    + mark.xlow[0:-2, 1:-1]
-                    + mark.xlow[2:, 1:-1]
-                    + mark.xlow[1:-1, :-2]
-                    + mark.xlow[1:-1, 2:]
-                )
-            if mark.ylow is not None:
-                result.ylow = 0.1 * (
-                    mark.ylow[1:-1, 1:-1]
-                    + mark.ylow[0:-2, 1:-1]
-                    + mark.ylow[2:, 1:-1]
-                    + mark.ylow[1:-1, :-2]
-                    + mark.ylow[1:-1, 2:]
-                )
-            if mark.corners is not None:
-                result.corners = 0.1 * (
-                    mark.corners[1:-1, 1:-1]
-                    + mark.corners[0:-2, 1:-1]
-                    + mark.corners[2:, 1:-1]
-                    + mark.corners[1:-1, :-2]
-                    + mark.corners[1:-1, 2:]
-                )
+    def dependencies(self, names=None):
+        """
+        Names of the nodes needed to calculate names (all nodes if names is None),
+        including the nodes that provide names themselves, in the order in which they
+        should be evaluated
+        """
+        if names is None:
+            names = self.nodes
+        elif isinstance(names, str):
+            names = [names]
+
+        result = []
+        visiting = set()
+
+        def visit(node):
+            if node in result:
+                return
+            if node in visiting:
+                raise ValueError(f"GeometryGraph has a cycle through '{node}'")
+            visiting.add(node)
+            for required in self.nodes[node]["requires"]:
+                visit(required)
+            visiting.remove(node)
+            result.append(node)
+
+        for name in names:
+            visit(self.getNode(name))
 
-            return result
-
-        mx = smooth_mask(markx)
-        my = smooth_mask(marky)
-
-        if tmp.centre is not None:
-            tmp.centre[1:-1, 1:-1] = (
-                (1.0 - mx.centre[1:-1, 1:-1] - my.centre[1:-1, 1:-1])
-                * tmp.centre[1:-1, 1:-1]
-                + mx.centre[1:-1, 1:-1]
-                * 0.5
-                * (tmp.centre[:-2, 1:-1] + tmp.centre[2:, 1:-1])
-                + my.centre[1:-1, 1:-1]
-                * 0.5
-                * (tmp.centre[1:-1, :-2] + tmp.centre[1:-1, 2:])
-            )
-            if tmp_inner is not None:
-                tmp.centre[0, 1:-1] = (
-                    (1.0 - mx.centre[0, 1:-1] - my.centre[0, 1:-1])
-                    * tmp.centre[0, 1:-1]
-                    + mx.centre[0, 1:-1]
-                    * 0.5
-                    * (tmp_inner.centre[-1, 1:-1] + tmp.centre[1, 1:-1])
-                    + my.centre[0, 1:-1]
-                    * 0.5
-                    * (tmp.centre[0, :-2] + tmp.centre[0, 2:])
-                )
-            else:
-                tmp.centre[1, 1:-1] = tmp.centre[1, 1:-1]
-            if tmp_outer is not None:
-                tmp.centre[-1, 1:-1] = (
-                    (1.0 - mx.centre[-1, 1:-1] - my.centre[-1, 1:-1])
-                    * tmp.centre[-1, 1:-1]
-                    + mx.centre[-1, 1:-1]
-                    * 0.5
-                    * (tmp.centre[-2, 1:-1] + tmp_outer.centre[0, 1:-1])
-                    + my.centre[-1, 1:-1]
-                    * 0.5
-                    * (tmp.centre[-1, :-2] + tmp.centre[-1, 2:])
-                )
-            else:
-                tmp.centre[-1, 1:-1] = tmp.centre[-2, 1:-1]
-            if tmp_lower is not None:
-                tmp.centre[1:-1, 0] = (
-                    (1.0 - mx.centre[1:-1, 0] - my.centre[1:-1, 0])
-                    * tmp.centre[1:-1, 0]
-                    + mx.centre[1:-1, 0]
-                    * 0.5
-                    * (tmp.centre[:-2, 0] + tmp.centre[2:, 0])
-                    + my.centre[1:-1, 0]
-                    * 0.5
-                    * (tmp_lower.centre[1:-1, -1] + tmp.centre[1:-1, 1])
-                )
-            if tmp_upper is not None:
-                tmp.centre[1:-1, -1] = (
-                    (1.0 - mx.centre[1:-1, -1] - my.centre[1:-1, -1])
-                    * tmp.centre[1:-1, -1]
-                    + mx.centre[1:-1, -1]
-                    * 0.5
-                    * (tmp.centre[:-2, -1] + tmp.centre[2:, -1])
-                    + my.centre[1:-1, -1]
-                    * 0.5
-                    * (tmp.centre[1:-1, -2] + tmp_upper.centre[1:-1, 0])
-                )
-        # Note indexing of staggered fields from neighbouring regions - staggered points
-        # overlap at the boundaries.
-
-        if tmp.xlow is not None:
-            tmp.xlow[1:-1, 1:-1] = (
-                (1.0 - mx.xlow[1:-1, 1:-1] - my.xlow[1:-1, 1:-1]) * tmp.xlow[1:-1, 1:-1]
-                + mx.xlow[1:-1, 1:-1] * 0.5 * (tmp.xlow[:-2, 1:-1] + tmp.xlow[2:, 1:-1])
-                + my.xlow[1:-1, 1:-1] * 0.5 * (tmp.xlow[1:-1, :-2] + tmp.xlow[1:-1, 2:])
-            )
-            if tmp_inner is not None:
-                tmp.xlow[0, 1:-1] = (
-                    (1.0 - mx.xlow[0, 1:-1] - my.xlow[0, 1:-1]) * tmp.xlow[0, 1:-1]
-                    + mx.xlow[0, 1:-1]
-                    * 0.5
-                    * (tmp_inner.xlow[-2, 1:-1] + tmp.xlow[1, 1:-1])
-                    + my.xlow[0, 1:-1] * 0.5 * (tmp.xlow[0, :-2] + tmp.xlow[0, 2:])
-                )
-            else:
-                tmp.xlow[0, 1:-1] = tmp.xlow[1, 1:-1]
-            if tmp_outer is not None:
-                tmp.xlow[-1, 1:-1] = (
-                    (1.0 - mx.xlow[-1, 1:-1] - my.xlow[-1, 1:-1]) * tmp.xlow[-1, 1:-1]
-                    + mx.xlow[-1, 1:-1]
-                    * 0.5
-                    * (tmp.xlow[-2, 1:-1] + tmp_outer.xlow[1, 1:-1])
-                    + my.xlow[-1, 1:-1] * 0.5 * (tmp.xlow[-1, :-2] + tmp.xlow[-1, 2:])
-                )
-            else:
-                tmp.xlow[-1, 1:-1] = tmp.xlow[-2, 1:-1]
-            if tmp_lower is not None:
-                tmp.xlow[1:-1, 0] = (
-                    (1.0 - mx.xlow[1:-1, 0] - my.xlow[1:-1, 0]) * tmp.xlow[1:-1, 0]
-                    + mx.xlow[1:-1, 0] * 0.5 * (tmp.xlow[:-2, 0] + tmp.xlow[2:, 0])
-                    + my.xlow[1:-1, 0]
-                    * 0.5
-                    * (tmp_lower.xlow[1:-1, -1] + tmp.xlow[1:-1, 1])
-                )
-            if tmp_upper is not None:
-                tmp.xlow[1:-1, -1] = (
-                    (1.0 - mx.xlow[1:-1, -1] - my.xlow[1:-1, -1]) * tmp.xlow[1:-1, -1]
-                    + mx.xlow[1:-1, -1] * 0.5 * (tmp.xlow[:-2, -1] + tmp.xlow[2:, -1])
-                    + my.xlow[1:-1, -1]
-                    * 0.5
-                    * (tmp.xlow[1:-1, -2] + tmp_upper.xlow[1:-1, 0])
-                )
-        if tmp.ylow is not None:
-            tmp.ylow[1:-1, 1:-1] = (
-                (1.0 - mx.ylow[1:-1, 1:-1] - my.ylow[1:-1, 1:-1]) * tmp.ylow[1:-1, 1:-1]
-                + mx.ylow[1:-1, 1:-1] * 0.5 * (tmp.ylow[:-2, 1:-1] + tmp.ylow[2:, 1:-1])
-                + my.ylow[1:-1, 1:-1] * 0.5 * (tmp.ylow[1:-1, :-2] + tmp.ylow[1:-1, 2:])
-            )
-            if tmp_inner is not None:
-                tmp.ylow[0, 1:-1] = (
-                    (1.0 - mx.ylow[0, 1:-1] - my.ylow[0, 1:-1]) * tmp.ylow[0, 1:-1]
-                    + mx.ylow[0, 1:-1]
-                    * 0.5
-                    * (tmp_inner.ylow[-1, 1:-1] + tmp.ylow[1, 1:-1])
-                    + my.ylow[0, 1:-1] * 0.5 * (tmp.ylow[0, :-2] + tmp.ylow[0, 2:])
-                )
-            else:
-                tmp.ylow[0, 1:-1] = tmp.ylow[1, 1:-1]
-            if tmp_outer is not None:
-                tmp.ylow[-1, 1:-1] = (
-                    (1.0 - mx.ylow[-1, 1:-1] - my.ylow[-1, 1:-1]) * tmp.ylow[-1, 1:-1]
-                    + mx.ylow[-1, 1:-1]
-                    * 0.5
-                    * (tmp.ylow[-2, 1:-1] + tmp_outer.ylow[0, 1:-1])
-                    + my.ylow[-1, 1:-1] * 0.5 * (tmp.ylow[-1, :-2] + tmp.ylow[-1, 2:])
-                )
-            else:
-                tmp.ylow[-1, 1:-1] = tmp.ylow[-2, 1:-1]
-            if tmp_lower is not None:
-                tmp.ylow[1:-1, 0] = (
-                    (1.0 - mx.ylow[1:-1, 0] - my.ylow[1:-1, 0]) * tmp.ylow[1:-1, 0]
-                    + mx.ylow[1:-1, 0] * 0.5 * (tmp.ylow[:-2, 0] + tmp.ylow[2:, 0])
-                    + my.ylow[1:-1, 0]
-                    * 0.5
-                    * (tmp_lower.ylow[1:-1, -2] + tmp.ylow[1:-1, 1])
-                )
-            if tmp_upper is not None:
-                tmp.ylow[1:-1, -1] = (
-                    (1.0 - mx.ylow[1:-1, -1] - my.ylow[1:-1, -1]) * tmp.ylow[1:-1, -1]
-                    + mx.ylow[1:-1, -1] * 0.5 * (tmp.ylow[:-2, -1] + tmp.ylow[2:, -1])
-                    + my.ylow[1:-1, -1]
-                    * 0.5
-                    * (tmp.ylow[1:-1, -2] + tmp_upper.ylow[1:-1, 1])
-                )
-        if tmp.corners is not None:
-            tmp.corners[1:-1, 1:-1] = (
-                (1.0 - mx.corners[1:-1, 1:-1] - my.corners[1:-1, 1:-1])
-                * tmp.corners[1:-1, 1:-1]
-                + mx.corners[1:-1, 1:-1]
-                * 0.5
-                * (tmp.corners[:-2, 1:-1] + tmp.corners[2:, 1:-1])
-                + my.corners[1:-1, 1:-1]
-                * 0.5
-                * (tmp.corners[1:-1, :-2] + tmp.corners[1:-1, 2:])
-            )
-            if tmp_inner is not None:
-                tmp.corners[0, 1:-1] = (
-                    (1.0 - mx.corners[0, 1:-1] - my.corners[0, 1:-1])
-                    * tmp.corners[0, 1:-1]
-                    + mx.corners[0, 1:-1]
-                    * 0.5
-                    * (tmp_inner.corners[-2, 1:-1] + tmp.corners[1, 1:-1])
-                    + my.corners[0, 1:-1]
-                    * 0.5
-                    * (tmp.corners[0, :-2] + tmp.corners[0, 2:])
-                )
-            else:
-                tmp.corners[0, 1:-1] = tmp.corners[1, 1:-1]
-            if tmp_outer is not None:
-                tmp.corners[-1, 1:-1] = (
-                    (1.0 - mx.corners[-1, 1:-1] - my.corners[-1, 1:-1])
-                    * tmp.corners[-1, 1:-1]
-                    + mx.corners[-1, 1:-1]
-                    * 0.5
-                    * (tmp.corners[-2, 1:-1] + tmp_outer.corners[1, 1:-1])
-                    + my.corners[-1, 1:-1]
-                    * 0.5
-                    * (tmp.corners[-1, :-2] + tmp.corners[-1, 2:])
-                )
-            else:
-                tmp.corners[-1, 1:-1] = tmp.corners[-2, 1:-1]
-            if tmp_lower is not None:
-                tmp.corners[1:-1, 0] = (
-                    (1.0 - mx.corners[1:-1, 0] - my.corners[1:-1, 0])
-                    * tmp.corners[1:-1, 0]
-                    + mx.corners[1:-1, 0]
-                    * 0.5
-                    * (tmp.corners[:-2, 0] + tmp.corners[2:, 0])
-                    + my.corners[1:-1, 0]
-                    * 0.5
-                    * (tmp_lower.corners[1:-1, -2] + tmp.corners[1:-1, 1])
-                )
-            if tmp_upper is not None:
-                tmp.corners[1:-1, -1] = (
-                    (1.0 - mx.corners[1:-1, -1] - my.corners[1:-1, -1])
-                    * tmp.corners[1:-1, -1]
-                    + mx.corners[1:-1, -1]
-                    * 0.5
-                    * (tmp.corners[:-2, -1] + tmp.corners[2:, -1])
-                    + my.corners[1:-1, -1]
-                    * 0.5
-                    * (tmp.corners[1:-1, -2] + tmp_upper.corners[1:-1, 1])
-                )
+        return result
 
-        diff = abs(tmp - getattr(self, varname))
-        changes = []
-        if diff.centre is not None:
-            changes.append(numpy.max(diff.centre))
-        if diff.xlow is not None:
-            changes.append(numpy.max(diff.xlow))
-        if diff.ylow is not None:
-            changes.append(numpy.max(diff.ylow))
-        if diff.corners is not None:
-            changes.append(numpy.max(diff.corners))
-        change = max(changes)
+    def evaluate(self, names=None, on_evaluate=None):
+        """
+        Evaluate the nodes needed to calculate names (all nodes if names is None) that
+        have not been evaluated yet. If on_evaluate is given, it is called with the name
+        of each node after it is evaluated, as well as self.on_evaluate
+        """
+        for node in self.dependencies(names):
+            if node not in self.evaluated:
+                start = time.perf_counter()
+                with _StageMemory() as memory:
+                    if node in self.stale:
+                        self.nodes[node]["func"](self.stale[node])
+                        self.stale[node] = set()
+                    else:
+                        self.nodes[node]["func"]()
+                self.timings[node] = time.perf_counter() - start
+                self.memory[node] = memory
+                self.evaluated.add(node)
+                if self.on_evaluate is not None:
+                    self.on_evaluate(node)
+                if on_evaluate is not None:
+                    on_evaluate(node)
+
+    def reset(self, evaluated=()):
+        """
+        Mark all nodes, except those in evaluated, as needing to be evaluated again
+        """
+        self.evaluated = set(evaluated)
 
-        return tmp, change
-        setattr(self, varname, tmp)
+    def markStale(self, parts, nodes=None):
+        """
+        Mark parts of the grid as needing to be updated by the local nodes in nodes
+        (all local nodes if nodes is None) when they are next evaluated
+        """
+        if nodes is None:
+            nodes = self.stale
+        for node in nodes:
+            node = self.getNode(node)
+            if node not in self.stale:
+                raise ValueError(f"'{node}' is not a local node of the GeometryGraph")
+            self.stale[node].update(parts)
+
+    def cost(self, name):
+        """
+        Total time taken by the last evaluation of the nodes needed to calculate name
+        """
+        return sum(self.timings.get(node, 0.0) for node in self.dependencies(name))
+
+    def describe(self, names=None):
+        """
+        Description of the nodes needed to calculate names (all nodes if names is
+        None), giving the quantities each one provides, the nodes it requires, and the
+        time taken by its last evaluation and the resident memory before, after and
+        during it
+        """
+        lines = []
+        for node in self.dependencies(names):
+            info = self.nodes[node]
+            if node in self.timings:
+                timing = f"{self.timings[node]:.3g}s"
+                memory = self.memory.get(node)
+                if memory is not None and memory.before is not None:
+                    timing += f", resident memory {memory}"
+            else:
+                timing = "not evaluated"
+            lines.append(f"{node}: {timing}")
+            lines.append(f"    provides: {', '.join(info['provides'])}")
+            lines.append(f"    requires: {', '.join(info['requires'])}")
+        return "\n".join(lines)
 
 
 class Mesh:
@@ -2375,9 +2776,52 @@ class Mesh:
         Equilibrium.user_options_factory,
         # Include settings for member MeshRegion objects
         MeshRegion.user_options_factory,
+        # Mesh-specific options
+        #######################
+        parallel_workers=WithMeta(
+            None,
+            doc=(
+                "Number of worker processes used to create the MeshRegions. None or 1 "
+                "creates them serially. Requires the 'fork' start method for "
+                "multiprocessing, which is not available on Windows"
+            ),
+            value_type=[int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
+        low_memory=WithMeta(
+            False,
+            doc=(
+                "Release the PsiContours and FineContours of the MeshRegions once the R "
+                "and Z arrays have been calculated, keeping only the distances along "
+                "the contours that are needed to calculate hy. Reduces memory use for "
+                "large grids, but the points cannot be redistributed afterwards. Also "
+                "prints the resident memory before and after each stage of the "
+                "calculation, and the peak during it (only on Linux)"
+            ),
+            value_type=bool,
+        ),
     )
 
-    def __init__(self, equilibrium, settings):
+    # Stage of the calculation at which each option is first used, for the options that
+    # are not used to create the MeshRegions: "RZ" for calculateRZ(), "geometry" for
+    # geometry(), or None for options that only change how the grid is calculated, not
+    # the result. Used to key the entries of a StageCache. All other options are used
+    # in the "mesh" stage.
+    option_stages = {
+        "low_memory": "RZ",
+        "cap_Bp_ylow_xpoint": "geometry",
+        "curvature_smoothing": "geometry",
+        "curvature_type": "geometry",
+        "geometry_rtol": "geometry",
+        "shiftedmetric": "geometry",
+        "smoothnl_max_iterations": "geometry",
+        "smoothnl_tolerance": "geometry",
+        "parallel_workers": None,
+        "contour_workers": None,
+        "contour_executor": None,
+    }
+
+    def __init__(self, equilibrium, settings, previous=None):
         """
         Parameters
         ----------
@@ -2386,6 +2830,13 @@ class Mesh:
         settings : dict
             Non-default values to use to generate the grid. Must be consistent with the
             ones that were used to create the equilibrium
+        previous : Mesh, optional
+            Mesh for a nearby equilibrium, for example the previous slice of a time
+            series, which should be created with previous=<the previous
+            TokamakEquilibrium>. If it has the same regions and sizes as this Mesh, the
+            FineContours of its contours are used as initial guesses for the
+            FineContours of this Mesh, which then only need refining to the new psi.
+            Otherwise the Mesh is generated from scratch
         """
         self.equilibrium = equilibrium
 
@@ -2418,6 +2869,17 @@ class Mesh:
             )
             self.git_diff = self.git_diff.strip()
 
+        if self.user_options.follow_perpendicular_cache:
+            self.perpendicular_trajectory_cache = (
+                PerpendicularTrajectoryCache.forEquilibrium(
+                    self.equilibrium,
+                    rtol=self.user_options.follow_perpendicular_rtol,
+                    atol=self.user_options.follow_perpendicular_atol,
+                )
+            )
+        else:
+            self.perpendicular_trajectory_cache = None
+
         # Generate MeshRegion object for each section of the mesh
         self.regions = {}
 
@@ -2442,23 +2904,76 @@ class Mesh:
                 else:
                     self.connections[region_id][key] = None
 
+        # Stages of the calculation of geometrical quantities
+        self.geometry_graph = self._makeGeometryGraph()
+
+        self._fine_contour_guesses = self._getFineContourGuesses(previous)
+
         self.makeRegions()
 
+        # Do not keep the previous Mesh's FineContours alive
+        self._fine_contour_guesses = {}
+
+    def _getFineContourGuesses(self, previous):
+        """
+        Get the positions of the FineContours of each contour of the Mesh previous, to
+        use as initial guesses, if previous has the same regions and sizes as this Mesh.
+        Returns a dict mapping region IDs to lists with the positions (or None) for each
+        contour.
+        """
+        if previous is None:
+            return {}
+
+        compatible = previous.region_lookup == self.region_lookup
+        if compatible:
+            for (name, i), region_id in self.region_lookup.items():
+                eq_region = self.equilibrium.regions[name]
+                previous_region = previous.regions[region_id]
+                if (
+                    previous_region.nx != eq_region.nx[i]
+                    or previous_region.ny != eq_region.ny(i)
+                    or previous_region.contours is None
+                ):
+                    compatible = False
+                    break
+        if not compatible:
+            print(
+                "Previous mesh has different regions or sizes, or its contours have "
+                "been released, so it cannot be used for initial guesses",
+                flush=True,
+            )
+            return {}
+
+        return {
+            region_id: [
+                None
+                if contour._fine_contour is None
+                else contour._fine_contour.positions
+                for contour in region.contours
+            ]
+            for region_id, region in previous.regions.items()
+        }
+
     def makeRegions(self):
-        for eq_region in self.equilibrium.regions.values():
-            for i in range(eq_region.nSegments):
-                region_id = self.region_lookup[(eq_region.name, i)]
-                eq_region_with_boundaries = eq_region.getRegridded(
-                    radialIndex=i, width=self.user_options.refine_width
-                )
-                self.regions[region_id] = MeshRegion(
-                    self,
-                    region_id,
-                    eq_region_with_boundaries,
-                    self.connections[region_id],
-                    i,
-                    self.user_options,
-                )
+        workers = self.user_options.parallel_workers
+        if (
+            workers is not None
+            and workers > 1
+            and "fork" not in multiprocessing.get_all_start_methods()
+        ):
+            warnings.warn(
+                "parallel_workers requires the 'fork' start method for multiprocessing, "
+                "which is not available. Creating regions serially."
+            )
+            workers = None
+
+        if workers is None or workers == 1:
+            for eq_region in self.equilibrium.regions.values():
+                for i in range(eq_region.nSegments):
+                    region_id = self.region_lookup[(eq_region.name, i)]
+                    self.regions[region_id] = self._makeRegion(eq_region.name, i)
+        else:
+            self._makeRegionsParallel(workers)
 
         # create groups that connect in x
         self.x_groups = []
@@ -2501,6 +3016,57 @@ class Mesh:
                     break
             self.y_groups.append(group)
 
+    def _makeRegion(self, eq_region_name, i):
+        """
+        Create the MeshRegion for radial segment i of the EquilibriumRegion called
+        eq_region_name
+        """
+        region_id = self.region_lookup[(eq_region_name, i)]
+        eq_region_with_boundaries = self.equilibrium.regions[
+            eq_region_name
+        ].getRegridded(radialIndex=i, width=self.user_options.refine_width)
+        return MeshRegion(
+            self,
+            region_id,
+            eq_region_with_boundaries,
+            self.connections[region_id],
+            i,
+            self.user_options,
+            fine_contour_guesses=self._fine_contour_guesses.get(region_id),
+        )
+
+    def _makeRegionsParallel(self, workers):
+        """
+        Create the MeshRegions using a pool of worker processes.
+
+        The workers are forked from this process, so they have a copy of this Mesh and
+        its Equilibrium without needing to pickle them. Each worker sends back its
+        MeshRegion pickled with references to the Mesh and Equilibrium replaced by
+        placeholders, which are restored when the MeshRegion is unpickled here.
+
+        The results are identical to creating the regions serially. Note that
+        PerpendicularTrajectoryCache entries added by the workers are not sent back.
+        """
+        global _mesh_for_workers
+        _mesh_for_workers = self
+        try:
+            # Use multiprocessing.Pool, as concurrent.futures.ProcessPoolExecutor only
+            # accepts a multiprocessing context for Python>=3.7
+            with multiprocessing.get_context("fork").Pool(workers) as pool:
+                results = {}
+                for eq_region in self.equilibrium.regions.values():
+                    for i in range(eq_region.nSegments):
+                        region_id = self.region_lookup[(eq_region.name, i)]
+                        results[region_id] = pool.apply_async(
+                            _makeRegionInWorker, (eq_region.name, i)
+                        )
+                for region_id in sorted(results):
+                    self.regions[region_id] = _RegionUnpickler(
+                        io.BytesIO(results[region_id].get()), self
+                    ).load()
+        finally:
+            _mesh_for_workers = None
+
     def redistributePoints(self, nonorthogonal_settings):
         warnings.warn(
             "It is not recommended to use Mesh.redistributePoints() for 'production' "
@@ -2513,297 +3079,386 @@ class Mesh:
         assert (
             not self.user_options.orthogonal
         ), "redistributePoints would do nothing for an orthogonal grid."
+        self._checkContoursAvailable("redistribute points")
         for region in self.regions.values():
+            # Regions whose spacing parameters have not changed do not need to be
+            # redistributed, and keeping their points exactly as they were means that
+            # the geometry only needs to be updated in the regions that change
+            previous_parameters = region.equilibriumRegion.getDistributionParameters()
+            region.equilibriumRegion.resetNonorthogonalOptions(nonorthogonal_settings)
+            if (
+                region.equilibriumRegion.getDistributionParameters()
+                == previous_parameters
+            ):
+                print("spacing unchanged in", region.name, flush=True)
+                continue
             print("redistributing", region.name, flush=True)
-            region.distributePointsNonorthogonal(nonorthogonal_settings)
+            region.distributePointsNonorthogonal()
+
+        # Geometrical quantities need to be calculated again
+        self.geometry_graph.reset()
 
     def calculateRZ(self):
         """
         Create arrays with R and Z values of all points in the grid
         """
+        self._checkContoursAvailable("calculate R and Z")
         print("Get RZ values", flush=True)
-        for region in self.regions.values():
-            region.fillRZ()
-        for region in self.regions.values():
-            region.getRZBoundary()
+        # Keep the previous values, to find which regions have changed
+        previous_RZ = {
+            region.myID: (region.Rxy.copy(), region.Zxy.copy())
+            for region in self.regions.values()
+            if hasattr(region, "Rxy") and hasattr(region, "Zxy")
+        }
+        with _StageMemory() as memory:
+            for region in self.regions.values():
+                region.fillRZ()
+            for region in self.regions.values():
+                region.getRZBoundary()
+        self._reportMemory("Get RZ values", memory)
+
+        # Only the regions whose points have moved need to be updated by the local
+        # stages of the geometry calculation. hy also uses the distances along the
+        # contours of the y-neighbours, and with cap_Bp_ylow_xpoint capBp uses Bpxy from
+        # the y-neighbours, so those need to be updated in the y-neighbours too.
+        self.changed_regions = {
+            region.myID
+            for region in self.regions.values()
+            if region.myID not in previous_RZ
+            or not _sameValues(region.Rxy, previous_RZ[region.myID][0])
+            or not _sameValues(region.Zxy, previous_RZ[region.myID][1])
+        }
+        del previous_RZ
+        print(
+            f"{len(self.changed_regions)} of {len(self.regions)} regions changed",
+            flush=True,
+        )
+        neighbours = set()
+        for region_id in self.changed_regions:
+            for direction in ["lower", "upper"]:
+                neighbour = self.regions[region_id].connections[direction]
+                if neighbour is not None:
+                    neighbours.add(neighbour)
+        self.geometry_graph.markStale(self.changed_regions)
+        neighbour_nodes = ["hy", "dphidy"]
+        if self.user_options.cap_Bp_ylow_xpoint:
+            neighbour_nodes.append("Bp")
+        self.geometry_graph.markStale(neighbours, neighbour_nodes)
+
+        if self.user_options.low_memory:
+            print("Release contours", flush=True)
+            with _StageMemory() as memory:
+                for region in self.regions.values():
+                    region.releaseContours()
+            self._reportMemory("Release contours", memory)
+
+        # Everything calculated from R and Z needs to be calculated again
+        self.geometry_graph.reset(evaluated=["RZ"])
+
+    def _checkContoursAvailable(self, action):
+        if any(region.contours is None for region in self.regions.values()):
+            raise ValueError(
+                f"Cannot {action} because the contours were released to save memory. "
+                f"Create the Mesh again with low_memory=False"
+            )
+
+    def _reportMemory(self, stage, memory):
+        # Print the resident memory used by a stage (see _StageMemory), in low-memory
+        # mode
+        if self.user_options.low_memory and memory.before is not None:
+            print(f"Resident memory for '{stage}': {memory}", flush=True)
+
+    def _reportNodeMemory(self, node):
+        self._reportMemory(node, self.geometry_graph.memory[node])
 
-    def geometry(self):
+    def resetOptions(self, settings):
         """
-        Calculate geometrical quantities for BOUT++
+        Replace the options of the Mesh and its MeshRegions with ones created from
+        settings, for example for a Mesh loaded from a StageCache. Only options that are
+        not used to create the MeshRegions (see option_stages) should be changed, as the
+        MeshRegions are not created again.
         """
+        self.user_options = self.user_options_factory.create(settings)
         for region in self.regions.values():
-            if not hasattr(region, "Rxy") or not hasattr(region, "Zxy"):
-                # R and Z arrays need calculating
-                self.calculateRZ()
-                break
-        print("Calculate geometry", flush=True)
-        for region in self.regions.values():
-            print("1", region.name, end="\r", flush=True)
-            region.geometry1()
-        for region in self.regions.values():
-            print("2", region.name, end="\r", flush=True)
-            region.geometry2()
-        print("Calculate zShift", flush=True)
-        for region in self.regions.values():
-            print(region.name, end="\r", flush=True)
-            region.calcZShift()
-        print("Calculate Metric", flush=True)
-        for region in self.regions.values():
-            print(region.name, end="\r", flush=True)
-            region.calcMetric()
-
-        if self.user_options.curvature_smoothing == "smoothnl":
-            # Nonlinear smoothing. Tries to smooth only regions with large changes in
-            # gradient.
-            # Smooth {bxcvx,bxcvy,bxcvz} and {curl_bOverB_x,curl_bOverB_y,curl_bOverB_z}
-            # separately (not consistently with each other).
-            if not self.user_options.shiftedmetric:
-                # If shiftedmetric==False, would need to follow IDL hypnotoad and:
-                #  - calculate bz = bxcvz + I*bxcvx
-                #  - smooth bxcvx, bxcvy, and bz
-                #  - set bxcvz = bz - I * bxcvx
-                # and similarly for curl_bOverB_z
-                raise ValueError(
-                    "shiftedmetric==False not handled in "
-                    "curvature_smoothing=='smoothnl'. Non-zero I requires bxcvx and "
-                    "bxcvz to be smoothed consistently"
-                )
-            self.smoothnl("bxcvx")
-            self.smoothnl("bxcvy")
-            self.smoothnl("bxcvz")
-            self.smoothnl("curl_bOverB_x")
-            self.smoothnl("curl_bOverB_y")
-            self.smoothnl("curl_bOverB_z")
+            region.user_options = region.user_options_factory.create(self.user_options)
+
+        # The nodes of the GeometryGraph depend on the options
+        graph_state = self._getGeometryGraphState()
+        self.geometry_graph = self._makeGeometryGraph()
+        self._setGeometryGraphState(graph_state)
+
+    def _getGeometryGraphState(self):
+        graph = self.geometry_graph
+        return {
+            "evaluated": graph.evaluated,
+            "timings": graph.timings,
+            "memory": graph.memory,
+            "stale": graph.stale,
+        }
 
-    def smoothnl(self, varname):
+    def _setGeometryGraphState(self, graph_state):
+        for name, value in graph_state.items():
+            setattr(self.geometry_graph, name, value)
+
+    def __getstate__(self):
+        # The nodes of the GeometryGraph are closures, which cannot be pickled, so only
+        # pickle its state and re-create the graph when unpickling
+        state = self.__dict__.copy()
+        if "geometry_graph" in state:
+            state["geometry_graph"] = self._getGeometryGraphState()
+        return state
+
+    def __setstate__(self, state):
+        graph_state = state.pop("geometry_graph", None)
+        self.__dict__.update(state)
+        if graph_state is not None:
+            self.geometry_graph = self._makeGeometryGraph()
+            self._setGeometryGraphState(graph_state)
+
+    def _makeGeometryGraph(self):
         """
-        Smoothing algorithm copied from IDL hypnotoad
-        https://github.com/boutproject/BOUT-dev/blob/v4.3.2/tools/tokamak_grids/gridgen/smooth_nl.pro  # noqa: E501
+        Create the GeometryGraph of the stages of geometry()
         """
-        npoints_centre = sum(region.nx * region.ny for region in self.regions.values())
-        npoints_xlow = sum(
-            (region.nx + (1 if region.connections["outer"] is None else 0)) * region.ny
-            for region in self.regions.values()
+        graph = GeometryGraph(on_evaluate=self._reportNodeMemory)
+
+        def forRegions(method, message=None):
+            # Call method on every region in turn, or for local nodes only on the
+            # regions whose IDs are in region_ids
+            def func(region_ids=None):
+                if message is not None:
+                    print(message, flush=True)
+                for region in self.regions.values():
+                    if region_ids is None or region.myID in region_ids:
+                        getattr(region, method)()
+
+            return func
+
+        def RZ():
+            for region in self.regions.values():
+                if not hasattr(region, "Rxy") or not hasattr(region, "Zxy"):
+                    # R and Z arrays need calculating
+                    self.calculateRZ()
+                    break
+
+        def capBp():
+            if self.user_options.cap_Bp_ylow_xpoint:
+                # (By default do _not_ do this)
+                # Get rid of minimum in Bpxy.ylow field, because it can cause large
+                # spikes in some metric coefficients, which may cause numerical problems
+                # in simulations
+                for region in self.regions.values():
+                    region.capBpYlowXpoint()
+
+        def hy(region_ids):
+            for region in self.regions.values():
+                if region.myID in region_ids:
+                    region.hy = region.calcHy()
+
+        graph.addNode("RZ", RZ, provides=["Rxy", "Zxy"])
+        graph.addNode(
+            "psixy",
+            forRegions("calcPsi", "Calculate geometry"),
+            provides=["psixy", "xcoord"],
+            requires=["RZ"],
+            local=True,
         )
-        npoints_ylow = sum(
-            region.nx * (region.ny + (1 if region.connections["upper"] is None else 0))
-            for region in self.regions.values()
+        graph.addNode(
+            "spacing", forRegions("calcSpacing"), provides=["dx", "dy"], local=True
         )
-        npoints_corners = sum(
-            (region.nx + (1 if region.connections["outer"] is None else 0))
-            * (region.ny + (1 if region.connections["upper"] is None else 0))
-            for region in self.regions.values()
+        graph.addNode(
+            "Bp",
+            forRegions("calcBp"),
+            provides=["Brxy", "Bzxy", "Bpxy"],
+            requires=["RZ", "psixy"],
+            local=True,
         )
+        graph.addNode(
+            "pressure",
+            forRegions("calcPressure"),
+            provides=["pressure"],
+            requires=["psixy"],
+            local=True,
+        )
+        graph.addNode(
+            "Btxy",
+            forRegions("calcBt"),
+            provides=["Btxy"],
+            requires=["RZ", "psixy"],
+            local=True,
+        )
+        # Bxy is calculated from Bpxy before it is capped
+        graph.addNode(
+            "Bxy",
+            forRegions("calcB"),
+            provides=["Bxy"],
+            requires=["Bp", "Btxy"],
+            local=True,
+        )
+        graph.addNode("capBp", capBp, provides=["Bpxy"], requires=["Bp", "Bxy"])
+        # hy also uses the distances along the contours of the y-neighbours, see
+        # calculateRZ()
+        graph.addNode("hy", hy, provides=["hy"], requires=["RZ", "spacing"], local=True)
+        if not self.user_options.orthogonal:
+            # Calculate beta (angle between e_x and Grad(x), also the angle between e_y
+            # and Grad(y)), used for non-orthogonal grid
+            graph.addNode(
+                "beta",
+                forRegions("calcBeta"),
+                provides=["cosBeta", "sinBeta", "tanBeta"],
+                requires=["RZ"],
+                local=True,
+            )
+        graph.addNode(
+            "dphidy",
+            forRegions("calcDphidy"),
+            provides=["dphidy"],
+            requires=["RZ", "Bpxy", "Btxy", "hy"],
+            local=True,
+        )
+        graph.addNode(
+            "zShift",
+            forRegions("calcZShift", "Calculate zShift"),
+            provides=["zShift", "ShiftAngle"],
+            requires=["dphidy", "spacing"],
+        )
+        metric_requires = ["RZ", "Bpxy", "hy", "dphidy", "spacing"]
+        if not self.user_options.orthogonal:
+            metric_requires.append("beta")
+        if not self.user_options.shiftedmetric:
+            metric_requires.append("zShift")
+        graph.addNode(
+            "metric",
+            forRegions("calcMetric", "Calculate Metric"),
+            provides=[
+                "I",
+                "sinty",
+                "ShiftTorsion",
+                "g11",
+                "g22",
+                "g33",
+                "g12",
+                "g13",
+                "g23",
+                "J",
+                "g_11",
+                "g_22",
+                "g_33",
+                "g_12",
+                "g_13",
+                "g_23",
+            ],
+            requires=metric_requires,
+        )
+        curvature = [
+            "curl_bOverB_x",
+            "curl_bOverB_y",
+            "curl_bOverB_z",
+            "bxcvx",
+            "bxcvy",
+            "bxcvz",
+        ]
+        graph.addNode(
+            "curvature",
+            forRegions("calc_curvature"),
+            provides=curvature,
+            requires=["RZ", "Bpxy", "Btxy", "Bxy", "hy", "spacing", "metric"],
+        )
+        if self.user_options.curvature_smoothing == "smoothnl":
+            graph.addNode(
+                "curvature_smoothing",
+                self._smoothCurvature,
+                provides=curvature,
+                requires=["curvature"],
+            )
 
-        region0 = list(self.regions.values())[0]
-        mxn = {}
-        myn = {}
-        # markx and marky include guard cells, to avoid needing to add them as members
-        # to MeshRegion objects (if they did not have guard cells, we would need to be
-        # able to get them from self.getNeighbour("inner"), etc. in
-        # MeshRegion.smoothnl_inner2()).
-        markx = {
-            region_name: MultiLocationArray(region.nx + 2, region.ny + 2)
-            for region_name, region in self.regions.items()
-        }
-        marky = {
-            region_name: MultiLocationArray(region.nx + 2, region.ny + 2)
-            for region_name, region in self.regions.items()
-        }
-        for i in range(50):
-            for region_name, region in self.regions.items():
-                mxn[region_name], myn[region_name] = region.smoothnl_inner1(varname)
-
-            if getattr(region0, varname).centre is not None:
-                mean_mxn = sum(x.centre.sum() for x in mxn.values()) / npoints_centre
-                mean_myn = sum(x.centre.sum() for x in myn.values()) / npoints_centre
-                for region_name, region in self.regions.items():
-                    this_markx = 0.5 * mxn[region_name].centre / mean_mxn
-                    this_markx = numpy.where(this_markx < 1.0, this_markx, 1.0)
-                    markx[region_name].centre[1:-1, 1:-1] = this_markx
-
-                    this_marky = 0.5 * myn[region_name].centre / mean_myn
-                    this_marky = numpy.where(this_marky < 1.0, this_marky, 1.0)
-                    marky[region_name].centre[1:-1, 1:-1] = this_marky
-
-                    if region.connections["inner"] is not None:
-                        markx[region.connections["inner"]].centre[
-                            -1, 1:-1
-                        ] = this_markx[0, :]
-                        marky[region.connections["inner"]].centre[
-                            -1, 1:-1
-                        ] = this_marky[0, :]
-                    if region.connections["outer"] is not None:
-                        markx[region.connections["outer"]].centre[0, 1:-1] = this_markx[
-                            -1, :
-                        ]
-                        marky[region.connections["outer"]].centre[0, 1:-1] = this_marky[
-                            -1, :
-                        ]
-                    if region.connections["lower"] is not None:
-                        markx[region.connections["lower"]].centre[
-                            1:-1, -1
-                        ] = this_markx[:, 0]
-                        marky[region.connections["lower"]].centre[
-                            1:-1, -1
-                        ] = this_marky[:, 0]
-                    if region.connections["upper"] is not None:
-                        markx[region.connections["upper"]].centre[1:-1, 0] = this_markx[
-                            :, -1
-                        ]
-                        marky[region.connections["upper"]].centre[1:-1, 0] = this_marky[
-                            :, -1
-                        ]
-                    if numpy.any(markx[region_name].centre[1:-1, 1:-1] > 1.0):
-                        raise ValueError(f"{markx[region_name].centre[1:-1, 1:-1]}")
-                    if numpy.any(markx[region_name].centre[1:-1, -1] > 1.0):
-                        raise ValueError(f"{markx[region_name].centre[1:-1, -1]}")
-
-            if getattr(region0, varname).xlow is not None:
-                mean_mxn = sum(x.xlow.sum() for x in mxn.values()) / npoints_xlow
-                mean_myn = sum(x.xlow.sum() for x in myn.values()) / npoints_xlow
-                for region_name, region in self.regions.items():
-                    this_markx = 0.5 * mxn[region_name].xlow / mean_mxn
-                    this_markx = numpy.where(this_markx < 1.0, this_markx, 1.0)
-                    markx[region_name].xlow[1:-1, 1:-1] = this_markx
-
-                    this_marky = 0.5 * myn[region_name].xlow / mean_myn
-                    this_marky = numpy.where(this_marky < 1.0, this_marky, 1.0)
-                    marky[region_name].xlow[1:-1, 1:-1] = this_marky
-
-                    if region.connections["inner"] is not None:
-                        markx[region.connections["inner"]].xlow[-1, 1:-1] = this_markx[
-                            0, :
-                        ]
-                        marky[region.connections["inner"]].xlow[-1, 1:-1] = this_marky[
-                            0, :
-                        ]
-                    if region.connections["outer"] is not None:
-                        markx[region.connections["outer"]].xlow[0, 1:-1] = this_markx[
-                            -1, :
-                        ]
-                        marky[region.connections["outer"]].xlow[0, 1:-1] = this_marky[
-                            -1, :
-                        ]
-                    if region.connections["lower"] is not None:
-                        markx[region.connections["lower"]].xlow[1:-1, -1] = this_markx[
-                            :, 0
-                        ]
-                        marky[region.connections["lower"]].xlow[1:-1, -1] = this_marky[
-                            :, 0
-                        ]
-                    if region.connections["upper"] is not None:
-                        markx[region.connections["upper"]].xlow[1:-1, 0] = this_markx[
-                            :, -1
-                        ]
-                        marky[region.connections["upper"]].xlow[1:-1, 0] = this_marky[
-                            :, -1
-                        ]
-
-            if getattr(region0, varname).ylow is not None:
-                mean_mxn = sum(x.ylow.sum() for x in mxn.values()) / npoints_ylow
-                mean_myn = sum(x.ylow.sum() for x in myn.values()) / npoints_ylow
-                for region_name, region in self.regions.items():
-                    this_markx = 0.5 * mxn[region_name].ylow / mean_mxn
-                    this_markx = numpy.where(this_markx < 1.0, this_markx, 1.0)
-                    markx[region_name].ylow[1:-1, 1:-1] = this_markx
-
-                    this_marky = 0.5 * myn[region_name].ylow / mean_myn
-                    this_marky = numpy.where(this_marky < 1.0, this_marky, 1.0)
-                    marky[region_name].ylow[1:-1, 1:-1] = this_marky
-
-                    if region.connections["inner"] is not None:
-                        markx[region.connections["inner"]].ylow[-1, 1:-1] = this_markx[
-                            0, :
-                        ]
-                        marky[region.connections["inner"]].ylow[-1, 1:-1] = this_marky[
-                            0, :
-                        ]
-                    if region.connections["outer"] is not None:
-                        markx[region.connections["outer"]].ylow[0, 1:-1] = this_markx[
-                            -1, :
-                        ]
-                        marky[region.connections["outer"]].ylow[0, 1:-1] = this_marky[
-                            -1, :
-                        ]
-                    if region.connections["lower"] is not None:
-                        markx[region.connections["lower"]].ylow[1:-1, -1] = this_markx[
-                            :, 0
-                        ]
-                        marky[region.connections["lower"]].ylow[1:-1, -1] = this_marky[
-                            :, 0
-                        ]
-                    if region.connections["upper"] is not None:
-                        markx[region.connections["upper"]].ylow[1:-1, 0] = this_markx[
-                            :, -1
-                        ]
-                        marky[region.connections["upper"]].ylow[1:-1, 0] = this_marky[
-                            :, -1
-                        ]
-
-            if getattr(region0, varname).corners is not None:
-                mean_mxn = sum(x.corners.sum() for x in mxn.values()) / npoints_corners
-                mean_myn = sum(x.corners.sum() for x in myn.values()) / npoints_corners
-                for region_name, region in self.regions.items():
-                    this_markx = 0.5 * mxn[region_name].corners / mean_mxn
-                    this_markx = numpy.where(this_markx < 1.0, this_markx, 1.0)
-                    markx[region_name].corners[1:-1, 1:-1] = this_markx
-
-                    this_marky = 0.5 * myn[region_name].corners / mean_myn
-                    this_marky = numpy.where(this_marky < 1.0, this_marky, 1.0)
-                    marky[region_name].corners[1:-1, 1:-1] = this_marky
-
-                    if region.connections["inner"] is not None:
-                        markx[region.connections["inner"]].corners[
-                            -1, 1:-1
-                        ] = this_markx[0, :]
-                        marky[region.connections["inner"]].corners[
-                            -1, 1:-1
-                        ] = this_marky[0, :]
-                    if region.connections["outer"] is not None:
-                        markx[region.connections["outer"]].corners[
-                            0, 1:-1
-                        ] = this_markx[-1, :]
-                        marky[region.connections["outer"]].corners[
-                            0, 1:-1
-                        ] = this_marky[-1, :]
-                    if region.connections["lower"] is not None:
-                        markx[region.connections["lower"]].corners[
-                            1:-1, -1
-                        ] = this_markx[:, 0]
-                        marky[region.connections["lower"]].corners[
-                            1:-1, -1
-                        ] = this_marky[:, 0]
-                    if region.connections["upper"] is not None:
-                        markx[region.connections["upper"]].corners[
-                            1:-1, 0
-                        ] = this_markx[:, -1]
-                        marky[region.connections["upper"]].corners[
-                            1:-1, 0
-                        ] = this_marky[:, -1]
-
-            changes = []
-            tmp = {}
-            for region_name, region in self.regions.items():
-                this_tmp, change = region.smoothnl_inner2(
-                    varname, markx[region_name], marky[region_name]
-                )
-                changes.append(change)
-                tmp[region_name] = this_tmp
+        return graph
 
-            change = max(changes)
+    def geometry(self, outputs=None, on_evaluate=None):
+        """
+        Calculate geometrical quantities for BOUT++
 
-            # Need to update the variables after calculating all tmp values because the
-            # variable values from neighbouring regions are used in
-            # region.smoothnl_inner2()
-            for region_name, region in self.regions.items():
-                setattr(region, varname, tmp[region_name])
+        Parameters
+        ----------
+        outputs : list of str, optional
+            Names of the quantities to calculate. Only the stages of the calculation
+            that these depend on (see self.geometry_graph) are evaluated. By default
+            calculate everything.
+        on_evaluate : callable, optional
+            Called with the name of each node of self.geometry_graph after it is
+            evaluated
+        """
+        # Always recalculate, in case the grid has been changed
+        self.geometry_graph.reset()
+        self.geometry_graph.evaluate(outputs, on_evaluate=on_evaluate)
+
+    def _smoothCurvature(self):
+        # Nonlinear smoothing. Tries to smooth only regions with large changes in
+        # gradient.
+        # Smooth {bxcvx,bxcvy,bxcvz} and {curl_bOverB_x,curl_bOverB_y,curl_bOverB_z}
+        # separately (not consistently with each other).
+        if not self.user_options.shiftedmetric:
+            # If shiftedmetric==False, would need to follow IDL hypnotoad and:
+            #  - calculate bz = bxcvz + I*bxcvx
+            #  - smooth bxcvx, bxcvy, and bz
+            #  - set bxcvz = bz - I * bxcvx
+            # and similarly for curl_bOverB_z
+            raise ValueError(
+                "shiftedmetric==False not handled in "
+                "curvature_smoothing=='smoothnl'. Non-zero I requires bxcvx and "
+                "bxcvz to be smoothed consistently"
+            )
+        self.smoothnl(
+            [
+                "bxcvx",
+                "bxcvy",
+                "bxcvz",
+                "curl_bOverB_x",
+                "curl_bOverB_y",
+                "curl_bOverB_z",
+            ]
+        )
 
-            print(f"Smoothing {varname} {i}: change={change}", flush=True)
+    def smoothnl(self, varnames):
+        """
+        Smoothing algorithm copied from IDL hypnotoad
+        https://github.com/boutproject/BOUT-dev/blob/v4.3.2/tools/tokamak_grids/gridgen/smooth_nl.pro  # noqa: E501
 
-            if change < 1.0e-3:
+        varnames is the name of a field, or a list of names of fields. Several fields
+        are smoothed together, as a stacked array, but independently of each other.
+        Smoothing of each field stops when the maximum change in an iteration is less
+        than smoothnl_tolerance, or after smoothnl_max_iterations iterations.
+        """
+        if isinstance(varnames, str):
+            varnames = [varnames]
+
+        stencil = _SmoothnlStencil(self.regions)
+        f = stencil.gather(varnames)
+
+        # indices of the fields that are still being smoothed
+        active = list(range(len(varnames)))
+        for i in range(self.user_options.smoothnl_max_iterations):
+            f_active = f[active]
+            mxn, myn = stencil.gradients(f_active)
+            mx = stencil.smoothMask(stencil.mark(mxn))
+            my = stencil.smoothMask(stencil.mark(myn))
+            tmp = stencil.update(f_active, mx, my)
+            changes = numpy.nanmax(numpy.abs(tmp - f_active), axis=1)
+            f[active] = tmp
+
+            for j, change in zip(active, changes):
+                print(f"Smoothing {varnames[j]} {i}: change={change}", flush=True)
+
+            active = [
+                j
+                for j, change in zip(active, changes)
+                if not change < self.user_options.smoothnl_tolerance
+            ]
+            if not active:
                 break
 
+        for varname, values in zip(varnames, f):
+            stencil.scatter(varname, values)
+
     def plotGridLines(self, **kwargs):
         from matplotlib import pyplot
         from cycler import cycle
@@ -2866,84 +3521,825 @@ class Mesh:
         except TypeError:
             markers = list(markers)
 
-        if ax is None:
-            fig, ax = pyplot.subplots(1)
-        else:
-            fig = ax.figure
+        if ax is None:
+            fig, ax = pyplot.subplots(1)
+        else:
+            fig = ax.figure
+
+        for region in self.regions.values():
+            c = next(colors)
+
+            if "scatter" in plot_types:
+                m = iter(markers)
+                ax.scatter(
+                    region.Rxy.centre,
+                    region.Zxy.centre,
+                    marker=next(m),
+                    c=c,
+                    label=region.myID,
+                    **kwargs,
+                )
+                if xlow:
+                    ax.scatter(
+                        region.Rxy.xlow, region.Zxy.xlow, marker=next(m), c=c, **kwargs
+                    )
+                if ylow:
+                    ax.scatter(
+                        region.Rxy.ylow, region.Zxy.ylow, marker=next(m), c=c, **kwargs
+                    )
+                if corners:
+                    ax.scatter(
+                        region.Rxy.corners,
+                        region.Zxy.corners,
+                        marker=next(m),
+                        c=c,
+                        **kwargs,
+                    )
+            if "radial" in plot_types:
+                R = numpy.empty([2 * region.nx + 1, region.ny])
+                R[1::2, :] = region.Rxy.centre
+                R[::2, :] = region.Rxy.xlow
+                Z = numpy.empty([2 * region.nx + 1, region.ny])
+                Z[1::2, :] = region.Zxy.centre
+                Z[::2, :] = region.Zxy.xlow
+                lines = ax.plot(R, Z, linestyle="-", c=c)
+                lines[0].set_label(region.myID)
+                if ylow:
+                    R = numpy.empty([2 * region.nx + 1, region.ny + 1])
+                    R[1::2, :] = region.Rxy.ylow
+                    R[::2, :] = region.Rxy.corners
+                    Z = numpy.empty([2 * region.nx + 1, region.ny + 1])
+                    Z[1::2, :] = region.Zxy.ylow
+                    Z[::2, :] = region.Zxy.corners
+                    ax.plot(R, Z, linestyle="--", c=c)
+            if "poloidal" in plot_types:
+                R = numpy.empty([region.nx, 2 * region.ny + 1])
+                R[:, 1::2] = region.Rxy.centre
+                R[:, ::2] = region.Rxy.ylow
+                Z = numpy.empty([region.nx, 2 * region.ny + 1])
+                Z[:, 1::2] = region.Zxy.centre
+                Z[:, ::2] = region.Zxy.ylow
+                lines = ax.plot(R.T, Z.T, linestyle="-", c=c, label=region.myID)
+                lines[0].set_label(region.myID)
+                if ylow:
+                    R = numpy.empty([region.nx + 1, 2 * region.ny + 1])
+                    R[:, 1::2] = region.Rxy.xlow
+                    R[:, ::2] = region.Rxy.corners
+                    Z = numpy.empty([region.nx, 2 * region.ny + 1])
+                    Z[:, 1::2] = region.Zxy.xlow
+                    Z[:, ::2] = region.Zxy.corners
+                    ax.plot(R.T, Z.T, linestyle="--", c=c)
+        l = ax.legend()
+        l.set_draggable(True)
+
+        return fig, ax
+
+    def plotPotential(self, *args, **kwargs):
+        """
+        Plot the flux function psi. Passes through to self.equilibrium.plotPotential.
+        """
+        return self.equilibrium.plotPotential(*args, **kwargs)
+
+
+class PerpendicularTrajectoryCache:
+    """
+    Lines followed along Grad(psi), stored as dense-output interpolants so that they can
+    be evaluated at new values of psi without being integrated again.
+
+    Each trajectory is keyed by its starting point and the value of psi there. The range
+    of psi covered by a trajectory is extended (by integrating from the end of the
+    stored range) when values of psi outside it are requested, so only the new part of
+    the line has to be followed.
+    """
+
+    # Weak reference to the most recently used cache for an equilibrium with a
+    # field_hash, so that the trajectories can be re-used when the equilibrium object is
+    # re-created from the same input (for example when options have been changed). Weak
+    # so that the cache, and the equilibrium whose f_R and f_Z it uses, are not kept
+    # alive once no equilibrium refers to them.
+    _latest = None
+
+    def __init__(
+        self,
+        f_R,
+        f_Z,
+        rtol=2.0e-8,
+        atol=1.0e-8,
+        field_hash=None,
+        max_trajectories=10000,
+    ):
+        self.f_R = f_R
+        self.f_Z = f_Z
+        self.rtol = rtol
+        self.atol = atol
+        self.field_hash = field_hash
+        # When there are more trajectories than this, the least recently used ones are
+        # removed. None for no limit
+        self.max_trajectories = max_trajectories
+
+        # Each entry is a dict {1: [...], -1: [...]} holding the OdeSolution objects
+        # for the segments of the trajectory in the direction of increasing and
+        # decreasing psi
+        self.trajectories = {}
+
+    @classmethod
+    def forEquilibrium(cls, equilibrium, rtol, atol):
+        """
+        Get the cache to use for equilibrium, creating a new one if there is no
+        compatible existing cache.
+
+        The cache is stored as equilibrium.perpendicular_trajectory_cache. If the
+        equilibrium has a field_hash attribute identifying its poloidal field, the cache
+        is also re-used by a new equilibrium object with the same field_hash, as long as
+        an equilibrium that uses it still exists.
+        """
+        field_hash = getattr(equilibrium, "field_hash", None)
+
+        try:
+            cache = equilibrium.perpendicular_trajectory_cache
+        except AttributeError:
+            cache = None
+            if field_hash is not None and cls._latest is not None:
+                cache = cls._latest()
+
+        if (
+            cache is None
+            or cache.field_hash != field_hash
+            or cache.rtol != rtol
+            or cache.atol != atol
+        ):
+            cache = cls(
+                equilibrium.f_R,
+                equilibrium.f_Z,
+                rtol=rtol,
+                atol=atol,
+                field_hash=field_hash,
+            )
+        else:
+            # may have been created by a different equilibrium object for the same field
+            cache.f_R = equilibrium.f_R
+            cache.f_Z = equilibrium.f_Z
+
+        equilibrium.perpendicular_trajectory_cache = cache
+        if field_hash is not None:
+            cls._latest = weakref.ref(cache)
+
+        return cache
+
+    def clear(self):
+        self.trajectories = {}
+
+    def _f(self, A, x):
+        return (self.f_R(x[0], x[1]), self.f_Z(x[0], x[1]))
+
+    def _extend(self, segments, direction, p0, A0, A_target):
+        """
+        Extend the trajectory described by segments so that it reaches A_target
+        """
+        if segments:
+            A_start = _segmentEnd(segments[-1], direction)
+            x_start = segments[-1](A_start)
+        else:
+            A_start = A0
+            x_start = numpy.array(tuple(p0))
+
+        solution = solve_ivp(
+            self._f,
+            (A_start, A_target),
+            x_start,
+            rtol=self.rtol,
+            atol=self.atol,
+            vectorized=True,
+            dense_output=True,
+        )
+        if not solution.success:
+            raise SolutionError(
+                f"Failed to follow Grad(psi) from {p0}: {solution.message}"
+            )
+        segments.append(solution.sol)
+
+    def follow(self, p0, A0, Avals):
+        """
+        Equivalent to followPerpendicular(f_R, f_Z, p0, A0, Avals, rtol, atol), but
+        using and updating the stored trajectories
+        """
+        key = (float(p0.R), float(p0.Z), float(A0))
+        # Re-insert the trajectory, so that self.trajectories is ordered from least to
+        # most recently used
+        trajectory = self.trajectories.pop(key, {1: [], -1: []})
+        self.trajectories[key] = trajectory
+        if self.max_trajectories is not None:
+            while len(self.trajectories) > self.max_trajectories:
+                del self.trajectories[next(iter(self.trajectories))]
+
+        Avals = numpy.array(Avals, dtype=float)
+        result = numpy.zeros([len(Avals), 2])
+        result[:] = tuple(p0)
+
+        # make sure rounding errors do not cause an integration in the wrong direction
+        offsets = Avals - A0
+        offsets[numpy.abs(offsets) < 1.0e-15 * numpy.abs(A0)] = 0.0
+
+        for direction in [1, -1]:
+            inds = numpy.where(direction * offsets > 0.0)[0]
+            if len(inds) == 0:
+                continue
+            segments = trajectory[direction]
+            A_target = Avals[inds[numpy.argmax(direction * offsets[inds])]]
+
+            if (
+                not segments
+                or direction * (A_target - _segmentEnd(segments[-1], direction)) > 0.0
+            ):
+                self._extend(segments, direction, p0, A0, A_target)
+
+            for segment in segments:
+                in_segment = (Avals[inds] >= segment.t_min) & (
+                    Avals[inds] <= segment.t_max
+                )
+                if numpy.any(in_segment):
+                    result[inds[in_segment]] = segment(Avals[inds[in_segment]]).T
+                inds = inds[~in_segment]
+
+        return [Point2D(*p) for p in result]
+
+
+def _arraysEqual(a, b):
+    # Check if arrays a and b have the same shape and values, treating NaNs as equal.
+    # numpy.array_equal() only has the equal_nan argument for numpy>=1.19
+    return a.shape == b.shape and bool(
+        numpy.all((a == b) | (numpy.isnan(a) & numpy.isnan(b)))
+    )
+
+
+def _sameValues(a, b):
+    # Check if MultiLocationArrays a and b have the same locations set, with identical
+    # values
+    return a._arrays.keys() == b._arrays.keys() and all(
+        _arraysEqual(array, b._arrays[location])
+        for location, array in a._arrays.items()
+    )
+
+
+def _residentMemory():
+    """
+    Current and peak resident memory of this process, in MB, from /proc/self/status, or
+    None if they are not available (/proc is only available on Linux)
+    """
+    try:
+        with open("/proc/self/status") as f:
+            status = f.read()
+    except OSError:
+        return None
+
+    memory = {}
+    for line in status.splitlines():
+        key, _, value = line.partition(":")
+        if key in ("VmRSS", "VmHWM"):
+            # values are in kB
+            memory[key] = int(value.split()[0]) / 1024
+    if len(memory) < 2:
+        return None
+    return memory["VmRSS"], memory["VmHWM"]
+
+
+def _resetPeakResidentMemory():
+    """
+    Reset the peak resident memory of this process to its current resident memory.
+    Returns False if this is not possible on this platform
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        return False
+    return True
+
+
+class _StageMemory:
+    """
+    Context manager which measures the resident memory of this process (in MB) before
+    and after a stage of the calculation, and the peak during the stage. Stages may be
+    nested.
+
+    The values are None if they cannot be measured on this platform (only Linux is
+    supported).
+    """
+
+    # Stages currently being measured, innermost last
+    _active = []
+
+    def __init__(self):
+        self.before = None
+        self.after = None
+        self.peak = None
+
+    def __enter__(self):
+        # Resetting the peak for this stage loses the peak so far of the stages that
+        # contain it, so record it first
+        self._updatePeaks()
+        self._peak_reset = _resetPeakResidentMemory()
+        memory = _residentMemory()
+        if memory is not None:
+            self.before = memory[0]
+        self._max = self.before
+        _StageMemory._active.append(self)
+        return self
+
+    def __exit__(self, *args):
+        self._updatePeaks()
+        _StageMemory._active.remove(self)
+        memory = _residentMemory()
+        if memory is not None:
+            self.after = memory[0]
+            if self._peak_reset and self._max is not None:
+                self.peak = self._max
+        del self._max
+        del self._peak_reset
+
+    @staticmethod
+    def _updatePeaks():
+        memory = _residentMemory()
+        if memory is None:
+            return
+        for stage in _StageMemory._active:
+            if stage._max is not None:
+                stage._max = max(stage._max, memory[1])
+
+    def __str__(self):
+        if self.before is None:
+            return "not available"
+        result = f"{self.before:.1f} MB before, {self.after:.1f} MB after"
+        if self.peak is not None:
+            result += f", peak {self.peak:.1f} MB"
+        return result
+
+
+def _segmentEnd(segment, direction):
+    """
+    End of the range of psi covered by an OdeSolution segment, in the direction of
+    increasing (direction=1) or decreasing (direction=-1) psi
+    """
+    return segment.t_max if direction > 0 else segment.t_min
+
+
+# Mesh being used by Mesh._makeRegionsParallel(). Set before the worker processes are
+# forked, so that they inherit it.
+_mesh_for_workers = None
+
+
+def _makeRegionInWorker(eq_region_name, i):
+    """
+    Create a MeshRegion in a worker process, and return it pickled
+    """
+    f = io.BytesIO()
+    _RegionPickler(f, _mesh_for_workers).dump(
+        _mesh_for_workers._makeRegion(eq_region_name, i)
+    )
+    return f.getvalue()
+
+
+# MeshRegion being used by MeshRegion.mapContours() with contour_executor='process'.
+# Set before the worker processes are forked, so that they inherit it.
+_region_for_workers = None
+
+
+def _mapContourInWorker(method_name, i):
+    """
+    Call a method of a MeshRegion for contour i in a worker process, and return the
+    contour and the result pickled
+    """
+    result = getattr(_region_for_workers, method_name)(i)
+    f = io.BytesIO()
+    _RegionPickler(f, _region_for_workers.meshParent).dump(
+        (_region_for_workers.contours[i], result)
+    )
+    return f.getvalue()
+
+
+class _SharedObjects:
+    """
+    Registry of the objects that MeshRegions share with their Mesh: the Mesh, its
+    Equilibrium, and the attributes of the Equilibrium (which may not be picklable, for
+    example psi, which may be a lambda function). Each object is registered by name, so
+    that _RegionPickler can replace it with its name, and _RegionUnpickler can look the
+    name up in the registry of the Mesh in the unpickling process.
+
+    Immutable values (numbers, strings, None, etc.) are not registered, as they are not
+    shared by identity.
+    """
+
+    _unshared_types = (numbers.Number, str, bytes, bool, type(None), tuple, frozenset)
+
+    def __init__(self, mesh):
+        self.objects = {"mesh": mesh, "equilibrium": mesh.equilibrium}
+        for name, value in vars(mesh.equilibrium).items():
+            if not isinstance(value, self._unshared_types):
+                self.objects["equilibrium." + name] = value
+
+        # Index for looking up names. name() also checks identity, so only the
+        # registered objects themselves match, not copies or other objects
+        self._names = {id(value): name for name, value in self.objects.items()}
+
+    def name(self, obj):
+        """
+        Name of obj if it is registered, otherwise None
+        """
+        name = self._names.get(id(obj))
+        if name is not None and self.objects[name] is obj:
+            return name
+        return None
+
+    def get(self, name):
+        """
+        Registered object called name
+        """
+        try:
+            return self.objects[name]
+        except KeyError:
+            raise pickle.UnpicklingError(f"unrecognised shared object {name}")
+
+
+class _RegionPickler(pickle.Pickler):
+    """
+    Pickler that replaces references to the objects shared with a Mesh (see
+    _SharedObjects) with placeholders
+    """
+
+    def __init__(self, file, mesh):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.shared = _SharedObjects(mesh)
+
+    def persistent_id(self, obj):
+        name = self.shared.name(obj)
+        if name is not None:
+            return ("shared", name)
+        return None
+
+
+class _RegionUnpickler(pickle.Unpickler):
+    """
+    Unpickler for objects pickled by _RegionPickler, which restores the references to
+    the objects shared with mesh
+    """
+
+    def __init__(self, file, mesh):
+        super().__init__(file)
+        self.shared = _SharedObjects(mesh)
+
+    def persistent_load(self, pid):
+        if pid[0] == "shared":
+            return self.shared.get(pid[1])
+        raise pickle.UnpicklingError(f"unrecognised persistent id {pid}")
+
+
+class _SmoothnlStencil:
+    """
+    Index maps used by Mesh.smoothnl() to apply the smoothing operations to the fields
+    on all regions and all cell locations at once.
+
+    The values of a field are stored in a single 'global' array, which holds the
+    arrays for each location ('centre', 'xlow', 'ylow' and 'corners') of each region,
+    flattened and concatenated in that order. Points on the shared boundaries of
+    staggered locations appear once for each region, as they do in the
+    MultiLocationArrays. The index maps give, for each point, the points of the global
+    array (in this region or in a neighbouring one) used by each term of the stencils,
+    so that each step of the algorithm is a few gathers and array operations. Where a
+    term is not used (e.g. at a boundary with no neighbouring region) the index is
+    self.size, which refers to a zero appended to the global array.
+    """
 
-        for region in self.regions.values():
-            c = next(colors)
+    locations = ["centre", "xlow", "ylow", "corners"]
+
+    def __init__(self, regions):
+        self.regions = regions
+
+        # shapes, offsets into the global array, and global indices of the points of
+        # each region for each location
+        self.shapes = {}
+        self.offsets = {}
+        self.indices = {}
+        n = 0
+        for location in self.locations:
+            for name, region in regions.items():
+                shape = (
+                    region.nx + (1 if location in ["xlow", "corners"] else 0),
+                    region.ny + (1 if location in ["ylow", "corners"] else 0),
+                )
+                size = shape[0] * shape[1]
+                self.shapes[(location, name)] = shape
+                self.offsets[(location, name)] = n
+                self.indices[(location, name)] = numpy.arange(n, n + size).reshape(
+                    shape
+                )
+                n += size
+        self.size = n
+
+        # number of distinct points at each location, used to normalise the mean
+        # gradients
+        self.npoints = {location: 0 for location in self.locations}
+        for region in regions.values():
+            nx_distinct = region.nx + (1 if region.connections["outer"] is None else 0)
+            ny_distinct = region.ny + (1 if region.connections["upper"] is None else 0)
+            self.npoints["centre"] += region.nx * region.ny
+            self.npoints["xlow"] += nx_distinct * region.ny
+            self.npoints["ylow"] += region.nx * ny_distinct
+            self.npoints["corners"] += nx_distinct * ny_distinct
+        self.location_sizes = [
+            sum(
+                numpy.prod(self.shapes[(location, name)], dtype=int) for name in regions
+            )
+            for location in self.locations
+        ]
 
-            if "scatter" in plot_types:
-                m = iter(markers)
-                ax.scatter(
-                    region.Rxy.centre,
-                    region.Zxy.centre,
-                    marker=next(m),
-                    c=c,
-                    label=region.myID,
-                    **kwargs,
+        self._makeGradientMaps()
+        self._makeMaskMaps()
+        self._makeUpdateMaps()
+
+    def _stagger(self, location):
+        return (
+            1 if location in ["xlow", "corners"] else 0,
+            1 if location in ["ylow", "corners"] else 0,
+        )
+
+    def _makeGradientMaps(self):
+        # Index maps for the one-sided differences dxm=f[xm_a]-f[xm_b], etc. Differences
+        # that are not set use index self.size for both terms, so evaluate to zero.
+        # Staggered points on the outer or upper boundary are not set so the results can
+        # be summed without duplicates.
+        maps = {key: [] for key in ["xm", "xp", "ym", "yp"]}
+        for location in self.locations:
+            sx, sy = self._stagger(location)
+            # corners do not set outer or upper boundary points in either direction
+            x_cols = slice(None, -1) if location == "corners" else slice(None)
+            y_rows = slice(None, -1) if location == "corners" else slice(None)
+            for name, region in self.regions.items():
+                ind = self.indices[(location, name)]
+                xm_a, xm_b, xp_a, xp_b, ym_a, ym_b, yp_a, yp_b = (
+                    numpy.full(ind.shape, self.size) for _ in range(8)
                 )
-                if xlow:
-                    ax.scatter(
-                        region.Rxy.xlow, region.Zxy.xlow, marker=next(m), c=c, **kwargs
+
+                xm_a[1 : -1 - sx, x_cols] = ind[1 : -1 - sx, x_cols]
+                xm_b[1 : -1 - sx, x_cols] = ind[: -2 - sx, x_cols]
+                xp_a[1 : -1 - sx, x_cols] = ind[2 : (-sx if sx else None), x_cols]
+                xp_b[1 : -1 - sx, x_cols] = ind[1 : -1 - sx, x_cols]
+                if region.connections["inner"] is not None:
+                    inner = self.indices[(location, region.connections["inner"])]
+                    xm_a[0, x_cols] = ind[0, x_cols]
+                    xm_b[0, x_cols] = inner[-1 - sx, x_cols]
+                if region.connections["outer"] is not None:
+                    outer = self.indices[(location, region.connections["outer"])]
+                    xm_a[-1 - sx, x_cols] = outer[0, x_cols]
+                    xm_b[-1 - sx, x_cols] = ind[-1 - sx, x_cols]
+
+                ym_a[y_rows, 1 : -1 - sy] = ind[y_rows, 1 : -1 - sy]
+                ym_b[y_rows, 1 : -1 - sy] = ind[y_rows, : -2 - sy]
+                yp_a[y_rows, 1 : -1 - sy] = ind[y_rows, 2 : (-sy if sy else None)]
+                yp_b[y_rows, 1 : -1 - sy] = ind[y_rows, 1 : -1 - sy]
+                if region.connections["lower"] is not None:
+                    lower = self.indices[(location, region.connections["lower"])]
+                    ym_a[y_rows, 0] = ind[y_rows, 0]
+                    ym_b[y_rows, 0] = lower[y_rows, -1 - sy]
+                if region.connections["upper"] is not None:
+                    upper = self.indices[(location, region.connections["upper"])]
+                    ym_a[y_rows, -1 - sy] = upper[y_rows, 0]
+                    ym_b[y_rows, -1 - sy] = ind[y_rows, -1 - sy]
+
+                maps["xm"].append((xm_a.flatten(), xm_b.flatten()))
+                maps["xp"].append((xp_a.flatten(), xp_b.flatten()))
+                maps["ym"].append((ym_a.flatten(), ym_b.flatten()))
+                maps["yp"].append((yp_a.flatten(), yp_b.flatten()))
+
+        self.gradient_maps = {
+            key: (
+                numpy.concatenate([a for a, _ in value]),
+                numpy.concatenate([b for _, b in value]),
+            )
+            for key, value in maps.items()
+        }
+
+    def _makeMaskMaps(self):
+        # The mask values are stored (like markx and marky in the IDL version) on
+        # arrays with a single guard cell on each side, filled from the neighbouring
+        # regions. Compose the maps from global array to guard-cell arrays and from
+        # guard-cell arrays to the 5-point stencil, so that the smoothed mask can be
+        # gathered directly from the global array. Guard cells that are not filled
+        # (those at a boundary with no neighbouring region, and the corner guard cells)
+        # refer to index self.size, which holds zero.
+        maps = {key: [] for key in ["c", "xm", "xp", "ym", "yp"]}
+        for location in self.locations:
+            guarded = {}
+            for name, region in self.regions.items():
+                nx, ny = self.shapes[(location, name)]
+                guarded[name] = numpy.full([nx + 2, ny + 2], self.size)
+            for name, region in self.regions.items():
+                ind = self.indices[(location, name)]
+                guarded[name][1:-1, 1:-1] = ind
+                if region.connections["inner"] is not None:
+                    guarded[region.connections["inner"]][-1, 1:-1] = ind[0, :]
+                if region.connections["outer"] is not None:
+                    guarded[region.connections["outer"]][0, 1:-1] = ind[-1, :]
+                if region.connections["lower"] is not None:
+                    guarded[region.connections["lower"]][1:-1, -1] = ind[:, 0]
+                if region.connections["upper"] is not None:
+                    guarded[region.connections["upper"]][1:-1, 0] = ind[:, -1]
+            for name in self.regions:
+                g = guarded[name]
+                maps["c"].append(g[1:-1, 1:-1].flatten())
+                maps["xm"].append(g[:-2, 1:-1].flatten())
+                maps["xp"].append(g[2:, 1:-1].flatten())
+                maps["ym"].append(g[1:-1, :-2].flatten())
+                maps["yp"].append(g[1:-1, 2:].flatten())
+
+        self.mask_maps = {key: numpy.concatenate(value) for key, value in maps.items()}
+
+    def _makeUpdateMaps(self):
+        # The update is applied in stages, in the same order as the IDL version: first
+        # all points away from region boundaries, then the inner, outer, lower and upper
+        # boundaries. Each stage uses the values of this region already updated by the
+        # previous stages, but the values from neighbouring regions from before the
+        # update. Indices >= self.size refer to the values before the update.
+        N = self.size
+        stages = [{"stencil": [], "copy": []} for _ in range(5)]
+
+        for location in self.locations:
+            sx, sy = self._stagger(location)
+            for name, region in self.regions.items():
+                ind = self.indices[(location, name)]
+
+                def neighbour(direction):
+                    return N + self.indices[(location, region.connections[direction])]
+
+                stages[0]["stencil"].append(
+                    (
+                        ind[1:-1, 1:-1],
+                        ind[:-2, 1:-1],
+                        ind[2:, 1:-1],
+                        ind[1:-1, :-2],
+                        ind[1:-1, 2:],
                     )
-                if ylow:
-                    ax.scatter(
-                        region.Rxy.ylow, region.Zxy.ylow, marker=next(m), c=c, **kwargs
+                )
+
+                if region.connections["inner"] is not None:
+                    stages[1]["stencil"].append(
+                        (
+                            ind[0, 1:-1],
+                            neighbour("inner")[-1 - sx, 1:-1],
+                            ind[1, 1:-1],
+                            ind[0, :-2],
+                            ind[0, 2:],
+                        )
                     )
-                if corners:
-                    ax.scatter(
-                        region.Rxy.corners,
-                        region.Zxy.corners,
-                        marker=next(m),
-                        c=c,
-                        **kwargs,
+                elif location != "centre":
+                    # Note: the IDL version does not set the inner boundary of 'centre'
+                    # fields
+                    stages[1]["copy"].append((ind[0, 1:-1], ind[1, 1:-1]))
+
+                if region.connections["outer"] is not None:
+                    stages[2]["stencil"].append(
+                        (
+                            ind[-1, 1:-1],
+                            ind[-2, 1:-1],
+                            neighbour("outer")[sx, 1:-1],
+                            ind[-1, :-2],
+                            ind[-1, 2:],
+                        )
+                    )
+                else:
+                    stages[2]["copy"].append((ind[-1, 1:-1], ind[-2, 1:-1]))
+
+                if region.connections["lower"] is not None:
+                    stages[3]["stencil"].append(
+                        (
+                            ind[1:-1, 0],
+                            ind[:-2, 0],
+                            ind[2:, 0],
+                            neighbour("lower")[1:-1, -1 - sy],
+                            ind[1:-1, 1],
+                        )
                     )
-            if "radial" in plot_types:
-                R = numpy.empty([2 * region.nx + 1, region.ny])
-                R[1::2, :] = region.Rxy.centre
-                R[::2, :] = region.Rxy.xlow
-                Z = numpy.empty([2 * region.nx + 1, region.ny])
-                Z[1::2, :] = region.Zxy.centre
-                Z[::2, :] = region.Zxy.xlow
-                lines = ax.plot(R, Z, linestyle="-", c=c)
-                lines[0].set_label(region.myID)
-                if ylow:
-                    R = numpy.empty([2 * region.nx + 1, region.ny + 1])
-                    R[1::2, :] = region.Rxy.ylow
-                    R[::2, :] = region.Rxy.corners
-                    Z = numpy.empty([2 * region.nx + 1, region.ny + 1])
-                    Z[1::2, :] = region.Zxy.ylow
-                    Z[::2, :] = region.Zxy.corners
-                    ax.plot(R, Z, linestyle="--", c=c)
-            if "poloidal" in plot_types:
-                R = numpy.empty([region.nx, 2 * region.ny + 1])
-                R[:, 1::2] = region.Rxy.centre
-                R[:, ::2] = region.Rxy.ylow
-                Z = numpy.empty([region.nx, 2 * region.ny + 1])
-                Z[:, 1::2] = region.Zxy.centre
-                Z[:, ::2] = region.Zxy.ylow
-                lines = ax.plot(R.T, Z.T, linestyle="-", c=c, label=region.myID)
-                lines[0].set_label(region.myID)
-                if ylow:
-                    R = numpy.empty([region.nx + 1, 2 * region.ny + 1])
-                    R[:, 1::2] = region.Rxy.xlow
-                    R[:, ::2] = region.Rxy.corners
-                    Z = numpy.empty([region.nx, 2 * region.ny + 1])
-                    Z[:, 1::2] = region.Zxy.xlow
-                    Z[:, ::2] = region.Zxy.corners
-                    ax.plot(R.T, Z.T, linestyle="--", c=c)
-        l = ax.legend()
-        l.set_draggable(True)
 
-        return fig, ax
+                if region.connections["upper"] is not None:
+                    stages[4]["stencil"].append(
+                        (
+                            ind[1:-1, -1],
+                            ind[:-2, -1],
+                            ind[2:, -1],
+                            ind[1:-1, -2],
+                            neighbour("upper")[1:-1, sy],
+                        )
+                    )
 
-    def plotPotential(self, *args, **kwargs):
+        self.update_stages = []
+        for stage in stages:
+            stencil = tuple(
+                numpy.concatenate(
+                    [s[i].flatten() for s in stage["stencil"]] + [[]]
+                ).astype(int)
+                for i in range(5)
+            )
+            copy = tuple(
+                numpy.concatenate(
+                    [c[i].flatten() for c in stage["copy"]] + [[]]
+                ).astype(int)
+                for i in range(2)
+            )
+            self.update_stages.append((stencil, copy))
+
+    def gather(self, varnames):
         """
-        Plot the flux function psi. Passes through to self.equilibrium.plotPotential.
+        Get the global array for the fields varnames, with shape
+        (len(varnames), self.size)
         """
-        return self.equilibrium.plotPotential(*args, **kwargs)
+        result = numpy.zeros([len(varnames), self.size])
+        for i, varname in enumerate(varnames):
+            for location in self.locations:
+                for name, region in self.regions.items():
+                    offset = self.offsets[(location, name)]
+                    values = getattr(getattr(region, varname), location)
+                    result[i, offset : offset + values.size] = values.flatten()
+        return result
+
+    def scatter(self, varname, values):
+        """
+        Set the values of the field varname of each region from a global array, in
+        place
+        """
+        for name, region in self.regions.items():
+            f = getattr(region, varname)
+            for location in self.locations:
+                offset = self.offsets[(location, name)]
+                shape = self.shapes[(location, name)]
+                setattr(
+                    f,
+                    location,
+                    values[offset : offset + shape[0] * shape[1]].reshape(shape),
+                )
+            setattr(region, varname, f)
+
+    def gradients(self, f):
+        """
+        Measure of the gradients in the x- and y-directions, 0.5*(|dxm| + |dxp|) and
+        0.5*(|dym| + |dyp|)
+        """
+
+        # Add a zero for the differences that are not set
+        f = numpy.concatenate([f, numpy.zeros([f.shape[0], 1])], axis=1)
+
+        def diff(key):
+            a, b = self.gradient_maps[key]
+            return numpy.abs(f[:, a] - f[:, b])
+
+        return 0.5 * (diff("xm") + diff("xp")), 0.5 * (diff("ym") + diff("yp"))
+
+    def mark(self, gradient):
+        """
+        Mask that is ~1 where gradient is large compared to its mean value at each
+        location, and ~0 where it is small
+        """
+        # Sum each field region-by-region, using contiguous 1d slices, so that the
+        # results do not depend on how many fields are being smoothed together (a
+        # reduction along the second dimension of a 2d array may add the elements in a
+        # different order)
+        sums = numpy.zeros([gradient.shape[0], len(self.locations)])
+        for i, g in enumerate(gradient):
+            for j, location in enumerate(self.locations):
+                location_sum = 0.0
+                for name in self.regions:
+                    offset = self.offsets[(location, name)]
+                    size = self.indices[(location, name)].size
+                    location_sum += g[offset : offset + size].sum()
+                sums[i, j] = location_sum / self.npoints[location]
+        mean = numpy.repeat(sums, self.location_sizes, axis=1)
+        result = 0.5 * gradient / mean
+        return numpy.where(result < 1.0, result, 1.0)
+
+    def smoothMask(self, mark):
+        # Add a zero for the guard cells that are not filled
+        mark = numpy.concatenate([mark, numpy.zeros([mark.shape[0], 1])], axis=1)
+        m = self.mask_maps
+        return 0.1 * (
+            mark[:, m["c"]]
+            + mark[:, m["xm"]]
+            + mark[:, m["xp"]]
+            + mark[:, m["ym"]]
+            + mark[:, m["yp"]]
+        )
+
+    def update(self, f, mx, my):
+        """
+        Apply one smoothing step to f, with the smoothed masks mx and my
+        """
+        # values before the update are stored at indices >= self.size
+        tmp = numpy.concatenate([f, f], axis=1)
+        for (t, xm, xp, ym, yp), (copy_to, copy_from) in self.update_stages:
+            tmp[:, t] = (
+                (1.0 - mx[:, t] - my[:, t]) * tmp[:, t]
+                + mx[:, t] * 0.5 * (tmp[:, xm] + tmp[:, xp])
+                + my[:, t] * 0.5 * (tmp[:, ym] + tmp[:, yp])
+            )
+            tmp[:, copy_to] = tmp[:, copy_from]
+        return tmp[:, : self.size]
 
 
 def followPerpendicular(f_R, f_Z, p0, A0, Avals, rtol=2.0e-8, atol=1.0e-8):
@@ -3004,6 +4400,303 @@ def followPerpendicular(f_R, f_Z, p0, A0, Avals, rtol=2.0e-8, atol=1.0e-8):
     return [Point2D(*p) for p in solution.y.T]
 
 
+def followPerpendicularBatch(
+    f_R, f_Z, points, A0s, Avals, rtol=2.0e-8, atol=1.0e-8, per_trajectory=True
+):
+    """
+    Follow lines perpendicular to Bp from each of several starting points until each of
+    the magnetic potential values in Avals is reached.
+
+    All trajectories are integrated together as a single stacked system of ODEs, with a
+    right-hand side that is vectorized over (2, Npts). Trajectory i starts from
+    points[i], where the potential is A0s[i]. The trajectories are first all brought to
+    the end of Avals closest to their starting points (integrating in a rescaled
+    variable so that they can still be integrated together), then integrated together
+    so that they can be output at the same evaluation points.
+
+    Trajectories that start inside the range of Avals are passed to
+    followPerpendicular().
+
+    Parameters
+    ----------
+    f_R, f_Z : callable
+        Components of Grad(psi)/|Grad(psi)|**2
+    points : sequence of Point2D
+        Starting points
+    A0s : sequence of float
+        Value of psi at each starting point
+    Avals : sequence of float
+        Values of psi at which to output positions, must be monotonic
+    rtol, atol : float
+        Tolerances for each trajectory
+    per_trajectory : bool, default True
+        If True, tighten the tolerances passed to solve_ivp so that the error norm of
+        the stacked system (the RMS over all components) enforces the tolerances on
+        every trajectory individually. If False, the tolerances apply to the RMS error
+        of the stacked system.
+
+    Returns
+    -------
+    numpy.ndarray
+        Positions with shape (Npts, len(Avals), 2), last dimension is (R, Z)
+    """
+    Avals = numpy.array(Avals, dtype=float)
+    A0s = numpy.array(A0s, dtype=float)
+    result = numpy.zeros([len(points), len(Avals), 2])
+
+    inside = (A0s > Avals.min()) & (A0s < Avals.max())
+    # following followPerpendicular(), integrate from the end of Avals that is closest
+    # to A0
+    reverse = numpy.abs(Avals[-1] - A0s) < numpy.abs(Avals[0] - A0s)
+
+    for i in numpy.where(inside)[0]:
+        result[i] = [
+            [p.R, p.Z]
+            for p in followPerpendicular(
+                f_R, f_Z, points[i], A0s[i], list(Avals), rtol=rtol, atol=atol
+            )
+        ]
+
+    for reversed_group in [False, True]:
+        inds = numpy.where(~inside & (reverse == reversed_group))[0]
+        if len(inds) == 0:
+            continue
+        if reversed_group:
+            group_Avals = Avals[::-1]
+        else:
+            group_Avals = Avals
+        positions = _followPerpendicularStacked(
+            f_R,
+            f_Z,
+            numpy.array([[points[i].R, points[i].Z] for i in inds]),
+            A0s[inds],
+            group_Avals,
+            rtol=rtol,
+            atol=atol,
+            per_trajectory=per_trajectory,
+        )
+        if reversed_group:
+            positions = positions[:, ::-1, :]
+        result[inds] = positions
+
+    return result
+
+
+def _followPerpendicularStacked(f_R, f_Z, p0, A0s, Avals, rtol, atol, per_trajectory):
+    """
+    Integrate the trajectories starting from p0 (an (Npts, 2) array) as a single stacked
+    system. Avals[0] must be the end of the range closest to all the values in A0s.
+    """
+    npoints = p0.shape[0]
+
+    def f_stacked(x):
+        # x has shape (2*npoints, m): reshape to (2, npoints, m) and evaluate the
+        # right-hand side for all trajectories in one call to each function
+        x = x.reshape((2, npoints, -1))
+        return numpy.concatenate([f_R(x[0], x[1]), f_Z(x[0], x[1])], axis=0)
+
+    if per_trajectory:
+        # solve_ivp uses an RMS norm over all components of the error, so a scaled
+        # error of at most 1 in that norm bounds the scaled error in each component by
+        # sqrt(n)
+        scale = 1.0 / numpy.sqrt(2 * npoints)
+        rtol = max(rtol * scale, 100.0 * numpy.finfo(float).eps)
+        atol = atol * scale
+
+    def solve(f, t_span, x0, t_eval):
+        solution = solve_ivp(
+            f, t_span, x0, t_eval=t_eval, rtol=rtol, atol=atol, vectorized=True
+        )
+        if not solution.success:
+            raise SolutionError(f"followPerpendicularBatch failed: {solution.message}")
+        return solution.y
+
+    x0 = numpy.concatenate([p0[:, 0], p0[:, 1]])
+
+    # First bring every trajectory to A = Avals[0]. The trajectories start at different
+    # values of A, so integrate in s, where A = A0s + s*(Avals[0] - A0s), for 0<=s<=1.
+    # This is usually a very short distance, as the starting points are usually close
+    # to the flux surface A = Avals[0].
+    offsets = numpy.tile(Avals[0] - A0s, 2)[:, numpy.newaxis]
+    if numpy.any(offsets != 0.0):
+        x0 = solve(lambda s, x: offsets * f_stacked(x), (0.0, 1.0), x0, [1.0])[:, 0]
+
+    # Now all trajectories are at the same value of A, so integrate them together to
+    # the values in Avals
+    if Avals[-1] == Avals[0]:
+        x = numpy.repeat(x0[:, numpy.newaxis], len(Avals), axis=1)
+    else:
+        x = solve(lambda A, x: f_stacked(x), (Avals[0], Avals[-1]), x0, Avals)
+
+    # x has shape (2*npoints, len(Avals))
+    return x.reshape((2, npoints, len(Avals))).transpose((1, 2, 0))
+
+
+class _NetCDF4GridFile:
+    """
+    Writes a BOUT++ grid file using netCDF4 directly.
+
+    Provides the write() and write_file_attribute() methods of
+    boututils.datafile.DataFile that are used by BoutMesh.writeGridfile(), and creates
+    the same dimensions and variables, but allows the array variables to be compressed
+    and chunked, and some variables to be stored in single precision.
+
+    Parameters
+    ----------
+    filename : str
+        Name of the file to create
+    complevel : int, optional
+        zlib compression level for array variables, 0 for no compression
+    shuffle : bool, optional
+        Use the HDF5 shuffle filter when compressing
+    chunksizes : tuple of (int or None), optional
+        Chunk sizes for 2d variables in the x- and y-directions. None for either size
+        uses the whole size of the variable in that direction. If chunksizes is None,
+        compressed variables are stored in chunks of the whole variable, split in the
+        y-direction and then the x-direction so that each chunk is at most
+        max_chunk_bytes, and uncompressed variables are not chunked
+    float32_variables : list of str, optional
+        Names of variables to store in single precision
+    update : bool, optional
+        Update an existing file instead of creating a new one. Variables that already
+        exist are only written if their values have changed. The names of the variables
+        that were written are recorded in self.written
+    min_chunked_bytes : int, optional
+        Array variables smaller than this many bytes are stored contiguously, without
+        chunking or compression. Chunked storage adds a few kB to the file for each
+        variable, which is more than compression saves for small arrays
+    """
+
+    # Largest size in bytes of the default chunks, the size of the default HDF5 chunk
+    # cache
+    max_chunk_bytes = 2 ** 20
+
+    def __init__(
+        self,
+        filename,
+        complevel=0,
+        shuffle=True,
+        chunksizes=None,
+        float32_variables=(),
+        update=False,
+        min_chunked_bytes=16384,
+    ):
+        from netCDF4 import Dataset
+
+        if update:
+            self.handle = Dataset(filename, "a")
+        else:
+            self.handle = Dataset(filename, "w", format="NETCDF4")
+        self.complevel = complevel
+        self.shuffle = shuffle
+        self.chunksizes = chunksizes
+        self.float32_variables = set(float32_variables)
+        self.min_chunked_bytes = min_chunked_bytes
+        self.written = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.handle.close()
+
+    def _dimension(self, name, size):
+        # Create dimension name if it does not exist yet
+        if name not in self.handle.dimensions:
+            self.handle.createDimension(name, size)
+        elif len(self.handle.dimensions[name]) != size:
+            raise ValueError(
+                f"Dimension {name} has size {len(self.handle.dimensions[name])}, "
+                f"cannot write a variable with size {size}"
+            )
+        return name
+
+    def _chunkSizes(self, shape, itemsize):
+        # Chunk sizes for an array variable with the given shape, or None to store it
+        # contiguously
+        if numpy.prod(shape) * itemsize < self.min_chunked_bytes:
+            return None
+        if self.chunksizes is not None:
+            return tuple(
+                size if chunk is None else min(chunk, size)
+                for chunk, size in zip(self.chunksizes, shape)
+            )
+        if self.complevel == 0:
+            return None
+        chunks = list(shape)
+        for i in reversed(range(len(chunks))):
+            while (
+                chunks[i] > 1 and numpy.prod(chunks) * itemsize > self.max_chunk_bytes
+            ):
+                chunks[i] = (chunks[i] + 1) // 2
+        return tuple(chunks)
+
+    def write(self, name, data):
+        if isinstance(data, str):
+            if name in self.handle.variables:
+                var = self.handle.variables[name]
+                if var[0] == data:
+                    return
+            else:
+                var = self.handle.createVariable(name, str, ())
+            var[0] = data
+            self.written.append(name)
+            return
+
+        attributes = getattr(data, "attributes", {})
+        data = numpy.asarray(data)
+        if data.dtype.kind == "i":
+            # Use 32-bit integers, like DataFile, for compatibility with NetCDF 3
+            data = data.astype(numpy.int32)
+        dtype = "f4" if name in self.float32_variables else data.dtype
+
+        if name in self.handle.variables:
+            var = self.handle.variables[name]
+            if var.shape != data.shape:
+                raise ValueError(
+                    f"Cannot update {name} in {self.handle.filepath()}: it has shape "
+                    f"{var.shape}, but the new values have shape {data.shape}"
+                )
+            var.set_auto_mask(False)
+            if (
+                _arraysEqual(var[...], data.astype(var.dtype))
+                and var.__dict__ == attributes
+            ):
+                return
+            var[...] = data
+            for attrname, value in attributes.items():
+                var.setncattr(attrname, value)
+            self.written.append(name)
+            return
+
+        kwargs = {}
+        if data.ndim == 0:
+            dims = ()
+        else:
+            dims = tuple(
+                self._dimension(dim, size)
+                for dim, size in zip(
+                    BoutArray.dims_from_type(attributes["bout_type"]), data.shape
+                )
+            )
+            chunksizes = self._chunkSizes(data.shape, numpy.dtype(dtype).itemsize)
+            if chunksizes is not None:
+                kwargs["chunksizes"] = chunksizes
+                if self.complevel > 0:
+                    kwargs["zlib"] = True
+                    kwargs["complevel"] = self.complevel
+                    kwargs["shuffle"] = self.shuffle
+
+        var = self.handle.createVariable(name, dtype, dims, **kwargs)
+        var[...] = data
+        for attrname, value in attributes.items():
+            var.setncattr(attrname, value)
+        self.written.append(name)
+
+    def write_file_attribute(self, name, value):
+        self.handle.setncattr(name, value)
+
+
 class BoutMesh(Mesh):
     """
     Mesh quantities to be written to a grid file for BOUT++
@@ -3042,11 +4735,82 @@ class BoutMesh(Mesh):
     user_options_factory = Mesh.user_options_factory.add(
         # BoutMesh-specific options
         ###########################
+        grid_file_writer=WithMeta(
+            "boututils",
+            doc=(
+                "Library used to write the grid file: 'boututils' uses "
+                "boututils.datafile.DataFile, 'netCDF4' uses netCDF4 directly, which "
+                "allows the grid_file_* compression, chunking and float32 options"
+            ),
+            value_type=str,
+            allowed=["boututils", "netCDF4"],
+        ),
+        grid_file_complevel=WithMeta(
+            0,
+            doc=(
+                "zlib compression level (1-9) for the arrays in the grid file, or 0 for "
+                "no compression. Arrays smaller than 16 kB are not compressed, as the "
+                "overhead of chunked storage is larger than the saving. Only used when "
+                "grid_file_writer='netCDF4'"
+            ),
+            value_type=int,
+            check_all=lambda x: 0 <= x <= 9,
+        ),
+        grid_file_shuffle=WithMeta(
+            True,
+            doc=(
+                "Use the shuffle filter when compressing the arrays in the grid file. "
+                "Only used when grid_file_writer='netCDF4'"
+            ),
+            value_type=bool,
+        ),
+        grid_file_chunk_x=WithMeta(
+            None,
+            doc=(
+                "Size of chunks in the x-direction for the 2d arrays in the grid file. "
+                "None uses the whole x-direction if grid_file_chunk_y is set. If both "
+                "are None, compressed arrays use chunks of the whole array, split so "
+                "that each is at most 1 MB. Only used when grid_file_writer='netCDF4'"
+            ),
+            value_type=[int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
+        grid_file_chunk_y=WithMeta(
+            None,
+            doc=(
+                "Size of chunks in the y-direction for the 2d arrays in the grid file. "
+                "None uses the whole y-direction if grid_file_chunk_x is set. If both "
+                "are None, compressed arrays use chunks of the whole array, split so "
+                "that each is at most 1 MB. Only used when grid_file_writer='netCDF4'"
+            ),
+            value_type=[int, NoneType],
+            check_all=lambda x: x is None or x > 0,
+        ),
+        grid_file_float32_diagnostics=WithMeta(
+            False,
+            doc=(
+                "Write the poloidal coordinates y-coord, theta and chi, which are for "
+                "diagnostics and not used by BOUT++ simulations, in single precision. "
+                "Only used when grid_file_writer='netCDF4'"
+            ),
+            value_type=bool,
+        ),
+    )
+
+    # The grid_file_* options are only used by writeGridfile()
+    option_stages = dict(
+        Mesh.option_stages,
+        grid_file_writer=None,
+        grid_file_complevel=None,
+        grid_file_shuffle=None,
+        grid_file_chunk_x=None,
+        grid_file_chunk_y=None,
+        grid_file_float32_diagnostics=None,
     )
 
-    def __init__(self, equilibrium, settings):
+    def __init__(self, equilibrium, settings, previous=None):
 
-        super().__init__(equilibrium, settings)
+        super().__init__(equilibrium, settings, previous=previous)
 
         # nx, ny both include boundary guard cells
         eq_region0 = next(iter(self.equilibrium.regions.values()))
@@ -3112,29 +4876,121 @@ class BoutMesh(Mesh):
             # No core region, set dy consistent with 0<=y<2pi in whole domain
             self.dy_scalar = 2.0 * numpy.pi / self.ny_noguards
 
-    def geometry(self):
-        # Call geometry() method of base class
-        super().geometry()
+    def gridFields(self):
+        """
+        Names of the 2d fields, and of the 1d x-direction arrays, that are written to
+        the grid file
+        """
+        fields = [
+            "Rxy",
+            "Zxy",
+            "psixy",
+            "dx",
+            "dy",
+            "Brxy",
+            "Bzxy",
+            "Bpxy",
+            "Btxy",
+            "Bxy",
+            "hy",
+            # if not self.user_options.orthogonal:
+            #    "beta",
+            #    "eta",
+            "dphidy",
+            "ShiftTorsion",
+            "zShift",
+        ]
+        x_arrays = ["ShiftAngle"]
+        # I think IntShiftTorsion should be the same as sinty in Hypnotoad1.
+        # IntShiftTorsion should never be used. It is only for some 'BOUT-06 style
+        # differencing'. IntShiftTorsion is not written by Hypnotoad1, so don't write
+        # here. /JTO 19/5/2019
+        if not self.user_options.shiftedmetric:
+            fields.append("sinty")
+        fields += ["g11", "g22", "g33", "g12", "g13", "g23", "J"]
+        fields += ["g_11", "g_22", "g_33", "g_12", "g_13", "g_23"]
+        if self.user_options.curvature_type == "curl(b/B) with x-y derivatives":
+            fields += ["curl_bOverB_x", "curl_bOverB_y", "curl_bOverB_z"]
+        elif self.user_options.curvature_type == "curl(b/B)":
+            fields += ["curl_bOverBx", "curl_bOverBy", "curl_bOverBz"]
+        fields += ["bxcvx", "bxcvy", "bxcvz"]
+
+        if hasattr(next(iter(self.equilibrium.regions.values())), "pressure"):
+            fields.append("pressure")
+
+        return fields, x_arrays
+
+    def geometry(self, outputs=None, on_output=None):
+        """
+        Calculate geometrical quantities for BOUT++, and collect the ones that are
+        written to the grid file from the regions
+
+        Parameters
+        ----------
+        outputs : list of str, optional
+            Names of the quantities to calculate. Only the stages of the calculation
+            that these depend on (see self.geometry_graph) are evaluated, and only the
+            ones that are written to the grid file are collected. By default calculate
+            and collect everything that is written to the grid file.
+        on_output : callable, optional
+            If given, each quantity that is written to the grid file is collected as
+            soon as the last stage that calculates it has been evaluated, before the
+            later stages, and on_output is then called with its name.
+        """
+        fields, x_arrays = self.gridFields()
+        if outputs is None:
+            outputs = fields + x_arrays
+
+        # Allocate the global arrays for the 2d fields first, and have the regions
+        # calculate the cell-centre values directly into views of them. The staggered
+        # locations of each region include an extra row or column that overlaps with the
+        # neighbouring region, so they are still stored in the regions and copied below.
+        # The cell-centre arrays are allocated separately from the other locations, so
+        # that the staggered locations of a global field are freed when it is released
+        # (see writeGridfile()), while the regions keep using the cell-centre values.
+        global_fields = {
+            name: MultiLocationArray(
+                self.nx, self.ny, storage={"centre": numpy.empty((self.nx, self.ny))}
+            )
+            for name in fields
+            if name in outputs
+        }
+        for region in self.regions.values():
+            region.setFieldStorage(
+                {
+                    name: {"centre": f.centre[self.region_indices[region.myID]]}
+                    for name, f in global_fields.items()
+                }
+            )
+
+        self.fields_to_output = []
+        self.arrayXDirection_to_output = []
 
         def addFromRegions(name):
             # Collect a 2d field from the regions
             self.fields_to_output.append(name)
-            f = MultiLocationArray(self.nx, self.ny)
+            f = global_fields[name]
             self.__dict__[name] = f
-            f.attributes = next(iter(self.regions.values())).__dict__[name].attributes
+            # Copy, so that setting 'bout_type' below does not change the attributes of
+            # the field in the region, which may be kept for the next call to geometry()
+            f.attributes = dict(
+                next(iter(self.regions.values())).__dict__[name].attributes
+            )
             for region in self.regions.values():
                 f_region = region.__dict__[name]
 
                 assert (
                     f.attributes == f_region.attributes
                 ), "attributes of a field must be set consistently in every region"
-                if f_region._centre_array is not None:
+                if f_region.has_centre and not numpy.may_share_memory(
+                    f_region.centre, f.centre
+                ):
                     f.centre[self.region_indices[region.myID]] = f_region.centre
-                if f_region._xlow_array is not None:
+                if f_region.has_xlow:
                     f.xlow[self.region_indices[region.myID]] = f_region.xlow[:-1, :]
-                if f_region._ylow_array is not None:
+                if f_region.has_ylow:
                     f.ylow[self.region_indices[region.myID]] = f_region.ylow[:, :-1]
-                if f_region._corners_array is not None:
+                if f_region.has_corners:
                     f.corners[self.region_indices[region.myID]] = f_region.corners[
                         :-1, :-1
                     ]
@@ -3150,7 +5006,9 @@ class BoutMesh(Mesh):
             f.centre[...] = float("nan")
             f.xlow[...] = float("nan")
             self.__dict__[name] = f
-            f.attributes = self.y_groups[0][0].__dict__[name].attributes
+            # Copy, so that setting 'bout_type' below does not change the attributes of
+            # the field in the region, which may be kept for the next call to geometry()
+            f.attributes = dict(self.y_groups[0][0].__dict__[name].attributes)
             for y_group in self.y_groups:
                 # Get values from first region in each y_group
                 region = y_group[0]
@@ -3160,71 +5018,45 @@ class BoutMesh(Mesh):
                 assert (
                     f.attributes == f_region.attributes
                 ), "attributes of a field must be set consistently in every region"
-                if f_region._centre_array is not None:
+                if f_region.has_centre:
                     f.centre[self.region_indices[region.myID][0], :] = f_region.centre
-                if f_region._xlow_array is not None:
+                if f_region.has_xlow:
                     f.xlow[self.region_indices[region.myID]] = f_region.xlow[:-1, :]
+                assert not f_region.has_ylow, "Cannot have an x-direction array at ylow"
                 assert (
-                    f_region._ylow_array is None
-                ), "Cannot have an x-direction array at ylow"
-                assert (
-                    f_region._corners_array is None
+                    not f_region.has_corners
                 ), "Cannot have an x-direction array at corners"
 
             # Set 'bout_type' so it gets saved in the grid file
             f.attributes["bout_type"] = "ArrayX"
 
-        addFromRegions("Rxy")
-        addFromRegions("Zxy")
-        addFromRegions("psixy")
-        addFromRegions("dx")
-        addFromRegions("dy")
-        addFromRegions("Brxy")
-        addFromRegions("Bzxy")
-        addFromRegions("Bpxy")
-        addFromRegions("Btxy")
-        addFromRegions("Bxy")
-        addFromRegions("hy")
-        # if not self.user_options.orthogonal:
-        #    addFromRegions('beta')
-        #    addFromRegions('eta')
-        addFromRegions("dphidy")
-        addFromRegions("ShiftTorsion")
-        addFromRegions("zShift")
-        addFromRegionsXArray("ShiftAngle")
-        # I think IntShiftTorsion should be the same as sinty in Hypnotoad1.
-        # IntShiftTorsion should never be used. It is only for some 'BOUT-06 style
-        # differencing'. IntShiftTorsion is not written by Hypnotoad1, so don't write
-        # here. /JTO 19/5/2019
-        if not self.user_options.shiftedmetric:
-            addFromRegions("sinty")
-        addFromRegions("g11")
-        addFromRegions("g22")
-        addFromRegions("g33")
-        addFromRegions("g12")
-        addFromRegions("g13")
-        addFromRegions("g23")
-        addFromRegions("J")
-        addFromRegions("g_11")
-        addFromRegions("g_22")
-        addFromRegions("g_33")
-        addFromRegions("g_12")
-        addFromRegions("g_13")
-        addFromRegions("g_23")
-        if self.user_options.curvature_type == "curl(b/B) with x-y derivatives":
-            addFromRegions("curl_bOverB_x")
-            addFromRegions("curl_bOverB_y")
-            addFromRegions("curl_bOverB_z")
-        elif self.user_options.curvature_type == "curl(b/B)":
-            addFromRegions("curl_bOverBx")
-            addFromRegions("curl_bOverBy")
-            addFromRegions("curl_bOverBz")
-        addFromRegions("bxcvx")
-        addFromRegions("bxcvy")
-        addFromRegions("bxcvz")
+        def collect(name):
+            if name in x_arrays:
+                addFromRegionsXArray(name)
+            else:
+                addFromRegions(name)
+            if on_output is not None:
+                on_output(name)
 
-        if hasattr(next(iter(self.equilibrium.regions.values())), "pressure"):
-            addFromRegions("pressure")
+        to_collect = [name for name in fields + x_arrays if name in outputs]
+
+        def collectReady(node):
+            # Collect the outputs whose values are final once node has been evaluated,
+            # i.e. the ones that node is the last provider of
+            for name in list(to_collect):
+                if self.geometry_graph.getNode(name) == node:
+                    to_collect.remove(name)
+                    collect(name)
+
+        # Call geometry() method of base class
+        if on_output is None:
+            # Collect everything at the end. This also keeps locations that later stages
+            # initialise in the regions, e.g. DDX() uses dx.xlow and dx.corners
+            super().geometry(outputs)
+            for name in to_collect:
+                collect(name)
+        else:
+            super().geometry(outputs, on_evaluate=collectReady)
 
     def writeArray(self, name, array, f):
         f.write(name, BoutArray(array.centre, attributes=array.attributes))
@@ -3235,10 +5067,79 @@ class BoutMesh(Mesh):
     def writeArrayXDirection(self, name, array, f):
         f.write(name, BoutArray(array.centre[:, 0], attributes=array.attributes))
 
-    def writeGridfile(self, filename):
-        from boututils.datafile import DataFile
+    def openGridfile(self, filename, update=False):
+        """
+        Create the grid file filename, using the writer chosen by the grid_file_writer
+        option. If update=True, open the existing file filename to update it, which
+        always uses netCDF4 directly
+        """
+        if update or self.user_options.grid_file_writer == "netCDF4":
+            if (
+                self.user_options.grid_file_chunk_x is None
+                and self.user_options.grid_file_chunk_y is None
+            ):
+                chunksizes = None
+            else:
+                chunksizes = (
+                    self.user_options.grid_file_chunk_x,
+                    self.user_options.grid_file_chunk_y,
+                )
+            if self.user_options.grid_file_float32_diagnostics:
+                float32_variables = [
+                    name + suffix
+                    for name in ["y-coord", "theta", "chi"]
+                    for suffix in ["", "_ylow"]
+                ]
+            else:
+                float32_variables = []
+            return _NetCDF4GridFile(
+                filename,
+                complevel=self.user_options.grid_file_complevel,
+                shuffle=self.user_options.grid_file_shuffle,
+                chunksizes=chunksizes,
+                float32_variables=float32_variables,
+                update=update,
+            )
+        else:
+            from boututils.datafile import DataFile
+
+            return DataFile(filename, create=True, format="NETCDF4")
+
+    def _geometryCalculated(self):
+        # Whether geometry() has calculated and collected all the quantities that are
+        # written to the grid file since the grid was last changed
+        fields, x_arrays = self.gridFields()
+        outputs = fields + x_arrays
+        graph = self.geometry_graph
+        return all(name in self.__dict__ for name in outputs) and all(
+            node in graph.evaluated for node in graph.dependencies(outputs)
+        )
+
+    def writeGridfile(self, filename, update=False):
+        """
+        Write the grid file filename
+
+        If geometry() has not been called since the grid was last changed, it is called
+        once the file is open, and each quantity is written to the file as soon as it
+        has been calculated. The global array of each quantity is then released once it
+        has been written, so it is not kept in this BoutMesh afterwards (the MeshRegions
+        still have the values).
+
+        Parameters
+        ----------
+        filename : str
+            Name of the grid file
+        update : bool, optional
+            Update the existing grid file filename in place, for example after
+            redistributePoints(), only rewriting the variables whose values have changed.
+            The grid_id and the provenance attributes are always updated.
+        """
+        stream = not self._geometryCalculated()
+        # Quantities that are needed for hthe and the poloidal coordinates, which are
+        # written at the end, so are released only after them
+        keep = ["dy", "hy", "zShift", "ShiftAngle"]
 
-        with DataFile(filename, create=True, format="NETCDF4") as f:
+        with self.openGridfile(filename, update=update) as f:
             # Save unique ID for grid file
             import uuid
 
@@ -3250,18 +5151,30 @@ class BoutMesh(Mesh):
             f.write("curvature_type", self.user_options.curvature_type)
             f.write("Bt_axis", self.equilibrium.Bt_axis)
 
-            # write the 2d fields
-            for name in self.fields_to_output:
-                self.writeArray(name, self.__dict__[name], f)
+            def writeOutput(name):
+                if name in self.arrayXDirection_to_output:
+                    # write a 1d field
+                    self.writeArrayXDirection(name, self.__dict__[name], f)
+                else:
+                    # write a 2d field
+                    self.writeArray(name, self.__dict__[name], f)
+
+            if stream:
+
+                def writeAndRelease(name):
+                    writeOutput(name)
+                    if name not in keep:
+                        del self.__dict__[name]
+
+                self.geometry(on_output=writeAndRelease)
+            else:
+                for name in self.fields_to_output + self.arrayXDirection_to_output:
+                    writeOutput(name)
 
             if self.user_options.orthogonal:
                 # Also write hy as "hthe" for backward compatibility
                 self.writeArray("hthe", self.hy, f)
 
-            # write the 1d fields
-            for name in self.arrayXDirection_to_output:
-                self.writeArrayXDirection(name, self.__dict__[name], f)
-
             # Write topology-setting indices for BoutMesh
             eq_region0 = next(iter(self.equilibrium.regions.values()))
 
@@ -3430,6 +5343,17 @@ class BoutMesh(Mesh):
                     self.equilibrium.geqdsk_input,
                 )
 
+        if stream:
+            for name in keep:
+                del self.__dict__[name]
+
+        if update:
+            print(
+                f"Updated {len(f.written)} variables in {filename}: "
+                + ", ".join(f.written),
+                flush=True,
+            )
+
     def plot2D(self, f, title=None):
         from matplotlib import pyplot
 
@@ -5,6 +5,8 @@ Utilities for writing and reading files compatible with Fortran
 
 import re
 
+import numpy
+
 
 def f2s(f):
     """
@@ -60,6 +62,38 @@ class ChunkOutput:
             self.fh.write("\n")
             self.counter = 0
 
+    def write_array(self, values):
+        """
+        Write the values of an array to the output, formatting the whole array at once
+        and writing it in a single call
+
+        The output is the same as calling write() for each value. Arrays that are not
+        numerical, or that contain NaN or negative zero (which are formatted slightly
+        differently by f2s), are written one value at a time.
+        """
+        if not (
+            isinstance(values, numpy.ndarray)
+            and values.dtype.kind in "fiu"
+            and values.ndim == 1
+        ) or numpy.any(numpy.isnan(values) | ((values == 0) & numpy.signbit(values))):
+            for value in values:
+                self.write(value)
+            return
+
+        # "% .9E" adds a space before positive values, like f2s
+        field = " " * self.extraspaces + "% .9E"
+
+        # Complete the current line, then write whole lines
+        nfirst = min(len(values), self.chunk - self.counter)
+        nlines, nlast = divmod(len(values) - nfirst, self.chunk)
+        form = field * nfirst
+        if self.counter + nfirst == self.chunk:
+            form += "\n"
+        form += (field * self.chunk + "\n") * nlines + field * nlast
+
+        self.fh.write(form % tuple(values.tolist()))
+        self.counter = (self.counter + len(values)) % self.chunk
+
     def newline(self):
         """
         Ensure that the file is at the start of a new line
@@ -89,8 +123,11 @@ def write_1d(val, out):
     """
     Writes a 1D variable val to the file handle out
     """
-    for i in range(len(val)):
-        out.write(val[i])
+    if isinstance(val, numpy.ndarray):
+        out.write_array(val)
+    else:
+        for i in range(len(val)):
+            out.write(val[i])
     out.newline()
 
 
@@ -99,10 +136,7 @@ def write_2d(val, out):
     Writes a 2D array. Note that this transposes
     the array, looping over the first index fastest
     """
-    nx, ny = val.shape
-    for y in range(ny):
-        for x in range(nx):
-            out.write(val[x, y])
+    out.write_array(val.ravel(order="F"))
     out.newline()
 
 
@@ -124,3 +158,24 @@ def next_value(fh):
                 yield float(match)
             else:
                 yield int(match)
+
+
+def read_fixed_width(lines, n, width=16):
+    """
+    Read n values from the start of a list of lines, where every line contains a whole
+    number of fixed-width fields, converting them all at once
+
+    Returns an array of the values and the number of lines that were used. Raises
+    ValueError if the lines are not in this format, or if the n values do not end at the
+    end of a line
+    """
+    lengths = numpy.fromiter((len(line) for line in lines), dtype=int, count=len(lines))
+    counts = numpy.cumsum(lengths // width)
+    nlines = numpy.searchsorted(counts, n) + 1
+    if nlines > len(lines) or counts[nlines - 1] != n:
+        raise ValueError(f"Could not find {n} fixed-width values")
+    if numpy.any(lengths[:nlines] % width != 0):
+        raise ValueError(f"Lines are not made of fields of width {width}")
+
+    data = "".join(lines[:nlines]).encode("ascii")
+    return numpy.frombuffer(data, dtype=f"S{width}").astype(float), nlines
@@ -20,10 +20,19 @@ along with FreeGS.  If not, see <http://www.gnu.org/licenses/>.
 
 """
 
+from collections import deque
 from datetime import date
-from numpy import zeros, pi
+from itertools import islice
+from numpy import array, column_stack, concatenate, ndarray, zeros, pi
 
-from ._fileutils import f2s, ChunkOutput, write_1d, write_2d, next_value
+from ._fileutils import (
+    f2s,
+    ChunkOutput,
+    write_1d,
+    write_2d,
+    next_value,
+    read_fixed_width,
+)
 
 
 def write(data, fh, label=None, shot=None, time=None):
@@ -155,18 +164,24 @@ def write(data, fh, label=None, shot=None, time=None):
     fh.write("{0:5d}{1:5d}\n".format(nbdry, nlim))
 
     if nbdry > 0:
-        for r, z in zip(data["rbdry"], data["zbdry"]):
-            co.write(r)
-            co.write(z)
+        co.write_array(_interleave(data["rbdry"], data["zbdry"]))
         co.newline()
 
     if nlim > 0:
-        for r, z in zip(data["rlim"], data["zlim"]):
-            co.write(r)
-            co.write(z)
+        co.write_array(_interleave(data["rlim"], data["zlim"]))
         co.newline()
 
 
+def _interleave(r, z):
+    """
+    Put the values of r and z in (R,Z) pairs
+    """
+    if isinstance(r, ndarray) and isinstance(z, ndarray):
+        n = min(len(r), len(z))
+        return column_stack((r[:n], z[:n])).ravel()
+    return [value for pair in zip(r, z) for value in pair]
+
+
 def read(fh, cocos=1):
     """
     Read a G-EQDSK formatted equilibrium file
@@ -201,8 +216,100 @@ def read(fh, cocos=1):
 
     """
 
+    return _read_slice(_LineReader(fh), cocos)
+
+
+def read_slices(fh, cocos=1, return_text=False):
+    """
+    Read a file containing one or more G-EQDSK equilibria, one after another (for
+    example the time slices of a discharge), reading each one only when it is needed
+
+    cocos        - as for read()
+    return_text  - if True, also return the text of each equilibrium
+
+    Yields
+    ------
+
+    A dictionary for each equilibrium, as returned by read(), or a tuple of the
+    dictionary and the text if return_text=True
+    """
+    reader = _LineReader(fh)
+
+    while True:
+        # Skip any blank lines between equilibria
+        while True:
+            lines = reader.take(1)
+            if not lines:
+                return
+            if lines[0].strip():
+                reader.put_back(lines)
+                break
+
+        reader.taken.clear()
+        data = _read_slice(reader, cocos)
+
+        if return_text:
+            yield data, "".join(reader.taken)
+        else:
+            yield data
+
+
+class _LineReader:
+    """
+    Reads the lines of a file handle as they are needed
+
+    The lines that have been read are kept in self.taken. Lines that were read but not
+    used can be put back, to be read again by the next call to take().
+    """
+
+    def __init__(self, fh):
+        self._lines = iter(fh)
+        self._pending = deque()
+        self.taken = []
+
+    def take(self, n):
+        """
+        Read the next n lines, or as many as there are if fewer than n are left
+        """
+        lines = []
+        while self._pending and len(lines) < n:
+            lines.append(self._pending.popleft())
+        if len(lines) < n:
+            lines.extend(islice(self._lines, n - len(lines)))
+        self.taken.extend(lines)
+        return lines
+
+    def rewind(self, position):
+        """
+        Put back all the lines read since len(self.taken) was position
+        """
+        self._pending.extendleft(reversed(self.taken[position:]))
+        del self.taken[position:]
+
+    def put_back(self, lines):
+        """
+        Put back lines, which must be the last lines that were read
+        """
+        self.rewind(len(self.taken) - len(lines))
+
+    def iter_lines(self):
+        """
+        Iterate over the remaining lines, reading one at a time
+        """
+        while True:
+            lines = self.take(1)
+            if not lines:
+                return
+            yield lines[0]
+
+
+def _read_slice(reader, cocos):
+    """
+    Read one equilibrium from reader, a _LineReader. See read()
+    """
+
     # Read the first line
-    header = fh.readline()
+    header = "".join(reader.take(1))
     words = header.split()  # Split on whitespace
     if len(words) < 3:
         raise ValueError("Expecting at least 3 numbers on first line")
@@ -240,32 +347,31 @@ def read(fh, cocos=1):
         None,
     ]
 
-    values = next_value(fh)
+    values, nbdry, nlim, boundaries = _read_values(reader, 20 + 5 * nx + nx * ny)
 
-    for f in fields:
-        val = next(values)
+    for i, f in enumerate(fields):
         if f:
-            data[f] = val
+            data[f] = float(values[i])
 
-    # Read arrays
+    # Read arrays, in the order they are stored in the file
+    offset = len(fields)
 
     def read_1d(n):
         """
         Read a 1D array of length n
         """
-        val = zeros(n)
-        for i in range(n):
-            val[i] = next(values)
+        nonlocal offset
+        val = values[offset : offset + n].copy()
+        offset += n
         return val
 
     def read_2d(n, m):
         """
         Read a 2D (n,m) array in Fortran order
         """
-        val = zeros([n, m])
-        for y in range(m):
-            for x in range(n):
-                val[x, y] = next(values)
+        nonlocal offset
+        val = values[offset : offset + n * m].reshape((n, m), order="F").copy()
+        offset += n * m
         return val
 
     data["fpol"] = read_1d(nx)
@@ -282,26 +388,92 @@ def read(fh, cocos=1):
         for var in ["psi", "simagx", "sibdry"]:
             data[var] /= 2 * pi
 
-    nbdry = next(values)
-    nlim = next(values)
-
     # print(nbdry, nlim)
 
     if nbdry > 0:
         # Read (R,Z) pairs
         print(nbdry)
-        data["rbdry"] = zeros(nbdry)
-        data["zbdry"] = zeros(nbdry)
-        for i in range(nbdry):
-            data["rbdry"][i] = next(values)
-            data["zbdry"][i] = next(values)
+        data["rbdry"] = boundaries[0 : 2 * nbdry : 2].copy()
+        data["zbdry"] = boundaries[1 : 2 * nbdry : 2].copy()
+        boundaries = boundaries[2 * nbdry :]
 
     if nlim > 0:
         # Read (R,Z) pairs
-        data["rlim"] = zeros(nlim)
-        data["zlim"] = zeros(nlim)
-        for i in range(nlim):
-            data["rlim"][i] = next(values)
-            data["zlim"][i] = next(values)
+        data["rlim"] = boundaries[0 : 2 * nlim : 2].copy()
+        data["zlim"] = boundaries[1 : 2 * nlim : 2].copy()
 
     return data
+
+
+def _read_values(reader, n):
+    """
+    Read all the values after the header line of a G-EQDSK equilibrium from reader, a
+    _LineReader
+
+    The n floating point values before the boundary and limiter sizes are normally in
+    fixed-width fields of 16 characters, so are split and converted all at once. If the
+    file is not in this format, the values are found with the regular expression used
+    by next_value(), which gives the same result for well-formed files.
+
+    Returns
+    -------
+
+    values          array of the n values
+    nbdry, nlim     Number of points in the boundary and limiter
+    boundaries      array of the (R,Z) pairs of the boundary, followed by those of the
+                    limiter
+    """
+    start = len(reader.taken)
+
+    try:
+        values = _read_fixed_width(reader, n)
+        words = reader.take(1)[0].split()
+        if len(words) != 2:
+            raise ValueError("Expecting 2 integers after the arrays")
+        nbdry, nlim = (int(word) for word in words)
+
+        boundaries = [
+            _read_fixed_width(reader, 2 * npoints)
+            for npoints in (nbdry, nlim)
+            if npoints > 0
+        ]
+        boundaries = concatenate(boundaries) if boundaries else zeros(0)
+    except (ValueError, IndexError):
+        reader.rewind(start)
+
+        # Only read as many lines as needed, so that any following equilibrium is not
+        # read
+        values = next_value(reader.iter_lines())
+        tokens = list(islice(values, n + 2))
+        if len(tokens) < n + 2:
+            raise ValueError(f"Expecting at least {n + 2} values after the header")
+        nbdry, nlim = tokens[n:]
+        nboundaries = 2 * (max(nbdry, 0) + max(nlim, 0))
+        boundaries = array(list(islice(values, nboundaries)), dtype=float)
+        if len(boundaries) < nboundaries:
+            raise ValueError(f"Expecting {nboundaries} boundary and limiter values")
+        values = array(tokens[:n], dtype=float)
+
+    return values, nbdry, nlim, boundaries
+
+
+def _read_fixed_width(reader, n, width=16):
+    """
+    Read n values in fixed-width fields from reader, a _LineReader, reading only the
+    lines that contain them. See _fileutils.read_fixed_width()
+    """
+    lines = []
+    count = 0
+    while count < n:
+        # Read the number of lines needed if there are 5 values on each line
+        new_lines = reader.take(-(-(n - count) // 5))
+        if not new_lines:
+            break
+        # Ignore any trailing whitespace, which would break up the fixed-width fields
+        new_lines = [line.rstrip() for line in new_lines]
+        count += sum(len(line) // width for line in new_lines)
+        lines += new_lines
+
+    values, used = read_fixed_width(lines, n, width)
+    reader.put_back(reader.taken[len(reader.taken) - len(lines) + used :])
+    return values
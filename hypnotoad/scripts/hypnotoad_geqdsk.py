@@ -52,8 +52,18 @@ def main():
 
         pdb.set_trace()
 
+    mesh = None
     with open(filename, "rt") as fh:
-        eq = tokamak.read_geqdsk(fh, settings=options, nonorthogonal_settings=options)
+        if options.get("stage_cache_dir", None) is not None:
+            # Create the mesh, starting from the last stage stored in the cache
+            mesh = tokamak.read_geqdsk_mesh(
+                fh, settings=options, nonorthogonal_settings=options
+            )
+            eq = mesh.equilibrium
+        else:
+            eq = tokamak.read_geqdsk(
+                fh, settings=options, nonorthogonal_settings=options
+            )
 
     if options.get("plot_regions", False):
         try:
@@ -71,8 +81,9 @@ def main():
 
     # Create the mesh
 
-    mesh = BoutMesh(eq, options)
-    mesh.calculateRZ()
+    if mesh is None:
+        mesh = BoutMesh(eq, options)
+        mesh.calculateRZ()
 
     if options.get("plot_mesh", False):
         try:
@@ -90,8 +101,8 @@ def main():
         except Exception as err:
             warnings.warn(str(err))
 
-    mesh.geometry()
-
+    # Calculates the geometry, unless it was loaded from the stage cache, writing each
+    # output to the file as soon as it has been calculated
     mesh.writeGridfile(options.get("grid_file", "bout.grd.nc"))
 
 
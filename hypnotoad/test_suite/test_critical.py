@@ -1,4 +1,6 @@
 import numpy as np
+import pytest
+from scipy.interpolate import RectBivariateSpline
 
 from hypnotoad.utils import critical
 
@@ -72,3 +74,139 @@ def test_doublet():
     assert len(opoints) == 2
     assert np.isclose(xpoints[0][0], r0, atol=1.0 / nx)
     assert np.isclose(xpoints[0][1], z0, atol=1.0 / ny)
+
+
+def test_find_critical_spline():
+    nx = 65
+    ny = 65
+
+    r1d = np.linspace(1.0, 2.0, nx)
+    z1d = np.linspace(-1.0, 1.0, ny)
+    r2d, z2d = np.meshgrid(r1d, z1d, indexing="ij")
+
+    r0 = 1.5
+    z0 = 0.1
+
+    def psi_func(R, Z):
+        return np.exp(-((R - r0) ** 2 + (Z - z0 - 0.3) ** 2) / 0.3 ** 2) + np.exp(
+            -((R - r0) ** 2 + (Z - z0 + 0.3) ** 2) / 0.3 ** 2
+        )
+
+    psi = psi_func(r2d, z2d)
+    f = RectBivariateSpline(r1d, z1d, psi)
+
+    # Passing an existing spline gives exactly the same critical points
+    assert critical.find_critical(r2d, z2d, psi, f=f) == critical.find_critical(
+        r2d, z2d, psi
+    )
+
+
+def test_refine_critical():
+    nx = 65
+    ny = 65
+
+    r1d = np.linspace(1.0, 2.0, nx)
+    z1d = np.linspace(-1.0, 1.0, ny)
+    r2d, z2d = np.meshgrid(r1d, z1d, indexing="ij")
+
+    r0 = 1.5
+
+    # This has two O-points, and one x-point at (r0, z0)
+    def psi_func(R, Z, z0):
+        return np.exp(-((R - r0) ** 2 + (Z - z0 - 0.3) ** 2) / 0.3 ** 2) + np.exp(
+            -((R - r0) ** 2 + (Z - z0 + 0.3) ** 2) / 0.3 ** 2
+        )
+
+    opoints, xpoints = critical.find_critical(r2d, z2d, psi_func(r2d, z2d, 0.1))
+
+    # Move the critical points by less than a grid cell
+    z0 = 0.11
+    f = RectBivariateSpline(r1d, z1d, psi_func(r2d, z2d, z0))
+    result = critical.refine_critical(f, r2d, z2d, opoints, xpoints)
+    expected = critical.find_critical(r2d, z2d, psi_func(r2d, z2d, z0))
+
+    assert result is not None
+    assert len(result[0]) == 2
+    assert len(result[1]) == 1
+    assert np.isclose(result[1][0][0], r0, atol=1.0e-5)
+    assert np.isclose(result[1][0][1], z0, atol=1.0e-5)
+    for points, expected_points in zip(result, expected):
+        for p, expected_p in zip(points, expected_points):
+            assert p == pytest.approx(expected_p, abs=1.0e-3)
+
+    # X-point cannot be refined to an O-point
+    assert critical.refine_critical(f, r2d, z2d, opoints, opoints[:1]) is None
+
+    # Critical points too far away
+    shifted = [(r, z + 0.2, psi) for r, z, psi in xpoints]
+    assert critical.refine_critical(f, r2d, z2d, opoints, shifted) is None
+
+    # Singular Jacobian, where psi is flat
+    flat = RectBivariateSpline(r1d, z1d, np.zeros_like(r2d))
+    assert critical.refine_critical(flat, r2d, z2d, opoints, xpoints) is None
+
+
+def test_find_Bp2_minima():
+    r1d = np.linspace(1.0, 2.0, 65)
+    z1d = np.linspace(-1.0, 1.0, 65)
+    r2d, z2d = np.meshgrid(r1d, z1d, indexing="ij")
+
+    # One O-point, and an X-point between it and a second O-point
+    psi = np.exp(-((r2d - 1.5) ** 2 + (z2d + 0.3) ** 2) / 0.3 ** 2) + np.exp(
+        -((r2d - 1.5) ** 2 + (z2d - 0.3) ** 2) / 0.3 ** 2
+    )
+    f = RectBivariateSpline(r1d, z1d, psi)
+
+    i, j = critical.find_Bp2_minima(f, r2d, z2d)
+    opoints, xpoints = critical.find_critical(r2d, z2d, psi)
+    assert len(i) >= len(opoints) + len(xpoints) == 3
+    for R, Z, _ in opoints + xpoints:
+        assert (
+            np.min((r2d[i, j] - R) ** 2 + (z2d[i, j] - Z) ** 2)
+            < (r1d[1] - r1d[0]) ** 2 + (z1d[1] - z1d[0]) ** 2
+        )
+
+    # Passing the candidates that have already been found gives the same result
+    assert critical.find_critical(r2d, z2d, psi, f=f, candidates=(i, j)) == (
+        opoints,
+        xpoints,
+    )
+
+
+def test_find_psisurface():
+    class Eq:
+        Rmin = 1.0
+        Rmax = 2.0
+        Zmin = -1.0
+        Zmax = 1.0
+
+        @staticmethod
+        def psi(R, Z):
+            return (R - 1.5) ** 2 + (Z - 0.1) ** 2
+
+    r0 = 1.5
+    z0 = 0.1
+    angles = np.linspace(0.0, 2.0 * np.pi, 16, endpoint=False)
+    psival = (0.2 + 0.1 * np.sin(angles)) ** 2
+
+    r, z = critical.find_psisurface(
+        Eq, r0, z0, r0 + 8.0 * np.cos(angles), z0 + 8.0 * np.sin(angles), psival=psival
+    )
+    assert r.shape == angles.shape
+    assert np.sqrt(Eq.psi(r, z)) == pytest.approx(np.sqrt(psival), abs=1.0e-10)
+    assert np.arctan2(z - z0, r - r0) % (2.0 * np.pi) == pytest.approx(
+        angles % (2.0 * np.pi), abs=1.0e-10
+    )
+
+    # A single line gives the same result
+    r1, z1 = critical.find_psisurface(
+        Eq,
+        r0,
+        z0,
+        r0 + 8.0 * np.cos(angles[3]),
+        z0 + 8.0 * np.sin(angles[3]),
+        psival=psival[3],
+    )
+    assert np.ndim(r1) == 0
+    assert r1 == r[3]
+    assert z1 == z[3]
@@ -18,6 +18,7 @@
 # Hypnotoad 2.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy
+import pickle
 import pytest
 from copy import deepcopy
 from hypnotoad.core.equilibrium import (
@@ -69,6 +70,16 @@ class TestPoints:
     def test_iter(self):
         assert [x for x in self.p0] == tight_approx([1.0, 2.0])
 
+    def test_iter_nested(self):
+        # iterators over the same point must be independent, so that Point2D can be
+        # used from several threads at once
+        assert [(x, y) for x in self.p0 for y in self.p0] == [
+            (1.0, 1.0),
+            (1.0, 2.0),
+            (2.0, 1.0),
+            (2.0, 2.0),
+        ]
+
     def test_repr(self):
         assert str(self.p0) == "Point2D(1.0,2.0)"
 
@@ -397,6 +408,19 @@ class TestContour:
             segment_length * numpy.arange(testcontour.npoints), abs=1.0e-4
         )
 
+    def test_releaseFineContour(self, testcontour):
+        c = testcontour.c
+        distance = c.distance
+        assert c._fine_contour is not None
+
+        c.releaseFineContour()
+        assert c._fine_contour is None
+        # distances are kept
+        assert c.distance is distance
+
+        # FineContour is re-created when needed
+        assert c.fine_contour is not None
+
     def test_iter(self, testcontour):
         clist = list(testcontour.c)
 
@@ -432,6 +456,22 @@ class TestContour:
             assert orig[n - 1 - i].Z == tight_approx(c[i].Z)
             assert total_d - orig.distance[n - 1 - i] == tight_approx(c.distance[i])
 
+    def test_pickle(self, testcontour):
+        c = testcontour.c
+        c.psi = None  # local function cannot be pickled
+
+        c2 = pickle.loads(pickle.dumps(c))
+
+        assert isinstance(c2.points, list)
+        assert len(c2) == len(c)
+        for p, p2 in zip(c, c2):
+            assert isinstance(p2, Point2D)
+            assert p2.R == p.R
+            assert p2.Z == p.Z
+        assert c2.startInd == c.startInd
+        assert c2.endInd == c.endInd
+        assert c2.psival == c.psival
+
     def test_refine(self, testcontour):
         # PsiContour.refine just calls PsiContour.getRefined, so this tests both
 
@@ -442,6 +482,13 @@ class TestContour:
         for p in c:
             assert c.psi(p.R, p.Z) == tight_approx(0.7)
 
+    def test_refine_gradpsi_newton(self, testcontour):
+        c = testcontour.c
+        c.psival = 0.9
+        c.refine(atol=1.0e-13, methods=["gradpsi-newton"])
+        for p in c:
+            assert c.psi(p.R, p.Z) == tight_approx(0.9)
+
     def test_coarseInterp(self, testcontour):
         c = testcontour.c
         c.startInd = 2
@@ -624,6 +671,29 @@ class TestContour:
                 testcontour.Z0 + r * numpy.sin(theta), abs=1.0e-4
             )
 
+    def test_FineContour_initial_positions(self, testcontour):
+        fc = FineContour(testcontour.c, dict(testcontour.c.user_options))
+
+        # Guess from a slightly larger circle, like the same contour of a nearby
+        # equilibrium
+        centre = numpy.array([testcontour.R0, testcontour.Z0])
+        guess = centre + 1.001 * (fc.positions - centre)
+
+        fc_guess = FineContour(
+            testcontour.c, dict(testcontour.c.user_options), initial_positions=guess
+        )
+        assert fc_guess.refine_methods[0] == "gradpsi-newton"
+        assert fc_guess.positions == pytest.approx(fc.positions, abs=1.0e-7)
+
+        # Guess that does not cover the whole contour is not used
+        fc_guess = FineContour(
+            testcontour.c,
+            dict(testcontour.c.user_options),
+            initial_positions=guess[: guess.shape[0] // 2],
+        )
+        assert fc_guess.refine_methods is None
+        assert fc_guess.positions == pytest.approx(fc.positions, abs=1.0e-7)
+
     def test_finecontour_extent_lower(self, testcontour):
         contour = testcontour.c
 
@@ -701,6 +771,40 @@ class TestEquilibrium:
         assert intersect.R == tight_approx(1.0)
         assert intersect.Z == tight_approx(1.0)
 
+    def test_findSaddlePoint(self, eq):
+        R0 = 1.02
+        Z0 = 0.03
+
+        eq.psi = lambda R, Z: (
+            (R - R0) ** 2 - 0.7 * (Z - Z0) ** 2 + 0.3 * (R - R0) ** 2 * (Z - Z0)
+        )
+        eq.Bp_R = lambda R, Z: (-1.4 * (Z - Z0) + 0.3 * (R - R0) ** 2) / R
+        eq.Bp_Z = lambda R, Z: -(2.0 * (R - R0) + 0.6 * (R - R0) * (Z - Z0)) / R
+
+        p1 = Point2D(0.8, -0.2)
+        p2 = Point2D(0.8, 0.2)
+
+        # Line searches along the sides of the box
+        xpoint = eq.findSaddlePoint(p1, p2)
+        assert xpoint.R == pytest.approx(R0, abs=1.0e-7)
+        assert xpoint.Z == pytest.approx(Z0, abs=1.0e-7)
+
+        # Newton iteration using the second derivatives
+        eq.d2psidR2 = lambda R, Z: 2.0 + 0.6 * (Z - Z0)
+        eq.d2psidZ2 = lambda R, Z: -1.4 + 0.0 * R
+        eq.d2psidRdZ = lambda R, Z: 0.6 * (R - R0)
+        xpoint = eq.findSaddlePoint(p1, p2)
+        assert xpoint.R == tight_approx(R0)
+        assert xpoint.Z == tight_approx(Z0)
+
+        # Falls back to line searches if the Newton iteration leaves the box
+        p1 = Point2D(0.7, -0.2)
+        p2 = Point2D(0.7, 0.2)
+        eq.d2psidR2 = lambda R, Z: 0.1 + 0.0 * R
+        xpoint = eq.findSaddlePoint(p1, p2)
+        assert xpoint.R == pytest.approx(R0, abs=1.0e-7)
+        assert xpoint.Z == pytest.approx(Z0, abs=1.0e-7)
+
     @pytest.mark.parametrize(
         ["grad_lower", "lower", "upper"], [[0.2, 0.4, 2.0], [-0.2, 2.0, 0.4]]
     )
@@ -1,3 +1,6 @@
+import numpy
+import pytest
+
 from hypnotoad.geqdsk import _fileutils
 from io import StringIO
 
@@ -21,3 +24,61 @@ def test_ChunkOutput():
         == """ 1.000000000E+00-3.200000000E+00 6.200000000E+05 8.765400000E-12 4.200000000E+01
    -76"""
     )
+
+
+@pytest.mark.parametrize("start", [0, 2, 4])
+@pytest.mark.parametrize("n", [0, 1, 3, 5, 12])
+@pytest.mark.parametrize("extraspaces", [0, 2])
+def test_ChunkOutput_write_array(start, n, extraspaces):
+    values = numpy.random.randn(n) * 10.0 ** numpy.random.randint(-150, 150, n)
+
+    output = StringIO()
+    co = _fileutils.ChunkOutput(output, extraspaces=extraspaces)
+    expected = StringIO()
+    co_expected = _fileutils.ChunkOutput(expected, extraspaces=extraspaces)
+
+    for co_ in [co, co_expected]:
+        for i in range(start):
+            co_.write(float(i))
+
+    co.write_array(values)
+    for value in values:
+        co_expected.write(value)
+    assert co.counter == co_expected.counter
+
+    # Values that f2s formats differently are written one at a time
+    special = numpy.array([1.0, -0.0, numpy.nan, numpy.inf, -numpy.inf])
+    co.write_array(special)
+    for value in special:
+        co_expected.write(value)
+
+    assert output.getvalue() == expected.getvalue()
+
+
+def test_read_fixed_width():
+    lines = [
+        " 1.000000000E+00-3.200000000E+00 6.200000000E+05",
+        " 8.765400000E-12",
+        " 4.200000000E+01 5.000000000E-01",
+        "    2    3",
+    ]
+
+    values, nlines = _fileutils.read_fixed_width(lines, 4)
+    numpy.testing.assert_array_equal(values, [1.0, -3.2, 6.2e5, 8.7654e-12])
+    assert nlines == 2
+
+    values, nlines = _fileutils.read_fixed_width(lines[nlines:], 2)
+    numpy.testing.assert_array_equal(values, [42.0, 0.5])
+    assert nlines == 1
+
+    # Values do not end at the end of a line
+    with pytest.raises(ValueError):
+        _fileutils.read_fixed_width(lines, 5)
+
+    # Not enough values
+    with pytest.raises(ValueError):
+        _fileutils.read_fixed_width(lines, 7)
+
+    # Line is not made of 16 character fields
+    with pytest.raises(ValueError):
+        _fileutils.read_fixed_width([lines[0], lines[1] + " 1"], 4)
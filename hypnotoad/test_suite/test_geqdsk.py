@@ -47,3 +47,103 @@ def test_writeread():
     # Check that data and data2 are the same
     for key in data:
         numpy.testing.assert_allclose(data2[key], data[key])
+
+
+def test_read_not_fixed_width():
+    """
+    Test that a file whose values are not in fixed-width fields is read the same as one
+    that is
+    """
+    nx = 17
+    ny = 23
+
+    data = {
+        "nx": nx,
+        "ny": ny,
+        "rdim": 2.0,
+        "zdim": 1.5,
+        "rcentr": 1.2,
+        "bcentr": 2.42,
+        "rleft": 0.5,
+        "zmid": 0.1,
+        "rmagx": 1.1,
+        "zmagx": 0.2,
+        "simagx": -2.3,
+        "sibdry": 0.21,
+        "cpasma": 1234521,
+        "fpol": numpy.random.rand(nx),
+        "pres": numpy.random.rand(nx),
+        "qpsi": numpy.random.rand(nx),
+        "psi": numpy.random.rand(nx, ny),
+        "rbdry": numpy.random.rand(7),
+        "zbdry": numpy.random.rand(7),
+        "rlim": numpy.random.rand(5),
+        "zlim": numpy.random.rand(5),
+    }
+
+    output = StringIO()
+    _geqdsk.write(data, output)
+    lines = output.getvalue().splitlines()
+
+    data2 = _geqdsk.read(StringIO(output.getvalue()))
+
+    # Separate the values with spaces, so the fields are no longer 16 characters wide
+    lines = [lines[0]] + [
+        " ".join(line[i : i + 16] for i in range(0, len(line), 16))
+        for line in lines[1:]
+    ]
+    data3 = _geqdsk.read(StringIO("\n".join(lines)))
+
+    assert data2.keys() == data3.keys()
+    for key in data:
+        numpy.testing.assert_allclose(data2[key], data[key])
+        numpy.testing.assert_array_equal(data3[key], data2[key])
+
+
+def test_read_slices():
+    """
+    Test that a file containing several equilibria is read one equilibrium at a time
+    """
+    texts = []
+    for nx, ny in [(9, 11), (12, 7), (5, 5)]:
+        data = {
+            "nx": nx,
+            "ny": ny,
+            "rdim": 2.0,
+            "zdim": 1.5,
+            "rcentr": 1.2,
+            "bcentr": 2.42,
+            "rleft": 0.5,
+            "zmid": 0.1,
+            "rmagx": 1.1,
+            "zmagx": 0.2,
+            "simagx": -2.3,
+            "sibdry": 0.21,
+            "cpasma": 1234521,
+            "fpol": numpy.random.rand(nx),
+            "pres": numpy.random.rand(nx),
+            "qpsi": numpy.random.rand(nx),
+            "psi": numpy.random.rand(nx, ny),
+            "rlim": numpy.random.rand(4),
+            "zlim": numpy.random.rand(4),
+        }
+        output = StringIO()
+        _geqdsk.write(data, output)
+        texts.append(output.getvalue())
+
+    # Second equilibrium is not in fixed-width format
+    lines = texts[1].splitlines(keepends=True)
+    texts[1] = lines[0] + "".join(
+        " ".join(line[i : i + 16] for i in range(0, len(line), 16))
+        for line in lines[1:]
+    )
+
+    slices = list(_geqdsk.read_slices(StringIO("\n".join(texts)), return_text=True))
+
+    assert len(slices) == 3
+    for (data, text), expected_text in zip(slices, texts):
+        assert text.strip() == expected_text.strip()
+        expected = _geqdsk.read(StringIO(expected_text))
+        assert data.keys() == expected.keys()
+        for key in data:
+            numpy.testing.assert_array_equal(data[key], expected[key])
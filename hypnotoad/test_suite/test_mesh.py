@@ -22,3 +22,879 @@ class TestMultiLocationArray:
         assert a._xlow_array == tight_approx(numpy.zeros([self.nx + 1, self.ny]))
         assert a._ylow_array == tight_approx(numpy.zeros([self.nx, self.ny + 1]))
         assert a._corners_array == tight_approx(numpy.zeros([self.nx + 1, self.ny + 1]))
+
+    def test_has_location(self, MLArray):
+        a = MLArray
+
+        assert not a.has_centre
+        assert not a.has_xlow
+        assert not a.has_ylow
+        assert not a.has_corners
+        assert a._buffer is None
+
+        a.xlow = 2.0
+        assert not a.has_centre
+        assert a.has_xlow
+        assert not a.has_ylow
+        assert not a.has_corners
+        assert a._centre_array is None
+
+        # getter initialises the array to zero
+        assert a.corners == tight_approx(numpy.zeros([self.nx + 1, self.ny + 1]))
+        assert a.has_corners
+
+        # all locations are views into the same buffer
+        assert a.xlow.base is a._buffer
+        assert a.corners.base is a._buffer
+
+    def test_ufunc(self, MLArray):
+        a = MLArray
+        a.centre = 1.0
+        a.xlow = 2.0
+        b = mesh.MultiLocationArray(self.nx, self.ny)
+        b.centre = 3.0
+        b.ylow = 4.0
+
+        # result only has the locations present in all the inputs
+        c = a + b
+        assert c.has_centre
+        assert not c.has_xlow
+        assert not c.has_ylow
+        assert c.centre == tight_approx(numpy.full([self.nx, self.ny], 4.0))
+
+        c = 2.0 * a
+        assert c.has_centre
+        assert c.has_xlow
+        assert c.xlow == tight_approx(numpy.full([self.nx + 1, self.ny], 4.0))
+
+        # out= and in-place operations write into the existing arrays
+        centre = a.centre
+        result = numpy.multiply(a, 3.0, out=(a,))
+        assert result is a
+        assert a.centre is centre
+        assert a.centre == tight_approx(numpy.full([self.nx, self.ny], 3.0))
+        assert a.xlow == tight_approx(numpy.full([self.nx + 1, self.ny], 6.0))
+
+        d = a
+        d += 1.0
+        assert d is a
+        assert a.centre is centre
+        assert a.centre == tight_approx(numpy.full([self.nx, self.ny], 4.0))
+
+        # out= creates a location of the output that was not set before
+        e = mesh.MultiLocationArray(self.nx, self.ny)
+        numpy.sqrt(a, out=(e,))
+        assert e.has_centre
+        assert e.has_xlow
+        assert e.centre == tight_approx(numpy.full([self.nx, self.ny], 2.0))
+
+    def test_copy_and_pickle(self, MLArray):
+        import pickle
+
+        a = MLArray
+        a.centre = 1.0
+        a.ylow = 2.0
+
+        for b in [a.copy(), pickle.loads(pickle.dumps(a))]:
+            assert b.has_centre
+            assert not b.has_xlow
+            assert b.has_ylow
+            assert not b.has_corners
+            assert b.centre == tight_approx(a.centre)
+            assert b.ylow == tight_approx(a.ylow)
+            assert b.ylow.base is b._buffer
+            assert not numpy.shares_memory(a._buffer, b._buffer)
+
+    def test_storage(self):
+        global_array = numpy.zeros([2 * self.nx, self.ny])
+        storage = {"centre": global_array[self.nx :, :]}
+
+        a = mesh.MultiLocationArray(self.nx, self.ny, storage=storage)
+        a.centre = 1.0
+        a.ylow = 2.0
+        assert a.centre is storage["centre"]
+        assert global_array[self.nx :, :] == tight_approx(
+            numpy.ones([self.nx, self.ny])
+        )
+        assert global_array[: self.nx, :] == tight_approx(
+            numpy.zeros([self.nx, self.ny])
+        )
+        # buffer only holds the other locations
+        assert a._buffer.size == (self.nx + 1) * self.ny + self.nx * (self.ny + 1) + (
+            self.nx + 1
+        ) * (self.ny + 1)
+
+        # copy does not share the storage
+        b = a.copy()
+        assert b.centre == tight_approx(a.centre)
+        assert b.ylow == tight_approx(a.ylow)
+        assert not numpy.shares_memory(b.centre, global_array)
+
+        c = 2.0 * b
+        c.attributes["bout_type"] = "Field2D"
+        d = c.withStorage(storage)
+        assert d.centre is storage["centre"]
+        assert d.attributes == {"bout_type": "Field2D"}
+        assert global_array[self.nx :, :] == tight_approx(
+            numpy.full([self.nx, self.ny], 2.0)
+        )
+        assert d.ylow == tight_approx(numpy.full([self.nx, self.ny + 1], 4.0))
+        assert d.withStorage(storage) is d
+
+        with pytest.raises(ValueError):
+            mesh.MultiLocationArray(self.nx, self.ny + 1, storage=storage)
+
+
+def test_handleMultiLocationArray():
+    class Thing:
+        @mesh.handleMultiLocationArray
+        def sum(self, a, b, scale=1.0):
+            return scale * (a + b)
+
+        @mesh.handleMultiLocationArray
+        def sumAndDifference(self, a, b):
+            return a + b, a - b
+
+    thing = Thing()
+
+    # other arguments are passed through unchanged
+    assert thing.sum(1.0, 2.0, scale=2.0) == 6.0
+    assert thing.sumAndDifference(3.0, 2.0) == (5.0, 1.0)
+
+    a = mesh.MultiLocationArray(3, 4)
+    a.centre = 3.0
+    a.xlow = 2.0
+    a.ylow = 1.0
+    b = mesh.MultiLocationArray(3, 4)
+    b.centre = 1.0
+    b.xlow = 4.0
+    b.corners = 5.0
+
+    # only the locations set in all the arguments are calculated
+    result = thing.sum(a, b, scale=2.0)
+    assert isinstance(result, mesh.MultiLocationArray)
+    assert result.has_centre
+    assert result.has_xlow
+    assert not result.has_ylow
+    assert not result.has_corners
+    assert result.centre == tight_approx(numpy.full((3, 4), 8.0))
+    assert result.xlow == tight_approx(numpy.full((4, 4), 12.0))
+
+    result = thing.sumAndDifference(a, b)
+    assert len(result) == 2
+    for x in result:
+        assert x.has_centre
+        assert x.has_xlow
+        assert not x.has_ylow
+        assert not x.has_corners
+    assert result[0].centre == tight_approx(numpy.full((3, 4), 4.0))
+    assert result[1].xlow == tight_approx(numpy.full((4, 4), -2.0))
+
+    # the arguments are not modified
+    assert not a.has_corners
+    assert not b.has_ylow
+
+    with pytest.raises(AssertionError):
+        thing.sum(a, 1.0)
+
+
+def test_followPerpendicularBatch():
+    # psi = R**2 + Z**2, so contours are circles with radius sqrt(psi)
+    def f_R(R, Z):
+        return R / (2.0 * (R ** 2 + Z ** 2))
+
+    def f_Z(R, Z):
+        return Z / (2.0 * (R ** 2 + Z ** 2))
+
+    theta = numpy.linspace(0.1, 1.2, 5)
+    # last point starts inside the range of Avals, so uses followPerpendicular()
+    r0 = numpy.array([1.0, 1.0 + 1.0e-5, 1.0 - 1.0e-5, 1.0, numpy.sqrt(1.3)])
+    points = [
+        mesh.Point2D(r * numpy.cos(t), r * numpy.sin(t)) for r, t in zip(r0, theta)
+    ]
+    A0s = r0 ** 2
+    Avals = numpy.array([1.0, 1.2, 1.5, 2.0])
+
+    result = mesh.followPerpendicularBatch(
+        f_R, f_Z, points, A0s, Avals, rtol=1.0e-10, atol=1.0e-11
+    )
+
+    assert result.shape == (5, 4, 2)
+    expected_R = (
+        numpy.sqrt(Avals)[numpy.newaxis, :] * numpy.cos(theta)[:, numpy.newaxis]
+    )
+    expected_Z = (
+        numpy.sqrt(Avals)[numpy.newaxis, :] * numpy.sin(theta)[:, numpy.newaxis]
+    )
+    assert result[:, :, 0] == pytest.approx(expected_R, abs=1.0e-8)
+    assert result[:, :, 1] == pytest.approx(expected_Z, abs=1.0e-8)
+
+    # reversed Avals
+    result_reversed = mesh.followPerpendicularBatch(
+        f_R, f_Z, points, A0s, Avals[::-1], rtol=1.0e-10, atol=1.0e-11
+    )
+    assert result_reversed == pytest.approx(result[:, ::-1, :], abs=1.0e-8)
+
+
+def test_PerpendicularTrajectoryCache():
+    # psi = R**2 + Z**2, so contours are circles with radius sqrt(psi)
+    def f_R(R, Z):
+        return R / (2.0 * (R ** 2 + Z ** 2))
+
+    def f_Z(R, Z):
+        return Z / (2.0 * (R ** 2 + Z ** 2))
+
+    cache = mesh.PerpendicularTrajectoryCache(f_R, f_Z, rtol=1.0e-10, atol=1.0e-11)
+
+    theta = 0.3
+    p0 = mesh.Point2D(numpy.cos(theta), numpy.sin(theta))
+    Avals = [1.0, 1.2, 1.5]
+
+    # first call should give the same result as followPerpendicular()
+    result = cache.follow(p0, 1.0, Avals)
+    expected = mesh.followPerpendicular(
+        f_R, f_Z, p0, 1.0, Avals, rtol=1.0e-10, atol=1.0e-11
+    )
+    assert [tuple(p) for p in result] == [tuple(p) for p in expected]
+    assert len(cache.trajectories) == 1
+
+    # values inside the stored range are interpolated, values outside it extend the
+    # stored trajectory in both directions
+    Avals = [0.5, 0.8, 1.1, 1.3, 2.0]
+    result = cache.follow(p0, 1.0, Avals)
+    assert len(cache.trajectories) == 1
+    trajectory = next(iter(cache.trajectories.values()))
+    assert len(trajectory[1]) == 2
+    assert len(trajectory[-1]) == 1
+    assert [p.R for p in result] == pytest.approx(
+        numpy.sqrt(Avals) * numpy.cos(theta), abs=1.0e-7
+    )
+    assert [p.Z for p in result] == pytest.approx(
+        numpy.sqrt(Avals) * numpy.sin(theta), abs=1.0e-7
+    )
+
+    # The least recently used trajectories are removed when there are too many
+    cache.max_trajectories = 2
+    p1 = mesh.Point2D(numpy.cos(1.0), numpy.sin(1.0))
+    p2 = mesh.Point2D(numpy.cos(2.0), numpy.sin(2.0))
+    cache.follow(p1, 1.0, [1.2])
+    cache.follow(p0, 1.0, [1.2])
+    cache.follow(p2, 1.0, [1.2])
+    assert list(cache.trajectories) == [
+        (p0.R, p0.Z, 1.0),
+        (p2.R, p2.Z, 1.0),
+    ]
+
+
+def test_PerpendicularTrajectoryCache_forEquilibrium():
+    import gc
+    from types import SimpleNamespace
+
+    def make_equilibrium():
+        return SimpleNamespace(f_R=lambda R, Z: R, f_Z=lambda R, Z: Z, field_hash="abc")
+
+    eq = make_equilibrium()
+    cache = mesh.PerpendicularTrajectoryCache.forEquilibrium(eq, rtol=1.0e-8, atol=0.0)
+    assert eq.perpendicular_trajectory_cache is cache
+
+    # Re-used by a new equilibrium for the same field, while it is alive
+    eq2 = make_equilibrium()
+    cache2 = mesh.PerpendicularTrajectoryCache.forEquilibrium(
+        eq2, rtol=1.0e-8, atol=0.0
+    )
+    assert cache2 is cache
+    assert cache.f_R is eq2.f_R
+
+    # Not kept alive once no equilibrium refers to it
+    del eq, eq2, cache, cache2
+    gc.collect()
+    assert mesh.PerpendicularTrajectoryCache._latest() is None
+
+
+def test_SmoothnlStencil():
+    from types import SimpleNamespace
+
+    # two regions connected radially
+    regions = {
+        0: SimpleNamespace(
+            name="inner",
+            nx=3,
+            ny=6,
+            connections={"inner": None, "outer": 1, "lower": None, "upper": None},
+        ),
+        1: SimpleNamespace(
+            name="outer",
+            nx=4,
+            ny=6,
+            connections={"inner": 0, "outer": None, "lower": None, "upper": None},
+        ),
+    }
+    for region in regions.values():
+        region.f = mesh.MultiLocationArray(region.nx, region.ny)
+        region.f.centre = 1.0
+        region.f.xlow = 1.0
+        region.f.ylow = 1.0
+        region.f.corners = 1.0
+
+    stencil = mesh._SmoothnlStencil(regions)
+    f = stencil.gather(["f"])
+    assert f.shape == (1, stencil.size)
+    # points on shared boundaries are included once for each region
+    assert stencil.size == (3 + 4) * 6 + (4 + 5) * 6 + (3 + 4) * 7 + (4 + 5) * 7
+
+    # add a spike at each location, which should be smoothed
+    for location in stencil.locations:
+        f[0, stencil.indices[(location, 1)][1, 3]] = 2.0
+    for i in range(10):
+        mxn, myn = stencil.gradients(f)
+        mx = stencil.smoothMask(stencil.mark(mxn))
+        my = stencil.smoothMask(stencil.mark(myn))
+        f = stencil.update(f, mx, my)
+    stencil.scatter("f", f[0])
+
+    # spike is spread out to neighbouring points
+    assert 1.0 < regions[1].f.centre[1, 3] < 1.5
+    assert regions[1].f.centre[2, 3] > 1.0
+    assert regions[1].f.centre[1, 4] > 1.0
+    assert numpy.all(regions[1].f.centre >= 1.0)
+    assert numpy.all(regions[1].f.centre < 1.5)
+    # points far from the spike are not changed
+    assert regions[0].f.centre[0, :] == tight_approx(numpy.ones(6))
+
+
+def test_fieldWithHalo():
+    class FakeRegion:
+        _halo_rows = mesh.MeshRegion._halo_rows
+        fieldWithHalo = mesh.MeshRegion.fieldWithHalo
+
+        def __init__(self, regions, connections, offset):
+            self.regions = regions
+            self.connections = connections
+            self.f = mesh.MultiLocationArray(3, 4)
+            self.g = mesh.MultiLocationArray(3, 4)
+            for location in ["centre", "xlow", "ylow", "corners"]:
+                shape = getattr(self.f, location).shape
+                values = offset + numpy.arange(shape[0] * shape[1]).reshape(shape)
+                setattr(self.f, location, values)
+                setattr(self.g, location, 2.0 * values)
+
+        def getNeighbour(self, face):
+            if self.connections[face] is None:
+                return None
+            return self.regions[self.connections[face]]
+
+    regions = {}
+    regions[0] = FakeRegion(
+        regions, {"inner": None, "outer": 1, "lower": None, "upper": None}, 0.0
+    )
+    regions[1] = FakeRegion(
+        regions, {"inner": 0, "outer": None, "lower": None, "upper": 0}, 100.0
+    )
+
+    # field given by name
+    f0 = regions[0].fieldWithHalo("f")
+    assert f0.field is regions[0].f
+    assert set(f0.halo) == {("outer", "centre"), ("outer", "ylow")}
+    assert f0.halo[("outer", "centre")] == tight_approx(regions[1].f.centre[0, :])
+    assert f0.halo[("outer", "ylow")] == tight_approx(regions[1].f.ylow[0, :])
+
+    # field given by a member MultiLocationArray
+    assert regions[0].fieldWithHalo(regions[0].f).field is regions[0].f
+
+    # field given by a function, evaluated only on the halo rows of the neighbours
+    f1 = regions[1].fieldWithHalo(lambda r: r.f * r.g + 1.0)
+    assert f1.field.centre == tight_approx(
+        regions[1].f.centre * regions[1].g.centre + 1.0
+    )
+    assert set(f1.halo) == {
+        ("inner", "centre"),
+        ("inner", "ylow"),
+        ("upper", "centre"),
+        ("upper", "xlow"),
+    }
+    assert f1.halo[("inner", "ylow")] == tight_approx(
+        regions[0].f.ylow[-1, :] * regions[0].g.ylow[-1, :] + 1.0
+    )
+    assert f1.halo[("upper", "xlow")] == tight_approx(
+        regions[0].f.xlow[:, 0] * regions[0].g.xlow[:, 0] + 1.0
+    )
+
+    # a FieldWithHalo is returned unchanged
+    assert regions[1].fieldWithHalo(f1) is f1
+
+    with pytest.raises(ValueError):
+        regions[0].fieldWithHalo(mesh.MultiLocationArray(3, 4))
+
+
+def test_DDX_DDY_missing_locations():
+    class FakeRegion:
+        _halo_rows = mesh.MeshRegion._halo_rows
+        fieldWithHalo = mesh.MeshRegion.fieldWithHalo
+        DDX = mesh.MeshRegion.DDX
+        DDY = mesh.MeshRegion.DDY
+
+        def __init__(self):
+            self.nx = 3
+            self.ny = 4
+            self.connections = {
+                "inner": None,
+                "outer": None,
+                "lower": None,
+                "upper": None,
+            }
+            self.dx = mesh.MultiLocationArray(self.nx, self.ny)
+            self.dy = mesh.MultiLocationArray(self.nx, self.ny)
+            for location in ["centre", "xlow", "ylow", "corners"]:
+                setattr(self.dx, location, 0.5)
+                setattr(self.dy, location, 0.25)
+            self.f = mesh.MultiLocationArray(self.nx, self.ny)
+            self.f.centre = numpy.arange(12.0).reshape(3, 4)
+            self.f.xlow = numpy.arange(16.0).reshape(4, 4) - 2.0
+
+        def getNeighbour(self, face):
+            return None
+
+    region = FakeRegion()
+
+    with pytest.warns(UserWarning) as record:
+        ddx = region.DDX("f")
+    assert len(record) == 2
+    assert ddx.has_centre
+    assert ddx.centre == tight_approx(numpy.full((3, 4), 8.0))
+    assert ddx.has_xlow
+    assert not ddx.has_ylow
+    assert not ddx.has_corners
+
+    with pytest.warns(UserWarning) as record:
+        ddy = region.DDY("f")
+    # DDY(f).centre and DDY(f).xlow need ylow and corners, and the boundary values of
+    # DDY(f).ylow and DDY(f).corners need ylow and corners too
+    assert len(record) == 4
+    assert not any(
+        getattr(ddy, "has_" + location)
+        for location in ["centre", "xlow", "ylow", "corners"]
+    )
+
+    # the input field is not modified
+    assert region.f.has_centre
+    assert region.f.has_xlow
+    assert not region.f.has_ylow
+    assert not region.f.has_corners
+
+
+@pytest.mark.parametrize("orthogonal", [True, False])
+def test_calcMetricAtLocation(orthogonal):
+    from types import SimpleNamespace
+
+    nx, ny = 3, 4
+    rng = numpy.random.default_rng(7)
+
+    def make_field(low, high, locations=mesh.MultiLocationArray.locations):
+        f = mesh.MultiLocationArray(nx, ny)
+        for location in locations:
+            setattr(f, location, rng.uniform(low, high, f._shape(location)))
+        return f
+
+    # cosBeta and tanBeta are only set at centre and ylow, as in calcBeta()
+    region = SimpleNamespace(
+        user_options=SimpleNamespace(orthogonal=orthogonal, geometry_rtol=1.0e-10),
+        bpsign=-1.0,
+        Rxy=make_field(1.0, 2.0),
+        Bpxy=make_field(0.1, 0.5),
+        hy=make_field(0.5, 1.0),
+        dphidy=make_field(-1.0, 1.0),
+        I=make_field(-0.1, 0.1),
+        cosBeta=make_field(0.8, 1.0, ["centre", "ylow"]),
+        tanBeta=make_field(-0.5, 0.5, ["centre", "ylow"]),
+    )
+    r = region
+    metric_names = ["g11", "g22", "g33", "g12", "g13", "g23", "J"]
+    metric_names += ["g_11", "g_22", "g_33", "g_12", "g_13", "g_23"]
+    for name in metric_names:
+        setattr(region, name, mesh.MultiLocationArray(nx, ny))
+    Jcheck = mesh.MultiLocationArray(nx, ny)
+
+    check = {
+        location: mesh.MeshRegion._calcMetricAtLocation(region, location, Jcheck)
+        for location in ["centre", "ylow"]
+    }
+
+    # same expressions as before the metric calculation was fused
+    if orthogonal:
+        expected = {
+            "g11": (r.Rxy * r.Bpxy) ** 2,
+            "g22": 1.0 / r.hy ** 2,
+            "g33": r.I * (r.Rxy * r.Bpxy) ** 2
+            + (r.dphidy / r.hy) ** 2
+            + 1.0 / r.Rxy ** 2,
+            "g12": mesh.MultiLocationArray(nx, ny).zero(),
+            "g13": -r.I * (r.Rxy * r.Bpxy) ** 2,
+            "g23": -r.dphidy / r.hy ** 2,
+            "g_11": 1.0 / (r.Rxy * r.Bpxy) ** 2 + (r.I * r.Rxy) ** 2,
+            "g_22": r.hy ** 2 + (r.Rxy * r.dphidy) ** 2,
+            "g_33": r.Rxy ** 2,
+            "g_12": r.Rxy ** 2 * r.dphidy * r.I,
+            "g_13": r.Rxy ** 2 * r.I,
+            "g_23": r.dphidy * r.Rxy ** 2,
+        }
+    else:
+        expected = {
+            "g11": (r.Rxy * r.Bpxy) ** 2,
+            "g22": 1.0 / (r.hy * r.cosBeta) ** 2,
+            "g33": 1.0 / r.Rxy ** 2
+            + (r.Rxy * r.Bpxy * r.I) ** 2
+            + (r.dphidy / (r.hy * r.cosBeta)) ** 2
+            + 2.0 * r.Rxy * r.Bpxy * r.I * r.dphidy * r.tanBeta / r.hy,
+            "g12": r.Rxy * numpy.abs(r.Bpxy) * r.tanBeta / r.hy,
+            "g13": -r.Rxy * r.Bpxy * r.dphidy * r.tanBeta / r.hy
+            - r.I * (r.Rxy * r.Bpxy) ** 2,
+            "g23": -r.bpsign * r.dphidy / (r.hy * r.cosBeta) ** 2
+            - r.Rxy * numpy.abs(r.Bpxy) * r.I * r.tanBeta / r.hy,
+            "g_11": 1.0 / (r.Rxy * r.Bpxy * r.cosBeta) ** 2 + (r.I * r.Rxy) ** 2,
+            "g_22": r.hy ** 2 + (r.dphidy * r.Rxy) ** 2,
+            "g_33": r.Rxy ** 2,
+            "g_12": r.bpsign * r.I * r.dphidy * r.Rxy ** 2
+            - r.hy * r.tanBeta / (r.Rxy * numpy.abs(r.Bpxy)),
+            "g_13": r.I * r.Rxy ** 2,
+            "g_23": r.bpsign * r.dphidy * r.Rxy ** 2,
+        }
+    expected["J"] = r.hy / r.Bpxy
+    for name, value in expected.items():
+        for location in ["centre", "ylow"]:
+            assert numpy.array_equal(
+                getattr(region, name)._getArray(location), value._getArray(location)
+            ), f"{name}.{location}"
+
+    e = expected
+    expected_Jcheck = r.bpsign / numpy.sqrt(
+        e["g11"] * e["g22"] * e["g33"]
+        + 2.0 * e["g12"] * e["g13"] * e["g23"]
+        - e["g11"] * e["g23"] ** 2
+        - e["g22"] * e["g13"] ** 2
+        - e["g33"] * e["g12"] ** 2
+    )
+    for location in ["centre", "ylow"]:
+        numpy.testing.assert_array_equal(
+            Jcheck._getArray(location), expected_Jcheck._getArray(location)
+        )
+        # random inputs do not give a consistent Jacobian
+        assert check[location] is False
+
+
+def test_GeometryGraph():
+    calls = []
+
+    def node(name):
+        return lambda: calls.append(name)
+
+    graph = mesh.GeometryGraph()
+    graph.addNode("a", node("a"), provides=["x", "y"])
+    graph.addNode("b", node("b"), provides=["z"], requires=["x"])
+    graph.addNode("c", node("c"), provides=["w"], requires=["a"])
+    graph.addNode("d", node("d"), provides=["v"], requires=["z", "w"])
+    # later node providing the same quantity replaces the earlier one as its provider
+    graph.addNode("e", node("e"), provides=["z"], requires=["b"])
+
+    assert graph.getNode("z") == "e"
+    assert graph.dependencies("w") == ["a", "c"]
+    # requirements are resolved when a node is added
+    assert graph.dependencies("v") == ["a", "b", "c", "d"]
+    assert graph.dependencies() == ["a", "b", "c", "d", "e"]
+
+    # only the nodes needed are evaluated, and each only once
+    graph.evaluate(["w"])
+    assert calls == ["a", "c"]
+    graph.evaluate(["v", "z"])
+    assert calls == ["a", "c", "b", "d", "e"]
+    graph.evaluate()
+    assert calls == ["a", "c", "b", "d", "e"]
+
+    assert graph.cost("v") == pytest.approx(
+        sum(graph.timings[n] for n in ["a", "b", "c", "d"])
+    )
+    assert "b: " in graph.describe("z")
+    assert "provides: z" in graph.describe("z")
+    assert "c: " not in graph.describe("z")
+
+    graph.reset(evaluated=["a"])
+    calls.clear()
+    graph.evaluate(["w"])
+    assert calls == ["c"]
+
+    with pytest.raises(ValueError):
+        graph.addNode("a", node("a"))
+    with pytest.raises(ValueError):
+        graph.evaluate(["not a quantity"])
+
+
+def test_GeometryGraph_local():
+    calls = []
+
+    graph = mesh.GeometryGraph()
+    graph.addNode("a", lambda parts: calls.append(("a", set(parts))), local=True)
+    graph.addNode("b", lambda parts: calls.append(("b", set(parts))), local=True)
+    graph.addNode("c", lambda: calls.append(("c", None)), requires=["a", "b"])
+
+    graph.markStale([0, 1, 2])
+    graph.markStale([3], ["b"])
+    graph.evaluate()
+    assert calls == [("a", {0, 1, 2}), ("b", {0, 1, 2, 3}), ("c", None)]
+
+    # local nodes only update the parts that are stale
+    graph.reset()
+    calls.clear()
+    graph.markStale([1])
+    graph.evaluate()
+    assert calls == [("a", {1}), ("b", {1}), ("c", None)]
+
+    graph.reset()
+    calls.clear()
+    graph.evaluate()
+    assert calls == [("a", set()), ("b", set()), ("c", None)]
+
+    with pytest.raises(ValueError):
+        graph.markStale([0], ["c"])
+
+
+def test_releaseContours():
+    released = []
+
+    class FakeContour:
+        def __init__(self, distance):
+            self.distance = numpy.array(distance)
+
+        def releaseFineContour(self):
+            released.append(self)
+
+    region = mesh.MeshRegion.__new__(mesh.MeshRegion)
+    region.contours = [FakeContour([0.0, 1.0, 2.0]), FakeContour([0.0, 1.5, 3.0])]
+    region.equilibriumRegion = FakeContour([0.0])
+    expected = region.stackedDistances()
+
+    region.releaseContours()
+
+    assert region.contours is None
+    assert len(released) == 3
+    assert numpy.array_equal(region.stackedDistances(), expected)
+
+    # releasing again does nothing
+    region.releaseContours()
+    assert len(released) == 3
+
+
+def test_setFieldStorage():
+    region = mesh.MeshRegion.__new__(mesh.MeshRegion)
+    region.nx = 3
+    region.ny = 4
+    region.Rxy = mesh.MultiLocationArray(3, 4)
+    region.Rxy.centre = 1.0
+    region.Rxy.xlow = 2.0
+
+    global_array = numpy.zeros([5, 4])
+    region.setFieldStorage({"Rxy": {"centre": global_array[1:4, :]}})
+
+    # field already set is moved into the storage
+    assert numpy.shares_memory(region.Rxy.centre, global_array)
+    assert region.Rxy.xlow == tight_approx(numpy.full([4, 4], 2.0))
+    assert global_array[1:4, :] == tight_approx(numpy.ones([3, 4]))
+
+    # fields created afterwards are calculated directly into the storage
+    region.Rxy = numpy.multiply(3.0, region.Rxy, out=region._newField("Rxy"))
+    assert numpy.shares_memory(region.Rxy.centre, global_array)
+    assert region.Rxy.xlow == tight_approx(numpy.full([4, 4], 6.0))
+    assert global_array[1:4, :] == tight_approx(numpy.full([3, 4], 3.0))
+    assert global_array[0, :] == tight_approx(numpy.zeros(4))
+    assert global_array[4, :] == tight_approx(numpy.zeros(4))
+
+    region.Rxy = region._evaluateField("Rxy", lambda x: x + 1.0, region.Rxy)
+    assert numpy.shares_memory(region.Rxy.centre, global_array)
+    assert region.Rxy.xlow == tight_approx(numpy.full([4, 4], 7.0))
+    assert not region.Rxy.has_ylow
+    assert global_array[1:4, :] == tight_approx(numpy.full([3, 4], 4.0))
+
+    # other fields are not affected
+    region.Zxy = region._newField("Zxy")
+    assert not numpy.shares_memory(region.Zxy.centre, global_array)
+
+
+def test_arraysEqual():
+    a = numpy.array([[1.0, float("nan")], [3.0, 4.0]])
+    assert mesh._arraysEqual(a, a.copy())
+    b = a.copy()
+    b[1, 1] = 5.0
+    assert not mesh._arraysEqual(a, b)
+    b = a.copy()
+    b[0, 0] = float("nan")
+    assert not mesh._arraysEqual(a, b)
+    assert not mesh._arraysEqual(a, a[:, :1])
+    assert mesh._arraysEqual(numpy.array(3, dtype=numpy.int32), numpy.array(3))
+
+
+def test_StageMemory():
+    if mesh._residentMemory() is None or not mesh._resetPeakResidentMemory():
+        pytest.skip("resident memory cannot be measured on this platform")
+
+    # allocate and release about 80 MB in an inner stage
+    with mesh._StageMemory() as outer:
+        with mesh._StageMemory() as inner:
+            a = numpy.ones(10 * 1024 ** 2)
+            del a
+        with mesh._StageMemory() as after:
+            pass
+
+    for memory in [outer, inner, after]:
+        assert memory.before > 0.0
+        assert memory.after > 0.0
+        assert memory.peak >= max(memory.before, memory.after)
+    assert inner.peak > inner.before + 70.0
+    # the peak of each stage is measured separately...
+    assert after.peak < inner.peak - 70.0
+    # ...but includes the peaks of the stages inside it
+    assert outer.peak >= inner.peak
+    assert "peak" in str(outer)
+    assert str(mesh._StageMemory()) == "not available"
+
+
+@pytest.mark.parametrize("complevel", [0, 4])
+def test_NetCDF4GridFile(tmp_path, complevel):
+    from boututils.boutarray import BoutArray
+    from boututils.datafile import DataFile
+    from netCDF4 import Dataset
+
+    f2d = BoutArray(
+        numpy.linspace(0.0, 1.0, 12).reshape(3, 4), attributes={"bout_type": "Field2D"}
+    )
+    f1d = BoutArray(numpy.arange(3.0), attributes={"bout_type": "ArrayX"})
+
+    def write(f):
+        f.write_file_attribute("grid_id", "abc")
+        f.write("nx", 3)
+        f.write("Bt_axis", 2.5)
+        f.write("curvature_type", "curl(b/B)")
+        f.write("Rxy", f2d)
+        f.write("Rxy_ylow", f2d)
+        f.write("ShiftAngle", f1d)
+
+    with DataFile(str(tmp_path / "ref.nc"), create=True, format="NETCDF4") as f:
+        write(f)
+    with mesh._NetCDF4GridFile(
+        str(tmp_path / "test.nc"),
+        complevel=complevel,
+        chunksizes=(None, 2),
+        float32_variables=["Rxy_ylow"],
+        min_chunked_bytes=0,
+    ) as f:
+        write(f)
+
+    with Dataset(tmp_path / "ref.nc") as ref, Dataset(tmp_path / "test.nc") as test:
+        assert test.grid_id == "abc"
+        assert {name: len(d) for name, d in test.dimensions.items()} == {
+            name: len(d) for name, d in ref.dimensions.items()
+        }
+        assert list(test.variables) == list(ref.variables)
+        for name in ref.variables:
+            assert test[name].dimensions == ref[name].dimensions
+            assert test[name].__dict__ == ref[name].__dict__
+            if name == "Rxy_ylow":
+                assert test[name].dtype == numpy.float32
+                assert numpy.asarray(test[name][...]) == pytest.approx(
+                    numpy.asarray(ref[name][...]), rel=1.0e-7
+                )
+            else:
+                assert test[name].dtype == ref[name].dtype
+                assert numpy.all(test[name][...] == ref[name][...])
+
+        assert test["Rxy"].chunking() == [3, 2]
+        if complevel > 0:
+            assert test["Rxy"].filters()["zlib"]
+            assert test["Rxy"].filters()["complevel"] == complevel
+        else:
+            assert not test["Rxy"].filters()["zlib"]
+
+
+def test_NetCDF4GridFile_compression(tmp_path):
+    from boututils.boutarray import BoutArray
+    from netCDF4 import Dataset
+
+    def field(nx, ny, i):
+        x, y = numpy.meshgrid(
+            numpy.linspace(0.0, 1.0, nx), numpy.linspace(0.0, 3.0, ny), indexing="ij"
+        )
+        return BoutArray(
+            numpy.sin(x + i) * numpy.cos(i * y) + i, attributes={"bout_type": "Field2D"}
+        )
+
+    def write(filename, nx, ny, complevel):
+        with mesh._NetCDF4GridFile(str(filename), complevel=complevel) as f:
+            for i in range(10):
+                f.write(f"f{i}", field(nx, ny, i))
+        return filename.stat().st_size
+
+    # compression reduces the size of a file with large arrays
+    assert write(tmp_path / "large4.nc", 64, 128, 4) < 0.8 * write(
+        tmp_path / "large0.nc", 64, 128, 0
+    )
+    with Dataset(tmp_path / "large4.nc") as f:
+        assert f["f0"].chunking() == [64, 128]
+        assert f["f0"].filters()["zlib"]
+        assert numpy.all(f["f3"][...] == field(64, 128, 3))
+    with Dataset(tmp_path / "large0.nc") as f:
+        assert f["f0"].chunking() == "contiguous"
+
+    # small arrays are not compressed, so do not make the file larger
+    assert write(tmp_path / "small4.nc", 10, 24, 4) <= write(
+        tmp_path / "small0.nc", 10, 24, 0
+    )
+    with Dataset(tmp_path / "small4.nc") as f:
+        assert f["f0"].chunking() == "contiguous"
+
+    # chunks are split to be at most max_chunk_bytes
+    f = mesh._NetCDF4GridFile.__new__(mesh._NetCDF4GridFile)
+    f.min_chunked_bytes = 16384
+    f.chunksizes = None
+    f.complevel = 4
+    assert f._chunkSizes((64, 128), 8) == (64, 128)
+    assert f._chunkSizes((1024, 1024), 8) == (1024, 128)
+    assert f._chunkSizes((1024, 1024), 4) == (1024, 256)
+    assert f._chunkSizes((10, 24), 8) is None
+    f.chunksizes = (None, 16)
+    assert f._chunkSizes((64, 128), 8) == (64, 16)
+
+
+def test_NetCDF4GridFile_update(tmp_path):
+    from boututils.boutarray import BoutArray
+    from netCDF4 import Dataset
+
+    filename = str(tmp_path / "test.nc")
+    attributes = {"bout_type": "Field2D"}
+    Rxy = BoutArray(numpy.ones([3, 4]), attributes=attributes)
+    Zxy = BoutArray(numpy.zeros([3, 4]), attributes=attributes)
+
+    with mesh._NetCDF4GridFile(filename) as f:
+        f.write_file_attribute("grid_id", "abc")
+        f.write("nx", 3)
+        f.write("Rxy", Rxy)
+        f.write("Zxy", Zxy)
+        f.write("hypnotoad_inputs", "a: 1")
+
+    Zxy = BoutArray(numpy.full([3, 4], 2.0), attributes=attributes)
+    with mesh._NetCDF4GridFile(filename, update=True) as f:
+        f.write_file_attribute("grid_id", "def")
+        f.write("nx", 3)
+        f.write("Rxy", Rxy)
+        f.write("Zxy", Zxy)
+        f.write("hypnotoad_inputs", "a: 2")
+        f.write("Bxy", Rxy)
+
+    # only the variables that changed, or are new, are written
+    assert f.written == ["Zxy", "hypnotoad_inputs", "Bxy"]
+
+    with Dataset(filename) as test:
+        assert test.grid_id == "def"
+        assert numpy.all(test["Zxy"][...] == 2.0)
+        assert test["hypnotoad_inputs"][0] == "a: 2"
+        assert test["Bxy"].dimensions == ("x", "y")
+
+    with pytest.raises(ValueError):
+        with mesh._NetCDF4GridFile(filename, update=True) as f:
+            f.write("Rxy", BoutArray(numpy.ones([4, 4]), attributes=attributes))
@@ -1,7 +1,11 @@
+import multiprocessing
 import numpy as np
 from io import StringIO
+import pytest
+import warnings
 
 from hypnotoad.cases import tokamak
+from hypnotoad.core.mesh import MultiLocationArray
 from hypnotoad.geqdsk import _geqdsk
 
 
@@ -71,6 +75,29 @@ def test_tokamak_interpolations():
         )
 
 
+def test_multilocationarray_arguments():
+    eq = make_lower_single_null()
+
+    R = MultiLocationArray(2, 3)
+    Z = MultiLocationArray(2, 3)
+    R.centre = np.linspace(1.4, 1.6, 6).reshape(2, 3)
+    Z.centre = np.linspace(-0.1, 0.1, 6).reshape(2, 3)
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = eq.Bp_R(R, Z)
+
+    # Only the locations set in the arguments are evaluated
+    assert result.has_centre
+    assert not any([result.has_xlow, result.has_ylow, result.has_corners])
+    assert np.array_equal(result.centre, eq.Bp_R(R.centre, Z.centre))
+
+    # The arguments are not modified
+    for arg in [R, Z]:
+        assert arg.has_centre
+        assert not any([arg.has_xlow, arg.has_ylow, arg.has_corners])
+
+
 def test_read_geqdsk():
     # Number of mesh points
     nx = 65
@@ -173,6 +200,529 @@ def test_read_geqdsk():
         )
 
 
+def test_read_geqdsk_cache(tmp_path):
+    nx = 33
+    ny = 33
+
+    R1d = np.linspace(1.0, 2.0, nx)
+    Z1d = np.linspace(-1.0, 1.0, ny)
+    R2d, Z2d = np.meshgrid(R1d, Z1d, indexing="ij")
+    psi2d = -1.5 * np.exp(-((R2d - 1.1) ** 2 + (Z2d - 0.2) ** 2) / 0.3 ** 2)
+
+    data = {
+        "nx": nx,
+        "ny": ny,
+        "rdim": 1.0,
+        "zdim": 2.0,
+        "rleft": 1.0,
+        "rcentr": 1.1,
+        "bcentr": 1.0,
+        "zmid": 0.0,
+        "rmagx": 1.1,
+        "zmagx": 0.2,
+        "simagx": -1.5,
+        "sibdry": -0.5,
+        "cpasma": 1234521,
+        "fpol": np.linspace(1.0, 0.9, nx),
+        "pres": np.zeros(nx),
+        "qpsi": np.zeros(nx),
+        "psi": psi2d,
+    }
+
+    output = StringIO()
+    _geqdsk.write(data, output)
+    contents = output.getvalue()
+
+    cache_dir = tmp_path / "cache"
+    settings = {"geqdsk_cache_dir": str(cache_dir)}
+
+    eq = tokamak.read_geqdsk(StringIO(contents), settings, make_regions=False)
+    assert len(list(cache_dir.glob("*.npz"))) == 1
+
+    # Read again, from the cache
+    eq2 = tokamak.read_geqdsk(StringIO(contents), settings, make_regions=False)
+    assert len(list(cache_dir.glob("*.npz"))) == 1
+    assert eq2.geqdsk_input == eq.geqdsk_input == contents
+    assert eq2.field_hash == eq.field_hash
+    for a, b in zip(eq2.psi_func.tck, eq.psi_func.tck):
+        np.testing.assert_array_equal(a, b)
+    for r, z in [(1.2, 0.1), (1.6, -0.4), (1.8, 0.9)]:
+        assert eq2.psi(r, z) == eq.psi(r, z)
+        assert eq2.Bp_R(r, z) == eq.Bp_R(r, z)
+        assert eq2.fpol(eq.psi(r, z)) == eq.fpol(eq.psi(r, z))
+
+    # Different settings are stored in a different entry
+    settings["reverse_current"] = True
+    eq3 = tokamak.read_geqdsk(StringIO(contents), settings, make_regions=False)
+    assert len(list(cache_dir.glob("*.npz"))) == 2
+    assert eq3.psi(1.2, 0.1) == -eq.psi(1.2, 0.1)
+
+    # Only the newest entry is kept if the size limit is too small for two entries
+    settings["reverse_current"] = False
+    settings["geqdsk_cache_spline"] = False
+    settings["geqdsk_cache_max_size"] = 1
+    eq4 = tokamak.read_geqdsk(StringIO(contents), settings, make_regions=False)
+    entries = list(cache_dir.glob("*.npz"))
+    assert len(entries) == 1
+    assert eq4.psi(1.2, 0.1) == eq.psi(1.2, 0.1)
+
+    eq5 = tokamak.read_geqdsk(StringIO(contents), settings, make_regions=False)
+    assert list(cache_dir.glob("*.npz")) == entries
+    assert eq5.psi(1.2, 0.1) == eq.psi(1.2, 0.1)
+
+
+@pytest.mark.parametrize("source", ["directory", "glob", "concatenated", "list"])
+def test_read_geqdsk_series(tmp_path, source):
+    nx = 33
+    ny = 33
+
+    R1d = np.linspace(1.0, 2.0, nx)
+    Z1d = np.linspace(-1.0, 1.0, ny)
+    R2d, Z2d = np.meshgrid(R1d, Z1d, indexing="ij")
+
+    texts = []
+    for i in range(4):
+        psi2d = -1.5 * np.exp(
+            -((R2d - 1.1 - 0.01 * i) ** 2 + (Z2d - 0.2) ** 2) / 0.3 ** 2
+        )
+        data = {
+            "nx": nx,
+            "ny": ny,
+            "rdim": 1.0,
+            "zdim": 2.0,
+            "rleft": 1.0,
+            "rcentr": 1.1,
+            "bcentr": 1.0,
+            "zmid": 0.0,
+            "rmagx": 1.1 + 0.01 * i,
+            "zmagx": 0.2,
+            "simagx": -1.5,
+            "sibdry": -0.5,
+            "cpasma": 1234521,
+            "fpol": np.linspace(1.0, 0.9, nx),
+            "pres": np.zeros(nx),
+            "qpsi": np.zeros(nx),
+            "psi": psi2d,
+        }
+        output = StringIO()
+        _geqdsk.write(data, output)
+        texts.append(output.getvalue())
+
+    (tmp_path / "series").mkdir()
+    filenames = []
+    for i, text in enumerate(texts):
+        filenames.append(str(tmp_path / "series" / f"g{i:03d}"))
+        with open(filenames[-1], "w") as f:
+            f.write(text)
+    with open(tmp_path / "concatenated", "w") as f:
+        f.write("".join(texts))
+
+    if source == "directory":
+        source = tmp_path / "series"
+    elif source == "glob":
+        source = str(tmp_path / "series" / "g*")
+    elif source == "concatenated":
+        source = tmp_path / "concatenated"
+    else:
+        source = filenames
+
+    series = list(tokamak.read_geqdsk_series(source, make_regions=False, prefetch=1))
+    assert len(series) == len(texts)
+    for text, eq in zip(texts, series):
+        expected = tokamak.read_geqdsk(StringIO(text), make_regions=False)
+        assert eq.geqdsk_input == text
+        assert eq.field_hash == expected.field_hash
+        assert eq.psi(1.2, 0.1) == expected.psi(1.2, 0.1)
+
+    # O-point of each slice refined from the one of the previous slice
+    series = tokamak.read_geqdsk_series(source, make_regions=False, warm_start=True)
+    for i, eq in enumerate(series):
+        assert eq.o_point.R == pytest.approx(1.1 + 0.01 * i, abs=1.0e-3)
+        assert eq.o_point.Z == pytest.approx(0.2, abs=1.0e-3)
+
+    raw = list(tokamak.read_geqdsk_series(source, raw=True))
+    assert len(raw) == len(texts)
+    for text, data in zip(texts, raw):
+        expected = _geqdsk.read(StringIO(text))
+        for key in expected:
+            np.testing.assert_array_equal(data[key], expected[key])
+
+    # Stopping early stops the background thread
+    series = tokamak.read_geqdsk_series(source, raw=True, prefetch=1)
+    next(series)
+    series.close()
+
+
+def test_option_stages():
+    from hypnotoad.core.mesh import BoutMesh
+
+    for cls in [tokamak.TokamakEquilibrium, BoutMesh]:
+        for name, stage in cls.option_stages.items():
+            assert name in cls.user_options_factory.defaults
+            assert stage in tokamak.StageCache.stages + [None]
+
+    settings = {"nx_core": 4}
+    nonorthogonal_settings = {"nonorthogonal_spacing_method": "orthogonal"}
+    keys = tokamak.StageCache.stageKeys("abc", settings, nonorthogonal_settings)
+    assert list(keys) == tokamak.StageCache.stages
+    assert len(set(keys.values())) == 4
+
+    def changed_stages(**changes):
+        new_keys = tokamak.StageCache.stageKeys(
+            "abc", dict(settings, **changes), nonorthogonal_settings
+        )
+        return [stage for stage in keys if new_keys[stage] != keys[stage]]
+
+    # Changing an option changes the key of the stage that uses it, and of all the
+    # following stages
+    assert changed_stages(nx_core=6) == ["equilibrium", "mesh", "RZ", "geometry"]
+    assert changed_stages(follow_perpendicular_rtol=1.0e-6) == [
+        "mesh",
+        "RZ",
+        "geometry",
+    ]
+    assert changed_stages(low_memory=True) == ["RZ", "geometry"]
+    assert changed_stages(curvature_type="curl(b/B)") == ["geometry"]
+    assert changed_stages(grid_file_complevel=5, parallel_workers=2) == []
+    # Explicitly setting the default value does not change the keys
+    assert changed_stages(nx_core=4, low_memory=False) == []
+
+    assert (
+        tokamak.StageCache.stageKeys("abd", settings, nonorthogonal_settings)[
+            "equilibrium"
+        ]
+        != keys["equilibrium"]
+    )
+    assert tokamak.StageCache.stageKeys("abc", settings, {})["equilibrium"] != (
+        keys["equilibrium"]
+    )
+
+
+def test_stage_cache(tmp_path):
+    cache = tokamak.StageCache(str(tmp_path), max_size=None)
+    assert cache.load("a") is None
+
+    cache.store("a", {"x": np.arange(3)})
+    np.testing.assert_array_equal(cache.load("a")["x"], np.arange(3))
+
+    # Results that cannot be pickled are not stored
+    with pytest.warns(UserWarning):
+        cache.store("b", lambda x: x)
+    assert cache.load("b") is None
+
+    # Invalid entries are ignored
+    (tmp_path / "c.pkl").write_bytes(b"not a pickle")
+    with pytest.warns(UserWarning):
+        assert cache.load("c") is None
+
+    # Only the newest entry is kept if the size limit is too small for two entries
+    cache = tokamak.StageCache(str(tmp_path), max_size=1)
+    cache.store("d", 1)
+    assert [path.name for path in tmp_path.glob("*.pkl")] == ["d.pkl"]
+
+
+def make_lower_single_null_geqdsk():
+    """
+    Contents of a G-EQDSK file for a lower single null equilibrium, and settings for a
+    small grid that is quick to create from it
+    """
+    nx = 65
+    ny = 65
+
+    r1d = np.linspace(1.2, 1.8, nx)
+    z1d = np.linspace(-0.5, 0.5, ny)
+    r2d, z2d = np.meshgrid(r1d, z1d, indexing="ij")
+
+    # Lower single null, with an X-point at (1.5, -0.3)
+    def psi_func(R, Z):
+        return -np.exp(-((R - 1.5) ** 2 + Z ** 2) / 0.3 ** 2) - np.exp(
+            -((R - 1.5) ** 2 + (Z + 0.6) ** 2) / 0.3 ** 2
+        )
+
+    data = {
+        "nx": nx,
+        "ny": ny,
+        "rdim": 0.6,
+        "zdim": 1.0,
+        "rleft": 1.2,
+        "rcentr": 1.5,
+        "bcentr": 1.0,
+        "zmid": 0.0,
+        "rmagx": 1.5,
+        "zmagx": 0.0,
+        "simagx": psi_func(1.5, 0.0),
+        "sibdry": psi_func(1.5, -0.3),
+        "cpasma": 1.0e6,
+        "fpol": np.full(nx, 1.5),
+        "pres": np.zeros(nx),
+        "qpsi": np.zeros(nx),
+        "psi": psi_func(r2d, z2d),
+    }
+
+    output = StringIO()
+    _geqdsk.write(data, output)
+    contents = output.getvalue()
+
+    settings = {
+        "nx_core": 2,
+        "nx_pf": 2,
+        "nx_sol": 2,
+        "ny_inner_divertor": 3,
+        "ny_outer_divertor": 3,
+        "ny_sol": 6,
+        "psinorm_core": 0.9,
+        "psinorm_pf": 0.9,
+        "psinorm_sol": 1.1,
+        "y_boundary_guards": 0,
+        "refine_methods": ["gradpsi-newton", "integrate+newton"],
+    }
+
+    return contents, settings
+
+
+def test_read_geqdsk_mesh(tmp_path, capsys):
+    contents, settings = make_lower_single_null_geqdsk()
+    settings["stage_cache_dir"] = str(tmp_path)
+
+    def read(**changes):
+        capsys.readouterr()
+        mesh = tokamak.read_geqdsk_mesh(StringIO(contents), dict(settings, **changes))
+        started_after = [
+            line
+            for line in capsys.readouterr().out.splitlines()
+            if line.startswith("Starting after stage")
+        ]
+        return mesh, started_after
+
+    mesh, started_after = read()
+    assert started_after == []
+    assert len(list(tmp_path.glob("*.pkl"))) == 4
+
+    def check_same(mesh2):
+        for region, region2 in zip(mesh.regions.values(), mesh2.regions.values()):
+            for name in ["Rxy", "Zxy", "hy", "Bpxy", "g11", "g22", "zShift"]:
+                np.testing.assert_array_equal(
+                    getattr(region2, name).centre, getattr(region, name).centre
+                )
+
+    # Options that do not change the grid only change the options of the result
+    mesh2, started_after = read(grid_file_complevel=5)
+    assert started_after == ["Starting after stage 'geometry'"]
+    assert mesh2.user_options.grid_file_complevel == 5
+    check_same(mesh2)
+
+    # Only the geometry is calculated again when an option used by geometry() changes
+    mesh2, started_after = read(geometry_rtol=1.0e-2)
+    assert started_after == ["Starting after stage 'RZ'"]
+    assert len(list(tmp_path.glob("*.pkl"))) == 5
+    assert mesh2.user_options.geometry_rtol == 1.0e-2
+    for region in mesh2.regions.values():
+        assert region.user_options.geometry_rtol == 1.0e-2
+    check_same(mesh2)
+
+
+def test_writeGridfile(tmp_path):
+    from netCDF4 import Dataset
+    from hypnotoad.core.mesh import BoutMesh
+
+    contents, settings = make_lower_single_null_geqdsk()
+    settings["grid_file_writer"] = "netCDF4"
+
+    def make_mesh():
+        eq = tokamak.read_geqdsk(StringIO(contents), settings)
+        mesh = BoutMesh(eq, settings)
+        mesh.calculateRZ()
+        return mesh
+
+    # Write the global arrays collected by geometry()
+    mesh = make_mesh()
+    mesh.geometry()
+    mesh.writeGridfile(str(tmp_path / "collected.nc"))
+    assert mesh.Rxy.has_centre
+
+    # Calculate the geometry while writing the file, and record which stages had been
+    # evaluated when each variable was written
+    mesh = make_mesh()
+    evaluated_when_written = {}
+    open_gridfile = mesh.openGridfile
+
+    def openGridfile(*args, **kwargs):
+        f = open_gridfile(*args, **kwargs)
+        write = f.write
+
+        def recordingWrite(name, data):
+            evaluated_when_written[name] = set(mesh.geometry_graph.evaluated)
+            write(name, data)
+
+        f.write = recordingWrite
+        return f
+
+    mesh.openGridfile = openGridfile
+    mesh.writeGridfile(str(tmp_path / "streamed.nc"))
+
+    # Each output is written as soon as it has been calculated
+    assert evaluated_when_written["Rxy"] == {"RZ"}
+    assert "metric" not in evaluated_when_written["Bxy"]
+    assert "curvature" not in evaluated_when_written["g11"]
+    # and is then released
+    for name in mesh.fields_to_output + mesh.arrayXDirection_to_output:
+        assert name not in mesh.__dict__
+
+    with Dataset(tmp_path / "collected.nc") as collected, Dataset(
+        tmp_path / "streamed.nc"
+    ) as streamed:
+        assert set(streamed.variables) == set(collected.variables)
+        for name, var in collected.variables.items():
+            assert streamed[name].__dict__ == var.__dict__, name
+            np.testing.assert_array_equal(streamed[name][...], var[...], err_msg=name)
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="parallel_workers requires the 'fork' start method",
+)
+def test_parallel_workers():
+    from hypnotoad.core.mesh import BoutMesh
+
+    contents, settings = make_lower_single_null_geqdsk()
+
+    eq = tokamak.read_geqdsk(StringIO(contents), settings)
+    serial = BoutMesh(eq, settings)
+    serial.calculateRZ()
+
+    eq_parallel = tokamak.read_geqdsk(StringIO(contents), settings)
+    parallel = BoutMesh(eq_parallel, dict(settings, parallel_workers=2))
+    parallel.calculateRZ()
+
+    assert list(parallel.regions) == list(serial.regions)
+    for region_id, region in parallel.regions.items():
+        expected = serial.regions[region_id]
+        assert region.name == expected.name
+        # References to the objects shared with the Mesh are restored
+        assert region.meshParent is parallel
+        assert region.equilibriumRegion.equilibrium is eq_parallel
+        assert region.equilibriumRegion.psi == eq_parallel.psi
+        for contour, expected_contour in zip(region.contours, expected.contours):
+            assert [tuple(p) for p in contour] == [tuple(p) for p in expected_contour]
+        for name in ["Rxy", "Zxy"]:
+            for location in ["centre", "xlow", "ylow", "corners"]:
+                np.testing.assert_array_equal(
+                    getattr(getattr(region, name), location),
+                    getattr(getattr(expected, name), location),
+                )
+
+    # Only the shared objects themselves are replaced by placeholders when pickling, not
+    # immutable values that happen to be attributes of the equilibrium, or copies
+    from copy import deepcopy
+    from hypnotoad.core.mesh import _SharedObjects
+
+    shared = _SharedObjects(parallel)
+    immutable = [
+        value
+        for value in vars(eq_parallel).values()
+        if isinstance(value, (bool, int, float, str, type(None)))
+    ]
+    assert immutable
+    for value in immutable:
+        assert shared.name(value) is None
+    assert shared.name(eq_parallel.psi_func) == "equilibrium.psi_func"
+    assert shared.name(deepcopy(eq_parallel.psi_func)) is None
+    assert shared.get("equilibrium.psi_func") is eq_parallel.psi_func
+
+
+def test_contour_workers():
+    import io
+    from hypnotoad.core.mesh import BoutMesh, _RegionPickler, _RegionUnpickler
+
+    contents, settings = make_lower_single_null_geqdsk()
+    settings.update(orthogonal=False, finecontour_Nfine=50, finecontour_atol=1.0e-8)
+    eq = tokamak.read_geqdsk(StringIO(contents), settings, settings)
+    mesh = BoutMesh(eq, settings)
+
+    # A region that ends on the wall
+    region = mesh.regions[0]
+    assert region.connections["lower"] is None
+    f = io.BytesIO()
+    _RegionPickler(f, mesh).dump(region.contours)
+    contours = f.getvalue()
+    user_options = dict(region.user_options)
+
+    def distribute(**options):
+        region.contours = _RegionUnpickler(io.BytesIO(contours), mesh).load()
+        region.user_options = region.user_options_factory.create(
+            dict(user_options, **options)
+        )
+        region.mapContours(region._refineContour)
+        region.distributePointsNonorthogonal()
+        return [[tuple(p) for p in contour] for contour in region.contours]
+
+    expected = distribute()
+    assert distribute(contour_workers=2, contour_executor="thread") == expected
+    if "fork" in multiprocessing.get_all_start_methods():
+        assert distribute(contour_workers=2, contour_executor="process") == expected
+
+
+def test_redistributePoints():
+    from hypnotoad.core.mesh import BoutMesh
+
+    contents, settings = make_lower_single_null_geqdsk()
+    settings.update(orthogonal=False, finecontour_Nfine=50, finecontour_atol=1.0e-8)
+    eq = tokamak.read_geqdsk(StringIO(contents), settings, settings)
+    mesh = BoutMesh(eq, settings)
+    mesh.geometry()
+    assert mesh.changed_regions == set(mesh.regions)
+
+    # Change the spacing of the inner divertor leg only
+    new_settings = dict(
+        settings, nonorthogonal_target_inner_lower_poloidal_spacing_length=0.05
+    )
+    with pytest.warns(UserWarning, match="not recommended"):
+        mesh.redistributePoints(new_settings)
+    mesh.calculateRZ()
+    inner_leg = {
+        region_id
+        for region_id, region in mesh.regions.items()
+        if region.equilibriumRegion.name == "inner_lower_divertor"
+    }
+    assert len(inner_leg) == 2
+    assert mesh.changed_regions == inner_leg
+    mesh.geometry()
+
+    def values(m):
+        return {
+            (name, region_id, location): array.copy()
+            for name in m.fields_to_output
+            for region_id, region in m.regions.items()
+            for location, array in region.__dict__[name]._arrays.items()
+        }
+
+    result = values(mesh)
+
+    # Updating only the changed regions gives the same result as calculating the
+    # geometry of all regions again
+    mesh.geometry_graph.reset()
+    mesh.geometry()
+    recalculated = values(mesh)
+    assert recalculated.keys() == result.keys()
+    for key, array in result.items():
+        np.testing.assert_array_equal(array, recalculated[key], err_msg=str(key))
+
+    # The same as a grid created with the new spacing. The points of the other regions
+    # have not moved. In the regions that were redistributed the points are found
+    # starting from the previous points, so they agree to within the tolerances of the
+    # contour refinement
+    new_eq = tokamak.read_geqdsk(StringIO(contents), settings, new_settings)
+    new_mesh = BoutMesh(new_eq, settings)
+    new_mesh.geometry()
+    expected = values(new_mesh)
+    assert expected.keys() == result.keys()
+    for (name, region_id, location), array in result.items():
+        key = (name, region_id, location)
+        if name in ["Rxy", "Zxy"] and region_id not in inner_leg:
+            assert np.array_equal(array, expected[key]), key
+        np.testing.assert_allclose(array, expected[key], rtol=1.0e-7, err_msg=str(key))
+
+
 def test_bounding():
     nx = 65
     ny = 65
@@ -363,7 +913,7 @@ def make_connected_double_null():
     )
 
 
-def make_lower_double_null():
+def make_lower_double_null(z_shift=0.0, previous=None, upper_coil=1.0):
     nx = 65
     ny = 65
 
@@ -375,14 +925,22 @@ def make_lower_double_null():
     z0 = 0.3
 
     def psi_func(R, Z):
+        Z = Z - z_shift
         return (
             -np.exp(-((R - r0) ** 2 + Z ** 2) / 0.3 ** 2)
             - np.exp(-((R - r0) ** 2 + (Z + 2 * z0) ** 2) / 0.3 ** 2)
-            - np.exp(-((R - r0) ** 2 + (Z - 2 * z0 - 0.003) ** 2) / 0.3 ** 2)
+            - upper_coil
+            * np.exp(-((R - r0) ** 2 + (Z - 2 * z0 - 0.003) ** 2) / 0.3 ** 2)
         )
 
     return tokamak.TokamakEquilibrium(
-        r1d, z1d, psi_func(r2d, z2d), [], [], make_regions=False  # psi1d, fpol
+        r1d,
+        z1d,
+        psi_func(r2d, z2d),
+        [],  # psi1d
+        [],  # fpol
+        make_regions=False,
+        previous=previous,
     )
 
 
@@ -504,6 +1062,41 @@ def test_makeregions_ldn():
     assert len(eq.regions) == 6
 
 
+def test_previous_equilibrium():
+    eq = make_lower_double_null()
+    eq.makeRegions()
+    for region in eq.regions.values():
+        region.fine_contour
+
+    # Critical points are refined from the ones of the previous equilibrium
+    eq_next = make_lower_double_null(z_shift=0.002, previous=eq)
+    expected = make_lower_double_null(z_shift=0.002)
+    assert len(eq_next.x_points) == len(expected.x_points) == 2
+    for xpoint, expected_xpoint in zip(eq_next.x_points, expected.x_points):
+        assert xpoint.R == pytest.approx(expected_xpoint.R, abs=1.0e-5)
+        assert xpoint.Z == pytest.approx(expected_xpoint.Z, abs=1.0e-5)
+    assert eq_next.o_point.Z == pytest.approx(expected.o_point.Z, abs=1.0e-5)
+
+    # FineContours of the previous regions are used as initial guesses
+    eq_next.makeRegions()
+    assert list(eq_next.regions) == list(eq.regions)
+    for name, region in eq_next.regions.items():
+        assert region.fine_contour_guess is eq.regions[name].fine_contour.positions
+
+    # Falls back to searching for the critical points if they cannot be refined
+    eq.critical_points = (eq.critical_points[0], eq.critical_points[0])
+    eq_next = make_lower_double_null(z_shift=0.002, previous=eq)
+    assert eq_next.critical_points == expected.critical_points
+
+    # Falls back to searching for the critical points if a critical point has appeared,
+    # here when changing from single null to double null
+    single_null = make_lower_double_null(upper_coil=0.0)
+    assert len(single_null.x_points) == 1
+    eq_next = make_lower_double_null(previous=single_null)
+    assert eq_next.critical_points == make_lower_double_null().critical_points
+    assert len(eq_next.x_points) == 2
+
+
 def test_makeregions_udn_largesep_1():
     eq = make_upper_double_null_largesep()
     eq.makeRegions()
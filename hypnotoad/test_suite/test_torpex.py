@@ -3,6 +3,7 @@ import pytest
 import numpy
 
 from hypnotoad.core.equilibrium import Equilibrium, Point2D
+from hypnotoad.core.mesh import MultiLocationArray
 from hypnotoad.cases import torpex
 
 
@@ -58,3 +59,157 @@ class TestTORPEX:
         import os
 
         os.remove(testfile)
+
+
+def test_coil_field():
+    # Compare the closed-form coil field with psi from the vector potential of the
+    # coils, differentiated symbolically
+    sympy = pytest.importorskip("sympy")
+    from sympy.functions.special.elliptic_integrals import elliptic_k, elliptic_e
+    import scipy.special
+
+    coils = [
+        {"R": 0.7667, "Z": 0.5262, "I": 7200.0},
+        {"R": 0.7667, "Z": -0.5262, "I": 7200.0},
+        {"R": 1.381, "Z": 0.5262, "I": -504.0},
+        {"R": 1.381, "Z": -0.5262, "I": -504.0},
+    ]
+    equilib = torpex.TORPEXMagneticField(
+        {"Coils": coils, "Bt_axis": 77.0e-3},
+        {"psi_core": -1.55e-3, "psi_sol": -1.47e-3},
+    )
+
+    # psi due to a single coil with radius a at height c, carrying current I
+    R, Z, a, c, I = sympy.symbols("R Z a c I")
+    D = (R + a) ** 2 + (Z - c) ** 2
+    kSquared = 4 * a * R / D
+    A_phi = (
+        I
+        * a
+        / sympy.sqrt(D)
+        / kSquared
+        * ((2 - kSquared) * elliptic_k(kSquared) - 2 * elliptic_e(kSquared))
+    )
+    psi = -R * A_phi * 4.0e-7
+    dpsidR = sympy.diff(psi, R)
+    dpsidZ = sympy.diff(psi, Z)
+    expected = {
+        "psi": psi,
+        "Bp_R": dpsidZ / R,
+        "Bp_Z": -dpsidR / R,
+        "d2psidR2": sympy.diff(psi, R, R),
+        "d2psidZ2": sympy.diff(psi, Z, Z),
+        "d2psidRdZ": sympy.diff(psi, R, Z),
+    }
+
+    Rgrid, Zgrid = numpy.meshgrid(
+        numpy.linspace(0.8, 1.2, 11), numpy.linspace(-0.2, 0.2, 13), indexing="ij"
+    )
+    for name, expr in expected.items():
+        func = sympy.lambdify(
+            [R, Z, a, c, I],
+            expr,
+            modules=[
+                "numpy",
+                {
+                    "elliptic_k": scipy.special.ellipk,
+                    "elliptic_e": scipy.special.ellipe,
+                },
+            ],
+        )
+        expected_values = sum(
+            func(Rgrid, Zgrid, coil["R"], coil["Z"], coil["I"]) for coil in coils
+        )
+        assert getattr(equilib, name)(Rgrid, Zgrid) == pytest.approx(
+            expected_values, rel=1.0e-9, abs=1.0e-12 * numpy.max(abs(expected_values))
+        ), name
+
+    # f_R and f_Z are calculated from the same derivatives as Bp_R and Bp_Z
+    dpsidR = -Rgrid * equilib.Bp_Z(Rgrid, Zgrid)
+    dpsidZ = Rgrid * equilib.Bp_R(Rgrid, Zgrid)
+    assert equilib.f_R(Rgrid, Zgrid) == pytest.approx(
+        dpsidR / (dpsidR ** 2 + dpsidZ ** 2), rel=1.0e-12
+    )
+    assert equilib.f_Z(Rgrid, Zgrid) == pytest.approx(
+        dpsidZ / (dpsidR ** 2 + dpsidZ ** 2), rel=1.0e-12
+    )
+
+
+@pytest.mark.parametrize("nderiv", [0, 1, 2])
+def test_coil_field_MultiLocationArray(nderiv):
+    coils = [
+        {"R": 0.7667, "Z": 0.5262, "I": 7200.0},
+        {"R": 0.7667, "Z": -0.5262, "I": 7200.0},
+        {"R": 1.381, "Z": 0.5262, "I": -504.0},
+        {"R": 1.381, "Z": -0.5262, "I": -504.0},
+    ]
+    equilib = torpex.TORPEXMagneticField(
+        {"Coils": coils, "Bt_axis": 77.0e-3},
+        {"psi_core": -1.55e-3, "psi_sol": -1.47e-3},
+    )
+
+    R = MultiLocationArray(3, 4)
+    Z = MultiLocationArray(3, 4)
+    R.centre, Z.centre = numpy.meshgrid(
+        numpy.linspace(0.9, 1.1, 3), numpy.linspace(-0.1, 0.1, 4), indexing="ij"
+    )
+    R.ylow, Z.ylow = numpy.meshgrid(
+        numpy.linspace(0.9, 1.1, 3), numpy.linspace(-0.12, 0.12, 5), indexing="ij"
+    )
+    # Z.xlow is not set, so the xlow location cannot be calculated
+    R.xlow = 1.0
+
+    result = equilib.coilPsi(R, Z, nderiv=nderiv)
+    assert len(result) == (nderiv + 1) * (nderiv + 2) // 2
+    for x, centre, ylow in zip(
+        result,
+        equilib.coilPsi(R.centre, Z.centre, nderiv=nderiv),
+        equilib.coilPsi(R.ylow, Z.ylow, nderiv=nderiv),
+    ):
+        assert x.has_centre
+        assert x.has_ylow
+        assert not x.has_xlow
+        assert not x.has_corners
+        assert x.centre == pytest.approx(centre, rel=1.0e-15)
+        assert x.ylow == pytest.approx(ylow, rel=1.0e-15)
+
+    # The arguments are not modified
+    assert not Z.has_xlow
+    assert not R.has_corners
+
+
+def test_tabulated_coil_field():
+    coils = [
+        {"R": 0.7667, "Z": 0.5262, "I": 7200.0},
+        {"R": 0.7667, "Z": -0.5262, "I": 7200.0},
+        {"R": 1.381, "Z": 0.5262, "I": -504.0},
+        {"R": 1.381, "Z": -0.5262, "I": -504.0},
+    ]
+    options = {"psi_core": -1.55e-3, "psi_sol": -1.47e-3}
+    equilib = torpex.TORPEXMagneticField({"Coils": coils, "Bt_axis": 77.0e-3}, options)
+    tabulated = torpex.TORPEXMagneticField(
+        {"Coils": coils, "Bt_axis": 77.0e-3}, dict(options, coil_field_grid_nR=129)
+    )
+
+    R, Z = numpy.meshgrid(
+        numpy.linspace(0.8, 1.2, 11), numpy.linspace(-0.2, 0.2, 13), indexing="ij"
+    )
+    for name in ["psi", "Bp_R", "Bp_Z", "d2psidR2", "d2psidZ2", "d2psidRdZ"]:
+        expected = getattr(equilib, name)(R, Z)
+        assert getattr(tabulated, name)(R, Z) == pytest.approx(
+            expected, abs=1.0e-8 * numpy.max(numpy.abs(expected))
+        ), name
+    assert tabulated.x_points[0].R == pytest.approx(equilib.x_points[0].R, abs=1.0e-8)
+    assert tabulated.x_points[0].Z == pytest.approx(equilib.x_points[0].Z, abs=1.0e-8)
+
+    # Outside the grid, the field is calculated from the coils
+    R = numpy.array([1.0, 2.0])
+    Z = numpy.array([0.0, 1.0])
+    assert tabulated.psi(R, Z)[1] == equilib.psi(R, Z)[1]
+    assert tabulated.psi(R, Z)[0] == pytest.approx(equilib.psi(R, Z)[0], rel=1.0e-8)
+
+    # A coarse grid is not accurate enough
+    with pytest.warns(UserWarning, match="coil_field_grid_rtol"):
+        torpex.TORPEXMagneticField(
+            {"Coils": coils, "Bt_axis": 77.0e-3}, dict(options, coil_field_grid_nR=9)
+        )
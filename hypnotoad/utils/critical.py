@@ -22,7 +22,7 @@ along with FreeGS.  If not, see <http://www.gnu.org/licenses/>.
 
 
 from scipy import interpolate
-from numpy.linalg import inv
+from numpy.linalg import inv, LinAlgError
 from numpy import (
     dot,
     linspace,
@@ -35,7 +35,7 @@ from numpy import (
 import numpy as np
 
 
-def find_critical(R, Z, psi, discard_xpoints=False):
+def find_critical(R, Z, psi, discard_xpoints=False, f=None, candidates=None):
     """
     Find critical points
 
@@ -45,6 +45,12 @@ def find_critical(R, Z, psi, discard_xpoints=False):
     R - R(nr, nz) 2D array of major radii
     Z - Z(nr, nz) 2D array of heights
     psi - psi(nr, nz) 2D array of psi values
+    f - Optional spline interpolating psi, a scipy.interpolate.RectBivariateSpline
+        of (R[:, 0], Z[0, :], psi), e.g. the one already created by an equilibrium.
+        If not given, it is created here
+    candidates - Optional (i, j) indices of the candidate critical points, as returned
+        by find_Bp2_minima(f, R, Z), if they have already been found. If not given,
+        they are found here
 
     Returns
     -------
@@ -60,11 +66,14 @@ def find_critical(R, Z, psi, discard_xpoints=False):
 
     """
 
-    # Get a spline interpolation function
-    f = interpolate.RectBivariateSpline(R[:, 0], Z[0, :], psi)
+    if f is None:
+        # Get a spline interpolation function
+        f = interpolate.RectBivariateSpline(R[:, 0], Z[0, :], psi)
 
     # Find candidate locations, based on minimising Bp^2
-    Bp2 = (f(R, Z, dx=1, grid=False) ** 2 + f(R, Z, dy=1, grid=False) ** 2) / R ** 2
+    if candidates is None:
+        candidates = find_Bp2_minima(f, R, Z)
+    i, j = candidates
 
     # Get grid resolution, which determines a reasonable tolerance
     # for the Newton iteration search area
@@ -72,139 +81,112 @@ def find_critical(R, Z, psi, discard_xpoints=False):
     dZ = Z[0, 1] - Z[0, 0]
     radius_sq = 9 * (dR ** 2 + dZ ** 2)
 
-    # Find local minima
-
-    J = zeros([2, 2])
+    # Use Newton iterations to find where both Br and Bz vanish, for all the local
+    # minima together
+
+    R0 = R[i, j]
+    Z0 = Z[i, j]
+
+    R1 = R0.copy()
+    Z1 = Z0.copy()
+
+    converged = np.zeros(len(R0), dtype=bool)
+
+    # Indices of the points still iterating
+    active = np.arange(len(R0))
+
+    count = 0
+    while len(active) > 0:
+        Ra = R1[active]
+        Za = Z1[active]
+
+        Br = -f(Ra, Za, dy=1, grid=False) / Ra
+        Bz = f(Ra, Za, dx=1, grid=False) / Ra
+
+        # Found a minimum
+        found = Br ** 2 + Bz ** 2 < 1e-6
+        converged[active[found]] = True
+
+        iterate = ~found
+        active = active[iterate]
+        if len(active) == 0:
+            break
+        Ra = Ra[iterate]
+        Za = Za[iterate]
+        Br = Br[iterate]
+        Bz = Bz[iterate]
+
+        # Jacobian matrix
+        # J = ( dBr/dR, dBr/dZ )
+        #     ( dBz/dR, dBz/dZ )
+        J = np.zeros([len(active), 2, 2])
+        J[:, 0, 0] = -Br / Ra - f(Ra, Za, dy=1, dx=1, grid=False) / Ra
+        J[:, 0, 1] = -f(Ra, Za, dy=2, grid=False) / Ra
+        J[:, 1, 0] = -Bz / Ra + f(Ra, Za, dx=2, grid=False) / Ra
+        J[:, 1, 1] = f(Ra, Za, dx=1, dy=1, grid=False) / Ra
+
+        Jinv = inv(J)
+        R1[active] = Ra - (Jinv[:, 0, 0] * Br + Jinv[:, 0, 1] * Bz)
+        Z1[active] = Za - (Jinv[:, 1, 0] * Br + Jinv[:, 1, 1] * Bz)
+
+        count += 1
+        # If (R1,Z1) is too far from (R0,Z0) then discard
+        # or if we've taken too many iterations
+        if count > 100:
+            break
+        keep = (R1[active] - R0[active]) ** 2 + (
+            Z1[active] - Z0[active]
+        ) ** 2 <= radius_sq
+        active = active[keep]
+
+    # Classify the critical points as either O-point or X-point
+    # Evaluate D = fxx * fyy - (fxy)^2 using the grid values of psi around the local
+    # minimum
+    i = i[converged]
+    j = j[converged]
+    R1 = R1[converged]
+    Z1 = Z1[converged]
+
+    d2dr2 = (psi[i + 2, j] - 2.0 * psi[i, j] + psi[i - 2, j]) / (2.0 * dR) ** 2
+    d2dz2 = (psi[i, j + 2] - 2.0 * psi[i, j] + psi[i, j - 2]) / (2.0 * dZ) ** 2
+    d2drdz = (
+        (psi[i + 2, j + 2] - psi[i + 2, j - 2]) / (4.0 * dZ)
+        - (psi[i - 2, j + 2] - psi[i - 2, j - 2]) / (4.0 * dZ)
+    ) / (4.0 * dR)
+    D = d2dr2 * d2dz2 - d2drdz ** 2
+
+    psi1 = f(R1, Z1, grid=False)
 
     xpoint = []
     opoint = []
-
-    nx, ny = Bp2.shape
-    for i in range(2, nx - 2):
-        for j in range(2, ny - 2):
-            if (
-                (Bp2[i, j] < Bp2[i + 1, j + 1])
-                and (Bp2[i, j] < Bp2[i + 1, j])
-                and (Bp2[i, j] < Bp2[i + 1, j - 1])
-                and (Bp2[i, j] < Bp2[i - 1, j + 1])
-                and (Bp2[i, j] < Bp2[i - 1, j])
-                and (Bp2[i, j] < Bp2[i - 1, j - 1])
-                and (Bp2[i, j] < Bp2[i, j + 1])
-                and (Bp2[i, j] < Bp2[i, j - 1])
-            ):
-
-                # Found local minimum
-
-                R0 = R[i, j]
-                Z0 = Z[i, j]
-
-                # Use Newton iterations to find where
-                # both Br and Bz vanish
-                R1 = R0
-                Z1 = Z0
-
-                count = 0
-                while True:
-
-                    Br = -f(R1, Z1, dy=1, grid=False) / R1
-                    Bz = f(R1, Z1, dx=1, grid=False) / R1
-
-                    if Br ** 2 + Bz ** 2 < 1e-6:
-                        # Found a minimum. Classify as either
-                        # O-point or X-point
-
-                        # Evaluate D = fxx * fyy - (fxy)^2
-                        if False:
-                            D = (
-                                f(R1, Z1, dx=2)[0][0] * f(R1, Z1, dy=2)[0][0]
-                                - (f(R1, Z1, dx=1, dy=1)[0][0]) ** 2
-                            )
-
-                            # print("D0 = %e" % D)
-
-                        if False:  # abs(D) < 1:
-                            # D small, so need to use another method
-                            # print("Small discriminant D (%e)" % (D,))
-
-                            # Try second derivative in index space
-
-                            dR = R[1, 0] - R[0, 0]
-                            dZ = Z[0, 1] - Z[0, 0]
-                            d2dr2 = (
-                                psi[i + 1, j] - 2.0 * psi[i, j] + psi[i - 1, j]
-                            ) / dR ** 2
-                            d2dz2 = (
-                                psi[i, j + 1] - 2.0 * psi[i, j] + psi[i, j - 1]
-                            ) / dZ ** 2
-                            d2drdz = (
-                                (psi[i + 1, j + 1] - psi[i + 1, j - 1]) / (2.0 * dZ)
-                                - (psi[i - 1, j + 1] - psi[i - 1, j - 1]) / (2.0 * dZ)
-                            ) / (2.0 * dR)
-                            D = d2dr2 * d2dz2 - d2drdz ** 2
-
-                            # print("D1 = %e" % D)
-
-                        if True:
-                            dR = R[1, 0] - R[0, 0]
-                            dZ = Z[0, 1] - Z[0, 0]
-                            d2dr2 = (
-                                psi[i + 2, j] - 2.0 * psi[i, j] + psi[i - 2, j]
-                            ) / (2.0 * dR) ** 2
-                            d2dz2 = (
-                                psi[i, j + 2] - 2.0 * psi[i, j] + psi[i, j - 2]
-                            ) / (2.0 * dZ) ** 2
-                            d2drdz = (
-                                (psi[i + 2, j + 2] - psi[i + 2, j - 2]) / (4.0 * dZ)
-                                - (psi[i - 2, j + 2] - psi[i - 2, j - 2]) / (4.0 * dZ)
-                            ) / (4.0 * dR)
-                            D = d2dr2 * d2dz2 - d2drdz ** 2
-
-                            # print("D2 = %e" % D)
-
-                        if D < 0.0:
-                            # Found X-point
-                            # print("Found X-point at %e, %e (f=%e, D=%e)"
-                            #       % (R1,Z1, f(R1,Z1)[0][0], D) )
-                            xpoint.append((R1, Z1, f(R1, Z1)[0][0]))
-                        else:
-                            # Found O-point
-                            # print("Found O-point at %e, %e (f=%e, D=%e)"
-                            #       % (R1,Z1, f(R1,Z1)[0][0], D) )
-                            opoint.append((R1, Z1, f(R1, Z1)[0][0]))
-                        break
-
-                    # Jacobian matrix
-                    # J = ( dBr/dR, dBr/dZ )
-                    #     ( dBz/dR, dBz/dZ )
-
-                    J[0, 0] = -Br / R1 - f(R1, Z1, dy=1, dx=1)[0][0] / R1
-                    J[0, 1] = -f(R1, Z1, dy=2)[0][0] / R1
-                    J[1, 0] = -Bz / R1 + f(R1, Z1, dx=2) / R1
-                    J[1, 1] = f(R1, Z1, dx=1, dy=1)[0][0] / R1
-
-                    d = dot(inv(J), [Br, Bz])
-
-                    R1 = R1 - d[0]
-                    Z1 = Z1 - d[1]
-
-                    count += 1
-                    # If (R1,Z1) is too far from (R0,Z0) then discard
-                    # or if we've taken too many iterations
-                    if ((R1 - R0) ** 2 + (Z1 - Z0) ** 2 > radius_sq) or (count > 100):
-                        # Discard this point
-                        break
+    for R1i, Z1i, psi1i, Di in zip(R1, Z1, psi1, D):
+        if Di < 0.0:
+            # Found X-point
+            xpoint.append((R1i, Z1i, psi1i))
+        else:
+            # Found O-point
+            opoint.append((R1i, Z1i, psi1i))
 
     # Remove duplicates
-    def remove_dup(points):
+    def remove_dup(points, tol_sq=1e-5):
+        # Keep each point unless it is within sqrt(tol_sq) of a point already kept.
+        # The kept points are stored in cells of that size, so each point only needs
+        # to be compared with the kept points in the 9 cells around it
+        cell_size = np.sqrt(tol_sq)
+        cells = {}
         result = []
-        for n, p in enumerate(points):
-            dup = False
-            for p2 in result:
-                if (p[0] - p2[0]) ** 2 + (p[1] - p2[1]) ** 2 < 1e-5:
-                    dup = True  # Duplicate
-                    break
+        for p in points:
+            ci = int(np.floor(p[0] / cell_size))
+            cj = int(np.floor(p[1] / cell_size))
+            dup = any(
+                (p[0] - p2[0]) ** 2 + (p[1] - p2[1]) ** 2 < tol_sq
+                for di in (-1, 0, 1)
+                for dj in (-1, 0, 1)
+                for p2 in cells.get((ci + di, cj + dj), ())
+            )
             if not dup:
                 result.append(p)  # Add to the list
+                cells.setdefault((ci, cj), []).append(p)
         return result
 
     xpoint = remove_dup(xpoint)
@@ -264,44 +246,269 @@ def find_critical(R, Z, psi, discard_xpoints=False):
     return opoint, xpoint
 
 
-def find_psisurface(eq, r0, z0, r1, z1, psival=1.0, n=100, axis=None):
+def find_Bp2_minima(f, R, Z):
+    """
+    Find the local minima of Bp^2 on the grid, which are the candidate critical points
+    used by find_critical
+
+    Inputs
+    ------
+
+    f - spline interpolating psi, e.g. scipy.interpolate.RectBivariateSpline
+    R - R(nr, nz) 2D array of major radii
+    Z - Z(nr, nz) 2D array of heights
+
+    Returns
+    -------
+
+    i, j - arrays of the indices of the grid points, in the range [2, n - 2) in each
+           direction, where Bp^2 is smaller than at all 8 of their neighbours, in the
+           same order as looping over i then j
+
+    """
+    # Evaluating the derivatives on the grid of R[:, 0] and Z[0, :] gives the same values
+    # as evaluating them at each point of R and Z, but is much faster
+    Bp2 = (f(R[:, 0], Z[0, :], dx=1) ** 2 + f(R[:, 0], Z[0, :], dy=1) ** 2) / R ** 2
+
+    nx, ny = Bp2.shape
+    centre = Bp2[2 : nx - 2, 2 : ny - 2]
+    is_minimum = np.ones(centre.shape, dtype=bool)
+    for di in (-1, 0, 1):
+        for dj in (-1, 0, 1):
+            if di != 0 or dj != 0:
+                is_minimum &= centre < Bp2[2 + di : nx - 2 + di, 2 + dj : ny - 2 + dj]
+    i, j = np.nonzero(is_minimum)
+    return i + 2, j + 2
+
+
+def refine_critical(f, R, Z, opoints, xpoints):
+    """
+    Refine the positions of the critical points of a nearby equilibrium (for example
+    the previous slice of a time series) for a new psi, using Newton iterations started
+    from each point instead of searching the whole grid as find_critical does
+
+    Inputs
+    ------
+
+    f - spline interpolating psi, e.g. scipy.interpolate.RectBivariateSpline
+    R - R(nr, nz) 2D array of major radii
+    Z - Z(nr, nz) 2D array of heights
+    opoints, xpoints - Lists of (R, Z, psi) tuples of the critical points of the nearby
+                       equilibrium, as returned by find_critical
+
+    Returns
+    -------
+
+    opoint, xpoint lists in the same form as find_critical, or None if any of the
+    points does not converge (including if the Jacobian is singular), moves by more
+    than three grid cells, leaves the grid, changes between O- and X-point, or merges
+    with another point. Critical points that are not close to one of the input points
+    are not found; compare the number of minima found by find_Bp2_minima to check
+    whether there may be new ones.
+
+    """
+    dR = R[1, 0] - R[0, 0]
+    dZ = Z[0, 1] - Z[0, 0]
+    radius_sq = 9 * (dR ** 2 + dZ ** 2)
+    step_tol_sq = 1.0e-16 * (dR ** 2 + dZ ** 2)
+
+    # Points must stay in the part of the grid searched by find_critical
+    Rmin, Rmax = R[2, 0], R[-3, 0]
+    Zmin, Zmax = Z[0, 2], Z[0, -3]
+
+    def refine(point):
+        R0, Z0, _ = point
+        R1 = R0
+        Z1 = Z0
+
+        J = zeros([2, 2])
+        count = 0
+        while True:
+            Br = -f(R1, Z1, dy=1, grid=False) / R1
+            Bz = f(R1, Z1, dx=1, grid=False) / R1
+
+            # Jacobian matrix
+            # J = ( dBr/dR, dBr/dZ )
+            #     ( dBz/dR, dBz/dZ )
+            J[0, 0] = -Br / R1 - f(R1, Z1, dy=1, dx=1, grid=False) / R1
+            J[0, 1] = -f(R1, Z1, dy=2, grid=False) / R1
+            J[1, 0] = -Bz / R1 + f(R1, Z1, dx=2, grid=False) / R1
+            J[1, 1] = f(R1, Z1, dx=1, dy=1, grid=False) / R1
+
+            try:
+                d = dot(inv(J), [Br, Bz])
+            except LinAlgError:
+                return None
+
+            R1 = R1 - d[0]
+            Z1 = Z1 - d[1]
+
+            count += 1
+            if ((R1 - R0) ** 2 + (Z1 - Z0) ** 2 > radius_sq) or (count > 100):
+                return None
+
+            if d[0] ** 2 + d[1] ** 2 < step_tol_sq:
+                # Converged. Iterate until the step is small, rather than stopping as
+                # soon as Bp is small as find_critical does, so that the result does not
+                # depend on where the iteration started
+                break
+
+        Br = -f(R1, Z1, dy=1, grid=False) / R1
+        Bz = f(R1, Z1, dx=1, grid=False) / R1
+        if (
+            Br ** 2 + Bz ** 2 >= 1e-6
+            or not Rmin <= R1 <= Rmax
+            or not Zmin <= Z1 <= Zmax
+        ):
+            return None
+
+        # Classify using D = fxx * fyy - (fxy)^2, which is negative at an X-point
+        D = (
+            f(R1, Z1, dx=2, grid=False) * f(R1, Z1, dy=2, grid=False)
+            - f(R1, Z1, dx=1, dy=1, grid=False) ** 2
+        )
+
+        return (float(R1), float(Z1), float(f(R1, Z1, grid=False))), D
+
+    opoint = []
+    for point in opoints:
+        result = refine(point)
+        if result is None or result[1] <= 0.0:
+            return None
+        opoint.append(result[0])
+
+    xpoint = []
+    for point in xpoints:
+        result = refine(point)
+        if result is None or result[1] >= 0.0:
+            return None
+        xpoint.append(result[0])
+
+    # Check that no two points have converged to the same critical point
+    points = opoint + xpoint
+    for n, p in enumerate(points):
+        for p2 in points[:n]:
+            if (p[0] - p2[0]) ** 2 + (p[1] - p2[1]) ** 2 < 1e-5:
+                return None
+
+    if len(opoint) > 0:
+        # Order the points in the same way as find_critical
+        Rmid = 0.5 * (R[-1, 0] + R[0, 0])
+        Zmid = 0.5 * (Z[0, -1] + Z[0, 0])
+        opoint.sort(key=lambda x: (x[0] - Rmid) ** 2 + (x[1] - Zmid) ** 2)
+
+        psi_axis = opoint[0][2]
+        xpoint.sort(key=lambda x: (x[2] - psi_axis) ** 2)
+
+    return opoint, xpoint
+
+
+def find_psisurface(
+    eq, r0, z0, r1, z1, psival=1.0, n=100, axis=None, atol=1.0e-12, maxits=100
+):
     """
     eq      - Equilibrium object
     (r0,z0) - Start location inside separatrix
     (r1,z1) - Location outside separatrix
 
     n - Number of starting points to use
-    """
-    # Clip (r1,z1) to be inside domain
-    # Shorten the line so that the direction is unchanged
-    if abs(r1 - r0) > 1e-6:
-        rclip = clip(r1, eq.Rmin, eq.Rmax)
-        z1 = z0 + (z1 - z0) * abs((rclip - r0) / (r1 - r0))
-        r1 = rclip
 
-    if abs(z1 - z0) > 1e-6:
-        zclip = clip(z1, eq.Zmin, eq.Zmax)
-        r1 = r0 + (r1 - r0) * abs((zclip - z0) / (z1 - z0))
-        z1 = zclip
+    r1, z1 and psival may be arrays, to search along many lines from (r0,z0) at once.
+    psi is evaluated at n points along all the lines in a single call, the first
+    crossing of psival along each line is found, and then all the crossings are refined
+    together with a bracketed root finder (the Illinois variant of regula falsi),
+    until the position along each line changes by less than atol.
 
-    r = linspace(r0, r1, n)
-    z = linspace(z0, z1, n)
+    Returns the (r,z) locations of the crossings, arrays if any of r1, z1 or psival
+    are arrays. If psi does not cross psival along a line, the point on the line where
+    psi is closest to psival is returned.
+    """
+    scalar = np.ndim(r1) == 0 and np.ndim(z1) == 0 and np.ndim(psival) == 0
+    r1, z1, psival = (np.atleast_1d(x).astype(float) for x in (r1, z1, psival))
+    r1, z1, psival = np.broadcast_arrays(r1, z1, psival)
+    r1 = r1.copy()
+    z1 = z1.copy()
 
-    if axis is not None:
-        axis.plot(r, z)
+    # Clip (r1,z1) to be inside domain
+    # Shorten the line so that the direction is unchanged
+    mask = abs(r1 - r0) > 1e-6
+    rclip = clip(r1[mask], eq.Rmin, eq.Rmax)
+    z1[mask] = z0 + (z1[mask] - z0) * abs((rclip - r0) / (r1[mask] - r0))
+    r1[mask] = rclip
 
-    psidiff = eq.psi(r, z) - psival
+    mask = abs(z1 - z0) > 1e-6
+    zclip = clip(z1[mask], eq.Zmin, eq.Zmax)
+    r1[mask] = r0 + (r1[mask] - r0) * abs((zclip - z0) / (z1[mask] - z0))
+    z1[mask] = zclip
 
-    # Find the first index this crosses zero
-    ind = np.argmax(psidiff[1:] * psidiff[0:-1] < 0.0)
-    # between ind and ind-1
+    # Points along each line are (r0,z0) + s*(dr,dz) for 0 <= s <= 1
+    dr = r1 - r0
+    dz = z1 - z0
 
-    f = psidiff[ind] / (psidiff[ind] - psidiff[ind - 1])
+    s = linspace(0.0, 1.0, n)
+    r = r0 + dr[:, np.newaxis] * s
+    z = z0 + dz[:, np.newaxis] * s
 
-    r = (1.0 - f) * r[ind] + f * r[ind - 1]
-    z = (1.0 - f) * z[ind] + f * z[ind - 1]
+    if axis is not None:
+        axis.plot(r.T, z.T)
+
+    psidiff = eq.psi(r, z) - psival[:, np.newaxis]
+
+    # Find the first index where each line crosses zero. The crossing is between ind
+    # and ind+1
+    crossing = psidiff[:, 1:] * psidiff[:, :-1] < 0.0
+    ind = np.argmax(crossing, axis=1)
+    found = crossing.any(axis=1)
+
+    result = np.where(found, s[ind], s[np.argmin(abs(psidiff), axis=1)])
+
+    # Refine the crossings, keeping each root bracketed by [a, b]
+    active = np.nonzero(found)[0]
+    a = s[ind[active]]
+    b = s[ind[active] + 1]
+    fa = psidiff[active, ind[active]]
+    fb = psidiff[active, ind[active] + 1]
+    # Tolerance on s for each line
+    stol = atol / np.sqrt(dr[active] ** 2 + dz[active] ** 2)
+    # Which end of the bracket was moved on the previous iteration: -1 for a, 1 for b
+    side = np.zeros(len(active), dtype=int)
+    snew = a - fa * (b - a) / (fb - fa)
+    for count in range(maxits):
+        if len(active) == 0:
+            break
+        fnew = eq.psi(r0 + dr[active] * snew, z0 + dz[active] * snew) - psival[active]
+
+        move_a = fnew * fa > 0.0
+        # Illinois modification: if the same end moves twice in a row, halve the value
+        # at the other end so that both ends of the bracket converge on the root
+        fb = np.where(move_a & (side == -1), 0.5 * fb, fb)
+        fa = np.where(~move_a & (side == 1), 0.5 * fa, fa)
+        a = np.where(move_a, snew, a)
+        fa = np.where(move_a, fnew, fa)
+        b = np.where(move_a, b, snew)
+        fb = np.where(move_a, fb, fnew)
+        side = np.where(move_a, -1, 1)
+
+        sold = snew
+        snew = a - fa * (b - a) / (fb - fa)
+
+        # Stop if the new point is exactly on the root, or if it cannot be improved
+        exact = (fnew == 0.0) | ~np.isfinite(snew)
+        done = exact | (abs(snew - sold) < stol)
+        result[active[done]] = np.where(exact[done], sold[done], snew[done])
+        iterate = ~done
+        active = active[iterate]
+        a, b, fa, fb = a[iterate], b[iterate], fa[iterate], fb[iterate]
+        side, snew, stol = side[iterate], snew[iterate], stol[iterate]
+    else:
+        result[active] = snew
+
+    r = r0 + dr * result
+    z = z0 + dz * result
 
     if axis is not None:
         axis.plot(r, z, "bo")
 
+    if scalar:
+        return r[0], z[0]
     return r, z
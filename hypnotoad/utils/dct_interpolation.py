@@ -125,16 +125,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)
@@ -181,16 +181,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)
@@ -237,16 +237,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)
@@ -292,16 +292,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)
@@ -347,16 +347,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)
@@ -405,16 +405,16 @@ class DCT_2D:
             ), "if R is a MultiLocationArray, then Z must be as well"
 
             result = MultiLocationArray(R.nx, R.ny)
-            if iR.centre is not None and iZ.centre is not None:
+            if iR.has_centre and iZ.has_centre:
                 result.centre = getResult(iR.centre, iZ.centre)
 
-            if iR.xlow is not None and iZ.xlow is not None:
+            if iR.has_xlow and iZ.has_xlow:
                 result.xlow = getResult(iR.xlow, iZ.xlow)
 
-            if iR.ylow is not None and iZ.ylow is not None:
+            if iR.has_ylow and iZ.has_ylow:
                 result.ylow = getResult(iR.ylow, iZ.ylow)
 
-            if iR.corners is not None and iZ.corners is not None:
+            if iR.has_corners and iZ.has_corners:
                 result.corners = getResult(iR.corners, iZ.corners)
         else:
             result = getResult(iR, iZ)